@@ -0,0 +1,74 @@
+"""
+Database migration: Double-entry ledger of money movements
+
+Revision ID: ledger
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'ledger'
+down_revision = 'payouts'
+branch_labels = None
+depends_on = None
+
+LEDGER_ACCOUNT_TYPE = sa.Enum('ASSET', 'LIABILITY', 'REVENUE', name='ledger_account_type_enum')
+LEDGER_ENTRY_KIND = sa.Enum('PAYMENT_RECEIVED', 'SETTLEMENT', 'SETTLEMENT_REVERSAL', 'PAYOUT', name='ledger_entry_kind_enum')
+
+
+def upgrade():
+    """Create ledger_accounts, ledger_entries and ledger_postings"""
+    op.create_table(
+        'ledger_accounts',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('account_type', LEDGER_ACCOUNT_TYPE, nullable=False),
+        sa.Column('owner_id', sa.String(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('balance_kobo', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_ledger_accounts_owner_id', 'ledger_accounts', ['owner_id'])
+
+    op.create_table(
+        'ledger_entries',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('kind', LEDGER_ENTRY_KIND, nullable=False),
+        sa.Column('reference', sa.String(), nullable=False),
+        sa.Column('transaction_id', sa.String(), sa.ForeignKey('transactions.id'), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('posted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'reference', name='uq_ledger_entries_kind_reference'),
+    )
+    op.create_index('ix_ledger_entries_transaction_id', 'ledger_entries', ['transaction_id'])
+    op.create_index('ix_ledger_entries_posted_at', 'ledger_entries', ['posted_at'])
+
+    op.create_table(
+        'ledger_postings',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('entry_id', sa.Integer(), sa.ForeignKey('ledger_entries.id'), nullable=False),
+        sa.Column('account_id', sa.String(), sa.ForeignKey('ledger_accounts.id'), nullable=False),
+        sa.Column('amount_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('balance_after_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('posted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_ledger_postings_entry_id', 'ledger_postings', ['entry_id'])
+    op.create_index('ix_ledger_postings_posted_at', 'ledger_postings', ['posted_at'])
+    op.create_index('ix_ledger_postings_account_posted', 'ledger_postings', ['account_id', 'posted_at', 'id'])
+
+
+def downgrade():
+    """Drop the ledger tables"""
+    op.drop_index('ix_ledger_postings_account_posted', table_name='ledger_postings')
+    op.drop_index('ix_ledger_postings_posted_at', table_name='ledger_postings')
+    op.drop_index('ix_ledger_postings_entry_id', table_name='ledger_postings')
+    op.drop_table('ledger_postings')
+    op.drop_index('ix_ledger_entries_posted_at', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_transaction_id', table_name='ledger_entries')
+    op.drop_table('ledger_entries')
+    op.drop_index('ix_ledger_accounts_owner_id', table_name='ledger_accounts')
+    op.drop_table('ledger_accounts')
+    LEDGER_ENTRY_KIND.drop(op.get_bind(), checkfirst=True)
+    LEDGER_ACCOUNT_TYPE.drop(op.get_bind(), checkfirst=True)
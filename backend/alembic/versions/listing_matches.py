@@ -0,0 +1,49 @@
+"""
+Database migration: Buyer matches for produce listings
+
+Revision ID: listing_matches
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'listing_matches'
+down_revision = 'produce_listing_search_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add listing_matches and the matched_at marker used by incremental matching"""
+    op.create_table(
+        'listing_matches',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('listing_id', sa.String(), sa.ForeignKey('produce_listings.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('buyer_id', sa.String(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('crop_score', sa.Float(), nullable=False),
+        sa.Column('distance_score', sa.Float(), nullable=False),
+        sa.Column('volume_score', sa.Float(), nullable=False),
+        sa.Column('price_score', sa.Float(), nullable=False),
+        sa.Column('reliability_score', sa.Float(), nullable=False),
+        sa.Column('distance_km', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('listing_id', 'buyer_id', name='uq_listing_matches_listing_buyer')
+    )
+    op.create_index('ix_listing_matches_listing_rank', 'listing_matches', ['listing_id', 'rank'])
+    op.create_index('ix_listing_matches_buyer_score', 'listing_matches', ['buyer_id', 'score'])
+
+    # Existing listings start unmatched and are picked up by the next run
+    op.add_column('produce_listings', sa.Column('matched_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_produce_listings_matched_at', 'produce_listings', ['matched_at'])
+
+
+def downgrade():
+    """Drop listing matches"""
+    op.drop_index('ix_produce_listings_matched_at', table_name='produce_listings')
+    op.drop_column('produce_listings', 'matched_at')
+    op.drop_index('ix_listing_matches_buyer_score', table_name='listing_matches')
+    op.drop_index('ix_listing_matches_listing_rank', table_name='listing_matches')
+    op.drop_table('listing_matches')
@@ -0,0 +1,39 @@
+"""
+Database migration: Store transaction and payment amounts in whole kobo
+
+Revision ID: money_minor_units
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'money_minor_units'
+down_revision = 'transaction_lookup_indexes'
+branch_labels = None
+depends_on = None
+
+# (table, float naira column, integer kobo column)
+MONEY_COLUMNS = (
+    ('transactions', 'agreed_price_per_kg', 'agreed_price_per_kg_kobo'),
+    ('transactions', 'total_amount', 'total_amount_kobo'),
+    ('payment_records', 'amount', 'amount_kobo'),
+)
+
+
+def upgrade():
+    """Add BigInteger kobo columns, fill them from the float naira columns and drop those"""
+    for table, naira, kobo in MONEY_COLUMNS:
+        op.add_column(table, sa.Column(kobo, sa.BigInteger(), nullable=True))
+        # Round through numeric so 0.29 becomes 29 kobo, not 28
+        op.execute(f"UPDATE {table} SET {kobo} = ROUND(CAST({naira} AS NUMERIC) * 100)")
+        op.alter_column(table, kobo, nullable=False)
+        op.drop_column(table, naira)
+
+
+def downgrade():
+    """Restore the float naira columns"""
+    for table, naira, kobo in reversed(MONEY_COLUMNS):
+        op.add_column(table, sa.Column(naira, sa.Float(), nullable=True))
+        op.execute(f"UPDATE {table} SET {naira} = {kobo} / 100.0")
+        op.alter_column(table, naira, nullable=False)
+        op.drop_column(table, kobo)
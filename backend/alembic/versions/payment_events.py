@@ -0,0 +1,42 @@
+"""
+Database migration: Inbox of Paystack webhook events
+
+Revision ID: payment_events
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'payment_events'
+down_revision = 'row_versions'
+branch_labels = None
+depends_on = None
+
+PAYMENT_EVENT_STATUS = sa.Enum('RECEIVED', 'PROCESSED', 'IGNORED', 'FAILED', name='payment_event_status_enum')
+
+
+def upgrade():
+    """Add payment_events with the replay index"""
+    op.create_table(
+        'payment_events',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('event', sa.String(), nullable=False),
+        sa.Column('reference', sa.String(), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('status', PAYMENT_EVENT_STATUS, nullable=False, server_default='RECEIVED'),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_payment_events_reference', 'payment_events', ['reference'])
+    op.create_index('ix_payment_events_status_received', 'payment_events', ['status', 'received_at'])
+
+
+def downgrade():
+    """Drop payment_events"""
+    op.drop_index('ix_payment_events_status_received', table_name='payment_events')
+    op.drop_index('ix_payment_events_reference', table_name='payment_events')
+    op.drop_table('payment_events')
+    PAYMENT_EVENT_STATUS.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,26 @@
+"""
+Database migration: Index pending payments by age for the reconciliation job
+
+Revision ID: payment_records_pending_index
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'payment_records_pending_index'
+down_revision = 'payment_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Partial index so each reconciliation batch reads only pending payments, oldest first"""
+    op.create_index(
+        'ix_payment_records_pending_created', 'payment_records',
+        ['created_at', 'id'], postgresql_where=sa.text("status = 'PENDING'")
+    )
+
+
+def downgrade():
+    """Drop the pending payments index"""
+    op.drop_index('ix_payment_records_pending_created', table_name='payment_records')
@@ -0,0 +1,97 @@
+"""
+Database migration: Farmer payout batches, payouts and the settlement ledger
+
+Revision ID: payouts
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'payouts'
+down_revision = 'money_minor_units'
+branch_labels = None
+depends_on = None
+
+PAYOUT_BATCH_STATUS = sa.Enum('PENDING', 'SUBMITTED', 'COMPLETED', 'FAILED', name='payout_batch_status_enum')
+PAYOUT_STATUS = sa.Enum('PENDING', 'PROCESSING', 'PAID', 'FAILED', name='payout_status_enum')
+
+
+def upgrade():
+    """Create payout_batches, payouts and settlement_ledger; add the farmer's Paystack recipient"""
+    op.add_column('farmer_profiles', sa.Column('paystack_recipient_code', sa.String(), nullable=True))
+
+    op.create_table(
+        'payout_batches',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('reference', sa.String(), nullable=False),
+        sa.Column('gateway', sa.String(), nullable=False),
+        sa.Column('status', PAYOUT_BATCH_STATUS, nullable=False, server_default='PENDING'),
+        sa.Column('transfer_count', sa.Integer(), nullable=False),
+        sa.Column('gross_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('fee_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('net_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('submitted_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('reference'),
+    )
+    op.create_index('ix_payout_batches_status_created', 'payout_batches', ['status', 'created_at'])
+
+    op.create_table(
+        'payouts',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('batch_id', sa.String(), sa.ForeignKey('payout_batches.id'), nullable=False),
+        sa.Column('farmer_id', sa.String(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('recipient_code', sa.String(), nullable=False),
+        sa.Column('reference', sa.String(), nullable=False),
+        sa.Column('gross_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('fee_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('net_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('status', PAYOUT_STATUS, nullable=False, server_default='PENDING'),
+        sa.Column('transfer_code', sa.String(), nullable=True),
+        sa.Column('failure_reason', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('paid_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('reference'),
+    )
+    op.create_index('ix_payouts_batch_id', 'payouts', ['batch_id'])
+    op.create_index('ix_payouts_farmer_id', 'payouts', ['farmer_id'])
+    op.create_index('ix_payouts_status', 'payouts', ['status'])
+
+    op.create_table(
+        'settlement_ledger',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('transaction_id', sa.String(), sa.ForeignKey('transactions.id'), nullable=False),
+        sa.Column('payout_id', sa.String(), sa.ForeignKey('payouts.id'), nullable=False),
+        sa.Column('farmer_id', sa.String(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('gross_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('fee_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('net_kobo', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('released_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_settlement_ledger_payout_id', 'settlement_ledger', ['payout_id'])
+    # One open settlement per deal
+    op.create_index('uq_settlement_ledger_open_transaction', 'settlement_ledger', ['transaction_id'], unique=True,
+                    postgresql_where=sa.text('released_at IS NULL'))
+
+
+def downgrade():
+    """Drop the payout tables and the farmer's Paystack recipient"""
+    op.drop_index('uq_settlement_ledger_open_transaction', table_name='settlement_ledger')
+    op.drop_index('ix_settlement_ledger_payout_id', table_name='settlement_ledger')
+    op.drop_table('settlement_ledger')
+    op.drop_index('ix_payouts_status', table_name='payouts')
+    op.drop_index('ix_payouts_farmer_id', table_name='payouts')
+    op.drop_index('ix_payouts_batch_id', table_name='payouts')
+    op.drop_table('payouts')
+    op.drop_index('ix_payout_batches_status_created', table_name='payout_batches')
+    op.drop_table('payout_batches')
+    op.drop_column('farmer_profiles', 'paystack_recipient_code')
+    PAYOUT_STATUS.drop(op.get_bind(), checkfirst=True)
+    PAYOUT_BATCH_STATUS.drop(op.get_bind(), checkfirst=True)
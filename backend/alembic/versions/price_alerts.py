@@ -0,0 +1,45 @@
+"""
+Database migration: Price alert subscriptions
+
+Revision ID: price_alerts
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'price_alerts'
+down_revision = 'price_index_daily'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add price_alerts with the range lookup index"""
+    op.create_table(
+        'price_alerts',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('crop_type', sa.String(), nullable=False),
+        sa.Column('region', sa.String(), nullable=False),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('direction', sa.Enum('ABOVE', 'BELOW', name='price_alert_direction_enum'), nullable=False),
+        sa.Column('threshold_price', sa.Float(), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=True),
+        sa.Column('last_triggered_at', sa.DateTime(), nullable=True),
+        sa.Column('last_triggered_price', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_price_alerts_user_id', 'price_alerts', ['user_id'])
+    op.create_index(
+        'ix_price_alerts_lookup', 'price_alerts',
+        ['crop_type', 'source', 'direction', 'region', 'threshold_price']
+    )
+
+
+def downgrade():
+    """Drop price alerts"""
+    op.drop_index('ix_price_alerts_lookup', table_name='price_alerts')
+    op.drop_index('ix_price_alerts_user_id', table_name='price_alerts')
+    op.drop_table('price_alerts')
+    sa.Enum(name='price_alert_direction_enum').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,45 @@
+"""
+Database migration: Daily market price index
+
+Revision ID: price_index_daily
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'price_index_daily'
+down_revision = 'produce_listing_text_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add price_index_daily and index deal dates for the rollups"""
+    op.create_table(
+        'price_index_daily',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('crop_type', sa.String(), nullable=False),
+        sa.Column('region', sa.String(), nullable=False),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('median_price', sa.Float(), nullable=False),
+        sa.Column('p25_price', sa.Float(), nullable=False),
+        sa.Column('p75_price', sa.Float(), nullable=False),
+        sa.Column('min_price', sa.Float(), nullable=False),
+        sa.Column('max_price', sa.Float(), nullable=False),
+        sa.Column('avg_price', sa.Float(), nullable=False),
+        sa.Column('sample_count', sa.Integer(), nullable=False),
+        sa.Column('volume_kg', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('crop_type', 'region', 'source', 'day', name='uq_price_index_daily_bucket')
+    )
+    op.create_index('ix_price_index_daily_crop_region_day', 'price_index_daily', ['crop_type', 'region', 'day'])
+    op.create_index('ix_transactions_matched_at', 'transactions', ['matched_at'])
+
+
+def downgrade():
+    """Drop the price index"""
+    op.drop_index('ix_transactions_matched_at', table_name='transactions')
+    op.drop_index('ix_price_index_daily_crop_region_day', table_name='price_index_daily')
+    op.drop_table('price_index_daily')
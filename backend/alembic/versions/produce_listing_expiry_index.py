@@ -0,0 +1,26 @@
+"""
+Database migration: Index available listings by expiry for the expiry job
+
+Revision ID: produce_listing_expiry_index
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'produce_listing_expiry_index'
+down_revision = 'listing_matches'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Partial index so the bulk expiry UPDATE only touches available listings"""
+    op.create_index(
+        'ix_produce_listings_available_expires', 'produce_listings',
+        ['expires_at'], postgresql_where=sa.text("status = 'AVAILABLE'")
+    )
+
+
+def downgrade():
+    """Drop the expiry index"""
+    op.drop_index('ix_produce_listings_available_expires', table_name='produce_listings')
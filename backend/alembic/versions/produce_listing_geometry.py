@@ -0,0 +1,62 @@
+"""
+Database migration: Store produce listing locations as PostGIS points
+
+Revision ID: produce_listing_geometry
+"""
+from alembic import op
+import sqlalchemy as sa
+import geoalchemy2
+
+# revision identifiers
+revision = 'produce_listing_geometry'
+down_revision = 'add_webchat_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Convert location from text to geometry(POINT, 4326) and add spatial indexes"""
+    op.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+
+    op.add_column('produce_listings', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('produce_listings', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('produce_listings', sa.Column('region', sa.String(), nullable=True))
+    op.add_column('produce_listings', sa.Column('geohash', sa.String(length=12), nullable=True))
+
+    # Existing rows hold EWKT text such as "SRID=4326;POINT(8.52 11.99)"
+    op.alter_column(
+        'produce_listings', 'location',
+        type_=geoalchemy2.Geometry('POINT', srid=4326, spatial_index=False),
+        postgresql_using='ST_GeomFromEWKT(location)'
+    )
+    op.execute(
+        "UPDATE produce_listings SET latitude = ST_Y(location), longitude = ST_X(location), "
+        "geohash = ST_GeoHash(location, 9)"
+    )
+
+    op.create_index('idx_produce_listings_location', 'produce_listings', ['location'], postgresql_using='gist')
+    op.execute(
+        "CREATE INDEX ix_produce_listings_location_geography "
+        "ON produce_listings USING gist ((location::geography))"
+    )
+    op.create_index('ix_produce_listings_region', 'produce_listings', ['region'])
+    op.create_index('ix_produce_listings_geohash', 'produce_listings', ['geohash'])
+
+
+def downgrade():
+    """Revert location to EWKT text"""
+    op.drop_index('ix_produce_listings_geohash', table_name='produce_listings')
+    op.drop_index('ix_produce_listings_region', table_name='produce_listings')
+    op.execute("DROP INDEX IF EXISTS ix_produce_listings_location_geography")
+    op.drop_index('idx_produce_listings_location', table_name='produce_listings')
+
+    op.alter_column(
+        'produce_listings', 'location',
+        type_=sa.Text(),
+        postgresql_using='ST_AsEWKT(location)'
+    )
+
+    op.drop_column('produce_listings', 'geohash')
+    op.drop_column('produce_listings', 'region')
+    op.drop_column('produce_listings', 'longitude')
+    op.drop_column('produce_listings', 'latitude')
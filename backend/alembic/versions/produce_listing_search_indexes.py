@@ -0,0 +1,38 @@
+"""
+Database migration: Composite and partial indexes for produce search
+
+Revision ID: produce_listing_search_indexes
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'produce_listing_search_indexes'
+down_revision = 'produce_listing_geometry'
+branch_labels = None
+depends_on = None
+
+AVAILABLE = sa.text("status = 'AVAILABLE'")
+
+
+def upgrade():
+    """Index the search filters together with the (created_at, id) keyset order"""
+    op.create_index(
+        'ix_produce_listings_available_crop_created', 'produce_listings',
+        ['crop_type', 'created_at', 'id'], postgresql_where=AVAILABLE
+    )
+    op.create_index(
+        'ix_produce_listings_available_created', 'produce_listings',
+        ['created_at', 'id'], postgresql_where=AVAILABLE
+    )
+    op.create_index('ix_produce_listings_farmer_created', 'produce_listings', ['farmer_id', 'created_at', 'id'])
+    op.create_index('ix_produce_listings_created_id', 'produce_listings', ['created_at', 'id'])
+    op.execute("ANALYZE produce_listings")
+
+
+def downgrade():
+    """Drop the produce search indexes"""
+    op.drop_index('ix_produce_listings_created_id', table_name='produce_listings')
+    op.drop_index('ix_produce_listings_farmer_created', table_name='produce_listings')
+    op.drop_index('ix_produce_listings_available_created', table_name='produce_listings')
+    op.drop_index('ix_produce_listings_available_crop_created', table_name='produce_listings')
@@ -0,0 +1,35 @@
+"""
+Database migration: Full-text and trigram search over produce listings
+
+Revision ID: produce_listing_text_search
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'produce_listing_text_search'
+down_revision = 'produce_listing_expiry_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Generated tsvector with a GIN index, and pg_trgm indexes for fuzzy matching"""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "ALTER TABLE produce_listings ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(crop_type, '') || ' ' || coalesce(transcription, ''))) STORED"
+    )
+    op.execute("CREATE INDEX ix_produce_listings_search_vector ON produce_listings USING gin (search_vector)")
+    op.execute("CREATE INDEX ix_produce_listings_crop_type_trgm ON produce_listings USING gin (crop_type gin_trgm_ops)")
+    op.execute(
+        "CREATE INDEX ix_produce_listings_transcription_trgm ON produce_listings USING gin (transcription gin_trgm_ops)"
+    )
+
+
+def downgrade():
+    """Drop the search indexes and column"""
+    op.drop_index('ix_produce_listings_transcription_trgm', table_name='produce_listings')
+    op.drop_index('ix_produce_listings_crop_type_trgm', table_name='produce_listings')
+    op.drop_index('ix_produce_listings_search_vector', table_name='produce_listings')
+    op.drop_column('produce_listings', 'search_vector')
@@ -0,0 +1,25 @@
+"""
+Database migration: Version columns for optimistic concurrency on listings and transactions
+
+Revision ID: row_versions
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'row_versions'
+down_revision = 'price_alerts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add version to produce_listings and transactions; existing rows start at 1"""
+    for table in ('produce_listings', 'transactions'):
+        op.add_column(table, sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    """Drop the version columns"""
+    for table in ('transactions', 'produce_listings'):
+        op.drop_column(table, 'version')
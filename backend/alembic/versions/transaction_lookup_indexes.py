@@ -0,0 +1,28 @@
+"""
+Database migration: Index transaction lookups by listing, party and status
+
+Revision ID: transaction_lookup_indexes
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'transaction_lookup_indexes'
+down_revision = 'payment_records_pending_index'
+branch_labels = None
+depends_on = None
+
+TRANSACTION_INDEXES = ('produce_listing_id', 'buyer_id', 'seller_id', 'status')
+
+
+def upgrade():
+    """Index the columns deals are looked up by, and payments by deal"""
+    for column in TRANSACTION_INDEXES:
+        op.create_index(f'ix_transactions_{column}', 'transactions', [column])
+    op.create_index('ix_payment_records_transaction_id', 'payment_records', ['transaction_id'])
+
+
+def downgrade():
+    """Drop the lookup indexes"""
+    op.drop_index('ix_payment_records_transaction_id', table_name='payment_records')
+    for column in reversed(TRANSACTION_INDEXES):
+        op.drop_index(f'ix_transactions_{column}', table_name='transactions')
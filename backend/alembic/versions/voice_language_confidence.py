@@ -0,0 +1,23 @@
+"""
+Database migration: Confidence of each voice note's detected language
+
+Revision ID: voice_language_confidence
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'voice_language_confidence'
+down_revision = 'voice_message_replies'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add language_confidence; existing notes have none, so they no longer override the profile language"""
+    op.add_column('voice_messages', sa.Column('language_confidence', sa.Float(), nullable=True))
+
+
+def downgrade():
+    """Drop language_confidence"""
+    op.drop_column('voice_messages', 'language_confidence')
@@ -0,0 +1,34 @@
+"""
+Database migration: Store each voice note's reply on the voice note
+
+Revision ID: voice_message_replies
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'voice_message_replies'
+down_revision = 'ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add the session, reply and TTS URL of each voice note; backfill what the sessions still point at"""
+    op.add_column('voice_messages', sa.Column('session_id', sa.String(), nullable=True))
+    op.add_column('voice_messages', sa.Column('ai_response', sa.Text(), nullable=True))
+    op.add_column('voice_messages', sa.Column('ai_voice_response_url', sa.String(), nullable=True))
+    op.create_index('ix_voice_messages_session_id', 'voice_messages', ['session_id'])
+    op.execute(
+        "UPDATE voice_messages SET session_id = chat_sessions.id, "
+        "ai_voice_response_url = chat_sessions.ai_voice_response_url "
+        "FROM chat_sessions WHERE chat_sessions.voice_message_id = voice_messages.id"
+    )
+
+
+def downgrade():
+    """Drop the reply columns"""
+    op.drop_index('ix_voice_messages_session_id', table_name='voice_messages')
+    op.drop_column('voice_messages', 'ai_voice_response_url')
+    op.drop_column('voice_messages', 'ai_response')
+    op.drop_column('voice_messages', 'session_id')
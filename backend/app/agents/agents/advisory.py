@@ -2,6 +2,7 @@ from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from app.core.config import settings
 from app.agents.tools.advisory_tools import get_crop_advice
+from app.agents.tools.market_tools import get_market_prices
 
 def create_advisory_agent():
     """Create the advisory agent"""
@@ -22,6 +23,7 @@ def create_advisory_agent():
 2. **Ask for Details**: If a farming question is too vague, ask for specifics before calling tools
 3. **Use Tools Wisely**: Only call get_crop_advice when you have a specific, detailed farming question
 4. **Be Encouraging**: Use friendly language and emojis to encourage farmers
+5. **Quote Real Prices**: For price questions, call get_market_prices instead of guessing
 
 **Examples of when NOT to call tools:**
 - "Hello" or "Hi" → Respond with a warm greeting
@@ -36,8 +38,9 @@ def create_advisory_agent():
 
 Keep responses simple, clear, and encouraging.
 DO NOT use XML tags like <function=...> in your response. Just use the provided tools directly."""),
+        ("system", "{language_instruction}"),
         MessagesPlaceholder(variable_name="messages"),
     ])
     
-    tools = [get_crop_advice]
+    tools = [get_crop_advice, get_market_prices]
     return prompt | llm.bind_tools(tools)
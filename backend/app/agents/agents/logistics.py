@@ -41,6 +41,7 @@ Once I have these details, I can schedule a pickup for you."
 - DO NOT use XML tags like <function=...> in your response. Just use the provided tools directly.
 
 Be efficient and friendly!"""),
+        ("system", "{language_instruction}"),
         MessagesPlaceholder(variable_name="messages"),
     ])
     
@@ -2,6 +2,7 @@ from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from app.core.config import settings
 from app.agents.tools.payment_tools import get_payment_info, process_payment
+from app.agents.tools.market_tools import get_market_prices
 
 def create_sales_agent():
     """Create the sales/transaction agent"""
@@ -24,7 +25,9 @@ def create_sales_agent():
    - ONLY call this if you have a specific numeric amount
    - The amount parameter MUST be a number (e.g., 5000.0), NOT a string
    - If you don't have an amount, explain to user how payments work instead
+   - Pass transaction_id when the user names the transaction (e.g., "txn_1a2b3c4d")
 4. **Be Security-Conscious**: Reassure users about payment security
+5. **Use get_market_prices**: When users ask what a crop is selling for or what price to ask
 
 **Examples:**
 User: "Check my payment status"
@@ -37,8 +40,9 @@ You: "Payments on ShukaLink are secure and easy! When you're ready to pay for a
 - Never call process_payment without a specific numeric amount. The amount must be a number type.
 - DO NOT use XML tags like <function=...> in your response. Just use the provided tools directly.
 - If you need to call a tool, do not output text before the tool call."""),
+        ("system", "{language_instruction}"),
         MessagesPlaceholder(variable_name="messages"),
     ])
     
-    tools = [get_payment_info, process_payment]
+    tools = [get_payment_info, process_payment, get_market_prices]
     return prompt | llm.bind_tools(tools)
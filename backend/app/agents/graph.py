@@ -5,12 +5,14 @@ from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from app.core.config import settings
 from app.agents.state import AgentState
+from app.agents.prompts import get_language_instruction
 from app.agents.agents.advisory import create_advisory_agent
 from app.agents.agents.logistics import create_logistics_agent
 from app.agents.agents.sales import create_sales_agent
 from app.agents.tools.advisory_tools import get_crop_advice
 from app.agents.tools.logistics_tools import get_transport_info, schedule_transport
 from app.agents.tools.payment_tools import get_payment_info, process_payment
+from app.agents.tools.market_tools import get_market_prices
 from langgraph.prebuilt import ToolNode
 
 def create_supervisor_node():
@@ -29,7 +31,7 @@ def create_supervisor_node():
         "Analyze the user's FIRST message to determine the topic:\n"
         "- Advisory: Farming advice, crops, pests, diseases, soil, fertilizer\n"
         "- Logistics: Transport, delivery, pickup, trucks\n"
-        "- Sales: Payments, transactions, buying, selling\n\n"
+        "- Sales: Payments, transactions, buying, selling, market prices\n\n"
         "IMPORTANT: Route based on the INITIAL query only. Once routed, the specialist handles the rest.\n"
         "Reply with ONLY ONE WORD: Advisory, Logistics, Sales, or FINISH"
     )
@@ -70,21 +72,25 @@ def create_agent_graph():
     sales_agent = create_sales_agent()
     
     # Create tool nodes
-    advisory_tools = [get_crop_advice]
+    advisory_tools = [get_crop_advice, get_market_prices]
     logistics_tools = [get_transport_info, schedule_transport]
-    sales_tools = [get_payment_info, process_payment]
+    sales_tools = [get_payment_info, process_payment, get_market_prices]
+    
+    def with_language(state: AgentState):
+        """Add the response-language instruction for the detected language"""
+        return {**state, "language_instruction": get_language_instruction(state.get("language"))}
     
     # Define agent nodes
     def advisory_node(state: AgentState):
-        result = advisory_agent.invoke(state)
+        result = advisory_agent.invoke(with_language(state))
         return {"messages": [result]}
         
     def logistics_node(state: AgentState):
-        result = logistics_agent.invoke(state)
+        result = logistics_agent.invoke(with_language(state))
         return {"messages": [result]}
         
     def sales_node(state: AgentState):
-        result = sales_agent.invoke(state)
+        result = sales_agent.invoke(with_language(state))
         return {"messages": [result]}
     
     # Build graph
@@ -0,0 +1,28 @@
+# Language-specific prompt fragments shared by the specialist agents
+from typing import Optional
+
+LANGUAGE_INSTRUCTIONS = {
+    "english": (
+        "**RESPONSE LANGUAGE:** Reply in simple, clear English. "
+        "Keep sentences short; many farmers read with difficulty."
+    ),
+    "hausa": (
+        "**RESPONSE LANGUAGE:** The farmer is speaking Hausa. Reply ONLY in Hausa (harshen Hausa), "
+        "using everyday rural Hausa words rather than technical English terms. "
+        "Keep the answer short - a few sentences at most. Keep crop names, prices (₦) and numbers as digits."
+    ),
+    "pidgin": (
+        "**RESPONSE LANGUAGE:** The farmer is speaking Nigerian Pidgin. Reply in Nigerian Pidgin, "
+        "the way people talk for market. Keep am short and clear."
+    ),
+    "mixed": (
+        "**RESPONSE LANGUAGE:** The farmer is mixing Hausa and English. Reply mainly in Hausa, "
+        "keeping English only for words they used in English (crop names, places, amounts). "
+        "Keep the answer short."
+    ),
+}
+
+
+def get_language_instruction(language: Optional[str]) -> str:
+    """Return the response-language instruction for a detected language"""
+    return LANGUAGE_INSTRUCTIONS.get(language or "english", LANGUAGE_INSTRUCTIONS["english"])
@@ -1,4 +1,4 @@
-from typing import TypedDict, Annotated, List, Union, Dict, Any
+from typing import TypedDict, Annotated, List, Optional, Union, Dict, Any
 from langgraph.graph.message import add_messages
 from langchain_core.messages import BaseMessage
 
@@ -6,4 +6,6 @@ class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
     next: str
     user_id: str
+    session_id: Optional[str]
     user_info: Dict[str, Any]
+    language: str
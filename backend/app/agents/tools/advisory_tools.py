@@ -1,21 +1,27 @@
 from langchain.tools import tool
-from typing import Optional
+from typing import List, Optional
 from app.services.advisory_service import AdvisoryService
 
 advisory_service = AdvisoryService()
 
 @tool
-def get_crop_advice(query: str, user_id: Optional[str] = None) -> str:
+def get_crop_advice(query: str, user_id: Optional[str] = None, other_questions: Optional[List[str]] = None) -> str:
     """
     Get expert farming advice for crops, pests, diseases, and soil management.
     Use this tool when the user asks specific questions about farming practices.
+    Answers come from the extension-service knowledge base.
     
     Args:
         query: The specific farming question (e.g., "how to treat maize stalk borer", "best fertilizer for yams")
         user_id: The ID of the user requesting advice (optional)
+        other_questions: Any further, separate farming questions from the same message (optional)
     
     Returns:
         Expert farming advice as a string
     """
     # Don't create User objects - just pass user_id to service
-    return advisory_service.get_crop_advice(query, user=None)
+    questions = [query] + list(other_questions or [])
+    answers = advisory_service.get_crop_advice_batch(questions, user=None)
+    if len(answers) == 1:
+        return answers[0]
+    return "\n\n---\n\n".join(f"Q: {question}\n{answer}" for question, answer in zip(questions, answers))
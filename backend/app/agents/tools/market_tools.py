@@ -0,0 +1,53 @@
+from langchain.tools import tool
+from typing import Dict, Optional
+from app.db.session import SessionLocal
+from app.services.price_index_service import ALL_REGIONS, price_index_service
+
+
+def format_price_summary(summary: Dict) -> str:
+    """Plain-text market price answer from PriceIndexService.summary()"""
+    place = "across Nigeria" if summary["region"] == ALL_REGIONS else f"in {summary['region'].title()}"
+    heading = f"{summary['crop_type'].title()} prices {place}, last {summary['days']} days:"
+    lines = [heading]
+
+    deals = summary.get("transaction")
+    if deals:
+        lines.append(
+            f"- Deals: ₦{deals['avg_price']:,.0f}/kg on average over {deals['sample_count']} deals "
+            f"({deals['volume_kg']:,.0f} kg). On {deals['latest_day']:%d %b} most deals were "
+            f"₦{deals['p25_price']:,.0f}-₦{deals['p75_price']:,.0f}/kg (median ₦{deals['median_price']:,.0f})."
+        )
+    asks = summary.get("listing")
+    if asks:
+        lines.append(
+            f"- Asking: ₦{asks['avg_price']:,.0f}/kg on average across {asks['sample_count']} listings, "
+            f"ranging ₦{asks['min_price']:,.0f}-₦{asks['max_price']:,.0f}/kg."
+        )
+    if not deals and not asks:
+        return f"No recent {summary['crop_type']} prices {place} yet."
+    return "\n".join(lines)
+
+
+@tool
+def get_market_prices(crop: str, region: Optional[str] = None, user_id: Optional[str] = None) -> str:
+    """
+    Get current market prices for a crop from recent deals and listings on ShukaLink.
+    Use this when the user asks what a crop is selling for or what price to ask.
+
+    Args:
+        crop: The crop (e.g., "maize", "tomatoes"; local names like "masara" work too)
+        region: The state to check prices in (e.g., "Kano"); leave empty for national prices
+        user_id: The ID of the user (optional)
+
+    Returns:
+        Recent deal and asking prices per kg as a string
+    """
+    db = SessionLocal()
+    try:
+        summary = price_index_service.summary(db, crop, region)
+        if region and not summary["transaction"] and not summary["listing"]:
+            # Nothing local yet; national prices are better than nothing
+            summary = price_index_service.summary(db, crop)
+        return format_price_summary(summary)
+    finally:
+        db.close()
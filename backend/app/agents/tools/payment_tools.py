@@ -1,30 +1,34 @@
 from langchain.tools import tool
-from typing import Optional
-from app.services.payment_service import PaymentService
+from langgraph.prebuilt import InjectedState
+from typing import Annotated, Optional
+from app.db.session import SessionLocal
+from app.services.payment_service import ANONYMOUS_USER_ID, PaymentService
 
 payment_service = PaymentService()
 
 @tool
-def get_payment_info(query: str, user_id: Optional[str] = None) -> str:
+def get_payment_info(query: str, user_id: Annotated[Optional[str], InjectedState("user_id")] = None) -> str:
     """
     Get information about payments, transaction history, or payment status.
     Use this when user asks about their payment status or history.
     
     Args:
         query: The question about payments (e.g., "check my payment status", "payment history")
-        user_id: The ID of the user (optional)
+        user_id: The ID of the user, taken from the conversation state (not chosen by the model)
     
     Returns:
         Payment information as a string
     """
     # Don't create User objects - just pass user_id to service
-    return payment_service.get_payment_info(query, user=None)
+    return payment_service.get_payment_info(query, user_id=user_id)
 
 @tool
-def process_payment(
+async def process_payment(
     amount: float, 
     description: str, 
-    user_id: Optional[str] = None
+    transaction_id: Optional[str] = None,
+    user_id: Annotated[Optional[str], InjectedState("user_id")] = None,
+    session_id: Annotated[Optional[str], InjectedState("session_id")] = None
 ) -> str:
     """
     Initiate a payment process. Only use this when you have a specific amount to charge.
@@ -33,9 +37,25 @@ def process_payment(
     Args:
         amount: The amount to pay as a number (e.g., 100.0, 5000.50)
         description: Description of the payment (e.g., "Payment for tomatoes delivery")
-        user_id: The ID of the user (optional)
+        transaction_id: The transaction being paid for, if the user gave one (e.g., "txn_1a2b3c4d")
+        user_id: The ID of the user, taken from the conversation state (not chosen by the model)
+        session_id: The chat session, taken from the conversation state
     
     Returns:
         Payment link or confirmation message
     """
-    return f"✅ Payment link generated for ₦{amount:,.2f}. Description: {description}. Please follow the link sent to your WhatsApp to complete the transaction."
+    if not user_id or user_id == ANONYMOUS_USER_ID:
+        return "Please message us from your registered phone number to make a payment."
+    db = SessionLocal()
+    try:
+        result = await payment_service.create_payment_link(
+            db, user_id, amount, description, session_id=session_id, transaction_id=transaction_id
+        )
+    except Exception as e:
+        return f"Sorry, we couldn't start the payment right now ({e}). Please try again in a few minutes."
+    finally:
+        db.close()
+    if not result.get("authorization_url"):
+        return result["message"]
+    return (f"✅ Payment link for ₦{amount:,.2f} (transaction {result['transaction_id']}): {result['authorization_url']}\n"
+            f"Reference: {result['reference']}. Description: {description}.")
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.endpoints import auth, whatsapp, produce, payments, logistics, admin, chat
+from app.api.endpoints import auth, whatsapp, produce, payments, logistics, admin, chat, market
 
 api_router = APIRouter()
 
@@ -10,4 +10,5 @@ api_router.include_router(whatsapp.router, prefix="/whatsapp", tags=["whatsapp"]
 api_router.include_router(produce.router, prefix="/produce", tags=["produce"])
 api_router.include_router(payments.router, prefix="/payments", tags=["payments"])
 api_router.include_router(logistics.router, prefix="/logistics", tags=["logistics"])
+api_router.include_router(market.router, prefix="/market", tags=["market"])
 api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from app.core.money import from_kobo
 from app.db.session import SessionLocal
 from app.models.user import User, UserType
 from app.api.deps import get_current_user, get_db
@@ -11,6 +13,8 @@ from app.models.notification import Notification
 from app.models.conversation import ChatSession as Conversation
 from app.models.logistics import LogisticsRequest
 from app.schemas import user as user_schemas
+from app.services.ledger_service import ledger_service
+from app.services.revenue_service import revenue_service
 
 router = APIRouter()
 
@@ -138,6 +142,40 @@ def get_platform_statistics(
         }
     }
 
+@router.get("/revenue")
+def get_revenue_report(
+    days: int = Query(30, ge=1, le=366),
+    current_user: User = Depends(require_admin),
+    db=Depends(get_db)
+):
+    """
+    Get payments and deal value for the last `days` days, summed in kobo by the database (Admin only)
+    """
+    return revenue_service.report(db, datetime.utcnow() - timedelta(days=days))
+
+@router.get("/ledger/daily")
+def get_ledger_daily_report(
+    day: Optional[date] = None,
+    current_user: User = Depends(require_admin),
+    db=Depends(get_db)
+):
+    """
+    Get the ledger's debits, credits and balances per account for a day, default yesterday (Admin only)
+    """
+    return ledger_service.daily_report(db, day or (datetime.utcnow().date() - timedelta(days=1)))
+
+@router.get("/ledger/accounts/{account_id}")
+def get_ledger_balance(
+    account_id: str,
+    current_user: User = Depends(require_admin),
+    db=Depends(get_db)
+):
+    """
+    Get the current balance of a ledger account, e.g. platform:escrow or farmer:<user id> (Admin only)
+    """
+    balance = ledger_service.balance(db, account_id)
+    return {"account_id": account_id, "balance_kobo": balance, "balance_naira": float(from_kobo(balance))}
+
 @router.get("/transactions")
 def get_all_transactions(
     skip: int = 0,
@@ -2,7 +2,7 @@
 Chat endpoint for WebSocket and REST-based chat functionality
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 import logging
@@ -18,7 +18,11 @@ from app.schemas.chat import (
 )
 from app.services.websocket_manager import manager
 from app.services.ai_agent import AIAgent
-from app.services.voice_service import VoiceService
+from app.services.language_service import language_detector, normalize_language
+from app.crud.crud_conversation import get_conversation_history, append_conversation_turn
+from app.workers.voice_processor import voice_processor
+from app.services.tts_service import tts_service
+from app.core.config import settings
 from app.core.security import verify_token
 from uuid import uuid4
 
@@ -27,7 +31,6 @@ logger = logging.getLogger(__name__)
 
 # Initialize services
 ai_agent = AIAgent()
-voice_service = VoiceService()
 
 
 async def authenticate_websocket_user(token: str, db: Session) -> Optional[User]:
@@ -138,16 +141,6 @@ async def websocket_chat_endpoint(
 
 
 
-def get_conversation_history(session: ChatSession, limit: int = 20) -> list:
-    """Extract conversation history from session's context_data"""
-    if not session.context_data:
-        return []
-    
-    messages = session.context_data.get("messages", [])
-    # Return last 'limit' messages
-    return messages[-limit:] if len(messages) > limit else messages
-
-
 async def handle_text_message(websocket: WebSocket, user: User, message_data: dict, db: Session):
     """Handle incoming text message and send AI response"""
     content = message_data.get("content", "").strip()
@@ -200,35 +193,11 @@ async def handle_text_message(websocket: WebSocket, user: User, message_data: di
     # Process message with AI agent (with context)
     try:
         logger.info(f"Processing message for session {session_id} with {len(conversation_history)} previous messages")
-        ai_response = await ai_agent.process_query(content, user=user, conversation_history=conversation_history)
-        
-        # Update conversation history in context_data
-        if not session.context_data:
-            session.context_data = {"messages": []}
-        elif "messages" not in session.context_data:
-            session.context_data["messages"] = []
-        
-        # Add user message to history
-        session.context_data["messages"].append({
-            "role": "user",
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat()
-        })
-        
-        # Add AI response to history  
-        session.context_data["messages"].append({
-            "role": "assistant",
-            "content": ai_response,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        detection = language_detector.detect(content, default=normalize_language(user.language_preference) or "english")
+        ai_response = await ai_agent.process_query(content, user=user, conversation_history=conversation_history, language=detection.language,
+                                               session_id=session_id)
         
-        # Mark context_data as modified for SQLAlchemy to track changes
-        from sqlalchemy.orm.attributes import flag_modified
-        flag_modified(session, "context_data")
-        
-        # Update session with latest message (for backward compatibility)
-        session.user_message = content
-        session.ai_response = ai_response
+        append_conversation_turn(session, content, ai_response)
         db.commit()
         
         # Send AI response back to client
@@ -237,7 +206,7 @@ async def handle_text_message(websocket: WebSocket, user: User, message_data: di
             "content": ai_response,
             "session_id": session_id,
             "timestamp": datetime.utcnow().isoformat(),
-            "language": user.language_preference.value if user.language_preference else "english"
+            "language": detection.language
         }
         
         await manager.send_personal_message(response_message, user.id)
@@ -400,7 +369,7 @@ async def get_session_history(
         "message_count": len(messages)
     }
 
-@router.post("/voice")
+@router.post("/voice", status_code=202)
 async def upload_voice_note(
     file: UploadFile = File(...),
     session_id: Optional[str] = Form(None),
@@ -408,20 +377,19 @@ async def upload_voice_note(
     db: Session = Depends(get_db)
 ):
     """
-    Upload a voice note for transcription and AI processing
+    Upload a voice note for background transcription and AI processing
     
     Process:
-    1. Save audio file temporarily
-    2. Transcribe using Groq Whisper
-    3. Detect language
-    4. Process with AI agent
-    5. Send response via WebSocket
-    6. Optionally generate TTS response
+    1. Save audio file
+    2. Create a pending VoiceMessage and queue it for the voice worker
+    3. Return 202 with the voice message id immediately
+    
+    The worker transcribes the note, detects the language, runs the AI agent and
+    pushes `voice_status`, `voice_transcription` and `ai_message` events over the
+    WebSocket. Poll `GET /chat/voice/{voice_message_id}` when no socket is open.
     """
     import aiofiles
-    import os
     from pathlib import Path
-    import time
     
     # Validate file type
     if not file.content_type or 'audio' not in file.content_type:
@@ -458,136 +426,91 @@ async def upload_voice_note(
             }, current_user.id)
     
     try:
-        # Save file temporarily
-        temp_dir = Path("temp_audio")
-        temp_dir.mkdir(exist_ok=True)
+        # Save file for the worker
+        upload_dir = Path(settings.VOICE_UPLOAD_DIR)
+        upload_dir.mkdir(exist_ok=True)
         
-        file_extension = Path(file.filename).suffix or ".ogg"
-        temp_filename = f"voice_{uuid4().hex[:8]}{file_extension}"
-        temp_path = temp_dir / temp_filename
+        file_extension = Path(file.filename or "").suffix or ".ogg"
+        voice_message_id = f"voice_{uuid4().hex[:8]}"
+        audio_path = upload_dir / f"{voice_message_id}{file_extension}"
         
         # Write file asynchronously
-        async with aiofiles.open(temp_path, 'wb') as out_file:
+        async with aiofiles.open(audio_path, 'wb') as out_file:
             content = await file.read()
             await out_file.write(content)
         
-        logger.info(f"Saved voice file: {temp_path}")
-        
-        # Transcribe using VoiceService
-        transcription_result = await voice_service.transcribe_voice_note(str(temp_path))
-        
-        if not transcription_result:
-            raise HTTPException(status_code=500, detail="Transcription failed")
+        logger.info(f"Saved voice file: {audio_path}")
         
-        # Detect language (simplified - can enhance with language detection)
-        detected_language = "english"  # Default
-        # You can add language detection here based on transcription
-        
-        # Create VoiceMessage record
+        # Create VoiceMessage record in pending state
         voice_message = VoiceMessage(
-            id=f"voice_{uuid4().hex[:8]}",
+            id=voice_message_id,
             user_id=current_user.id,
-            audio_file_url=str(temp_path),  # In production, upload to S3/R2
+            audio_file_url=str(audio_path),  # In production, upload to S3/R2
             audio_duration_seconds=0.0,  # Can extract from file metadata
-            language_detected=detected_language,
-            transcription=transcription_result,
-            transcription_confidence=0.95,
-            processing_status="completed",
-            processed_at=datetime.utcnow(),
+            language_detected=normalize_language(current_user.language_preference) or "english",
+            processing_status="pending",
             source=MessageSource.IN_APP
         )
         db.add(voice_message)
         db.commit()
         
-        logger.info(f"Transcription: {transcription_result}")
-        
-        # Send transcription via WebSocket
-        if manager.is_connected(current_user.id):
-            await manager.send_personal_message({
-                "type": "voice_transcription",
-                "transcription": transcription_result,
-                "confidence": 0.95,
-                "language": detected_language,
-                "session_id": session_id
-            }, current_user.id)
-        
-        # Get conversation history from session
-        conversation_history = get_conversation_history(session)
-        
-        # Process with AI agent (with context)
-        ai_response = await ai_agent.process_query(transcription_result, user=current_user, conversation_history=conversation_history)
-        
-        # Update conversation history in context_data
-        if not session.context_data:
-            session.context_data = {"messages": []}
-        elif "messages" not in session.context_data:
-            session.context_data["messages"] = []
-        
-        # Add transcribed message to history
-        session.context_data["messages"].append({
-            "role": "user",
-            "content": transcription_result,
-            "timestamp": datetime.utcnow().isoformat()
-        })
-        
-        # Add AI response to history
-        session.context_data["messages"].append({
-            "role": "assistant",
-            "content": ai_response,
-            "timestamp": datetime.utcnow().isoformat()
-        })
-        
-        # Mark context_data as modified for SQLAlchemy
-        from sqlalchemy.orm.attributes import flag_modified
-        flag_modified(session, "context_data")
-        
-        # Update session
-        session.user_message = transcription_result
-        session.ai_response = ai_response
-        session.voice_message_id = voice_message.id
-        db.commit()
-        
-        # Optional: Generate TTS response (placeholder for now)
-        tts_audio_url = None
-        # TODO: Implement TTS generation
-        # tts_audio_url = await generate_tts(ai_response, language=detected_language)
-        
-        # Send AI response via WebSocket
-        if manager.is_connected(current_user.id):
-            await manager.send_personal_message({
-                "type": "ai_message",
-                "content": ai_response,
-                "session_id": session_id,
-                "tts_audio_url": tts_audio_url,
-                "language": detected_language,
-                "timestamp": datetime.utcnow().isoformat()
-            }, current_user.id)
-        
-        # Clean up temp file
-        try:
-            os.remove(temp_path)
-        except:
-            pass
-        
-        return {
-            "session_id": session_id,
-            "transcription": transcription_result,
-            "ai_response": ai_response,
-            "language": detected_language,
-            "tts_audio_url": tts_audio_url
-        }
-        
+        await voice_processor.submit(voice_message_id, session_id, current_user.id)
     except Exception as e:
-        logger.error(f"Error processing voice note: {e}", exc_info=True)
-        
-        # Send error via WebSocket
-        if manager.is_connected(current_user.id):
-            await manager.send_personal_message({
-                "type": "error",
-                "error": "Failed to process voice note",
-                "details": str(e),
-                "session_id": session_id
-            }, current_user.id)
-        
-        raise HTTPException(status_code=500, detail=f"Error processing voice note: {str(e)}")
+        logger.error(f"Error queueing voice note: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error queueing voice note: {str(e)}")
+    
+    return {
+        "voice_message_id": voice_message_id,
+        "session_id": session_id,
+        "status": "pending",
+        "status_url": f"{settings.API_V1_STR}/chat/voice/{voice_message_id}"
+    }
+
+
+@router.get("/voice/{voice_message_id}")
+async def get_voice_note_status(
+    voice_message_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the processing status and results of an uploaded voice note"""
+    voice_message = db.query(VoiceMessage).filter(
+        VoiceMessage.id == voice_message_id,
+        VoiceMessage.user_id == current_user.id
+    ).first()
+    
+    if not voice_message:
+        raise HTTPException(status_code=404, detail="Voice message not found")
+    
+    # The reply is stored on the note itself, so older notes of a session keep theirs
+    return {
+        "voice_message_id": voice_message.id,
+        "status": voice_message.processing_status,
+        "transcription": voice_message.transcription,
+        "language": voice_message.language_detected,
+        "session_id": voice_message.session_id,
+        "ai_response": voice_message.ai_response,
+        "tts_audio_url": voice_message.ai_voice_response_url,
+        "created_at": voice_message.created_at.isoformat() if voice_message.created_at else None,
+        "processed_at": voice_message.processed_at.isoformat() if voice_message.processed_at else None
+    }
+
 
+@router.get("/tts/{audio_key}")
+async def get_tts_audio(audio_key: str):
+    """
+    Serve a cached TTS reply. FileResponse answers Range requests with 206
+    partial content, so mobile players can seek and resume on slow connections.
+    """
+    if not tts_service.cache.is_valid_key(audio_key):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    path = tts_service.cache.get(audio_key)
+    if not path:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    # Content-addressed files never change, so clients may cache them forever
+    return FileResponse(
+        path,
+        media_type=tts_service.engine.media_type,
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
@@ -1,10 +1,15 @@
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from app.db.session import SessionLocal
-from app.schemas.logistics import LogisticsRequest, LogisticsResponse, LogisticsRequestUpdate
+from app.schemas.logistics import (
+    LogisticsRequest, LogisticsResponse, LogisticsRequestUpdate, TransportQuoteRequest, TransportQuoteResponse
+)
 from app.crud import crud_logistics
 from app.crud import crud_transaction
 from app.api.deps import get_current_user
 from app.models.user import User
+from app.services.geo_service import LocationError, resolve_location
+from app.services.logistics_cost_service import logistics_cost_service
 
 router = APIRouter()
 
@@ -58,6 +63,25 @@ def request_logistics(
         logger.error(f"Error requesting logistics: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/quotes", response_model=List[TransportQuoteResponse])
+def quote_transport(
+    quote_request: TransportQuoteRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Price transport for many pickup/drop-off pairs at once: road distance, vehicles and cost per route
+    """
+    origins, destinations = [], []
+    for n, route in enumerate(quote_request.routes):
+        try:
+            pickup, dropoff = resolve_location(route.pickup), resolve_location(route.dropoff)
+        except LocationError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Route {n}: {e}")
+        origins.append((pickup.latitude, pickup.longitude))
+        destinations.append((dropoff.latitude, dropoff.longitude))
+    quotes = logistics_cost_service.quote_many(origins, destinations, [route.quantity_kg for route in quote_request.routes])
+    return [quote.as_dict() for quote in quotes]
+
 @router.get("/{logistics_id}", response_model=LogisticsResponse)
 def get_logistics(
     logistics_id: str,
@@ -0,0 +1,112 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from app.api.deps import get_current_user
+from app.crud.crud_price_alert import create_price_alert, delete_price_alert, get_price_alert, get_price_alerts
+from app.db.session import SessionLocal
+from app.models.user import User
+from app.schemas.market import PriceAlertCreate, PriceAlertResponse, PriceIndexResponse, PriceSummaryResponse
+from app.services.price_index_service import SOURCES, price_index_service
+
+router = APIRouter()
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@router.get("/prices", response_model=List[PriceIndexResponse])
+def get_price_history(
+    crop: str = Query(..., min_length=2, max_length=50),
+    region: Optional[str] = None,
+    days: int = Query(30, ge=1, le=365),
+    source: Optional[str] = Query(None, pattern=f"^({'|'.join(SOURCES)})$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Daily market prices per kg for a crop, latest first
+
+    Local crop names work ("masara" is maize). Without a region the
+    national rollup is returned. source=transaction is agreed deal prices,
+    source=listing is asking prices; both by default.
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    try:
+        return price_index_service.price_history(db, crop, region, days, source)
+    except Exception as e:
+        logger.error(f"Error reading price history for {crop}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/prices/summary", response_model=PriceSummaryResponse)
+def get_price_summary(
+    crop: str = Query(..., min_length=2, max_length=50),
+    region: Optional[str] = None,
+    days: int = Query(14, ge=1, le=365),
+    db: Session = Depends(get_db)
+):
+    """
+    Deal and asking prices for a crop over the last `days` days: volume
+    weighted average and range over the window, quartiles of the latest day
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    try:
+        return price_index_service.summary(db, crop, region, days)
+    except Exception as e:
+        logger.error(f"Error summarising prices for {crop}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/alerts", response_model=PriceAlertResponse, status_code=status.HTTP_201_CREATED)
+def create_alert(
+    price_alert: PriceAlertCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Subscribe to a price alert
+
+    source=transaction watches the daily median deal price of the crop in
+    the region (or nationally); source=listing watches the asking price of
+    every new listing. Each alert notifies at most once a day.
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    try:
+        db_price_alert = create_price_alert(db, price_alert.model_dump(), current_user.id)
+        logger.info(f"Price alert {db_price_alert.id} created for user {current_user.id}")
+        return db_price_alert
+    except Exception as e:
+        logger.error(f"Error creating price alert: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/alerts", response_model=List[PriceAlertResponse])
+def list_alerts(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    The current user's price alerts, newest first
+    """
+    return get_price_alerts(db, current_user.id, skip, limit)
+
+@router.delete("/alerts/{alert_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_alert(
+    alert_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Unsubscribe from a price alert
+    """
+    db_price_alert = get_price_alert(db, alert_id)
+    if not db_price_alert or db_price_alert.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Price alert not found")
+    delete_price_alert(db, alert_id)
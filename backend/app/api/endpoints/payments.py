@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
-from app.crud import get_transaction, update_transaction, update_transaction_status
-from app.crud.crud_transaction import create_payment_record, get_payment_record, update_payment_record
-from app.services.payment_service import PaymentService
+from app.crud import get_transaction, get_transaction_for_listing, update_transaction, update_transaction_status
+from app.crud.crud_transaction import create_payment_record
+from app.services.payment_service import PaymentService, payer_email
 from app.core.config import settings
-from app.schemas.payment import PaymentRecordCreate, PaymentRecordUpdate
-from app.models.transaction import PaymentStatus, TransactionStatus
+from app.schemas.payment import PaymentRecordCreate
+from app.models.payment_event import PaymentEvent, PaymentEventStatus
+from app.models.transaction import TransactionStatus
+from app.workers.payment_events import payment_event_id, payment_event_processor, store_payment_event
 import hashlib
 import hmac
 import json
@@ -31,8 +33,8 @@ async def initialize_payment(transaction_id: str, db: Session = Depends(get_db))
     logger.info(f"Initializing payment for transaction {transaction_id}")
 
     try:
-        # 1. Get the transaction
-        transaction = get_transaction(db, transaction_id)
+        # 1. Get the transaction (older clients send the listing id instead)
+        transaction = get_transaction(db, transaction_id) or get_transaction_for_listing(db, transaction_id)
         if not transaction:
             logger.warning(f"Transaction not found: {transaction_id}")
             raise HTTPException(
@@ -53,11 +55,11 @@ async def initialize_payment(transaction_id: str, db: Session = Depends(get_db))
         
         # 4. Initialize with Paystack
         payment_service = PaymentService()
-        amount_kobo = int(transaction.total_amount * 100)
-        email = f"user_{transaction.buyer_id}@ShukaLink.com"  # In real app, fetch buyer's email
+        amount_kobo = transaction.total_amount_kobo
+        email = payer_email(transaction.buyer_id)
         
         try:
-            paystack_response = payment_service.initialize_transaction(
+            paystack_response = await payment_service.initialize_transaction(
                 email=email,
                 amount=amount_kobo,
                 reference=payment_reference,
@@ -82,7 +84,8 @@ async def initialize_payment(transaction_id: str, db: Session = Depends(get_db))
                 currency="NGN",
                 reference=payment_reference,
                 status="PENDING",  # Use uppercase to match enum
-                paystack_data={"access_code": data.get("access_code")}
+                paystack_data={"access_code": data.get("access_code"),
+                               "authorization_url": data.get("authorization_url")}
             )
             
             create_payment_record(db, payment_record_in, transaction.id)
@@ -113,7 +116,8 @@ async def initialize_payment(transaction_id: str, db: Session = Depends(get_db))
 @router.post("/verify")
 async def verify_payment_webhook(request: Request, db: Session = Depends(get_db)):
     """
-    Verify payment completion (called by Paystack webhook)
+    Receive a Paystack webhook: verify, store in the inbox and acknowledge.
+    The payment event worker applies it in the background.
     """
     import logging
     logger = logging.getLogger(__name__)
@@ -139,60 +143,41 @@ async def verify_payment_webhook(request: Request, db: Session = Depends(get_db)
             logger.warning("Invalid Paystack signature")
             raise HTTPException(status_code=400, detail="Invalid signature")
     
-    # 2. Parse Payload
+    # 2. Parse the body we already hold
     try:
-        payload = await request.json()
+        payload = json.loads(body)
     except json.JSONDecodeError:
         logger.warning("Invalid JSON payload in webhook")
         raise HTTPException(status_code=400, detail="Invalid JSON")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON")
         
-    event = payload.get("event")
-    data = payload.get("data", {})
-    reference = data.get("reference")
-    
-    logger.info(f"Received webhook event: {event} for reference: {reference}")
-    
-    if not reference:
-        return {"status": "ignored", "message": "No reference found"}
+    event_id = payment_event_id(payload, body)
+    logger.info(f"Received webhook event: {payload.get('event')} ({event_id})")
 
+    # 3. Store in the inbox; a redelivery of an event already applied is acknowledged and dropped
     try:
-        # 3. Find PaymentRecord
-        from app.models.transaction import PaymentRecord
-        payment_record = db.query(PaymentRecord).filter(PaymentRecord.reference == reference).first()
-        
-        if not payment_record:
-            # If record not found, we can't update it. Log error.
-            logger.error(f"Payment record not found for reference: {reference}")
-            return {"status": "error", "message": "Payment record not found"}
-            
-        # 4. Handle Events
-        if event == "charge.success":
-            # Update PaymentRecord
-            payment_update = PaymentRecordUpdate(
-                status="SUCCESS",  # Use uppercase to match enum
-                paystack_data=payload
-            )
-            update_payment_record(db, payment_record.id, payment_update)
-            
-            # Update Transaction
-            update_transaction_status(db, payment_record.transaction_id, TransactionStatus.PAYMENT_CONFIRMED)
-            
-            # Here you would trigger logistics, notify user, etc.
-            logger.info(f"Payment confirmed for transaction {payment_record.transaction_id}")
-            
-            return {"status": "success", "message": "Payment verified"}
-            
-        elif event == "charge.failed":
-            payment_update = PaymentRecordUpdate(
-                status="FAILED",  # Use uppercase to match enum
-                paystack_data=payload
-            )
-            update_payment_record(db, payment_record.id, payment_update)
-            logger.info(f"Payment failed for transaction {payment_record.transaction_id}")
-            return {"status": "success", "message": "Payment marked as failed"}
-            
+        db_event = store_payment_event(db, event_id, payload)
     except Exception as e:
-        logger.error(f"Error processing webhook: {e}", exc_info=True)
-        return {"status": "error", "message": str(e)}
-        
-    return {"status": "ignored"}
\ No newline at end of file
+        # Not acknowledged, so Paystack retries the delivery
+        logger.error(f"Error storing webhook {event_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not store event")
+    outcome = "accepted"
+    if db_event is None:
+        stored_status = db.query(PaymentEvent.status).filter(PaymentEvent.id == event_id).scalar()
+        if stored_status != PaymentEventStatus.RECEIVED:
+            logger.info(f"Duplicate webhook {event_id} ignored")
+            return {"status": "duplicate", "event_id": event_id}
+        # Stored but maybe never queued (the queue was down): queue it again.
+        # The worker's conditional claim makes a second apply a no-op.
+        logger.info(f"Redelivered webhook {event_id} is still pending; queueing it again")
+        outcome = "requeued"
+
+    # 4. Hand over to the worker; a lost job is replayed from the inbox on restart
+    try:
+        await payment_event_processor.submit(event_id)
+    except Exception as e:
+        # Stored but not queued: not acknowledged, so Paystack's retry queues it
+        logger.error(f"Error queueing webhook {event_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not queue event")
+    return {"status": outcome, "event_id": event_id}
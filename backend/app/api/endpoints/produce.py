@@ -1,14 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, Response, status
+from pydantic import TypeAdapter
 from typing import List, Optional
 from app.db.session import SessionLocal
-from app.schemas.produce import ProduceCreate, ProduceResponse, ProduceSearch, ProduceListingUpdate
+from app.schemas.produce import ProduceCreate, ProduceResponse, ProduceSearch, ProduceListingUpdate, ListingStatus, ListingMatchResponse, BulkImportResponse, ReservationCreate
+from app.schemas.transaction import TransactionResponse
 from app.crud import create_produce_listing, get_produce_listing, delete_produce_listing, update_produce_listing, get_produce_listings, search_produce_listings
-from app.crud import crud_produce
+from app.crud import crud_produce, create_reservation
 from app.api.deps import get_current_user
 from app.models.user import User, UserType
+from app.services.bulk_import_service import (
+    BulkImportError, TooManyRowsError, UnsupportedFormatError, bulk_import_service
+)
+from app.services.cache_service import CachedResponse, etag_matches, response_cache
+from app.services.geo_service import LocationError, resolve_location
+from app.services.listing_state_service import ListingStateError
+from app.tasks.match_listings import match_listing, match_new_listings
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 200
+
+
+LISTINGS_ADAPTER = TypeAdapter(List[ProduceResponse])
+LISTING_ADAPTER = TypeAdapter(ProduceResponse)
+
+
+def next_cursor_headers(listings: list, limit: int) -> dict:
+    """Expose the keyset cursor for the next page when this page is full"""
+    if len(listings) == limit and listings:
+        return {"X-Next-Cursor": crud_produce.encode_listing_cursor(listings[-1])}
+    return {}
+
+
+def cached_json_response(entry: CachedResponse, if_none_match: Optional[str]) -> Response:
+    """The cached body, or 304 Not Modified when the client already has it"""
+    # no-cache: clients may store the page but must revalidate with the ETag
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -19,6 +50,7 @@ def get_db():
 @router.post("/", response_model=ProduceResponse)
 def create_produce(
     produce_in: ProduceCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db=Depends(get_db)
 ):
@@ -47,14 +79,23 @@ def create_produce(
     # produce_data = {
     #     **produce_in.model_dump(),
     #     farmer_id=current_user.id
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, Response, status
+from pydantic import TypeAdapter
 from typing import List, Optional
 from app.db.session import SessionLocal
-from app.schemas.produce import ProduceCreate, ProduceResponse, ProduceSearch, ProduceListingUpdate
+from app.schemas.produce import ProduceCreate, ProduceResponse, ProduceSearch, ProduceListingUpdate, ListingStatus, ListingMatchResponse, BulkImportResponse, ReservationCreate
+from app.schemas.transaction import TransactionResponse
 from app.crud import create_produce_listing, get_produce_listing, delete_produce_listing, update_produce_listing, get_produce_listings, search_produce_listings
-from app.crud import crud_produce
+from app.crud import crud_produce, create_reservation
 from app.api.deps import get_current_user
 from app.models.user import User, UserType
+from app.services.bulk_import_service import (
+    BulkImportError, TooManyRowsError, UnsupportedFormatError, bulk_import_service
+)
+from app.services.cache_service import CachedResponse, etag_matches, response_cache
+from app.services.geo_service import LocationError, resolve_location
+from app.services.listing_state_service import ListingStateError
+from app.tasks.match_listings import match_listing, match_new_listings
 
 router = APIRouter()
 
@@ -68,6 +109,7 @@ def get_db():
 @router.post("/", response_model=ProduceResponse)
 def create_produce(
     produce_in: ProduceCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db=Depends(get_db)
 ):
@@ -98,36 +140,110 @@ def create_produce(
     #     farmer_id=current_user.id
     # }
 
-    return create_produce_listing(db, produce_data)
+    try:
+        produce = create_produce_listing(db, produce_data)
+    except LocationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Rank candidate buyers once the response is sent
+    background_tasks.add_task(match_listing, produce.id)
+    return produce
+
+
+@router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_import_produce(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    atomic: bool = False,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
+    """
+    Create many produce listings at once (Farmer, Aggregator or Admin)
+
+    Send a JSON array (application/json), one JSON object per line
+    (application/x-ndjson) or CSV with a header row (text/csv). Rows use the
+    same fields as POST /produce/. Farmers list their own stock; aggregators
+    and admins give the farmer_id of the farmer each row is listed for.
+
+    Valid rows are created and invalid ones reported by row number. With
+    atomic=true nothing is created if any row is invalid.
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.info(f"Bulk import by user {current_user.id}, content type {request.headers.get('content-type')}")
+
+    if current_user.user_type not in (UserType.FARMER, UserType.AGGREGATOR, UserType.ADMIN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only farmers and aggregators can import produce listings"
+        )
+
+    try:
+        result = await bulk_import_service.import_listings(
+            db, request.headers.get("content-type"), request.stream(), current_user, atomic=atomic
+        )
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    except TooManyRowsError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except BulkImportError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if atomic and result.errors:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": "No listings were created", "errors": result.errors}
+        )
+
+    if result.created:
+        response_cache.invalidate(crud_produce.CACHE_NAMESPACE)
+        # New listings are pending, so one incremental run matches them all
+        background_tasks.add_task(match_new_listings)
+    return result
 
 
 
 @router.get("/all", response_model=List[ProduceResponse])
 def get_all_produce(
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
     farmer_id: Optional[str] = None,
+    after: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     db=Depends(get_db)
 ):
     """
     Search and list available produce
+
+    Pages are newest first. Pass the X-Next-Cursor response header as `after`
+    to fetch the next page. Pages carry an ETag; send it back as
+    If-None-Match to get 304 Not Modified while the page is unchanged.
     """
     import logging
     logger = logging.getLogger(__name__)
-    logger.info(f"Fetching all produce: skip={skip}, limit={limit}, farmer_id={farmer_id}")
+    logger.info(f"Fetching all produce: skip={skip}, limit={limit}, farmer_id={farmer_id}, after={after}")
     
     try:
         filters = {
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "after": after
         }
 
         if farmer_id:
             filters["farmer_id"] = farmer_id
 
-        produce_list = get_produce_listings(db, **filters)
-        logger.info(f"Found {len(produce_list)} produce items")
-        return produce_list
+        def build():
+            produce_list = get_produce_listings(db, **filters)
+            logger.info(f"Found {len(produce_list)} produce items")
+            body = LISTINGS_ADAPTER.dump_json(LISTINGS_ADAPTER.validate_python(produce_list, from_attributes=True))
+            return body, next_cursor_headers(produce_list, limit)
+
+        entry = response_cache.get_or_build(crud_produce.CACHE_NAMESPACE, "all", filters, build)
+        return cached_json_response(entry, if_none_match)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching produce: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -136,20 +252,66 @@ def get_all_produce(
 def search_produce(
     crop_type: Optional[str] = None,
     min_quantity: Optional[int] = None,
-    radius_km: Optional[int] = None,
+    radius_km: Optional[float] = None,
     max_price: Optional[float] = None,
     farmer_id: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    location: Optional[str] = None,
+    listing_status: Optional[ListingStatus] = Query(ListingStatus.AVAILABLE, alias="status"),
+    min_freshness: Optional[float] = Query(None, ge=0, le=1),
+    q: Optional[str] = Query(None, max_length=200),
+    sort: str = Query("newest", pattern="^(newest|freshest)$"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     db=Depends(get_db)
 ):
     """
     Search and list available produce
+
+    Pages are newest first. Pass the X-Next-Cursor response header as `after`
+    to fetch the next page.
+
+    To search "within 50 km", pass radius_km=50 with either latitude and
+    longitude or a location ("lat,lon" or a town/market name). Results are
+    then ordered nearest first and include distance_km.
+
+    min_freshness (0-1) drops listings nearing the end of their shelf life;
+    sort=freshest orders by freshness instead of age (paged with skip).
+
+    q searches crop names (local names such as "masara" and misspellings
+    such as "tomatos" included) and voice listing transcriptions; results
+    are then ordered best match first with search_rank (paged with skip).
+
+    Pages carry an ETag; send it back as If-None-Match to get 304 Not
+    Modified while the page is unchanged.
     """
     import logging
     logger = logging.getLogger(__name__)
-    logger.info(f"Searching produce: crop={crop_type}, min_qty={min_quantity}, max_price={max_price}, farmer={farmer_id}")
+    logger.info(f"Searching produce: crop={crop_type}, min_qty={min_quantity}, max_price={max_price}, farmer={farmer_id}, radius={radius_km}")
+
+    if radius_km:
+        if radius_km < 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="radius_km must be positive")
+        if (latitude is None or longitude is None) and not location:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="radius_km needs a centre: latitude and longitude, or location"
+            )
+        try:
+            centre = resolve_location(location, latitude, longitude)
+        except LocationError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        latitude, longitude = centre.latitude, centre.longitude
 
     try:
-        filters = {}
+        filters = {"status": listing_status, "sort": sort, "skip": skip, "limit": limit, "after": after}
+        if min_freshness is not None:
+            filters["min_freshness"] = min_freshness
+        if q and q.strip():
+            filters["q"] = q
         if crop_type:
             filters["crop_type"] = crop_type
         if min_quantity:
@@ -158,12 +320,23 @@ def search_produce(
             filters["max_price"] = max_price
         if radius_km:
             filters["radius_km"] = radius_km
+            filters["latitude"] = latitude
+            filters["longitude"] = longitude
         if farmer_id:
             filters["farmer_id"] = farmer_id
         
-        produce_list = search_produce_listings(db, **filters)
-        logger.info(f"Search found {len(produce_list)} items")
-        return produce_list
+        def build():
+            produce_list = search_produce_listings(db, **filters)
+            logger.info(f"Search found {len(produce_list)} items")
+            body = LISTINGS_ADAPTER.dump_json(LISTINGS_ADAPTER.validate_python(produce_list, from_attributes=True))
+            keyset = not radius_km and not filters.get("q") and sort == "newest"
+            headers = next_cursor_headers(produce_list, limit) if keyset else {}
+            return body, headers
+
+        entry = response_cache.get_or_build(crud_produce.CACHE_NAMESPACE, "search", filters, build)
+        return cached_json_response(entry, if_none_match)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error searching produce: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -171,6 +344,7 @@ def search_produce(
 @router.get("/{produce_id}", response_model=ProduceResponse)
 def get_produce_details(
     produce_id: str,
+    if_none_match: Optional[str] = Header(None),
     db=Depends(get_db)
 ):
     """
@@ -181,24 +355,93 @@ def get_produce_details(
     logger.info(f"Fetching produce details: {produce_id}")
 
     try:
-        produce = get_produce_listing(db, produce_id)
-        if not produce:
-            logger.warning(f"Produce not found: {produce_id}")
+        def build():
+            produce = get_produce_listing(db, produce_id)
+            if not produce:
+                logger.warning(f"Produce not found: {produce_id}")
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Produce listing not found"
+                )
+            return LISTING_ADAPTER.dump_json(LISTING_ADAPTER.validate_python(produce, from_attributes=True)), {}
+
+        entry = response_cache.get_or_build(crud_produce.CACHE_NAMESPACE, "detail", {"id": produce_id}, build)
+        return cached_json_response(entry, if_none_match)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching produce details: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{produce_id}/matches", response_model=List[ListingMatchResponse])
+def get_produce_matches(
+    produce_id: str,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
+    """
+    Best-matched buyers for a listing (owner or admin), best first
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.info(f"Fetching matches for produce {produce_id}")
+
+    produce = get_produce_listing(db, produce_id)
+    if not produce:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Produce listing not found"
+        )
+    if produce.farmer_id != current_user.id and current_user.user_type != UserType.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view matches for this produce listing"
+        )
+    return produce.matches
+
+@router.post("/{produce_id}/reserve", response_model=TransactionResponse, status_code=status.HTTP_201_CREATED)
+def reserve_produce(
+    produce_id: str,
+    reservation_in: ReservationCreate,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
+    """
+    Reserve part or all of a listing's quantity (Buyer only); opens a
+    PENDING transaction at the asking price
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+    logger.info(f"Reserving {reservation_in.quantity_kg}kg of produce {produce_id} for user {current_user.id}")
+
+    if current_user.user_type != UserType.BUYER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only buyers can reserve produce"
+        )
+    try:
+        transaction = create_reservation(db, produce_id, current_user.id, reservation_in.quantity_kg)
+        if transaction is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Produce listing not found"
             )
-        return produce
+        logger.info(f"Reserved produce {produce_id}: transaction {transaction.id}")
+        return transaction
     except HTTPException:
         raise
+    except ListingStateError as e:
+        # Sold out, no longer available or outbid by a concurrent buyer
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except Exception as e:
-        logger.error(f"Error fetching produce details: {e}", exc_info=True)
+        logger.error(f"Error reserving produce: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/{produce_id}", response_model=ProduceResponse)
 def update_produce(
     produce_id: str,
     produce_in: ProduceListingUpdate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db=Depends(get_db)
 ):
@@ -230,9 +473,15 @@ def update_produce(
         # Update the produce
         updated_produce = update_produce_listing(db, existing_produce.id, produce_in.model_dump())
         logger.info(f"Produce updated successfully: {produce_id}")
+        background_tasks.add_task(match_listing, updated_produce.id)
         return updated_produce
     except HTTPException:
         raise
+    except LocationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ListingStateError as e:
+        # Stale version or a transition the state machine does not allow
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except Exception as e:
         logger.error(f"Error updating produce: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -17,10 +17,68 @@ class Settings(BaseSettings):
     PAYSTACK_SECRET_KEY: Optional[str] = None
     PAYSTACK_PUBLIC_KEY: Optional[str] = None
     PAYSTACK_WEBHOOK_SECRET: Optional[str] = None
+    PAYSTACK_BASE_URL: str = "https://api.paystack.co"
+    PAYSTACK_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    PAYSTACK_READ_TIMEOUT_SECONDS: float = 10.0
+    PAYSTACK_MAX_CONNECTIONS: int = 20
+    PAYSTACK_MAX_RETRIES: int = 2  # Retries after the first attempt, on 5xx and network errors
+    PAYSTACK_RETRY_BACKOFF_SECONDS: float = 0.5
+    PAYSTACK_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures before calls fail fast
+    PAYSTACK_CIRCUIT_RESET_SECONDS: float = 30.0
+    PAYMENT_EVENT_QUEUE_BACKEND: str = "memory"  # "memory" or "redis"
+    PAYMENT_EVENT_WORKER_CONCURRENCY: int = 2
+    PAYMENT_EVENT_MAX_RETRIES: int = 5
+    PAYMENT_EVENT_RETRY_BACKOFF_SECONDS: float = 2.0
+    RECONCILE_STALE_AFTER_MINUTES: int = 30  # Pending payments older than this are checked with Paystack
+    RECONCILE_ABANDON_AFTER_HOURS: int = 24  # Abandoned or unknown at Paystack after this: FAILED
+    RECONCILE_BATCH_SIZE: int = 200
+    RECONCILE_CONCURRENCY: int = 8  # Paystack verify calls in flight
+    PAYOUT_GATEWAY: str = "paystack"  # "paystack", or "local" to mark transfers paid without sending money
+    PAYOUT_FEE_GATEWAY: str = "paystack"  # Fee deducted from payouts, from PaymentService.payment_gateways
+    PAYOUT_BATCH_SIZE: int = 100  # Transfers per bulk call (Paystack's limit)
+    PAYOUT_MAX_TRANSACTIONS: int = 5000  # Delivered deals settled per run
+    PAYOUT_MAX_ATTEMPTS: int = 5  # Submissions of a batch before it is FAILED
+    PAYOUT_RETRY_FAILED_AFTER_HOURS: int = 24  # A farmer whose transfer failed waits this long before the next
+    LOGISTICS_DETOUR_FACTOR: float = 1.3  # Road km per straight-line km, where no road network covers a leg
+    LOGISTICS_ROAD_NETWORK_PATH: Optional[str] = None  # JSON road graph (see road_network.py); straight lines if unset
     LLAMA3_MODEL: str = "meta-llama/llama-4-scout-17b-16e-instruct"
     WHISPER_MODEL: str = "large-v3"
     CHROMADB_PATH: str = "./data/chromadb"
+    KNOWLEDGE_BASE_DIR: str = "./knowledge_base"
+    EMBEDDING_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    KNOWLEDGE_BASE_CHUNK_SIZE: int = 800
+    KNOWLEDGE_BASE_CHUNK_OVERLAP: int = 150
+    KNOWLEDGE_BASE_TOP_K: int = 3
+    KNOWLEDGE_BASE_MIN_SCORE: float = 0.3
     GROQ_API_KEY: Optional[str] = os.getenv("GROQ_API_KEY")
+    REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
+
+    # Background voice processing
+    VOICE_QUEUE_BACKEND: str = "memory"  # "memory" or "redis"
+    VOICE_WORKER_CONCURRENCY: int = 2
+    VOICE_WORKER_MAX_RETRIES: int = 3
+    VOICE_WORKER_RETRY_BACKOFF_SECONDS: float = 2.0
+    VOICE_UPLOAD_DIR: str = "temp_audio"
+
+    # Spoken replies
+    TTS_ENABLED: bool = True
+    TTS_CACHE_DIR: str = "./data/tts_cache"
+    TTS_SPEED_WPM: int = 150
+
+    # Buyer matching
+    MATCHING_TOP_K: int = 10
+    MATCHING_BATCH_SIZE: int = 256
+    MATCHING_BUYER_MATRIX_TTL_SECONDS: int = 300
+
+    # Price alerts
+    PRICE_ALERT_COOLDOWN_HOURS: int = 24  # At most one alert per subscription per window
+    PRICE_ALERT_BOOK_TTL_SECONDS: int = 300
+
+    # Response cache for hot produce reads
+    CACHE_BACKEND: str = "memory"  # "memory" (per process) or "redis" (shared, plus per-process LRU)
+    CACHE_MAX_ENTRIES: int = 2048
+    CACHE_TTL_SECONDS: int = 60
+    CACHE_VERSION_TTL_SECONDS: float = 1.0
 
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""
+Money in naira and kobo.
+
+Amounts are stored as whole kobo (BigInteger columns) and handled in
+Python as Decimal naira, never float: float naira cannot hold most kobo
+values exactly (0.29 * 100 == 28.999999999999996), so int(amount * 100)
+loses a kobo. Conversions go through the decimal string of a value and
+round half up, the way a cashier would.
+
+`Money` is the pydantic type for naira amounts in schemas: it accepts
+numbers or numeric strings, keeps two decimal places and serializes to a
+JSON number.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Annotated, Union
+
+from pydantic import AfterValidator, PlainSerializer
+
+KOBO_PER_NAIRA = 100
+_KOBO = Decimal("1")
+_NAIRA = Decimal("0.01")
+
+Number = Union[int, float, str, Decimal]
+
+
+def to_decimal(value: Number) -> Decimal:
+    """Exact Decimal of a number as written (floats by their shortest repr, so 0.29 stays 0.29)"""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+def to_kobo(naira: Number) -> int:
+    """Whole kobo in a naira amount"""
+    return int((to_decimal(naira) * KOBO_PER_NAIRA).quantize(_KOBO, rounding=ROUND_HALF_UP))
+
+
+def from_kobo(kobo: int) -> Decimal:
+    """Naira amount of whole kobo"""
+    return (Decimal(int(kobo)) / KOBO_PER_NAIRA).quantize(_NAIRA)
+
+
+def naira(value: Number) -> Decimal:
+    """A naira amount rounded to the kobo"""
+    return to_decimal(value).quantize(_NAIRA, rounding=ROUND_HALF_UP)
+
+
+def line_total_kobo(price_per_kg: Number, quantity_kg: Number) -> int:
+    """Kobo due for quantity_kg at price_per_kg naira, rounded once at the end"""
+    return to_kobo(to_decimal(price_per_kg) * to_decimal(quantity_kg))
+
+
+def percent_kobo(kobo: int, percent: Number) -> int:
+    """percent % of an amount in kobo, rounded half up to the kobo"""
+    return int((Decimal(int(kobo)) * to_decimal(percent) / 100).quantize(_KOBO, rounding=ROUND_HALF_UP))
+
+
+Money = Annotated[
+    Decimal,
+    AfterValidator(naira),
+    PlainSerializer(float, return_type=float, when_used="json"),
+]
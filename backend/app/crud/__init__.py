@@ -5,6 +5,7 @@ from .crud_transaction import *
 from .crud_logistics import *
 from .crud_notification import *
 from .crud_conversation import *
+from .crud_price_alert import *
 
 __all__ = [
     # User CRUD operations
@@ -27,16 +28,22 @@ __all__ = [
     "get_produce_listings",
     "update_produce_listing",
     "delete_produce_listing",
+    "reserve_produce_quantity",
+    "release_produce_quantity",
+    "settle_produce_listing",
     
     # Transaction CRUD operations
     "create_transaction",
     "get_transaction",
+    "get_transaction_for_listing",
+    "get_user_payments",
     "get_transactions",
     "update_transaction",
     "delete_transaction",
     "create_payment_record",
     "get_payment_record",
     "update_transaction_status",
+    "create_reservation",
     
     # Logistics CRUD operations
     "create_logistics_request",
@@ -62,4 +69,10 @@ __all__ = [
     "get_chat_session",
     "create_advisory_record",
     "get_advisory_record",
+
+    # Price alert CRUD operations
+    "create_price_alert",
+    "get_price_alert",
+    "get_price_alerts",
+    "delete_price_alert",
 ]
\ No newline at end of file
@@ -1,5 +1,7 @@
+from datetime import datetime
 from typing import List, Optional
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
 from app.models.conversation import VoiceMessage, ChatSession, AdvisoryRecord
 from app.schemas.conversation import VoiceMessageCreate, VoiceMessageUpdate, ChatSessionCreate, ChatSessionUpdate, AdvisoryRecordCreate, AdvisoryRecordUpdate
 
@@ -82,6 +84,43 @@ def get_chat_session(db: Session, chat_session_id: str) -> Optional[ChatSession]
     return db.query(ChatSession).filter(ChatSession.id == chat_session_id).first()
 
 
+def get_conversation_history(session: ChatSession, limit: int = 20) -> list:
+    """Extract conversation history from session's context_data"""
+    if not session.context_data:
+        return []
+    
+    messages = session.context_data.get("messages", [])
+    # Return last 'limit' messages
+    return messages[-limit:] if len(messages) > limit else messages
+
+
+def append_conversation_turn(session: ChatSession, user_message: str, ai_response: str) -> ChatSession:
+    """Append a user/assistant exchange to the session history (caller commits)."""
+    if not session.context_data:
+        session.context_data = {"messages": []}
+    elif "messages" not in session.context_data:
+        session.context_data["messages"] = []
+    
+    session.context_data["messages"].append({
+        "role": "user",
+        "content": user_message,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+    session.context_data["messages"].append({
+        "role": "assistant",
+        "content": ai_response,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+    
+    # Mark context_data as modified for SQLAlchemy to track changes
+    flag_modified(session, "context_data")
+    
+    # Keep latest exchange on the row (for backward compatibility)
+    session.user_message = user_message
+    session.ai_response = ai_response
+    return session
+
+
 def get_chat_sessions(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[str] = None) -> List[ChatSession]:
     """Get a list of chat sessions."""
     query = db.query(ChatSession)
@@ -0,0 +1,53 @@
+# app/crud/crud_price_alert.py
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from app.models.market import ALL_REGIONS, PriceAlert
+from app.services.price_alert_service import price_alert_service
+from app.services.search_service import normalize_crop_name
+
+
+def create_price_alert(db: Session, price_alert: dict, user_id: str) -> PriceAlert:
+    """Create a price alert subscription; crop and region names are normalised."""
+    crop = price_alert["crop_type"]
+    region = price_alert.get("region")
+    db_price_alert = PriceAlert(
+        user_id=user_id,
+        crop_type=normalize_crop_name(crop) or crop.strip().lower(),
+        region=region.strip().lower() if region else ALL_REGIONS,
+        source=getattr(price_alert["source"], "value", price_alert["source"]),
+        direction=price_alert["direction"],
+        threshold_price=price_alert["threshold_price"]
+    )
+    db.add(db_price_alert)
+    db.commit()
+    db.refresh(db_price_alert)
+    price_alert_service.invalidate()
+    return db_price_alert
+
+
+def get_price_alert(db: Session, price_alert_id: str) -> Optional[PriceAlert]:
+    """Get a price alert by ID."""
+    return db.query(PriceAlert).filter(PriceAlert.id == price_alert_id).first()
+
+
+def get_price_alerts(db: Session, user_id: str, skip: int = 0, limit: int = 100) -> List[PriceAlert]:
+    """Get a user's price alerts, newest first."""
+    return (
+        db.query(PriceAlert)
+        .filter(PriceAlert.user_id == user_id)
+        .order_by(PriceAlert.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+def delete_price_alert(db: Session, price_alert_id: str) -> bool:
+    """Delete a price alert."""
+    db_price_alert = get_price_alert(db, price_alert_id)
+    if db_price_alert:
+        db.delete(db_price_alert)
+        db.commit()
+        price_alert_service.invalidate()
+        return True
+    return False
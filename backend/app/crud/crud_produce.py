@@ -1,8 +1,81 @@
 
-from typing import List, Optional
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import uuid4
+from geoalchemy2 import Geography
+from sqlalchemy import cast, func, insert, literal, or_, and_, case, tuple_, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from app.models.matching import ListingMatch
 from app.models.produce import ProduceListing
-from app.schemas.produce import ProduceListingCreate, ProduceListingUpdate
+from app.models.transaction import Transaction, TransactionStatus
+from app.schemas.produce import ProduceListingCreate, ProduceListingUpdate, ListingStatus, QualityGrade
+from app.services.cache_service import PRODUCE_CACHE_NAMESPACE as CACHE_NAMESPACE, response_cache
+from app.services.geo_service import ResolvedLocation, resolve_location, geohash_cover, haversine_km
+from app.services.listing_state_service import (
+    InsufficientQuantityError, ListingUnavailableError, StaleVersionError, check_transition
+)
+from app.services.price_alert_service import price_alert_service
+from app.services.price_index_service import price_index_service
+from app.services.search_service import normalize_crop_name, search_service
+
+# Leftover quantity below this counts as sold out (float kg arithmetic)
+QUANTITY_EPSILON = 1e-6
+# Expired listing ids per IN (...) when dropping their matches
+EXPIRE_CHUNK_SIZE = 5000
+
+
+def apply_location(db_produce_listing: ProduceListing, location: ResolvedLocation):
+    """Set the point and its derived columns on a listing."""
+    db_produce_listing.location = location.ewkt
+    db_produce_listing.latitude = location.latitude
+    db_produce_listing.longitude = location.longitude
+    db_produce_listing.region = location.region
+    db_produce_listing.geohash = location.geohash
+
+def listing_crop_day(db_produce_listing: ProduceListing):
+    """The asking-price index bucket a listing counts in."""
+    return db_produce_listing.crop_type, db_produce_listing.created_at.date()
+
+def listing_price(db_produce_listing: ProduceListing):
+    """(id, crop, region, asking price) of a listing, as listing price alerts take it."""
+    return (db_produce_listing.id, db_produce_listing.crop_type, db_produce_listing.region,
+            db_produce_listing.expected_price_per_kg)
+
+def encode_listing_cursor(db_produce_listing: ProduceListing) -> str:
+    """Opaque keyset cursor for the position just after this listing."""
+    payload = json.dumps([db_produce_listing.created_at.isoformat(), db_produce_listing.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_listing_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_listing_cursor; raises ValueError for a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, listing_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(listing_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _paginate(query, skip: int, limit: int, after: Optional[str]):
+    """
+    Newest first, ordered on (created_at, id) so the composite indexes serve
+    both the filter and the sort. With `after`, seek past the cursor instead
+    of counting through `skip` rows.
+    """
+    if after:
+        created_at, listing_id = decode_listing_cursor(after)
+        # Row-value comparison lets the index seek straight to the cursor
+        query = query.filter(tuple_(ProduceListing.created_at, ProduceListing.id) < tuple_(created_at, listing_id))
+    query = query.order_by(ProduceListing.created_at.desc(), ProduceListing.id.desc())
+    if not after:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+
 def create_produce_listing(db: Session, produce_listing: ProduceListingCreate) -> ProduceListing:
     """Create a new produce listing."""
     import logging
@@ -21,11 +94,12 @@ def create_produce_listing(db: Session, produce_listing: ProduceListingCreate) -
         if hasattr(quality_grade_val, 'value'):
             quality_grade_val = quality_grade_val.value
             
-        # Handle location conversion
-        # Default to Kano if not provided or invalid (MVP)
-        # In production, use geocoding here
-        # Format: SRID=4326;POINT(longitude latitude)
-        location_wkt = "SRID=4326;POINT(8.5200 11.9999)" 
+        # Coordinates, WKT or a known place name; raises LocationError if unresolvable
+        location = resolve_location(
+            produce_listing.get("location"),
+            produce_listing.get("latitude"),
+            produce_listing.get("longitude")
+        )
         
         db_produce_listing = ProduceListing(
             farmer_id=produce_listing["farmer_id"],
@@ -34,17 +108,20 @@ def create_produce_listing(db: Session, produce_listing: ProduceListingCreate) -
             quality_grade=quality_grade_val,
             harvest_date=produce_listing["harvest_date"],
             expected_price_per_kg=produce_listing["expected_price_per_kg"],
-            location=location_wkt,
             storage_conditions=produce_listing.get("storage_conditions"),
             shelf_life_days=produce_listing.get("shelf_life_days"),
             expires_at=produce_listing["expires_at"],
             voice_message_id=produce_listing.get("voice_message_id"),
             transcription=produce_listing.get("transcription")
         )
+        apply_location(db_produce_listing, location)
 
         db.add(db_produce_listing)
         db.commit()
         db.refresh(db_produce_listing)
+        response_cache.invalidate(CACHE_NAMESPACE)
+        price_index_service.refresh_listings(db, [listing_crop_day(db_produce_listing)])
+        price_alert_service.evaluate_listings(db, [listing_price(db_produce_listing)])
         logger.info(f"Created produce listing {db_produce_listing.id}")
         return db_produce_listing
     except Exception as e:
@@ -52,16 +129,64 @@ def create_produce_listing(db: Session, produce_listing: ProduceListingCreate) -
         db.rollback()
         raise
 
+def bulk_insert_produce_listings(db: Session, listings: List[Tuple[dict, ResolvedLocation]]) -> List[str]:
+    """
+    Insert validated listings and return their ids. Does not commit, so
+    several chunks can share one transaction.
+
+    The rows are passed as executemany parameters. SQLAlchemy renders them
+    as multi-row INSERT ... VALUES batches ("insertmanyvalues") from one
+    cached compiled statement, which avoids compiling a fresh
+    insert().values([...]) with thousands of bind parameters per chunk.
+    """
+    if not listings:
+        return []
+    now = datetime.utcnow()
+    rows = []
+    ids = set()
+    for data, location in listings:
+        # Short ids can collide within a large batch; draw again if so
+        listing_id = f"prod_{uuid4().hex[:8]}"
+        while listing_id in ids:
+            listing_id = f"prod_{uuid4().hex[:8]}"
+        ids.add(listing_id)
+        quality_grade = data.get("quality_grade") or QualityGrade.GOOD
+        rows.append({
+            "id": listing_id,
+            "farmer_id": data["farmer_id"],
+            "crop_type": getattr(data["crop_type"], "value", data["crop_type"]),
+            "quantity_kg": data["quantity_kg"],
+            "quality_grade": QualityGrade(quality_grade),
+            "harvest_date": data["harvest_date"],
+            "expected_price_per_kg": data["expected_price_per_kg"],
+            "location": location.ewkt,
+            "latitude": location.latitude,
+            "longitude": location.longitude,
+            "region": location.region,
+            "geohash": location.geohash,
+            "storage_conditions": data.get("storage_conditions"),
+            "shelf_life_days": data.get("shelf_life_days"),
+            "status": ListingStatus.AVAILABLE,
+            "version": 1,
+            "created_at": now,
+            "expires_at": data["expires_at"],
+            "voice_message_id": data.get("voice_message_id"),
+            "transcription": data.get("transcription"),
+        })
+    db.execute(insert(ProduceListing), rows)
+    return [row["id"] for row in rows]
+
 def get_produce_listing(db: Session, produce_listing_id: str) -> Optional[ProduceListing]:
     """Get a produce listing by ID."""
     return db.query(ProduceListing).filter(ProduceListing.id == produce_listing_id).first()
 
-def get_produce_listings(db: Session, skip: int = 0, limit: int = 100, farmer_id: Optional[str] = None) -> List[ProduceListing]:
+def get_produce_listings(db: Session, skip: int = 0, limit: int = 100, farmer_id: Optional[str] = None,
+                         after: Optional[str] = None) -> List[ProduceListing]:
     """Get a list of produce listings all or from a farmer"""
     query = db.query(ProduceListing)
     if farmer_id:
         query = query.filter(ProduceListing.farmer_id == farmer_id)
-    return query.offset(skip).limit(limit).all()
+    return _paginate(query, skip, limit, after).all()
 
 def search_produce_listings( 
     db: Session,
@@ -70,13 +195,36 @@ def search_produce_listings(
     max_price: Optional[float] = None,
     radius_km: Optional[float] = None,
     farmer_id: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    status: Optional[ListingStatus] = None,
+    min_freshness: Optional[float] = None,
+    q: Optional[str] = None,
+    sort: str = "newest",
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    after: Optional[str] = None
 ):
-    """Get a list of produce listings.base on criteria"""
+    """Get a list of produce listings.base on criteria
+
+    Results are newest first; pass the previous page's cursor as `after` for
+    the next page. With a radius and a centre point, only listings within
+    `radius_km` are returned, nearest first, each with `distance_km` set
+    (these pages use `skip`). `sort="freshest"` orders by freshness score in
+    the database, also paged with `skip`.
+
+    `q` is free text matched against crop names (with local synonyms and
+    typo tolerance) and voice transcriptions. Without a radius, matches are
+    ordered best first, each with `search_rank` set, and paged with `skip`.
+    """
     query = db.query(ProduceListing)
 
+    if status:
+        query = query.filter(ProduceListing.status == status)
+
     if crop_type:
+        # "masara" or "tomatos" still find maize and tomatoes
+        crop_type = normalize_crop_name(crop_type) or crop_type
         query = query.filter(ProduceListing.crop_type == crop_type)
 
     if min_quantity:
@@ -85,13 +233,104 @@ def search_produce_listings(
     if max_price:
         query = query.filter(ProduceListing.expected_price_per_kg <= max_price)
 
-    # if radius_km:
-    #     query = query.filter(ProduceListing.location <= radius_km)
-
     if farmer_id:
         query = query.filter(ProduceListing.farmer_id == farmer_id)
 
-    return query.offset(skip).limit(limit).all()
+    if min_freshness is not None:
+        query = query.filter(ProduceListing.freshness_score >= min_freshness)
+
+    rank = None
+    if q:
+        query, rank = search_service.apply(db, query, q)
+
+    if radius_km and latitude is not None and longitude is not None:
+        if db.get_bind().dialect.name == "postgresql":
+            return _search_within_radius_postgis(query, latitude, longitude, radius_km, skip, limit)
+        return _search_within_radius_geohash(query, latitude, longitude, radius_km, skip, limit)
+
+    if q:
+        return _order_by_search_rank(query, rank, skip, limit)
+
+    if sort == "freshest":
+        return (
+            query.order_by(ProduceListing.freshness_score.desc(), ProduceListing.created_at.desc(),
+                           ProduceListing.id.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+    if sort != "newest":
+        raise ValueError(f"Unknown sort '{sort}'; use 'newest' or 'freshest'")
+
+    return _paginate(query, skip, limit, after).all()
+
+
+def _order_by_search_rank(query, rank, skip: int, limit: int):
+    """Best text matches first; rank is a SQL expression or in-process scores by id."""
+    if isinstance(rank, dict):
+        listings = sorted(
+            query.all(),
+            key=lambda listing: (rank.get(listing.id, 0.0), listing.created_at, listing.id),
+            reverse=True
+        )[skip:skip + limit]
+        for listing in listings:
+            listing.search_rank = rank.get(listing.id, 0.0)
+        return listings
+
+    rows = (
+        query.add_columns(rank.label("search_rank"))
+        .order_by(rank.desc(), ProduceListing.created_at.desc(), ProduceListing.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    listings = []
+    for listing, search_rank in rows:
+        listing.search_rank = round(float(search_rank), 4)
+        listings.append(listing)
+    return listings
+
+
+def _search_within_radius_postgis(query, latitude: float, longitude: float, radius_km: float, skip: int, limit: int):
+    """ST_DWithin on geography, served by the GiST index on location::geography."""
+    centre = cast(func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), 4326), Geography)
+    listing_geography = cast(ProduceListing.location, Geography)
+    distance_m = func.ST_Distance(listing_geography, centre)
+
+    rows = (
+        query.add_columns(distance_m.label("distance_m"))
+        .filter(func.ST_DWithin(listing_geography, centre, radius_km * 1000))
+        .order_by(distance_m)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    listings = []
+    for listing, distance in rows:
+        listing.distance_km = round(distance / 1000, 3)
+        listings.append(listing)
+    return listings
+
+
+def _search_within_radius_geohash(query, latitude: float, longitude: float, radius_km: float, skip: int, limit: int):
+    """Indexed geohash prefix ranges to find candidates, then an exact haversine check."""
+    cells = geohash_cover(latitude, longitude, radius_km)
+    # "~" sorts after every geohash character, so each prefix is a range scan on the index
+    query = query.filter(or_(*[
+        and_(ProduceListing.geohash >= cell, ProduceListing.geohash < cell + "~")
+        for cell in cells
+    ]))
+
+    matches = []
+    for listing in query.all():
+        if listing.latitude is None or listing.longitude is None:
+            continue
+        distance = haversine_km(latitude, longitude, listing.latitude, listing.longitude)
+        if distance <= radius_km:
+            listing.distance_km = round(distance, 3)
+            matches.append(listing)
+    matches.sort(key=lambda listing: listing.distance_km)
+    return matches[skip:skip + limit]
 
 
 # def update_produce_listing(db: Session, produce_listing_id: str, produce_listing_update: ProduceListingUpdate) -> Optional[ProduceListing]:
@@ -113,7 +352,24 @@ def update_produce_listing(db: Session, produce_listing_id: str, produce_listing
     if not db_produce_listing:
         return None
 
-    update_dict = produce_listing_update
+    update_dict = dict(produce_listing_update)
+    previous_crop_day = listing_crop_day(db_produce_listing)
+
+    # Compare-and-swap: the flush below updates WHERE version = the version read here
+    expected_version = update_dict.pop("version", None)
+    if expected_version is not None and expected_version != db_produce_listing.version:
+        raise StaleVersionError(
+            f"Listing {produce_listing_id} is at version {db_produce_listing.version}, not {expected_version}"
+        )
+    if update_dict.get("status") is not None:
+        check_transition(ListingStatus(db_produce_listing.status), ListingStatus(update_dict["status"]))
+
+    # Explicit coordinates take precedence over a location string
+    latitude = update_dict.pop("latitude", None)
+    longitude = update_dict.pop("longitude", None)
+    if latitude is not None and longitude is not None:
+        apply_location(db_produce_listing, resolve_location(latitude=latitude, longitude=longitude))
+        update_dict.pop("location", None)
 
     for field, value in update_dict.items():
 
@@ -124,23 +380,151 @@ def update_produce_listing(db: Session, produce_listing_id: str, produce_listing
         if isinstance(value, Enum):
             value = value.value
 
-        # Convert location WKT to EWKT
+        # Resolve the new location and keep the derived columns in step
         if field == "location":
-            value = f"SRID=4326;{value}"
+            apply_location(db_produce_listing, resolve_location(value))
+            continue
 
         setattr(db_produce_listing, field, value)
 
-    db.commit()
+    # Queue the listing for the next buyer matching run
+    db_produce_listing.matched_at = None
+
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise StaleVersionError(f"Listing {produce_listing_id} was modified concurrently")
     db.refresh(db_produce_listing)
+    response_cache.invalidate(CACHE_NAMESPACE)
+    price_index_service.refresh_listings(db, {previous_crop_day, listing_crop_day(db_produce_listing)})
     return db_produce_listing
 
 
+def reserve_produce_quantity(db: Session, produce_listing_id: str, quantity_kg: float) -> Optional[ProduceListing]:
+    """
+    Take quantity_kg off an AVAILABLE listing in one conditional UPDATE; the
+    listing moves to MATCHED when nothing is left. No row lock is held, so
+    concurrent buyers race on the WHERE clause and at most the available
+    quantity is ever reserved. Returns None if the listing does not exist and
+    raises ListingUnavailableError / InsufficientQuantityError if the
+    reservation lost. Does not commit.
+    """
+    if quantity_kg <= 0:
+        raise ValueError("Reserved quantity must be positive")
+    remaining = ProduceListing.quantity_kg - quantity_kg
+    sold_out = remaining <= QUANTITY_EPSILON
+    reserved = (
+        db.query(ProduceListing)
+        .filter(
+            ProduceListing.id == produce_listing_id,
+            ProduceListing.status == ListingStatus.AVAILABLE,
+            ProduceListing.quantity_kg >= quantity_kg - QUANTITY_EPSILON,
+        )
+        .update({
+            ProduceListing.quantity_kg: case((sold_out, 0.0), else_=remaining),
+            ProduceListing.status: case(
+                (sold_out, literal(ListingStatus.MATCHED, ProduceListing.status.type)), else_=ProduceListing.status
+            ),
+            ProduceListing.version: ProduceListing.version + 1,
+        }, synchronize_session=False)
+    )
+    db_produce_listing = db.get(ProduceListing, produce_listing_id, populate_existing=True)
+    if reserved or db_produce_listing is None:
+        return db_produce_listing
+    if db_produce_listing.status != ListingStatus.AVAILABLE:
+        raise ListingUnavailableError(f"Listing {produce_listing_id} is {db_produce_listing.status.value}")
+    raise InsufficientQuantityError(
+        f"Only {db_produce_listing.quantity_kg:g}kg left on listing {produce_listing_id}, requested {quantity_kg:g}kg"
+    )
+
+
+def release_produce_quantity(db: Session, produce_listing_id: str, quantity_kg: float) -> bool:
+    """
+    Hand a cancelled reservation back to its listing (MATCHED -> AVAILABLE)
+    and queue it for matching again. Does not commit.
+    """
+    released = (
+        db.query(ProduceListing)
+        .filter(
+            ProduceListing.id == produce_listing_id,
+            ProduceListing.status.in_((ListingStatus.AVAILABLE, ListingStatus.MATCHED, ListingStatus.EXPIRED)),
+        )
+        .update({
+            ProduceListing.quantity_kg: ProduceListing.quantity_kg + quantity_kg,
+            ProduceListing.status: case(
+                (ProduceListing.status == ListingStatus.MATCHED,
+                 literal(ListingStatus.AVAILABLE, ProduceListing.status.type)),
+                else_=ProduceListing.status,
+            ),
+            ProduceListing.matched_at: None,
+            ProduceListing.version: ProduceListing.version + 1,
+        }, synchronize_session=False)
+    )
+    return bool(released)
+
+
+def settle_produce_listing(db: Session, produce_listing_id: str) -> bool:
+    """
+    Mark a MATCHED listing SOLD once none of its deals is still open
+    (every one completed or cancelled). Does not commit.
+    """
+    open_deals = (
+        db.query(Transaction.id)
+        .filter(
+            Transaction.produce_listing_id == produce_listing_id,
+            Transaction.status.notin_((TransactionStatus.COMPLETED, TransactionStatus.CANCELLED)),
+        )
+        .exists()
+    )
+    settled = (
+        db.query(ProduceListing)
+        .filter(
+            ProduceListing.id == produce_listing_id,
+            ProduceListing.status == ListingStatus.MATCHED,
+            ~open_deals,
+        )
+        .update({
+            ProduceListing.status: ListingStatus.SOLD,
+            ProduceListing.version: ProduceListing.version + 1,
+        }, synchronize_session=False)
+    )
+    return bool(settled)
+
+
 
 def delete_produce_listing(db: Session, produce_listing_id: str) -> bool:
     """Delete a produce listing."""
     db_produce_listing = get_produce_listing(db, produce_listing_id)
     if db_produce_listing:
+        crop_day = listing_crop_day(db_produce_listing)
         db.delete(db_produce_listing)
         db.commit()
+        response_cache.invalidate(CACHE_NAMESPACE)
+        price_index_service.refresh_listings(db, [crop_day])
         return True
-    return False
\ No newline at end of file
+    return False
+
+
+def expire_produce_listings(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Mark every available listing past its expires_at as EXPIRED in one UPDATE
+    and drop the buyer matches of the listings it expired (listings expired
+    by earlier runs are left alone). Returns the number of listings expired.
+    """
+    now = now or datetime.utcnow()
+    expired_ids = db.execute(
+        update(ProduceListing)
+        .where(ProduceListing.status == ListingStatus.AVAILABLE, ProduceListing.expires_at < now)
+        .values(status=ListingStatus.EXPIRED, version=ProduceListing.version + 1)
+        .returning(ProduceListing.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    for start in range(0, len(expired_ids), EXPIRE_CHUNK_SIZE):
+        db.query(ListingMatch).filter(
+            ListingMatch.listing_id.in_(expired_ids[start:start + EXPIRE_CHUNK_SIZE])
+        ).delete(synchronize_session=False)
+    db.commit()
+    if expired_ids:
+        response_cache.invalidate(CACHE_NAMESPACE)
+    return len(expired_ids)
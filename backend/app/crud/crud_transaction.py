@@ -1,10 +1,17 @@
 # app/crud/crud_transaction.py
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from app.models.transaction import Transaction, PaymentRecord, PaymentMethod, PaymentStatus
+from typing import Iterable, List, Optional
+from sqlalchemy import or_, select, union_all
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from app.core.money import line_total_kobo
+from app.models.produce import ProduceListing
+from app.models.transaction import Transaction, TransactionStatus, PaymentRecord, PaymentMethod, PaymentStatus
 from app.schemas.transaction import TransactionCreate, TransactionUpdate
 from app.schemas.payment import PaymentRecordCreate, PaymentRecordUpdate
+from app.crud.crud_produce import release_produce_quantity, reserve_produce_quantity, settle_produce_listing
+from app.services.cache_service import PAYMENTS_CACHE_NAMESPACE, PRODUCE_CACHE_NAMESPACE, response_cache, user_namespace
+from app.services.listing_state_service import StaleVersionError
+from app.services.price_index_service import TRANSACTION_SOURCE, price_index_service, transaction_crop_day
 
 
 def create_transaction(db: Session, transaction: TransactionCreate) -> Transaction:
@@ -21,17 +28,72 @@ def create_transaction(db: Session, transaction: TransactionCreate) -> Transacti
     db.add(db_transaction)
     db.commit()
     db.refresh(db_transaction)
+    price_index_service.refresh_transactions(db, [db_transaction])
     return db_transaction
 
 
+def create_reservation(db: Session, produce_listing_id: str, buyer_id: str, quantity_kg: float) -> Optional[Transaction]:
+    """
+    Reserve quantity_kg of a listing for a buyer and open a PENDING deal at
+    the asking price, in one database transaction. Returns None if the
+    listing does not exist; raises a ListingStateError if the reservation lost.
+    """
+    db_produce_listing = reserve_produce_quantity(db, produce_listing_id, quantity_kg)
+    if db_produce_listing is None:
+        return None
+    db_transaction = Transaction(
+        produce_listing_id=produce_listing_id,
+        seller_id=db_produce_listing.farmer_id,
+        buyer_id=buyer_id,
+        agreed_price_per_kg=db_produce_listing.expected_price_per_kg,
+        quantity_kg=quantity_kg,
+        total_amount_kobo=line_total_kobo(db_produce_listing.expected_price_per_kg, quantity_kg),
+        status=TransactionStatus.PENDING
+    )
+    db.add(db_transaction)
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(db_transaction)
+    response_cache.invalidate(PRODUCE_CACHE_NAMESPACE)
+    return db_transaction
+
+
+# Deals on a listing still waiting for the buyer's payment
+AWAITING_PAYMENT_STATUSES = (TransactionStatus.PENDING, TransactionStatus.PAYMENT_INITIATED)
+
+
 def get_transaction(db: Session, transaction_id: str) -> Optional[Transaction]:
-    """Get a transaction by ID. or produce listing as fallback"""
-    return db.query(Transaction).filter(or_(Transaction.id == transaction_id, Transaction.produce_listing_id == transaction_id)).first()
+    """Get a transaction by ID, with its payment records."""
+    return (
+        db.query(Transaction)
+        .options(selectinload(Transaction.payment_records))
+        .filter(Transaction.id == transaction_id)
+        .first()
+    )
+
+
+def get_transaction_for_listing(db: Session, produce_listing_id: str, buyer_id: Optional[str] = None) -> Optional[Transaction]:
+    """
+    Get the latest deal on a listing that is still awaiting payment,
+    optionally for one buyer. A listing can have several deals, so this
+    is ordered rather than "any match".
+    """
+    query = db.query(Transaction).options(selectinload(Transaction.payment_records)).filter(
+        Transaction.produce_listing_id == produce_listing_id,
+        Transaction.status.in_(AWAITING_PAYMENT_STATUSES),
+    )
+    if buyer_id:
+        query = query.filter(Transaction.buyer_id == buyer_id)
+    return query.order_by(Transaction.matched_at.desc(), Transaction.id.desc()).first()
 
 
 def get_transactions(db: Session, skip: int = 0, limit: int = 100, buyer_id: Optional[str] = None, seller_id: Optional[str] = None) -> List[Transaction]:
     """Get a list of transactions."""
-    query = db.query(Transaction)
+    # payment_status reads payment_records; load them in one query, not one per row
+    query = db.query(Transaction).options(selectinload(Transaction.payment_records))
     if buyer_id:
         query = query.filter(Transaction.buyer_id == buyer_id)
     if seller_id:
@@ -39,6 +101,68 @@ def get_transactions(db: Session, skip: int = 0, limit: int = 100, buyer_id: Opt
     return query.offset(skip).limit(limit).all()
 
 
+def get_user_payments(db: Session, user_id: str, skip: int = 0, limit: int = 10,
+                      key: Optional[str] = None) -> list:
+    """
+    A user's deals, as buyer or seller, newest first, each with its crop and
+    latest payment, in one query. key narrows it to one deal by transaction
+    id or payment reference. Rows carry: id, status, total_amount_kobo,
+    quantity_kg, matched_at, buyer_id, crop_type, payment_status,
+    payment_reference and payment_confirmed_at.
+    """
+    # One indexed branch per role rather than an OR across both columns
+    deal_ids = union_all(
+        select(Transaction.id).where(Transaction.buyer_id == user_id),
+        select(Transaction.id).where(Transaction.seller_id == user_id),
+    )
+    latest_payment = (
+        select(PaymentRecord.id)
+        .where(PaymentRecord.transaction_id == Transaction.id)
+        .order_by(PaymentRecord.created_at.desc(), PaymentRecord.id.desc())
+        .limit(1)
+        .correlate(Transaction)
+        .scalar_subquery()
+    )
+    query = (
+        db.query(
+            Transaction.id, Transaction.status, Transaction.total_amount_kobo, Transaction.quantity_kg,
+            Transaction.matched_at, Transaction.buyer_id, ProduceListing.crop_type,
+            PaymentRecord.status.label("payment_status"), PaymentRecord.reference.label("payment_reference"),
+            PaymentRecord.confirmed_at.label("payment_confirmed_at"),
+        )
+        .join(ProduceListing, ProduceListing.id == Transaction.produce_listing_id)
+        .outerjoin(PaymentRecord, PaymentRecord.id == latest_payment)
+        .filter(Transaction.id.in_(deal_ids))
+    )
+    if key:
+        query = query.filter(or_(
+            Transaction.id == key,
+            Transaction.id.in_(select(PaymentRecord.transaction_id).where(PaymentRecord.reference == key)),
+        ))
+    return query.order_by(Transaction.matched_at.desc(), Transaction.id.desc()).offset(skip).limit(limit).all()
+
+
+def invalidate_payment_summaries(user_ids: Iterable[str]):
+    """Drop the cached payment answers of these users"""
+    for user_id in set(user_ids):
+        if user_id:
+            response_cache.invalidate(user_namespace(PAYMENTS_CACHE_NAMESPACE, user_id))
+
+
+def invalidate_payment_summaries_for_references(db: Session, references: Iterable[str]):
+    """Drop the cached payment answers of the buyers and sellers behind these payments"""
+    references = list(references)
+    if not references:
+        return
+    parties = (
+        db.query(Transaction.buyer_id, Transaction.seller_id)
+        .join(PaymentRecord, PaymentRecord.transaction_id == Transaction.id)
+        .filter(PaymentRecord.reference.in_(references))
+        .all()
+    )
+    invalidate_payment_summaries(user_id for row in parties for user_id in row)
+
+
 def update_transaction(db: Session, transaction_id: str, transaction_update: TransactionUpdate) -> Optional[Transaction]:
     """Update a transaction."""
     db_transaction = get_transaction(db, transaction_id)
@@ -48,6 +172,7 @@ def update_transaction(db: Session, transaction_id: str, transaction_update: Tra
             setattr(db_transaction, field, value)
         db.commit()
         db.refresh(db_transaction)
+        price_index_service.refresh_transactions(db, [db_transaction])
     return db_transaction
 
 
@@ -55,8 +180,10 @@ def delete_transaction(db: Session, transaction_id: str) -> bool:
     """Delete a transaction."""
     db_transaction = get_transaction(db, transaction_id)
     if db_transaction:
+        crop_day = transaction_crop_day(db_transaction)
         db.delete(db_transaction)
         db.commit()
+        price_index_service.refresh(db, TRANSACTION_SOURCE, [crop_day])
         return True
     return False
 
@@ -65,9 +192,27 @@ def update_transaction_status(db: Session, transaction_id: str, status) -> Optio
     """Update the status of a transaction."""
     db_transaction = get_transaction(db, transaction_id)
     if db_transaction:
+        previous, status = db_transaction.status, TransactionStatus(getattr(status, "value", status))
         db_transaction.status = status
-        db.commit()
+        try:
+            # Compare-and-swap on the transaction version
+            db.flush()
+            # The listing follows its deals: cancelled quantity goes back on sale,
+            # and the listing is sold once its last open deal completes
+            if status == TransactionStatus.CANCELLED and previous != TransactionStatus.CANCELLED:
+                release_produce_quantity(db, db_transaction.produce_listing_id, db_transaction.quantity_kg)
+            elif status == TransactionStatus.COMPLETED:
+                settle_produce_listing(db, db_transaction.produce_listing_id)
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            raise StaleVersionError(f"Transaction {transaction_id} was modified concurrently")
         db.refresh(db_transaction)
+        if status in (TransactionStatus.CANCELLED, TransactionStatus.COMPLETED):
+            response_cache.invalidate(PRODUCE_CACHE_NAMESPACE)
+        invalidate_payment_summaries([db_transaction.buyer_id, db_transaction.seller_id])
+        # A deal's price enters (or leaves) the index as its state changes
+        price_index_service.refresh_transactions(db, [db_transaction])
     return db_transaction
 
 
@@ -86,6 +231,7 @@ def create_payment_record(db: Session, payment_record: PaymentRecordCreate, tran
     db.add(db_payment_record)
     db.commit()
     db.refresh(db_payment_record)
+    invalidate_payment_summaries_for_references(db, [db_payment_record.reference])
     return db_payment_record
 
 
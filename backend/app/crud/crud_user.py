@@ -3,6 +3,7 @@ from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.models.user import User, FarmerProfile, BuyerProfile
 from app.schemas.user import UserCreate, UserUpdate, FarmerProfileCreate, BuyerProfileCreate, FarmerProfileUpdate, BuyerProfileUpdate
+from app.services.matching_service import matching_service
 
 
 def create_user(db: Session, user: UserCreate) -> User:
@@ -90,6 +91,7 @@ def create_buyer_profile(db: Session, buyer_profile: BuyerProfileCreate, user_id
     db.add(db_buyer_profile)
     db.commit()
     db.refresh(db_buyer_profile)
+    matching_service.invalidate()
     return db_buyer_profile
 
 
@@ -124,4 +126,5 @@ def update_buyer_profile(db: Session, user_id: str, buyer_profile_update: BuyerP
             setattr(db_buyer_profile, field, value)
         db.commit()
         db.refresh(db_buyer_profile)
+        matching_service.invalidate()
     return db_buyer_profile
@@ -0,0 +1,54 @@
+# app/db/functions.py
+"""
+SQL functions whose spelling differs between PostgreSQL and SQLite, so model
+expressions can be written once and evaluated in the database.
+"""
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import Float
+
+
+class days_since(FunctionElement):
+    """Whole days (floored, UTC) from a timestamp column to now"""
+    type = Float()
+    inherit_cache = True
+    name = "days_since"
+
+
+@compiles(days_since)
+def _days_since_default(element, compiler, **kw):
+    (timestamp,) = list(element.clauses)
+    return "FLOOR(EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - %s)) / 86400.0)" % compiler.process(timestamp, **kw)
+
+
+@compiles(days_since, "postgresql")
+def _days_since_postgresql(element, compiler, **kw):
+    (timestamp,) = list(element.clauses)
+    # Naive timestamps are stored in UTC (datetime.utcnow)
+    return "FLOOR(EXTRACT(EPOCH FROM (TIMEZONE('utc', NOW()) - %s)) / 86400.0)" % compiler.process(timestamp, **kw)
+
+
+@compiles(days_since, "sqlite")
+def _days_since_sqlite(element, compiler, **kw):
+    (timestamp,) = list(element.clauses)
+    days = "(julianday('now') - julianday(%s))" % compiler.process(timestamp, **kw)
+    # CAST truncates towards zero; step down for negative fractions to floor
+    return "(CAST(CAST(%s AS INTEGER) AS REAL) - (%s < CAST(%s AS INTEGER)))" % (days, days, days)
+
+
+class greatest(FunctionElement):
+    """Largest of the arguments"""
+    type = Float()
+    inherit_cache = True
+    name = "greatest"
+
+
+@compiles(greatest)
+def _greatest_default(element, compiler, **kw):
+    return "GREATEST(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(greatest, "sqlite")
+def _greatest_sqlite(element, compiler, **kw):
+    # SQLite's multi-argument MAX() is the scalar maximum
+    return "MAX(%s)" % compiler.process(element.clauses, **kw)
@@ -50,6 +50,7 @@ class VoiceMessage(Base):
     audio_file_url = Column(String, nullable=False)  # S3/Cloudflare R2 URL
     audio_duration_seconds = Column(Float, nullable=False)
     language_detected = Column(Enum("english", "hausa", "pidgin", "mixed", name="language_detected_enum"), default="hausa")
+    language_confidence = Column(Float, nullable=True)  # Of language_detected, 0.0-1.0
     
     # Processing status
     transcription = Column(Text, nullable=True)  # Transcribed text
@@ -60,6 +61,11 @@ class VoiceMessage(Base):
     # AI context
     identified_intent = Column(Enum(IntentCategory, name="identified_intent_enum"), default=IntentCategory.UNKNOWN)
     entities_extracted = Column(JSON, nullable=True)  # {"crop_type": "tomatoes", "quantity": "50kg"}
+
+    # Reply to this note; a session's voice_message_id only points at its latest note
+    session_id = Column(String, nullable=True, index=True)  # Chat session the note was sent in
+    ai_response = Column(Text, nullable=True)
+    ai_voice_response_url = Column(String, nullable=True)  # TTS audio URL
     
     # Metadata
     source = Column(Enum(MessageSource, name="source_enum"), default=MessageSource.WHATSAPP)
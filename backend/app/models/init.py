@@ -5,6 +5,11 @@ from .transaction import Transaction, PaymentRecord
 from .logistics import LogisticsRequest
 from .conversation import VoiceMessage, ChatSession, AdvisoryRecord
 from .notification import Notification
+from .matching import ListingMatch
+from .market import PriceIndexDaily, PriceAlert
+from .payment_event import PaymentEvent
+from .payout import PayoutBatch, Payout, SettlementEntry
+from .ledger import LedgerAccount, LedgerEntry, LedgerPosting
 
 __all__ = [
     "User",
@@ -17,5 +22,15 @@ __all__ = [
     "VoiceMessage",
     "ChatSession",
     "AdvisoryRecord",
-    "Notification"
+    "Notification",
+    "ListingMatch",
+    "PriceIndexDaily",
+    "PriceAlert",
+    "PaymentEvent",
+    "PayoutBatch",
+    "Payout",
+    "SettlementEntry",
+    "LedgerAccount",
+    "LedgerEntry",
+    "LedgerPosting"
 ]
\ No newline at end of file
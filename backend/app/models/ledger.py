@@ -0,0 +1,86 @@
+# app/models/ledger.py
+from datetime import datetime
+from enum import Enum as PyEnum
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, ForeignKey, Enum, Index, UniqueConstraint, event
+from sqlalchemy.orm import relationship
+from app.db.base_class import Base
+
+
+class LedgerAccountType(PyEnum):
+    ASSET = "ASSET"          # Money the platform holds (its Paystack balance)
+    LIABILITY = "LIABILITY"  # Money owed on: buyers' escrow, farmers' earnings
+    REVENUE = "REVENUE"      # Fees the platform keeps
+
+
+class LedgerEntryKind(PyEnum):
+    PAYMENT_RECEIVED = "PAYMENT_RECEIVED"        # Buyer paid through Paystack; held in escrow
+    SETTLEMENT = "SETTLEMENT"                    # Delivered deals moved from escrow to the farmer, less fees
+    SETTLEMENT_REVERSAL = "SETTLEMENT_REVERSAL"  # The settlement's payout failed; back to escrow
+    PAYOUT = "PAYOUT"                            # Transfer to the farmer paid
+
+
+class LedgerAccount(Base):
+    """
+    An account of the double-entry ledger. balance_kobo is debits minus
+    credits over all its postings (so liabilities and revenue are negative),
+    kept up to date by every posting, so a balance is a primary key read.
+    """
+    __tablename__ = "ledger_accounts"
+
+    id = Column(String, primary_key=True)  # "platform:paystack", "farmer:<user id>", ...
+    account_type = Column(Enum(LedgerAccountType, name="ledger_account_type_enum"), nullable=False)
+    owner_id = Column(String, ForeignKey("users.id"), nullable=True, index=True)
+    balance_kobo = Column(BigInteger, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class LedgerEntry(Base):
+    """
+    One money movement: a set of postings that sum to zero. Entries are
+    append-only and unique per (kind, reference), the payment or payout
+    they record, so recording the same movement twice is a no-op.
+    """
+    __tablename__ = "ledger_entries"
+    __table_args__ = (
+        UniqueConstraint("kind", "reference", name="uq_ledger_entries_kind_reference"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(Enum(LedgerEntryKind, name="ledger_entry_kind_enum"), nullable=False)
+    reference = Column(String, nullable=False)  # PaymentRecord or Payout reference
+    transaction_id = Column(String, ForeignKey("transactions.id"), nullable=True, index=True)
+    description = Column(String, nullable=True)
+    posted_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    postings = relationship("LedgerPosting", back_populates="entry")
+
+
+class LedgerPosting(Base):
+    """
+    One line of an entry: amount_kobo is a debit when positive and a credit
+    when negative. balance_after_kobo snapshots the account's balance with
+    this posting applied, so the balance at any moment is one index seek.
+    """
+    __tablename__ = "ledger_postings"
+    __table_args__ = (
+        # Balance of an account at a point in time, and its statement
+        Index("ix_ledger_postings_account_posted", "account_id", "posted_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entry_id = Column(Integer, ForeignKey("ledger_entries.id"), nullable=False, index=True)
+    account_id = Column(String, ForeignKey("ledger_accounts.id"), nullable=False)
+    amount_kobo = Column(BigInteger, nullable=False)
+    balance_after_kobo = Column(BigInteger, nullable=False)
+    posted_at = Column(DateTime, nullable=False, index=True)  # The entry's, for range scans
+
+    entry = relationship("LedgerEntry", back_populates="postings")
+
+
+@event.listens_for(LedgerEntry, "before_update")
+@event.listens_for(LedgerEntry, "before_delete")
+@event.listens_for(LedgerPosting, "before_update")
+@event.listens_for(LedgerPosting, "before_delete")
+def _append_only(mapper, connection, target):
+    raise ValueError("Ledger entries are append-only; post a reversing entry instead")
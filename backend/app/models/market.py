@@ -0,0 +1,76 @@
+# app/models/market.py
+from datetime import datetime
+from uuid import uuid4
+from sqlalchemy import Column, String, Float, Date, DateTime, Integer, ForeignKey, Boolean, Enum, UniqueConstraint, Index
+from sqlalchemy.orm import relationship
+from app.db.base_class import Base
+
+from app.schemas.market import PriceAlertDirection
+
+# Price sources: agreed deal prices and listing asking prices
+TRANSACTION_SOURCE = "transaction"
+LISTING_SOURCE = "listing"
+# Region of national rollups and alerts
+ALL_REGIONS = "all"
+
+
+class PriceIndexDaily(Base):
+    """
+    Daily price rollup for one crop in one region, from agreed deal prices
+    ("transaction") or asking prices ("listing"). Region "all" is the
+    national rollup. Maintained by app.services.price_index_service.
+    """
+    __tablename__ = "price_index_daily"
+    __table_args__ = (
+        UniqueConstraint("crop_type", "region", "source", "day", name="uq_price_index_daily_bucket"),
+        # Price history of a crop in a region, latest first
+        Index("ix_price_index_daily_crop_region_day", "crop_type", "region", "day"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: f"pidx_{uuid4().hex[:8]}")
+    crop_type = Column(String, nullable=False)
+    region = Column(String, nullable=False)
+    source = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+
+    # Price per kg (NGN)
+    median_price = Column(Float, nullable=False)
+    p25_price = Column(Float, nullable=False)
+    p75_price = Column(Float, nullable=False)
+    min_price = Column(Float, nullable=False)
+    max_price = Column(Float, nullable=False)
+    avg_price = Column(Float, nullable=False)  # Volume weighted
+
+    sample_count = Column(Integer, nullable=False)
+    volume_kg = Column(Float, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PriceAlert(Base):
+    """
+    A user's price alert subscription. "transaction" alerts watch the daily
+    deal price index (median); "listing" alerts watch each new listing's
+    asking price. Region "all" matches every region.
+    """
+    __tablename__ = "price_alerts"
+    __table_args__ = (
+        # Range lookup of the alerts a price crosses
+        Index("ix_price_alerts_lookup", "crop_type", "source", "direction", "region", "threshold_price"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: f"alert_{uuid4().hex[:8]}")
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    crop_type = Column(String, nullable=False)
+    region = Column(String, nullable=False, default=ALL_REGIONS)
+    source = Column(String, nullable=False, default=TRANSACTION_SOURCE)
+    direction = Column(Enum(PriceAlertDirection, name="price_alert_direction_enum"), nullable=False)
+    threshold_price = Column(Float, nullable=False)  # Per kg (NGN)
+
+    active = Column(Boolean, default=True)
+    last_triggered_at = Column(DateTime, nullable=True)
+    last_triggered_price = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    user = relationship("User")
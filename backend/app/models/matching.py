@@ -0,0 +1,40 @@
+# app/models/matching.py
+from datetime import datetime
+from uuid import uuid4
+from sqlalchemy import Column, String, Float, DateTime, Integer, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.orm import relationship
+from app.db.base_class import Base
+
+
+class ListingMatch(Base):
+    """A candidate buyer for a produce listing, as ranked by the matching engine"""
+    __tablename__ = "listing_matches"
+    __table_args__ = (
+        UniqueConstraint("listing_id", "buyer_id", name="uq_listing_matches_listing_buyer"),
+        # A listing's matches in rank order
+        Index("ix_listing_matches_listing_rank", "listing_id", "rank"),
+        # A buyer's best matches
+        Index("ix_listing_matches_buyer_score", "buyer_id", "score"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: f"match_{uuid4().hex[:8]}")
+    listing_id = Column(String, ForeignKey("produce_listings.id", ondelete="CASCADE"), nullable=False)
+    buyer_id = Column(String, ForeignKey("users.id"), nullable=False)
+
+    # Overall score (0-1) and its rank among this listing's matches (1 = best)
+    score = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)
+
+    # Score components, each 0-1
+    crop_score = Column(Float, nullable=False)
+    distance_score = Column(Float, nullable=False)
+    volume_score = Column(Float, nullable=False)
+    price_score = Column(Float, nullable=False)
+    reliability_score = Column(Float, nullable=False)
+    distance_km = Column(Float, nullable=True)  # None when the buyer has no location
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    listing = relationship("ProduceListing", back_populates="matches")
+    buyer = relationship("User")
@@ -0,0 +1,37 @@
+# app/models/payment_event.py
+from datetime import datetime
+from enum import Enum as PyEnum
+from sqlalchemy import Column, String, DateTime, Integer, Enum, JSON, Text, Index
+from app.db.base_class import Base
+
+
+class PaymentEventStatus(PyEnum):
+    RECEIVED = "RECEIVED"    # Stored and acknowledged, waiting for the worker
+    PROCESSED = "PROCESSED"  # Applied to the payment and transaction
+    IGNORED = "IGNORED"      # Nothing to apply (unknown reference, unhandled event, amount mismatch)
+    FAILED = "FAILED"        # Gave up after retries; see last_error
+
+
+class PaymentEvent(Base):
+    """
+    Inbox of raw Paystack webhook events. Rows are inserted once, keyed by the
+    event's dedup id, and never rewritten apart from the processing markers,
+    so a redelivered webhook is a no-op and a lost worker job can be replayed.
+    """
+    __tablename__ = "payment_events"
+    __table_args__ = (
+        # Replay of events the worker has not finished
+        Index("ix_payment_events_status_received", "status", "received_at"),
+    )
+
+    id = Column(String, primary_key=True)  # "<event>:<Paystack data.id>" (see payment_event_id)
+    event = Column(String, nullable=False)
+    reference = Column(String, nullable=True, index=True)
+    payload = Column(JSON, nullable=False)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Processing markers
+    status = Column(Enum(PaymentEventStatus, name="payment_event_status_enum"), default=PaymentEventStatus.RECEIVED, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
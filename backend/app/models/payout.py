@@ -0,0 +1,109 @@
+# app/models/payout.py
+from datetime import datetime
+from enum import Enum as PyEnum
+from uuid import uuid4
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, ForeignKey, Enum, Text, Index, text
+from sqlalchemy.orm import relationship
+from app.db.base_class import Base
+
+
+class PayoutBatchStatus(PyEnum):
+    PENDING = "PENDING"      # Built, not yet accepted by the payout gateway
+    SUBMITTED = "SUBMITTED"  # Accepted; some transfers are still processing
+    COMPLETED = "COMPLETED"  # Every transfer was paid or failed
+    FAILED = "FAILED"        # The gateway kept rejecting the batch; see last_error
+
+
+class PayoutStatus(PyEnum):
+    PENDING = "PENDING"        # Waiting for its batch to be submitted
+    PROCESSING = "PROCESSING"  # Transfer accepted by the gateway, or its outcome is not known yet
+    PAID = "PAID"              # Money sent to the farmer
+    FAILED = "FAILED"          # Transfer failed; its deals are settled again later
+
+
+class PayoutBatch(Base):
+    """
+    One bulk transfer call to the payout gateway. Paystack's bulk API has no
+    batch-level key, so the batch reference is only our own id for the call:
+    deduplication relies solely on each payout's transfer reference, which
+    never changes, so resubmitting after a timeout cannot pay a farmer twice.
+    """
+    __tablename__ = "payout_batches"
+    __table_args__ = (
+        # Batches still to submit, oldest first
+        Index("ix_payout_batches_status_created", "status", "created_at"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: f"pob_{uuid4().hex[:12]}")
+    reference = Column(String, unique=True, nullable=False)  # Our id for the bulk call; not sent to Paystack
+    gateway = Column(String, nullable=False)
+    status = Column(Enum(PayoutBatchStatus, name="payout_batch_status_enum"), default=PayoutBatchStatus.PENDING, nullable=False)
+
+    # Totals in whole kobo: gross - fee = net, the amount transferred
+    transfer_count = Column(Integer, nullable=False)
+    gross_kobo = Column(BigInteger, nullable=False)
+    fee_kobo = Column(BigInteger, nullable=False)
+    net_kobo = Column(BigInteger, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    submitted_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    payouts = relationship("Payout", back_populates="batch")
+
+
+class Payout(Base):
+    """The transfer to one farmer in a batch, for all their settled deals"""
+    __tablename__ = "payouts"
+
+    id = Column(String, primary_key=True, default=lambda: f"po_{uuid4().hex[:12]}")
+    batch_id = Column(String, ForeignKey("payout_batches.id"), nullable=False, index=True)
+    farmer_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    recipient_code = Column(String, nullable=False)
+    reference = Column(String, unique=True, nullable=False)  # Transfer reference; the gateway dedupes on it
+
+    gross_kobo = Column(BigInteger, nullable=False)
+    fee_kobo = Column(BigInteger, nullable=False)
+    net_kobo = Column(BigInteger, nullable=False)
+
+    status = Column(Enum(PayoutStatus, name="payout_status_enum"), default=PayoutStatus.PENDING, nullable=False, index=True)
+    transfer_code = Column(String, nullable=True)  # Gateway's id for the transfer
+    failure_reason = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    paid_at = Column(DateTime, nullable=True)
+
+    batch = relationship("PayoutBatch", back_populates="payouts")
+    entries = relationship("SettlementEntry", back_populates="payout")
+
+
+class SettlementEntry(Base):
+    """
+    Ledger of what each payout settles: one row per delivered deal, with the
+    fee taken from it. A deal has at most one open (unreleased) entry, which
+    the database enforces, so concurrent runs cannot settle it twice. Rows
+    are never deleted; when a transfer fails its entries are released and the
+    deals are settled again in a later batch.
+    """
+    __tablename__ = "settlement_ledger"
+    __table_args__ = (
+        Index(
+            "uq_settlement_ledger_open_transaction", "transaction_id", unique=True,
+            postgresql_where=text("released_at IS NULL"), sqlite_where=text("released_at IS NULL"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    transaction_id = Column(String, ForeignKey("transactions.id"), nullable=False)
+    payout_id = Column(String, ForeignKey("payouts.id"), nullable=False, index=True)
+    farmer_id = Column(String, ForeignKey("users.id"), nullable=False)
+
+    gross_kobo = Column(BigInteger, nullable=False)  # The deal's total_amount_kobo
+    fee_kobo = Column(BigInteger, nullable=False)
+    net_kobo = Column(BigInteger, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    released_at = Column(DateTime, nullable=True)  # Set when the payout failed
+
+    payout = relationship("Payout", back_populates="entries")
@@ -1,10 +1,12 @@
 # app/models/produce.py
 from datetime import datetime, timedelta
 from uuid import uuid4
-from sqlalchemy import Column, String, Float, DateTime, Integer, ForeignKey, Boolean, Enum, JSON, Text
+from sqlalchemy import Column, String, Float, DateTime, Integer, ForeignKey, Boolean, Enum, JSON, Text, DDL, Index, event, text, case, cast, or_
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from geoalchemy2 import Geometry
 from app.db.base_class import Base
+from app.db.functions import days_since, greatest
 from enum import Enum as PyEnum
 
 from app.schemas.produce import CropType, ListingStatus, QualityGrade
@@ -33,6 +35,30 @@ from app.schemas.produce import CropType, ListingStatus, QualityGrade
 
 class ProduceListing(Base):
     __tablename__ = "produce_listings"
+    __table_args__ = (
+        # Buyer search: available listings of a crop, newest first (keyset on created_at, id).
+        # Partial on PostgreSQL; other databases get the full index.
+        Index(
+            "ix_produce_listings_available_crop_created",
+            "crop_type", "created_at", "id",
+            postgresql_where=text("status = 'AVAILABLE'")
+        ),
+        Index(
+            "ix_produce_listings_available_created",
+            "created_at", "id",
+            postgresql_where=text("status = 'AVAILABLE'")
+        ),
+        # A farmer's own listings, newest first
+        Index("ix_produce_listings_farmer_created", "farmer_id", "created_at", "id"),
+        # Unfiltered listing pages
+        Index("ix_produce_listings_created_id", "created_at", "id"),
+        # Expiry job: available listings by expiry time
+        Index(
+            "ix_produce_listings_available_expires",
+            "expires_at",
+            postgresql_where=text("status = 'AVAILABLE'")
+        ),
+    )
 
     id = Column(String, primary_key=True, index=True, default=lambda: f"prod_{uuid4().hex[:8]}")
     farmer_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -46,8 +72,11 @@ class ProduceListing(Base):
     expected_price_per_kg = Column(Float, nullable=False)
     
     # Location & Storage
-    location = Column(Text, nullable=False)
-    # location = Column(Geometry("POINT", srid=4326), nullable=False)
+    location = Column(Geometry("POINT", srid=4326, spatial_index=True), nullable=False)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    region = Column(String, nullable=True, index=True)  # State, e.g. "kano"
+    geohash = Column(String(12), nullable=True, index=True)  # Spatial index for databases without PostGIS
     storage_conditions = Column(String, nullable=True)  # "mud_silo", "plastic_bins", etc.
     shelf_life_days = Column(Integer, nullable=True)  # Estimated remaining shelf life
     
@@ -55,6 +84,9 @@ class ProduceListing(Base):
     status = Column(Enum(ListingStatus, name="produce_listng_status_enum"), default=ListingStatus.AVAILABLE)
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime, nullable=False)  # Auto-calculated based on crop type + shelf life
+    matched_at = Column(DateTime, nullable=True, index=True)  # Last buyer matching run; None = pending
+    # Bumped on every write; ORM updates compare-and-swap on it (see __mapper_args__)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Voice context (for voice listings)
     voice_message_id = Column(String, ForeignKey("voice_messages.id"), nullable=True)
@@ -64,12 +96,56 @@ class ProduceListing(Base):
     farmer = relationship("User", back_populates="produce_listings")
     voice_message = relationship("VoiceMessage")
     transactions = relationship("Transaction", back_populates="produce_listing")
+    matches = relationship(
+        "ListingMatch", back_populates="listing", order_by="ListingMatch.rank",
+        cascade="all, delete-orphan", passive_deletes=True
+    )
     
-    # Calculated field example (in property or service)
-    @property
+    # Flushes emit UPDATE ... WHERE version = :loaded and raise StaleDataError if another writer got there first
+    __mapper_args__ = {"version_id_col": version}
+
+    # Set by radius searches
+    distance_km = None
+    # Set by free-text searches
+    search_rank = None
+    
+    # Calculated on the instance, or in SQL for filtering and ordering.
+    # app.services.freshness_service scores many listings at once.
+    @hybrid_property
     def freshness_score(self):
         """Calculate freshness based on days since harvest and shelf life"""
         days_since_harvest = (datetime.utcnow() - self.harvest_date).days
         if not self.shelf_life_days or self.shelf_life_days == 0:
             return 0.0
-        return max(0.0, 1.0 - (days_since_harvest / self.shelf_life_days))
\ No newline at end of file
+        return max(0.0, 1.0 - (days_since_harvest / self.shelf_life_days))
+
+    @freshness_score.expression
+    def freshness_score(cls):
+        return case(
+            (or_(cls.shelf_life_days.is_(None), cls.shelf_life_days == 0), 0.0),
+            else_=greatest(0.0, 1.0 - days_since(cls.harvest_date) / cast(cls.shelf_life_days, Float))
+        )
+
+
+# Radius searches cast to geography for metre distances, so index that expression too
+event.listen(
+    ProduceListing.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_produce_listings_location_geography "
+        "ON produce_listings USING gist ((location::geography))"
+    ).execute_if(dialect="postgresql")
+)
+
+# Free-text search: a generated tsvector over crop and transcription, and
+# trigram indexes for typo-tolerant matching (see app.services.search_service)
+for statement in (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE produce_listings ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(crop_type, '') || ' ' || coalesce(transcription, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_produce_listings_search_vector ON produce_listings USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_produce_listings_crop_type_trgm ON produce_listings USING gin (crop_type gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_produce_listings_transcription_trgm "
+    "ON produce_listings USING gin (transcription gin_trgm_ops)",
+):
+    event.listen(ProduceListing.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
@@ -1,8 +1,10 @@
 # app/models/transaction.py
 from datetime import datetime, timedelta
 from uuid import uuid4
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Enum, Boolean, JSON
+from sqlalchemy import Column, String, Float, DateTime, Integer, BigInteger, ForeignKey, Enum, Boolean, JSON
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
+from app.core.money import from_kobo, to_kobo
 from app.db.base_class import Base
 from enum import Enum as PyEnum
 
@@ -32,21 +34,24 @@ class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(String, primary_key=True, index=True, default=lambda: f"txn_{uuid4().hex[:8]}")
-    produce_listing_id = Column(String, ForeignKey("produce_listings.id"), nullable=False)
-    seller_id = Column(String, ForeignKey("users.id"), nullable=False)  # Farmer
-    buyer_id = Column(String, ForeignKey("users.id"), nullable=False)
+    produce_listing_id = Column(String, ForeignKey("produce_listings.id"), nullable=False, index=True)
+    seller_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)  # Farmer
+    buyer_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
     
-    # Transaction details
-    agreed_price_per_kg = Column(Float, nullable=False)
+    # Transaction details; money is stored in whole kobo
+    agreed_price_per_kg_kobo = Column(BigInteger, nullable=False)
     quantity_kg = Column(Float, nullable=False)
-    total_amount = Column(Float, nullable=False)  # Calculated: price * quantity
+    total_amount_kobo = Column(BigInteger, nullable=False)  # Calculated: price * quantity
     
     #  Status & timing
-    status = Column(Enum(TransactionStatus, name="transaction_status_enum"), default=TransactionStatus.PENDING)
-    matched_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(Enum(TransactionStatus, name="transaction_status_enum"), default=TransactionStatus.PENDING, index=True)
+    matched_at = Column(DateTime, default=datetime.utcnow, index=True)
     payment_confirmed_at = Column(DateTime, nullable=True)
     delivered_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
+    # Bumped on every write; ORM updates compare-and-swap on it
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
     
     # Relationships
     produce_listing = relationship("ProduceListing", back_populates="transactions")
@@ -55,6 +60,32 @@ class Transaction(Base):
     payment_records = relationship("PaymentRecord", back_populates="transaction")
     logistics_request = relationship("LogisticsRequest", uselist=False, back_populates="transaction")
     
+    @hybrid_property
+    def agreed_price_per_kg(self):
+        """Naira per kg, as a Decimal"""
+        return None if self.agreed_price_per_kg_kobo is None else from_kobo(self.agreed_price_per_kg_kobo)
+
+    @agreed_price_per_kg.setter
+    def agreed_price_per_kg(self, value):
+        self.agreed_price_per_kg_kobo = None if value is None else to_kobo(value)
+
+    @agreed_price_per_kg.expression
+    def agreed_price_per_kg(cls):
+        return cls.agreed_price_per_kg_kobo / 100.0
+
+    @hybrid_property
+    def total_amount(self):
+        """Naira, as a Decimal"""
+        return None if self.total_amount_kobo is None else from_kobo(self.total_amount_kobo)
+
+    @total_amount.setter
+    def total_amount(self, value):
+        self.total_amount_kobo = None if value is None else to_kobo(value)
+
+    @total_amount.expression
+    def total_amount(cls):
+        return cls.total_amount_kobo / 100.0
+
     @property
     def payment_status(self):
         if not self.payment_records:
@@ -74,11 +105,11 @@ class PaymentRecord(Base):
     __tablename__ = "payment_records"
 
     id = Column(String, primary_key=True, default=lambda: f"pay_{uuid4().hex[:8]}")
-    transaction_id = Column(String, ForeignKey("transactions.id"), nullable=False)
+    transaction_id = Column(String, ForeignKey("transactions.id"), nullable=False, index=True)
     
     # Payment details
     payment_method = Column(Enum(PaymentMethod), default=PaymentMethod.PAYSTACK, name="payment_method_enum")
-    amount = Column(Float, nullable=False)
+    amount_kobo = Column(BigInteger, nullable=False)
     currency = Column(String, default="NGN")
     reference = Column(String, unique=True, nullable=False)  # Paystack reference
     
@@ -91,4 +122,17 @@ class PaymentRecord(Base):
     paystack_data = Column(JSON, nullable=True)  # Raw webhook data
     
     # Relationships
-    transaction = relationship("Transaction", back_populates="payment_records")
\ No newline at end of file
+    transaction = relationship("Transaction", back_populates="payment_records")
+
+    @hybrid_property
+    def amount(self):
+        """Naira, as a Decimal"""
+        return None if self.amount_kobo is None else from_kobo(self.amount_kobo)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_kobo = None if value is None else to_kobo(value)
+
+    @amount.expression
+    def amount(cls):
+        return cls.amount_kobo / 100.0
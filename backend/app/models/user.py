@@ -63,6 +63,9 @@ class FarmerProfile(Base):
     
     # Economic Data
     typical_price_range = Column(JSON, nullable=True)  # {"tomatoes": {"min": 500, "max": 1500}}
+
+    # Payouts
+    paystack_recipient_code = Column(String, nullable=True)  # Paystack transfer recipient for the farmer's bank account
     
     # Relationships
     user = relationship("User", back_populates="farmer_profile")
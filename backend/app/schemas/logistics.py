@@ -1,7 +1,11 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
 from enum import Enum
+from app.core.money import Money
+
+# Routes priced per batch quote request
+MAX_QUOTE_ROUTES = 1000
 
 
 class LogisticsStatus(Enum):
@@ -68,4 +72,23 @@ class LogisticsResponse(BaseModel):
     driver_notes: Optional[str] = None
     current_location: Optional[str] = None
     created_at: datetime
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+
+
+class TransportQuoteRoute(BaseModel):
+    pickup: str  # "latitude,longitude", a WKT POINT or a known town or market
+    dropoff: str
+    quantity_kg: float = Field(gt=0)
+
+
+class TransportQuoteRequest(BaseModel):
+    routes: List[TransportQuoteRoute] = Field(min_length=1, max_length=MAX_QUOTE_ROUTES)
+
+
+class TransportQuoteResponse(BaseModel):
+    distance_km: float
+    quantity_kg: float
+    transport_type: str
+    vehicles: Dict[str, int]
+    cost_kobo: int
+    cost: Money
@@ -0,0 +1,77 @@
+from datetime import date, datetime
+from enum import Enum
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class PriceIndexResponse(BaseModel):
+    crop_type: str
+    region: str  # "all" for the national rollup
+    source: str  # "transaction" (agreed deals) or "listing" (asking prices)
+    day: date
+    median_price: float
+    p25_price: float
+    p75_price: float
+    min_price: float
+    max_price: float
+    avg_price: float  # Volume weighted
+    sample_count: int
+    volume_kg: float
+
+    class Config:
+        from_attributes = True
+
+
+class PriceWindowSummary(BaseModel):
+    sample_count: int
+    volume_kg: float
+    avg_price: float  # Volume weighted over the window
+    min_price: float
+    max_price: float
+    # Quartiles of the latest day with data
+    latest_day: date
+    median_price: float
+    p25_price: float
+    p75_price: float
+
+
+class PriceSummaryResponse(BaseModel):
+    crop_type: str
+    region: str
+    days: int
+    transaction: Optional[PriceWindowSummary] = None
+    listing: Optional[PriceWindowSummary] = None
+
+
+class PriceSource(Enum):
+    TRANSACTION = "transaction"  # Daily median of agreed deal prices
+    LISTING = "listing"          # Asking price of each new listing
+
+
+class PriceAlertDirection(Enum):
+    ABOVE = "ABOVE"  # Price at or above the threshold
+    BELOW = "BELOW"  # Price at or below the threshold
+
+
+class PriceAlertCreate(BaseModel):
+    crop_type: str = Field(..., min_length=2, max_length=50)  # Local names accepted
+    region: Optional[str] = None  # None for every region
+    source: PriceSource = PriceSource.TRANSACTION
+    direction: PriceAlertDirection
+    threshold_price: float = Field(..., gt=0)  # Per kg
+
+
+class PriceAlertResponse(BaseModel):
+    id: str
+    crop_type: str
+    region: str
+    source: str
+    direction: PriceAlertDirection
+    threshold_price: float
+    active: bool
+    last_triggered_at: Optional[datetime] = None
+    last_triggered_price: Optional[float] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -2,12 +2,13 @@
 from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel
+from app.core.money import Money
 
 
 class PaymentRecordBase(BaseModel):
     transaction_id: str
     payment_method: str
-    amount: float
+    amount: Money
     currency: str
     reference: str
     status: str
@@ -20,7 +21,7 @@ class PaymentRecordCreate(PaymentRecordBase):
 
 class PaymentRecordUpdate(BaseModel):
     payment_method: Optional[str] = None
-    amount: Optional[float] = None
+    amount: Optional[Money] = None
     currency: Optional[str] = None
     reference: Optional[str] = None
     status: Optional[str] = None
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from enum import Enum
 
 
@@ -35,7 +35,9 @@ class ProduceListingCreate(BaseModel):
     quality_grade: Optional[QualityGrade] = QualityGrade.GOOD
     harvest_date: datetime
     expected_price_per_kg: float
-    location: str  # Will be handled as coordinates in the service layer
+    location: Optional[str] = None  # "lat,lon", WKT POINT or a known town/market name
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     storage_conditions: Optional[str] = None
     shelf_life_days: Optional[int] = None
     expires_at: datetime
@@ -49,13 +51,16 @@ class ProduceListingUpdate(BaseModel):
     quality_grade: Optional[QualityGrade] = None
     harvest_date: Optional[datetime] = None
     expected_price_per_kg: Optional[float] = None
-    location: Optional[str] = None  # Will be handled as coordinates in the service layer
+    location: Optional[str] = None  # "lat,lon", WKT POINT or a known town/market name
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     storage_conditions: Optional[str] = None
     shelf_life_days: Optional[int] = None
     expires_at: Optional[datetime] = None
     voice_message_id: Optional[str] = None
     transcription: Optional[str] = None
     status: Optional[ListingStatus] = None
+    version: Optional[int] = None  # Version last read; the update is rejected if the listing changed since
 
 
 class ProduceListingResponse(BaseModel):
@@ -66,9 +71,16 @@ class ProduceListingResponse(BaseModel):
     quality_grade: QualityGrade
     harvest_date: datetime
     expected_price_per_kg: float
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    region: Optional[str] = None
+    distance_km: Optional[float] = None  # Only set on radius searches
+    freshness_score: Optional[float] = None
+    search_rank: Optional[float] = None  # Only set on free-text searches
     storage_conditions: Optional[str] = None
     shelf_life_days: Optional[int] = None
     status: ListingStatus
+    version: int = 1
     created_at: datetime
     expires_at: datetime
     voice_message_id: Optional[str] = None
@@ -80,10 +92,43 @@ class ProduceSearch(BaseModel):
     min_quantity: Optional[float] = None
     max_price: Optional[float] = None
     location: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     radius_km: Optional[int] = 25
     quality_grade: Optional[QualityGrade] = None
 
 
+class ListingMatchResponse(BaseModel):
+    buyer_id: str
+    score: float
+    rank: int
+    crop_score: float
+    distance_score: float
+    volume_score: float
+    price_score: float
+    reliability_score: float
+    distance_km: Optional[float] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ReservationCreate(BaseModel):
+    quantity_kg: float = Field(..., gt=0)
+
+
+class BulkImportRowError(BaseModel):
+    row: int  # 1-based data row (CSV rows exclude the header)
+    errors: List[str]
+
+
+class BulkImportResponse(BaseModel):
+    created: int
+    ids: List[str]
+    errors: List[BulkImportRowError]
+
+
 # Aliases for backward compatibility with endpoints
 ProduceCreate = ProduceListingCreate
 ProduceResponse = ProduceListingResponse
@@ -1,27 +1,17 @@
 from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel
-from enum import Enum
-
-
-class TransactionStatus(Enum):
-    PENDING = "pending"          # Matched but not paid
-    PAYMENT_INITIATED = "payment_initiated"  # Payment link sent
-    PAYMENT_CONFIRMED = "payment_confirmed"  # Payment received
-    IN_LOGISTICS = "in_logistics" # Transport arranged
-    DELIVERED = "delivered"       # Successfully delivered
-    COMPLETED = "completed"       # Payment released to farmer
-    DISPUTED = "disputed"         # Problem reported
-    CANCELLED = "cancelled"       # Transaction cancelled
+from app.core.money import Money
+from app.models.transaction import TransactionStatus  # One enum for the column and the API
 
 
 class TransactionCreate(BaseModel):
     produce_listing_id: str
     seller_id: str  # Farmer
     buyer_id: str
-    agreed_price_per_kg: float
+    agreed_price_per_kg: Money
     quantity_kg: float
-    total_amount: float  # Calculated: price * quantity
+    total_amount: Money  # Calculated: price * quantity
     status: Optional[TransactionStatus] = TransactionStatus.PENDING
 
 
@@ -29,9 +19,9 @@ class TransactionUpdate(BaseModel):
     produce_listing_id: Optional[str] = None
     seller_id: Optional[str] = None
     buyer_id: Optional[str] = None
-    agreed_price_per_kg: Optional[float] = None
+    agreed_price_per_kg: Optional[Money] = None
     quantity_kg: Optional[float] = None
-    total_amount: Optional[float] = None
+    total_amount: Optional[Money] = None
     status: Optional[TransactionStatus] = None
 
 
@@ -40,12 +30,13 @@ class TransactionResponse(BaseModel):
     produce_listing_id: str
     seller_id: str
     buyer_id: str
-    agreed_price_per_kg: float
+    agreed_price_per_kg: Money
     quantity_kg: float
-    total_amount: float
+    total_amount: Money
     status: TransactionStatus
     matched_at: datetime
     payment_confirmed_at: Optional[datetime] = None
     delivered_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    version: int = 1
 
@@ -1,8 +1,11 @@
 """
 Advisory Service for crop and farming advice
 """
-from typing import Optional
+from typing import List, Optional
+from app.core.config import settings
 from app.models.user import User
+from app.services.knowledge_base import knowledge_base, RetrievedChunk
+from app.services.entity_extraction import entity_extractor
 
 
 class AdvisoryService:
@@ -10,71 +13,54 @@ class AdvisoryService:
     Advisory service that provides crop and farming-related advice
     """
     
-    def __init__(self):
-        # Initialize with common crop advice database
-        self.crop_advice_db = {
-            'maize': {
-                'planting': 'Plant maize during the rainy season with spacing of 75cm x 25cm. Use 18-6-12 or 15-15-15 fertilizer at planting.',
-                'pests': 'Common pests include stem borers and fall armyworm. Use appropriate insecticides and crop rotation.',
-                'harvesting': 'Harvest when cobs are fully developed and kernels are in the dough stage, typically 90-120 days after planting.'
-            },
-            'rice': {
-                'planting': 'Prepare well-leveled fields with proper water management. Transplant seedlings at 20x20cm spacing.',
-                'pests': 'Watch for brown planthopper and rice stem borer. Maintain proper water levels to reduce pest pressure.',
-                'harvesting': 'Harvest when 80-85% of grains have turned golden yellow, typically 3-6 months after transplanting.'
-            },
-            'cassava': {
-                'planting': 'Plant during early rainy season. Use healthy stem cuttings at 1x1m spacing in well-drained soil.',
-                'pests': 'Major pests include cassava mosaic disease and green mites. Use disease-free planting materials.',
-                'harvesting': 'Harvest 8-12 months after planting when leaves begin to yellow. Roots can remain in ground for up to 24 months.'
-            }
-        }
+    def __init__(self, kb=None):
+        # Extension-service documents, see app/services/knowledge_base.py
+        self.knowledge_base = kb or knowledge_base
     
     def get_crop_advice(self, crop_query: str, user: Optional[User] = None):
         """
         Provide crop-specific advice based on user query
         """
-        crop_query_lower = crop_query.lower().strip()
-        
-        # Identify crop from query
-        crop = self._identify_crop_from_query(crop_query_lower)
+        return self.get_crop_advice_batch([crop_query], user=user)[0]
+    
+    def get_crop_advice_batch(self, crop_queries: List[str], user: Optional[User] = None) -> List[str]:
+        """
+        Answer several advisory questions with a single knowledge base lookup
+        """
+        # Questions naming a crop only search that crop's documents (plus general ones)
+        by_crop = {}
+        for index, query in enumerate(crop_queries):
+            crop = entity_extractor.extract(query).crop
+            by_crop.setdefault(crop, []).append(index)
         
-        if crop:
-            advice = self.crop_advice_db.get(crop, {})
-            if advice:
-                response = f"🌾 *{crop.title()} Advisory*\n\n"
-                
-                if 'planting' in crop_query_lower or 'plant' in crop_query_lower:
-                    response += f"🌱 *Planting Tips:*\n{advice.get('planting', 'No specific planting advice available.')}\n\n"
-                elif 'pest' in crop_query_lower or 'disease' in crop_query_lower or 'pests' in crop_query_lower:
-                    response += f"🪲 *Pest Management:*\n{advice.get('pests', 'No specific pest management advice available.')}\n\n"
-                elif 'harvest' in crop_query_lower or 'harvesting' in crop_query_lower:
-                    response += f" reap *Harvesting Tips:*\n{advice.get('harvesting', 'No specific harvesting advice available.')}\n\n"
-                else:
-                    # Provide all advice if no specific category is requested
-                    response += f"🌱 *Planting Tips:*\n{advice.get('planting', 'No planting advice available.')}\n\n"
-                    response += f"🪲 *Pest Management:*\n{advice.get('pests', 'No pest management advice available.')}\n\n"
-                    response += f" reap *Harvesting Tips:*\n{advice.get('harvesting', 'No harvesting advice available.')}\n\n"
-                
-                response += "For more specific advice, please provide details about your farming conditions."
-                return response
-            else:
-                return f"Sorry, I don't have specific advice for {crop}. Try asking about maize, rice, or cassava."
-        else:
-            return "I can provide advice for specific crops like maize, rice, or cassava. Please specify which crop you need advice for."
+        answers = [None] * len(crop_queries)
+        for crop, indexes in by_crop.items():
+            results = self.knowledge_base.query_batch(
+                [crop_queries[index] for index in indexes],
+                k=settings.KNOWLEDGE_BASE_TOP_K,
+                crop=crop,
+                min_score=settings.KNOWLEDGE_BASE_MIN_SCORE
+            )
+            for index, chunks in zip(indexes, results):
+                answers[index] = self._format_advice(chunks)
+        return answers
     
-    def _identify_crop_from_query(self, query: str):
+    def _format_advice(self, chunks: List[RetrievedChunk]) -> str:
         """
-        Identify crop from user query
+        Format retrieved passages with their sources
         """
-        if any(crop in query for crop in ['maize', 'corn']):
-            return 'maize'
-        elif any(crop in query for crop in ['rice', 'paddy']):
-            return 'rice'
-        elif any(crop in query for crop in ['cassava', 'gari', 'tapioca']):
-            return 'cassava'
-        else:
-            return None
+        if not chunks:
+            return ("I don't have an extension guide that answers this yet. "
+                    "Please tell me the crop and what you see on your farm, and I will advise from general practice.")
+        
+        crop = chunks[0].crop
+        heading = "General Farming Advisory" if crop == "general" else f"{crop.title()} Advisory"
+        response = f"🌾 *{heading}*\n\n"
+        response += "\n\n".join(chunk.text for chunk in chunks)
+        
+        sources = list(dict.fromkeys(chunk.title for chunk in chunks))
+        response += f"\n\n_Source: {', '.join(sources)}_"
+        return response
     
     def get_general_advice(self, topic: str, user: Optional[User] = None):
         """
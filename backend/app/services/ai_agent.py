@@ -3,6 +3,7 @@ AI Agent Service for processing user queries using Multi-Agent System with LangG
 """
 from typing import Optional
 from app.models.user import User
+from app.services.language_service import normalize_language
 
 
 class AIAgent:
@@ -18,7 +19,8 @@ class AIAgent:
             print(f"Error initializing agent graph: {e}")
             self.graph = None
     
-    async def process_query(self, query: str, user: Optional[User] = None, conversation_history: Optional[list] = None):
+    async def process_query(self, query: str, user: Optional[User] = None, conversation_history: Optional[list] = None, language: Optional[str] = None,
+                            session_id: Optional[str] = None):
         """
         Process a user query and return an appropriate response (async with timeout)
         
@@ -26,6 +28,9 @@ class AIAgent:
             query: The user's current message
             user: User object with profile information
             conversation_history: List of previous messages
+            language: Detected message language (english, hausa, pidgin, mixed);
+                falls back to the user's language preference
+            session_id: Chat session the message belongs to, if any
         """
         if not self.graph:
             return "System is currently initializing or missing configuration (GROQ_API_KEY). Please try again later."
@@ -47,42 +52,32 @@ class AIAgent:
         # Add current query
         messages.append(HumanMessage(content=query))
         
+        if not language and user is not None:
+            language = normalize_language(getattr(user, "language_preference", None))
+        
         # Prepare initial state
         initial_state = {
             "messages": messages,
             "next": "",
             "user_id": user.id if user else "anonymous",
+            "session_id": session_id,
             "user_info": {
                 "phone": user.phone_number if user else None,
                 "name": user.village if user else None,
                 "type": user.user_type if user else None
-            }
+            },
+            "language": language or "english"
         }
         
 
         print("TRACING DATAFLOW: INITIAL STATE", initial_state)
         try:
-            # Run the synchronous invoke in a thread pool with timeout protection
-            loop = asyncio.get_event_loop()
-            
-            # Wrap invoke in a lambda for executor
-            def invoke_graph():
-                print("DEBUG: Starting graph.invoke()")
-                try:
-                    result = self.graph.invoke(
-                        initial_state,
-                        config={"recursion_limit": 50}
-                    )
-                    print("DEBUG: graph.invoke() completed successfully")
-                    return result
-                except Exception as e:
-                    print(f"DEBUG: graph.invoke() raised exception: {e}")
-                    raise
-            
-            # Execute with 30 second timeout
+            # Run the graph on this event loop with a 30 second timeout: the
+            # synchronous agent nodes run in a thread pool, async tools
+            # (payments) are awaited here
             try:
                 result = await asyncio.wait_for(
-                    loop.run_in_executor(None, invoke_graph),
+                    self.graph.ainvoke(initial_state, config={"recursion_limit": 50}),
                     timeout=30.0
                 )
             except asyncio.TimeoutError:
@@ -0,0 +1,262 @@
+"""
+Bulk Import Service for loading many produce listings in one request.
+
+Request bodies are JSON arrays, NDJSON (one object per line) or CSV with a
+header row. NDJSON and CSV are parsed as the body streams in; every row is
+validated with the ProduceCreate schema and its location resolved. Valid
+rows are inserted in chunks with multi-row INSERTs inside a single
+transaction, and invalid rows are reported by row number instead of
+failing the import.
+"""
+import codecs
+import csv
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.crud.crud_produce import bulk_insert_produce_listings
+from app.models.user import User, UserType
+from app.schemas.produce import ProduceCreate
+from app.services.geo_service import LocationError, ResolvedLocation, resolve_location
+from app.services.price_alert_service import price_alert_service
+from app.services.price_index_service import price_index_service
+
+logger = logging.getLogger(__name__)
+
+JSON_TYPES = {"application/json"}
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+CSV_TYPES = {"text/csv", "application/csv"}
+
+
+class BulkImportError(ValueError):
+    """Raised when the body as a whole cannot be imported"""
+
+
+class UnsupportedFormatError(BulkImportError):
+    """Raised for a content type that is not JSON, NDJSON or CSV"""
+
+
+class TooManyRowsError(BulkImportError):
+    """Raised when the body holds more rows than the import limit"""
+
+
+@dataclass
+class BulkImportResult:
+    created: int = 0
+    ids: List[str] = field(default_factory=list)
+    errors: List[Dict] = field(default_factory=list)
+    # (id, crop, region, asking price) of created listings, for price alerts
+    prices: List[Tuple] = field(default_factory=list, repr=False)
+
+    def add_error(self, row: int, messages: List[str]):
+        self.errors.append({"row": row, "errors": messages})
+
+
+def _format_validation_error(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines (without line endings) as data arrives"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(row, record, error) per non-blank line"""
+    row = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row, None, f"invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "expected a JSON object"
+            continue
+        yield row, record, None
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    (row, record, error) per data row of a CSV with a header. Physical lines
+    are joined while a quoted field is still open, so values may contain
+    newlines; empty cells are treated as missing.
+    """
+    header = None
+    record_lines: List[str] = []
+    row = 0
+    async for line in iter_lines(chunks):
+        record_lines.append(line)
+        text = "\n".join(record_lines)
+        if text.count('"') % 2:
+            continue  # inside a quoted field
+        record_lines = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) > len(header):
+            yield row, None, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row, {name: value for name, value in zip(header, values) if value.strip() != ""}, None
+    if record_lines:
+        yield row + 1, None, "unterminated quoted field"
+
+
+async def iter_json_array_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(row, record, error) per element of a JSON array body"""
+    body = b"".join([chunk async for chunk in chunks])
+    try:
+        records = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise BulkImportError(f"Invalid JSON body: {e.msg}")
+    if not isinstance(records, list):
+        raise BulkImportError("Expected a JSON array of listings")
+    for row, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            yield row, None, "expected a JSON object"
+            continue
+        yield row, record, None
+
+
+def record_parser(content_type: Optional[str]) -> Callable:
+    media_type = (content_type or "application/json").split(";")[0].strip().lower()
+    if media_type in JSON_TYPES:
+        return iter_json_array_records
+    if media_type in NDJSON_TYPES:
+        return iter_ndjson_records
+    if media_type in CSV_TYPES:
+        return iter_csv_records
+    raise UnsupportedFormatError(f"Unsupported content type '{media_type}'; send JSON, NDJSON or CSV")
+
+
+class BulkImportService:
+    def __init__(self, chunk_size: int = 500, max_rows: int = 20000):
+        self.chunk_size = chunk_size
+        self.max_rows = max_rows
+
+    def validate_record(self, record: dict, user: User) -> Tuple[dict, ResolvedLocation]:
+        """Validate one row; raises ValidationError, LocationError or ValueError"""
+        record = dict(record)
+        if isinstance(record.get("crop_type"), str):
+            record["crop_type"] = record["crop_type"].strip().lower()
+        if isinstance(record.get("quality_grade"), str):
+            record["quality_grade"] = record["quality_grade"].strip().upper()
+
+        farmer_id = record.pop("farmer_id", None)
+        if user.user_type == UserType.FARMER:
+            farmer_id = farmer_id or user.id
+            if farmer_id != user.id:
+                raise ValueError("farmer_id: only aggregators may import listings for other farmers")
+        elif not farmer_id:
+            # Only farmers own listings, as with POST /produce/
+            raise ValueError("farmer_id: required when importing for farmers")
+
+        data = ProduceCreate.model_validate(record).model_dump()
+        data["farmer_id"] = farmer_id
+        location = resolve_location(data.get("location"), data.get("latitude"), data.get("longitude"))
+        return data, location
+
+    def _unknown_farmers(self, db: Session, farmer_ids: Set[str], known: Set[str]) -> Set[str]:
+        """Farmer ids in the chunk that are not farmer accounts"""
+        unseen = farmer_ids - known
+        if unseen:
+            found = db.query(User.id).filter(User.id.in_(unseen), User.user_type == UserType.FARMER).all()
+            known.update(user_id for (user_id,) in found)
+        return farmer_ids - known
+
+    def _insert_chunk(self, db: Session, chunk: List[Tuple[int, dict, ResolvedLocation]],
+                      user: User, known_farmers: Set[str], result: BulkImportResult):
+        unknown = self._unknown_farmers(db, {data["farmer_id"] for _, data, _ in chunk}, known_farmers)
+        valid = []
+        for row, data, location in chunk:
+            if data["farmer_id"] in unknown:
+                result.add_error(row, [f"farmer_id: no farmer with id '{data['farmer_id']}'"])
+            else:
+                valid.append((data, location))
+        ids = bulk_insert_produce_listings(db, valid)
+        result.ids.extend(ids)
+        result.created += len(ids)
+        result.prices.extend(
+            (listing_id, getattr(data["crop_type"], "value", data["crop_type"]), location.region,
+             data["expected_price_per_kg"])
+            for listing_id, (data, location) in zip(ids, valid)
+        )
+
+    async def import_listings(self, db: Session, content_type: Optional[str], chunks: AsyncIterator[bytes],
+                              user: User, atomic: bool = False) -> BulkImportResult:
+        """
+        Stream, validate and insert listings. Commits once at the end; with
+        `atomic`, any row error rolls back the whole import.
+        """
+        parser = record_parser(content_type)
+        result = BulkImportResult()
+        # Farmer accounts seen so far; an uploading farmer owns their rows
+        known_farmers = {user.id} if user.user_type == UserType.FARMER else set()
+        chunk: List[Tuple[int, dict, ResolvedLocation]] = []
+        rows = 0
+        try:
+            async for row, record, error in parser(chunks):
+                rows += 1
+                if rows > self.max_rows:
+                    raise TooManyRowsError(f"At most {self.max_rows} listings per import")
+                if error:
+                    result.add_error(row, [error])
+                    continue
+                try:
+                    data, location = self.validate_record(record, user)
+                except ValidationError as e:
+                    result.add_error(row, _format_validation_error(e))
+                    continue
+                except (LocationError, ValueError) as e:
+                    result.add_error(row, [str(e)])
+                    continue
+                chunk.append((row, data, location))
+                if len(chunk) >= self.chunk_size:
+                    await run_in_threadpool(self._insert_chunk, db, chunk, user, known_farmers, result)
+                    chunk = []
+            if chunk:
+                await run_in_threadpool(self._insert_chunk, db, chunk, user, known_farmers, result)
+
+            if atomic and result.errors:
+                await run_in_threadpool(db.rollback)
+                result.created, result.ids, result.prices = 0, [], []
+            else:
+                await run_in_threadpool(db.commit)
+        except Exception:
+            await run_in_threadpool(db.rollback)
+            raise
+
+        if result.created:
+            today = datetime.utcnow().date()
+            crop_days = {(crop, today) for _, crop, _, _ in result.prices}
+            await run_in_threadpool(price_index_service.refresh_listings, db, crop_days)
+            await run_in_threadpool(price_alert_service.evaluate_listings, db, result.prices)
+
+        result.errors.sort(key=lambda error: error["row"])
+        logger.info(f"Bulk import by {user.id}: {result.created} created, {len(result.errors)} rejected")
+        return result
+
+
+bulk_import_service = BulkImportService()
@@ -0,0 +1,220 @@
+"""
+Response cache for hot read endpoints.
+
+Serialized response bodies are kept in an in-process LRU and, when
+`settings.CACHE_BACKEND` is "redis", in a shared Redis cache as well so every
+API process benefits from a miss filled by another.
+
+Keys carry a per-namespace version number. Writes call `invalidate()`,
+which bumps the version, so every cached page of that namespace becomes
+unreachable at once without scanning for keys; stale entries simply age out.
+With a shared backend the version lives in Redis and each process re-reads it
+at most every `CACHE_VERSION_TTL_SECONDS`.
+
+Each entry has a content ETag so clients can revalidate with If-None-Match
+and receive 304 Not Modified without a body.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Listing detail and search pages
+PRODUCE_CACHE_NAMESPACE = "produce"
+# Payment answers for the chat agents, one namespace per user
+PAYMENTS_CACHE_NAMESPACE = "payments"
+
+
+def user_namespace(namespace: str, user_id: str) -> str:
+    """Namespace scoped to one user, so invalidating it leaves other users' entries alone"""
+    return f"{namespace}:{user_id}"
+
+
+@dataclass
+class CachedResponse:
+    """A serialized response body with its ETag and extra headers"""
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        return json.dumps({"body": self.body.decode("utf-8"), "etag": self.etag, "headers": self.headers})
+
+    @classmethod
+    def from_json(cls, data) -> "CachedResponse":
+        payload = json.loads(data)
+        return cls(payload["body"].encode("utf-8"), payload["etag"], payload.get("headers") or {})
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header covers the ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in {tag[2:] if tag.startswith("W/") else tag for tag in tags}
+
+
+class MemoryCacheBackend:
+    """Thread-safe LRU with a per-entry time to live"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl_seconds: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Shared cache in Redis; values are CachedResponse JSON"""
+
+    def __init__(self, url: str, prefix: str = "shukalink:cache:"):
+        import redis
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        data = self.client.get(self.prefix + key)
+        return None if data is None else CachedResponse.from_json(data)
+
+    def set(self, key: str, value: CachedResponse, ttl_seconds: float):
+        self.client.set(self.prefix + key, value.to_json(), ex=max(1, int(ttl_seconds)))
+
+    def version(self, namespace: str) -> int:
+        return int(self.client.get(f"{self.prefix}version:{namespace}") or 0)
+
+    def bump_version(self, namespace: str) -> int:
+        return int(self.client.incr(f"{self.prefix}version:{namespace}"))
+
+
+def create_cache_backend(backend: str, redis_url: Optional[str] = None):
+    """Shared backend from its configured name; None for in-process only"""
+    if backend == "redis":
+        if not redis_url:
+            raise ValueError("REDIS_URL must be set to use the redis cache backend")
+        return RedisCacheBackend(redis_url)
+    if backend != "memory":
+        raise ValueError(f"Unknown cache backend: {backend}")
+    return None
+
+
+class ResponseCache:
+    def __init__(self, local: MemoryCacheBackend = None, shared=None, ttl_seconds: float = 60,
+                 version_ttl_seconds: float = 1.0):
+        self.local = local or MemoryCacheBackend()
+        self.shared = shared
+        self.ttl_seconds = ttl_seconds
+        self.version_ttl_seconds = version_ttl_seconds
+        self._versions: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def version(self, namespace: str) -> int:
+        """Current version of a namespace; re-read from the shared backend when stale"""
+        with self._lock:
+            checked_at, version = self._versions.get(namespace, (0.0, 0))
+            if self.shared is None or time.monotonic() - checked_at < self.version_ttl_seconds:
+                return version
+        try:
+            version = self.shared.version(namespace)
+        except Exception as e:
+            logger.warning(f"Shared cache unavailable reading version of {namespace}: {e}")
+        with self._lock:
+            self._versions[namespace] = (time.monotonic(), version)
+        return version
+
+    def invalidate(self, namespace: str):
+        """Make every cached entry of the namespace unreachable"""
+        version = None
+        if self.shared is not None:
+            try:
+                version = self.shared.bump_version(namespace)
+            except Exception as e:
+                logger.warning(f"Shared cache unavailable invalidating {namespace}: {e}")
+        with self._lock:
+            if version is None:
+                version = self._versions.get(namespace, (0.0, 0))[1] + 1
+            self._versions[namespace] = (time.monotonic(), version)
+
+    def key(self, namespace: str, kind: str, params: Optional[dict] = None) -> str:
+        """Versioned key; params are hashed so any filter combination is a distinct entry"""
+        digest = hashlib.sha256(json.dumps(params or {}, sort_keys=True, default=str).encode()).hexdigest()[:24]
+        return f"{namespace}:v{self.version(namespace)}:{kind}:{digest}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self.local.get(key)
+        if entry is not None or self.shared is None:
+            return entry
+        try:
+            entry = self.shared.get(key)
+        except Exception as e:
+            logger.warning(f"Shared cache unavailable reading {key}: {e}")
+            return None
+        if entry is not None:
+            self.local.set(key, entry, self.ttl_seconds)
+        return entry
+
+    def set(self, key: str, entry: CachedResponse):
+        self.local.set(key, entry, self.ttl_seconds)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, entry, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Shared cache unavailable writing {key}: {e}")
+
+    def get_or_build(self, namespace: str, kind: str, params: Optional[dict],
+                     build: Callable[[], Tuple[bytes, Dict[str, str]]]) -> CachedResponse:
+        """Cached entry for the key, or build the body (and headers) and store it"""
+        key = self.key(namespace, kind, params)
+        entry = self.get(key)
+        if entry is None:
+            body, headers = build()
+            entry = CachedResponse(body, make_etag(body), headers)
+            self.set(key, entry)
+        return entry
+
+
+response_cache = ResponseCache(
+    local=MemoryCacheBackend(settings.CACHE_MAX_ENTRIES),
+    shared=create_cache_backend(settings.CACHE_BACKEND, settings.REDIS_URL),
+    ttl_seconds=settings.CACHE_TTL_SECONDS,
+    version_ttl_seconds=settings.CACHE_VERSION_TTL_SECONDS,
+)
@@ -0,0 +1,329 @@
+"""
+Entity Extraction for farmer messages.
+
+All lexicon entries (crops in English, Hausa and Pidgin, Nigerian states,
+cities and markets, units, number words and service intent keywords) are
+compiled once into an Aho-Corasick automaton, so a message is scanned a
+single time regardless of how many patterns there are.
+"""
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Canonical crop -> synonyms. Canonical names follow CropType where one exists.
+CROP_SYNONYMS = {
+    "maize": ["maize", "corn", "masara", "agbado"],
+    "rice": ["rice", "paddy", "shinkafa", "ofada"],
+    "cassava": ["cassava", "rogo", "gari", "garri", "tapioca", "akpu"],
+    "sorghum": ["sorghum", "guinea corn", "dawa"],
+    "millet": ["millet", "gero", "maiwa"],
+    "tomatoes": ["tomato", "tomatoes", "tumatir", "tumatur", "tomatis"],
+    "onions": ["onion", "onions", "albasa", "alubosa"],
+    "peppers": ["pepper", "peppers", "barkono", "tatase", "attarugu", "shombo", "pepe"],
+    "yams": ["yam", "yams", "doya", "isu"],
+    "beans": ["beans", "cowpea", "cowpeas", "wake", "black-eyed peas"],
+    "groundnut": ["groundnut", "groundnuts", "peanut", "peanuts", "gyada"],
+    "soybean": ["soybean", "soybeans", "soya", "soya beans", "waken suya"],
+    "sesame": ["sesame", "beniseed", "ridi"],
+    "ginger": ["ginger", "citta", "chitta"],
+}
+
+# State -> (aliases, latitude, longitude of the state capital)
+NIGERIAN_STATES = {
+    "abia": (["abia", "umuahia"], 5.5320, 7.4860),
+    "adamawa": (["adamawa", "yola"], 9.2035, 12.4954),
+    "akwa ibom": (["akwa ibom", "uyo"], 5.0377, 7.9128),
+    "anambra": (["anambra", "awka"], 6.2104, 7.0741),
+    "bauchi": (["bauchi"], 10.3158, 9.8442),
+    "bayelsa": (["bayelsa", "yenagoa"], 4.9267, 6.2676),
+    "benue": (["benue", "makurdi"], 7.7322, 8.5391),
+    "borno": (["borno", "maiduguri"], 11.8311, 13.1510),
+    "cross river": (["cross river", "calabar"], 4.9757, 8.3417),
+    "delta": (["delta", "asaba"], 6.1985, 6.7319),
+    "ebonyi": (["ebonyi", "abakaliki"], 6.3249, 8.1137),
+    "edo": (["edo", "benin city"], 6.3350, 5.6037),
+    "ekiti": (["ekiti", "ado-ekiti", "ado ekiti"], 7.6211, 5.2214),
+    "enugu": (["enugu"], 6.4584, 7.5464),
+    "fct": (["fct", "abuja"], 9.0765, 7.3986),
+    "gombe": (["gombe"], 10.2897, 11.1673),
+    "imo": (["imo", "owerri"], 5.4850, 7.0350),
+    "jigawa": (["jigawa", "dutse"], 11.7562, 9.3389),
+    "kaduna": (["kaduna"], 10.5105, 7.4165),
+    "kano": (["kano"], 12.0022, 8.5920),
+    "katsina": (["katsina"], 12.9908, 7.6018),
+    "kebbi": (["kebbi", "birnin kebbi"], 12.4539, 4.1975),
+    "kogi": (["kogi", "lokoja"], 7.8023, 6.7333),
+    "kwara": (["kwara", "ilorin"], 8.4966, 4.5426),
+    "lagos": (["lagos", "legas", "ikeja"], 6.6018, 3.3515),
+    "nasarawa": (["nasarawa", "lafia"], 8.4939, 8.5156),
+    "niger": (["niger state", "minna"], 9.6139, 6.5569),
+    "ogun": (["ogun", "abeokuta"], 7.1475, 3.3619),
+    "ondo": (["ondo", "akure"], 7.2571, 5.2058),
+    "osun": (["osun", "osogbo"], 7.7827, 4.5418),
+    "oyo": (["oyo", "ibadan"], 7.3775, 3.9470),
+    "plateau": (["plateau", "jos"], 9.8965, 8.8583),
+    "rivers": (["rivers state", "port harcourt"], 4.8156, 7.0498),
+    "sokoto": (["sokoto"], 13.0059, 5.2476),
+    "taraba": (["taraba", "jalingo"], 8.8937, 11.3596),
+    "yobe": (["yobe", "damaturu"], 11.7470, 11.9608),
+    "zamfara": (["zamfara", "gusau"], 12.1704, 6.6641),
+}
+
+# Towns outside state capitals -> (state, latitude, longitude)
+TOWNS = {
+    "zaria": ("kaduna", 11.0855, 7.7199),
+    "funtua": ("katsina", 11.5233, 7.3081),
+    "onitsha": ("anambra", 6.1498, 6.7857),
+    "wudil": ("kano", 11.8094, 8.8391),
+    "kura": ("kano", 11.7711, 8.4289),
+    "potiskum": ("yobe", 11.7128, 11.0780),
+}
+
+# Produce markets -> (aliases, state, latitude, longitude)
+MARKETS = {
+    "dawanau market": (["dawanau", "kasuwar dawanau"], "kano", 12.0667, 8.4667),
+    "singer market": (["singer market", "kasuwar singa"], "kano", 11.9976, 8.5253),
+    "mile 12 market": (["mile 12", "mile twelve"], "lagos", 6.6100, 3.3958),
+    "oyingbo market": (["oyingbo"], "lagos", 6.4833, 3.3833),
+    "bodija market": (["bodija"], "oyo", 7.4167, 3.9167),
+    "ogbete market": (["ogbete"], "enugu", 6.4419, 7.4964),
+    "kure market": (["kure market"], "niger", 9.6081, 6.5500),
+    "wuse market": (["wuse market"], "fct", 9.0700, 7.4700),
+}
+
+# Unit -> (aliases, approximate kg per unit where it is standard)
+UNITS = {
+    "bag": (["bag", "bags", "buhu", "sack", "sacks"], 100.0),
+    "kg": (["kg", "kgs", "kilo", "kilos", "kilogram", "kilograms"], 1.0),
+    "tonne": (["ton", "tons", "tonne", "tonnes"], 1000.0),
+    "basket": (["basket", "baskets", "kwando", "kwandon"], None),
+    "crate": (["crate", "crates"], None),
+    "tuber": (["tuber", "tubers"], None),
+    "mudu": (["mudu", "tiya"], 2.5),
+    "load": (["load", "loads", "truck", "trucks", "lorry"], None),
+}
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "twenty": 20, "thirty": 30, "forty": 40,
+    "fifty": 50, "hundred": 100,
+    # Hausa
+    "daya": 1, "biyu": 2, "uku": 3, "hudu": 4, "biyar": 5, "shida": 6, "bakwai": 7,
+    "takwas": 8, "tara": 9, "goma": 10, "ashirin": 20, "talatin": 30, "arba'in": 40,
+    "hamsin": 50, "dari": 100,
+}
+
+# (domain, intent) -> keywords
+INTENT_KEYWORDS = {
+    ("logistics", "rates"): ["rate", "rates", "price", "cost", "how much", "nawa", "farashi", "kudin mota"],
+    ("logistics", "track"): ["track", "tracking", "status", "delivery", "where is"],
+    ("logistics", "book"): ["book", "order", "schedule"],
+    ("logistics", "scope_local"): ["local"],
+    ("logistics", "scope_regional"): ["regional"],
+    ("logistics", "scope_national"): ["national", "country", "nationwide"],
+    ("payment", "status"): ["status", "confirm", "confirmed", "verify"],
+    ("payment", "make"): ["make", "pay", "paying", "process", "biya"],
+    ("payment", "history"): ["history", "past", "previous"],
+    ("payment", "methods"): ["method", "methods", "option", "options", "gateway"],
+}
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over lowercase strings.
+    Matches are only reported on word boundaries.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, payload: Any):
+        if self._built:
+            raise RuntimeError("Cannot add patterns after the automaton is built")
+        state = 0
+        for char in pattern.lower():
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), payload))
+
+    def build(self):
+        """Compute failure links breadth-first"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, payload) for every whole-word match in `text`"""
+        if not self._built:
+            self.build()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, payload in self._output[state]:
+                start, end = index - length + 1, index + 1
+                # A digit may run straight into a word, as in "20bags"
+                before_ok = start == 0 or not text[start - 1].isalnum() or text[start - 1].isdigit()
+                if before_ok and (end == len(text) or not text[end].isalnum()):
+                    yield start, end, payload
+
+
+@dataclass
+class ExtractedEntities:
+    """Entities found in a message"""
+    crops: List[str] = field(default_factory=list)
+    locations: List[Dict[str, Any]] = field(default_factory=list)
+    quantities: List[Dict[str, Any]] = field(default_factory=list)
+    units: List[str] = field(default_factory=list)
+    intents: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def crop(self) -> Optional[str]:
+        return self.crops[0] if self.crops else None
+
+    def has_intent(self, domain: str, intent: str) -> bool:
+        return intent in self.intents.get(domain, [])
+
+    @property
+    def states(self) -> List[str]:
+        return list(dict.fromkeys(location["state"] for location in self.locations))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form, as stored in VoiceMessage.entities_extracted"""
+        data = {
+            "crops": self.crops,
+            "locations": self.locations,
+            "quantities": self.quantities,
+            "intents": self.intents,
+        }
+        # Shorthand fields kept from the original column format
+        if self.crop:
+            data["crop_type"] = self.crop
+        if self.quantities:
+            data["quantity"] = f"{self.quantities[0]['value']:g} {self.quantities[0]['unit']}"
+        return data
+
+
+class EntityExtractor:
+    """
+    Single-pass extractor over the combined crop, place, unit and intent lexicon
+    """
+
+    def __init__(self):
+        self.automaton = AhoCorasick()
+        for crop, synonyms in CROP_SYNONYMS.items():
+            for synonym in synonyms:
+                self.automaton.add(synonym, ("crop", crop))
+        for state, (aliases, lat, lon) in NIGERIAN_STATES.items():
+            for alias in aliases:
+                self.automaton.add(alias, ("location", {"name": state, "kind": "state", "state": state, "lat": lat, "lon": lon}))
+        for town, (state, lat, lon) in TOWNS.items():
+            self.automaton.add(town, ("location", {"name": town, "kind": "town", "state": state, "lat": lat, "lon": lon}))
+        for market, (aliases, state, lat, lon) in MARKETS.items():
+            for alias in aliases:
+                self.automaton.add(alias, ("location", {"name": market, "kind": "market", "state": state, "lat": lat, "lon": lon}))
+        for unit, (aliases, _) in UNITS.items():
+            for alias in aliases:
+                self.automaton.add(alias, ("unit", unit))
+        for word, value in NUMBER_WORDS.items():
+            self.automaton.add(word, ("number", value))
+        for (domain, intent), keywords in INTENT_KEYWORDS.items():
+            for keyword in keywords:
+                self.automaton.add(keyword, ("intent", (domain, intent)))
+        self.automaton.build()
+
+    def _select_matches(self, text: str) -> List[Tuple[int, int, str, Any]]:
+        """
+        Keep the longest match at each position so "guinea corn" wins over "corn"
+        and "mile 12" over the number 12. Intent keywords may overlap other entities.
+        """
+        matches = [(start, end, kind, value) for start, end, (kind, value) in self.automaton.iter_matches(text)]
+        matches.extend(
+            (match.start(), match.end(), "number", float(match.group().replace(",", "")))
+            for match in _NUMBER_PATTERN.finditer(text)
+        )
+        matches.sort(key=lambda match: (match[0], -(match[1] - match[0])))
+
+        selected = []
+        covered_until = -1
+        for start, end, kind, value in matches:
+            if kind == "intent":
+                selected.append((start, end, kind, value))
+            elif start >= covered_until:
+                selected.append((start, end, kind, value))
+                covered_until = end
+        return selected
+
+    def extract(self, text: str) -> ExtractedEntities:
+        """Find every crop, location, quantity and intent in `text` in a single scan"""
+        entities = ExtractedEntities()
+        if not text:
+            return entities
+        text = text.lower()
+
+        seen_locations = set()
+        # Last number or unit seen, to pair "50 bags" and Hausa word order "buhu hamsin"
+        previous = None
+        for start, end, kind, value in self._select_matches(text):
+            if kind == "crop":
+                if value not in entities.crops:
+                    entities.crops.append(value)
+            elif kind == "location":
+                if value["name"] not in seen_locations:
+                    seen_locations.add(value["name"])
+                    entities.locations.append(dict(value))
+            elif kind == "intent":
+                domain, intent = value
+                intents = entities.intents.setdefault(domain, [])
+                if intent not in intents:
+                    intents.append(intent)
+                continue
+
+            if kind == "unit" and value not in entities.units:
+                entities.units.append(value)
+
+            if kind in ("number", "unit"):
+                adjacent = previous is not None and not text[previous[1]:start].strip()
+                if adjacent and {previous[2], kind} == {"number", "unit"}:
+                    number, unit = (previous[3], value) if kind == "unit" else (value, previous[3])
+                    entities.quantities.append({"value": number, "unit": unit})
+                    previous = None
+                    continue
+            previous = (start, end, kind, value)
+
+        return entities
+
+
+def quantity_in_kg(quantity: Dict[str, Any]) -> Optional[float]:
+    """Convert an extracted quantity to kg when its unit has a standard weight"""
+    kg_per_unit = UNITS.get(quantity["unit"], (None, None))[1]
+    return quantity["value"] * kg_per_unit if kg_per_unit else None
+
+
+# Shared extractor instance; the automaton is compiled once at import
+entity_extractor = EntityExtractor()
@@ -0,0 +1,210 @@
+"""
+Geo Service for resolving listing locations and radius searches.
+
+Locations are stored as PostGIS POINTs (SRID 4326). For databases without
+PostGIS (SQLite in tests and local development) each listing also carries a
+geohash, and radius queries become indexed prefix-range scans over the 3x3
+block of geohash cells around the search centre followed by an exact
+haversine check.
+"""
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.services.entity_extraction import entity_extractor, NIGERIAN_STATES
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+_LAT_LON_PATTERN = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+_WKT_POINT_PATTERN = re.compile(
+    r"^\s*(?:SRID=(\d+);)?\s*POINT\s*\(\s*(-?\d+(?:\.\d+)?)\s+(-?\d+(?:\.\d+)?)\s*\)\s*$", re.IGNORECASE
+)
+
+
+class LocationError(ValueError):
+    """Raised when a location string cannot be resolved to coordinates"""
+
+
+@dataclass
+class ResolvedLocation:
+    latitude: float
+    longitude: float
+    region: Optional[str] = None
+
+    @property
+    def ewkt(self) -> str:
+        """Extended WKT for PostGIS (note: longitude first)"""
+        return f"SRID=4326;POINT({self.longitude} {self.latitude})"
+
+    @property
+    def geohash(self) -> str:
+        return encode_geohash(self.latitude, self.longitude)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def haversine_km_matrix(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Pairwise great-circle distances in kilometres: rows are the first set of
+    points, columns the second. NaN coordinates give NaN distances.
+    """
+    phi1 = np.radians(np.asarray(lat1, dtype=float))[:, None]
+    phi2 = np.radians(np.asarray(lat2, dtype=float))[None, :]
+    lambda1 = np.radians(np.asarray(lon1, dtype=float))[:, None]
+    lambda2 = np.radians(np.asarray(lon2, dtype=float))[None, :]
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin((lambda2 - lambda1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_km_pairs(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Element-wise great-circle distances in kilometres between the i-th
+    point of the first set and the i-th point of the second.
+    """
+    phi1, phi2 = np.radians(np.asarray(lat1, dtype=float)), np.radians(np.asarray(lat2, dtype=float))
+    d_lambda = np.radians(np.asarray(lon2, dtype=float) - np.asarray(lon1, dtype=float))
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+_STATE_NAMES = list(NIGERIAN_STATES)
+_STATE_LATITUDES = np.array([NIGERIAN_STATES[state][1] for state in _STATE_NAMES])
+_STATE_LONGITUDES = np.array([NIGERIAN_STATES[state][2] for state in _STATE_NAMES])
+
+
+@lru_cache(maxsize=4096)
+def nearest_region(latitude: float, longitude: float) -> str:
+    """State whose capital is closest to the point"""
+    distances = haversine_km_matrix([latitude], [longitude], _STATE_LATITUDES, _STATE_LONGITUDES)[0]
+    return _STATE_NAMES[int(np.argmin(distances))]
+
+
+def _validate(latitude: float, longitude: float):
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise LocationError(f"Coordinates out of range: {latitude}, {longitude}")
+
+
+def resolve_location(location: Optional[str] = None, latitude: Optional[float] = None,
+                     longitude: Optional[float] = None) -> ResolvedLocation:
+    """
+    Resolve explicit coordinates, a "lat,lon" string, a WKT/EWKT POINT, or a
+    place name from the gazetteer (state, town or market).
+    """
+    if latitude is not None and longitude is not None:
+        _validate(latitude, longitude)
+        return ResolvedLocation(latitude, longitude, nearest_region(latitude, longitude))
+
+    if not location or not location.strip():
+        raise LocationError("A location is required")
+
+    match = _LAT_LON_PATTERN.match(location)
+    if match:
+        lat, lon = float(match.group(1)), float(match.group(2))
+        _validate(lat, lon)
+        return ResolvedLocation(lat, lon, nearest_region(lat, lon))
+
+    match = _WKT_POINT_PATTERN.match(location)
+    if match:
+        if match.group(1) and match.group(1) != "4326":
+            raise LocationError(f"Unsupported SRID {match.group(1)}; use 4326")
+        lon, lat = float(match.group(2)), float(match.group(3))
+        _validate(lat, lon)
+        return ResolvedLocation(lat, lon, nearest_region(lat, lon))
+
+    places = entity_extractor.extract(location).locations
+    if places:
+        # The most specific place wins: market, then town, then state
+        place = min(places, key=lambda p: {"market": 0, "town": 1, "state": 2}[p["kind"]])
+        return ResolvedLocation(place["lat"], place["lon"], place["state"])
+
+    raise LocationError(f"Could not resolve location '{location}'; send 'latitude,longitude' or a known town")
+
+
+def point_coordinates(value) -> Optional[Tuple[float, float]]:
+    """
+    (latitude, longitude) of a stored POINT: EWKT text (SQLite) or a PostGIS
+    geometry element. None if there is no point.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        try:
+            from geoalchemy2.shape import to_shape
+            point = to_shape(value)
+            return point.y, point.x
+        except Exception:
+            return None
+    match = _WKT_POINT_PATTERN.match(value)
+    if not match:
+        return None
+    return float(match.group(3)), float(match.group(2))
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Standard base32 geohash"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bit, value, even = 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        if coordinate >= mid:
+            value = (value << 1) | 1
+            interval[0] = mid
+        else:
+            value <<= 1
+            interval[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bit, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_cell_size_degrees(precision: int) -> Tuple[float, float]:
+    """(height, width) of a geohash cell in degrees"""
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def geohash_cover(latitude: float, longitude: float, radius_km: float) -> List[str]:
+    """
+    Geohash prefixes whose cells together cover the circle: the cell holding the
+    centre and its eight neighbours, at the finest precision where one cell is
+    at least as large as the radius.
+    """
+    lat_km_per_degree = 111.32
+    lon_km_per_degree = max(111.32 * math.cos(math.radians(latitude)), 1e-6)
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size_degrees(candidate)
+        if height * lat_km_per_degree >= radius_km and width * lon_km_per_degree >= radius_km:
+            precision = candidate
+            break
+
+    height, width = geohash_cell_size_degrees(precision)
+    cells = []
+    for d_lat in (-height, 0.0, height):
+        for d_lon in (-width, 0.0, width):
+            lat = min(max(latitude + d_lat, -90.0), 90.0)
+            lon = (longitude + d_lon + 180.0) % 360.0 - 180.0
+            cell = encode_geohash(lat, lon, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
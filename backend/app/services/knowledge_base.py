@@ -0,0 +1,309 @@
+"""
+Advisory Knowledge Base backed by a local vector index.
+
+Extension-service documents (markdown or text files under
+`settings.KNOWLEDGE_BASE_DIR/<crop>/`) are split into overlapping chunks,
+embedded with a local CPU sentence-transformers model and stored in a
+persistent ChromaDB collection at `settings.CHROMADB_PATH`. Re-indexing is
+incremental: only files whose content hash changed are re-embedded.
+
+When ChromaDB or the embedding model are not installed, or the index has not
+been built yet, queries fall back to keyword overlap over the same chunks.
+"""
+import hashlib
+import importlib.util
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "advisory_documents"
+DOCUMENT_EXTENSIONS = {".md", ".txt"}
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_HEADING_MARKER = re.compile(r"^#+\s*", re.MULTILINE)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "the", "and", "for", "how", "what", "when", "with", "can", "are", "you", "your",
+    "does", "should", "which", "from", "into", "this", "that", "have", "about", "best", "my"
+}
+
+
+@dataclass
+class RetrievedChunk:
+    """A knowledge base chunk returned by a query"""
+    text: str
+    source: str
+    crop: str
+    title: str
+    score: float
+
+
+def chunk_text(text: str, chunk_size: int = 800, overlap: int = 150) -> List[str]:
+    """
+    Split a document into chunks of at most `chunk_size` characters.
+    Chunks end on paragraph or sentence boundaries where possible, and each
+    chunk repeats the last `overlap` characters of the previous one so an
+    answer spanning a boundary is still retrievable.
+    """
+    pieces = []
+    for paragraph in _PARAGRAPH_SPLIT.split(text.strip()):
+        # Keep headings as context but drop the markdown markers
+        paragraph = " ".join(_HEADING_MARKER.sub("", paragraph).split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= chunk_size:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_SPLIT.split(paragraph):
+            # Hard-wrap sentences that are longer than a chunk on their own
+            while len(sentence) > chunk_size:
+                pieces.append(sentence[:chunk_size])
+                sentence = sentence[chunk_size:]
+            if sentence:
+                pieces.append(sentence)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > chunk_size:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            # Start the overlap on a word boundary
+            if tail and " " in tail:
+                tail = tail[tail.index(" ") + 1:]
+            current = f"{tail} {piece}".strip() if tail else piece
+            if len(current) > chunk_size:
+                current = piece
+        else:
+            current = f"{current} {piece}".strip() if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def tokenize(text: str) -> set:
+    return {token for token in _TOKEN_PATTERN.findall(text.lower()) if len(token) > 2 and token not in _STOPWORDS}
+
+
+def find_documents(root: Path) -> List[Path]:
+    """Documents live one folder down, in a folder named after their crop"""
+    if not root.exists():
+        return []
+    return sorted(
+        path for path in root.rglob("*")
+        if path.is_file() and path.suffix.lower() in DOCUMENT_EXTENSIONS and len(path.relative_to(root).parts) > 1
+    )
+
+
+def load_document(path: Path, root: Path) -> Dict:
+    """Read a document and derive its metadata from its location and heading"""
+    content = path.read_text(encoding="utf-8")
+    relative = path.relative_to(root)
+    crop = relative.parts[0].lower()
+    title_match = re.search(r"^#\s+(.+)$", content, re.MULTILINE)
+    return {
+        "source": relative.as_posix(),
+        "crop": crop,
+        "title": title_match.group(1).strip() if title_match else path.stem.replace("_", " ").title(),
+        "content": content,
+        "content_hash": hashlib.sha256(content.encode("utf-8")).hexdigest()
+    }
+
+
+class KnowledgeBase:
+    """
+    Persistent vector index of advisory documents
+    """
+
+    def __init__(self, persist_path: Optional[str] = None, documents_dir: Optional[str] = None,
+                 model_name: Optional[str] = None):
+        self.persist_path = persist_path or settings.CHROMADB_PATH
+        self.documents_dir = Path(documents_dir or settings.KNOWLEDGE_BASE_DIR)
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self._client = None
+        self._collection = None
+        self._model = None
+        self._local_chunks: Optional[List[Dict]] = None
+        self._unavailable_reason: Optional[str] = None
+
+    @property
+    def available(self) -> bool:
+        """Whether the vector store and embedding model can be loaded"""
+        if self._unavailable_reason is None and self._collection is None:
+            try:
+                if importlib.util.find_spec("sentence_transformers") is None:
+                    raise ImportError("sentence-transformers is not installed")
+                self.collection
+            except Exception as e:
+                self._unavailable_reason = str(e)
+                logger.warning(f"Knowledge base unavailable: {e}")
+        return self._unavailable_reason is None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            import chromadb
+
+            self._client = chromadb.PersistentClient(path=self.persist_path)
+            self._collection = self._client.get_or_create_collection(
+                COLLECTION_NAME, metadata={"hnsw:space": "cosine"}
+            )
+        return self._collection
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in batches on the CPU"""
+        embeddings = self.model.encode(
+            texts, batch_size=32, normalize_embeddings=True, show_progress_bar=False
+        )
+        return embeddings.tolist()
+
+    def count(self) -> int:
+        return self.collection.count() if self.available else 0
+
+    def _indexed_hashes(self) -> Dict[str, str]:
+        """Map of source -> content hash for everything currently in the index"""
+        existing = self.collection.get(include=["metadatas"])
+        return {
+            metadata["source"]: metadata["content_hash"]
+            for metadata in existing["metadatas"] or []
+        }
+
+    def reindex(self, full: bool = False) -> Dict[str, int]:
+        """
+        Bring the index in line with the documents directory.
+        Unchanged files are skipped unless `full` is set; files removed from
+        disk are removed from the index.
+        """
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "chunks": 0}
+        paths = find_documents(self.documents_dir)
+        indexed = self._indexed_hashes()
+        seen = set()
+
+        for path in paths:
+            document = load_document(path, self.documents_dir)
+            source = document["source"]
+            seen.add(source)
+
+            previous_hash = indexed.get(source)
+            if previous_hash == document["content_hash"] and not full:
+                stats["unchanged"] += 1
+                continue
+            if previous_hash is not None:
+                self.collection.delete(where={"source": source})
+
+            chunks = chunk_text(document["content"], settings.KNOWLEDGE_BASE_CHUNK_SIZE,
+                                settings.KNOWLEDGE_BASE_CHUNK_OVERLAP)
+            if chunks:
+                self.collection.add(
+                    ids=[f"{source}#{index}" for index in range(len(chunks))],
+                    documents=chunks,
+                    embeddings=self.embed(chunks),
+                    metadatas=[{
+                        "source": source,
+                        "crop": document["crop"],
+                        "title": document["title"],
+                        "content_hash": document["content_hash"],
+                        "chunk_index": index
+                    } for index in range(len(chunks))]
+                )
+            stats["chunks"] += len(chunks)
+            stats["updated" if previous_hash is not None else "added"] += 1
+            logger.info(f"Indexed {source} ({len(chunks)} chunks)")
+
+        for source in set(indexed) - seen:
+            self.collection.delete(where={"source": source})
+            stats["removed"] += 1
+            logger.info(f"Removed {source} from the knowledge base")
+
+        return stats
+
+    def query_batch(self, queries: List[str], k: int = 4, crop: Optional[str] = None,
+                    min_score: float = 0.0) -> List[List[RetrievedChunk]]:
+        """
+        Retrieve the top-k chunks for each query, embedding all queries in
+        one pass and searching the index with a single call.
+        """
+        if not queries:
+            return []
+        if not self.available or self.collection.count() == 0:
+            return self._keyword_query_batch(queries, k, crop, min_score)
+
+        results = self.collection.query(
+            query_embeddings=self.embed(queries),
+            n_results=min(k, self.collection.count()),
+            where={"crop": {"$in": [crop, "general"]}} if crop else None,
+            include=["documents", "metadatas", "distances"]
+        )
+
+        batches = []
+        for documents, metadatas, distances in zip(
+            results["documents"], results["metadatas"], results["distances"]
+        ):
+            chunks = []
+            for text, metadata, distance in zip(documents, metadatas, distances):
+                # Cosine distance -> similarity
+                score = 1.0 - distance
+                if score < min_score:
+                    continue
+                chunks.append(RetrievedChunk(
+                    text=text,
+                    source=metadata["source"],
+                    crop=metadata["crop"],
+                    title=metadata["title"],
+                    score=score
+                ))
+            batches.append(chunks)
+        return batches
+
+    def _keyword_query_batch(self, queries: List[str], k: int, crop: Optional[str],
+                             min_score: float) -> List[List[RetrievedChunk]]:
+        """Rank chunks read straight from disk by the share of query words they contain"""
+        if self._local_chunks is None:
+            self._local_chunks = []
+            for path in find_documents(self.documents_dir):
+                document = load_document(path, self.documents_dir)
+                for text in chunk_text(document["content"], settings.KNOWLEDGE_BASE_CHUNK_SIZE,
+                                       settings.KNOWLEDGE_BASE_CHUNK_OVERLAP):
+                    self._local_chunks.append({"text": text, "tokens": tokenize(text), **document})
+
+        batches = []
+        for query in queries:
+            query_tokens = tokenize(query)
+            scored = []
+            for chunk in self._local_chunks:
+                if crop and chunk["crop"] not in (crop, "general"):
+                    continue
+                overlap = len(query_tokens & chunk["tokens"])
+                score = overlap / len(query_tokens) if query_tokens else 0.0
+                if overlap and score >= min_score:
+                    scored.append((score, chunk))
+            scored.sort(key=lambda item: item[0], reverse=True)
+            batches.append([
+                RetrievedChunk(text=chunk["text"], source=chunk["source"], crop=chunk["crop"],
+                               title=chunk["title"], score=score)
+                for score, chunk in scored[:k]
+            ])
+        return batches
+
+    def query(self, query: str, k: int = 4, crop: Optional[str] = None,
+              min_score: float = 0.0) -> List[RetrievedChunk]:
+        return self.query_batch([query], k=k, crop=crop, min_score=min_score)[0]
+
+
+# Shared knowledge base instance
+knowledge_base = KnowledgeBase()
@@ -0,0 +1,173 @@
+"""
+Language Service for identifying English, Hausa and Pidgin messages
+"""
+import re
+from typing import Dict, Optional
+
+
+# Marker words that are frequent in one language and rare in the others.
+# Shared short words (e.g. "na", "don", "da") are deliberately left out.
+HAUSA_MARKERS = {
+    'ina', 'kana', 'kina', 'yana', 'tana', 'muna', 'suna', 'zan', 'zai', 'za', 'mun', 'sun',
+    'ne', 'ce', 'ba', 'kuma', 'amma', 'wannan', 'wancan', 'yanzu', 'akwai', 'babu', 'nawa',
+    'yaya', 'sannu', 'nagode', 'godiya', 'don allah', 'kudi', 'kuɗi', 'gona', 'manomi',
+    'masara', 'shinkafa', 'tumatir', 'albasa', 'doya', 'rogo', 'wake', 'gyada', 'dawa',
+    'hatsi', 'barkono', 'taki', 'kwari', 'buhu', 'buhuna', 'kasuwa', 'mota', 'sayar',
+    'saya', 'farashi', 'lafiya', 'ruwa', 'damina', 'rani', 'girbi', 'shuka', 'ka', 'ki',
+    'mu', 'su', 'ni', 'shi', 'ita', 'mene', 'meye', 'ina son', 'ku', 'ya', 'ta'
+}
+
+PIDGIN_MARKERS = {
+    'dey', 'wetin', 'abeg', 'una', 'wey', 'sabi', 'wahala', 'pikin', 'comot', 'oga',
+    'dem', 'sef', 'abi', 'shey', 'how far', 'no be', 'na im', 'e don', 'don reach',
+    'make i', 'i wan', 'wan', 'go fit', 'small small', 'chop', 'oya', 'sharp sharp',
+    'waka', 'dis', 'dat', 'dey go', 'sey', 'ehn', 'nko', 'kuku'
+}
+
+ENGLISH_MARKERS = {
+    'the', 'is', 'are', 'was', 'and', 'what', 'how', 'my', 'i', 'to', 'of', 'for', 'with',
+    'this', 'that', 'have', 'has', 'can', 'should', 'will', 'would', 'please', 'price',
+    'when', 'where', 'which', 'your', 'you', 'it', 'in', 'on', 'do', 'does', 'need', 'want',
+    'crop', 'crops', 'farm', 'maize', 'rice', 'tomatoes', 'bags', 'transport', 'payment'
+}
+
+# Letters that only occur in Hausa (boko script hooked consonants)
+HAUSA_CHARACTERS = set('ƙɗɓƘƊƁ')
+
+# Whisper has no Pidgin model; Nigerian Pidgin transcribes best with the English decoder
+WHISPER_LANGUAGE_CODES = {
+    'english': 'en',
+    'hausa': 'ha',
+    'pidgin': 'en',
+    'mixed': None,  # let Whisper auto-detect
+}
+
+SUPPORTED_LANGUAGES = ('english', 'hausa', 'pidgin', 'mixed')
+
+# A recent voice note's language overrides the profile only when detected at least this surely
+RECENT_LANGUAGE_MIN_CONFIDENCE = 0.8
+
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+class LanguageDetection:
+    """
+    Result of a language identification pass
+    """
+
+    def __init__(self, language: str, confidence: float, scores: Dict[str, float]):
+        self.language = language
+        self.confidence = confidence
+        self.scores = scores
+
+    def __repr__(self):
+        return f"LanguageDetection(language={self.language!r}, confidence={self.confidence:.2f})"
+
+
+class LanguageDetector:
+    """
+    Fast local language identification for farmer messages.
+    Scores unigrams and bigrams against small marker lexicons, so it runs in
+    microseconds and needs no model download.
+    """
+
+    def __init__(self, mixed_threshold: float = 0.35, min_markers: int = 1):
+        # A second language counts as "mixed" when it has this share of the top score
+        self.mixed_threshold = mixed_threshold
+        self.min_markers = min_markers
+        # Ordered so that ties resolve to the more specific language
+        self.lexicons = {
+            'hausa': HAUSA_MARKERS,
+            'pidgin': PIDGIN_MARKERS,
+            'english': ENGLISH_MARKERS,
+        }
+
+    def detect(self, text: Optional[str], default: str = 'english') -> LanguageDetection:
+        """
+        Identify the language of a transcription or text message.
+
+        Args:
+            text: Message text
+            default: Language returned when the text carries no usable signal
+        """
+        if not text or not text.strip():
+            return LanguageDetection(default, 0.0, {})
+
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        if not tokens:
+            return LanguageDetection(default, 0.0, {})
+
+        bigrams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+        scores = {}
+        for language, lexicon in self.lexicons.items():
+            hits = sum(1 for token in tokens if token in lexicon)
+            # Multi-word markers are stronger evidence than single words
+            hits += 2 * sum(1 for bigram in bigrams if bigram in lexicon)
+            scores[language] = float(hits)
+
+        # Pidgin is English-lexified: once a Pidgin marker shows up, the
+        # English function words around it are evidence for Pidgin too
+        if scores['pidgin'] > 0:
+            scores['pidgin'] += scores['english']
+            scores['english'] = 0.0
+
+        scores['hausa'] += 3.0 * sum(1 for char in text if char in HAUSA_CHARACTERS)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_language, best_score = ranked[0]
+        runner_up_language, runner_up_score = ranked[1]
+
+        if best_score < self.min_markers:
+            return LanguageDetection(default, 0.0, scores)
+
+        total = sum(scores.values())
+        confidence = best_score / total if total else 0.0
+
+        # Code-switching between Hausa and English/Pidgin is common in voice notes
+        if 'hausa' in (best_language, runner_up_language) and runner_up_score >= self.mixed_threshold * best_score \
+                and runner_up_score >= self.min_markers:
+            return LanguageDetection('mixed', confidence, scores)
+
+        return LanguageDetection(best_language, confidence, scores)
+
+    def whisper_hint(self, preferred_language: Optional[str] = None, recent_language: Optional[str] = None,
+                     recent_confidence: Optional[float] = None) -> Optional[str]:
+        """
+        Pick the Whisper language code to transcribe with.
+
+        The recent language was detected from a transcript Whisper produced
+        under the previous hint, so it feeds back on itself: it is only used
+        when it agrees with the profile preference or was detected with at
+        least RECENT_LANGUAGE_MIN_CONFIDENCE. A recent note that disagrees
+        less surely means the user may have switched, so Whisper auto-detects
+        (None), as it does when nothing is known or the user code-switches.
+        """
+        preferred, recent = normalize_language(preferred_language), normalize_language(recent_language)
+        if recent and recent != preferred:
+            if (recent_confidence or 0.0) < RECENT_LANGUAGE_MIN_CONFIDENCE:
+                return None
+            return WHISPER_LANGUAGE_CODES.get(recent)
+        return WHISPER_LANGUAGE_CODES.get(preferred) if preferred else None
+
+
+def normalize_language(language) -> Optional[str]:
+    """
+    Normalize an enum, Whisper code or free-form name to a supported language
+    """
+    if language is None:
+        return None
+    if hasattr(language, 'value'):
+        language = language.value
+    language = str(language).strip().lower()
+    if language in ('en', 'eng'):
+        return 'english'
+    if language in ('ha', 'hau'):
+        return 'hausa'
+    if language in ('pcm', 'pidgin english', 'naija'):
+        return 'pidgin'
+    return language if language in SUPPORTED_LANGUAGES else None
+
+
+# Shared detector instance
+language_detector = LanguageDetector()
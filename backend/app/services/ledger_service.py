@@ -0,0 +1,196 @@
+"""
+Ledger Service for the double-entry record of money movements.
+
+Every movement is an entry of postings that sum to zero, written in the
+caller's database transaction next to the payment or payout state change
+it records, so the ledger and that state commit or roll back together.
+Accounts:
+
+- platform:paystack (asset): money held in the Paystack balance
+- platform:escrow (liability): buyers' payments for deals not yet settled
+- platform:fees (revenue): fees taken from farmers' payouts
+- farmer:<user id> (liability): settled earnings not yet transferred
+
+Each posting updates its account's running balance in place (one UPDATE
+... RETURNING, which also serializes concurrent posters per account) and
+stores the balance after it, so current and historical balances are single
+row reads and a day's report is a range scan over ledger_postings.
+"""
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+
+from app.core.money import from_kobo
+from app.models.ledger import LedgerAccount, LedgerAccountType, LedgerEntry, LedgerEntryKind, LedgerPosting
+from app.models.payout import Payout
+
+PAYSTACK_ACCOUNT = "platform:paystack"
+ESCROW_ACCOUNT = "platform:escrow"
+FEES_ACCOUNT = "platform:fees"
+FARMER_ACCOUNT_PREFIX = "farmer:"
+
+PLATFORM_ACCOUNTS = {
+    PAYSTACK_ACCOUNT: LedgerAccountType.ASSET,
+    ESCROW_ACCOUNT: LedgerAccountType.LIABILITY,
+    FEES_ACCOUNT: LedgerAccountType.REVENUE,
+}
+
+
+class UnbalancedEntryError(ValueError):
+    """The postings of an entry do not sum to zero"""
+
+
+def farmer_account(farmer_id: str) -> str:
+    return f"{FARMER_ACCOUNT_PREFIX}{farmer_id}"
+
+
+class LedgerService:
+    def post(self, db: Session, kind: LedgerEntryKind, reference: str, lines: Iterable[Tuple[str, int]],
+             now: Optional[datetime] = None, transaction_id: Optional[str] = None,
+             description: Optional[str] = None) -> Optional[LedgerEntry]:
+        """
+        Add a balanced entry of (account id, kobo) lines, debits positive.
+        Flushed, not committed. Returns None if this movement is already
+        recorded or nothing moves.
+        """
+        amounts = Counter()
+        for account_id, kobo in lines:
+            amounts[account_id] += int(kobo)
+        amounts = {account_id: kobo for account_id, kobo in amounts.items() if kobo}
+        if sum(amounts.values()) != 0:
+            raise UnbalancedEntryError(f"{kind.value} {reference} does not balance: {amounts}")
+        if not amounts:
+            return None
+        if db.query(LedgerEntry.id).filter(LedgerEntry.kind == kind, LedgerEntry.reference == reference).first():
+            return None
+
+        now = now or datetime.utcnow()
+        entry = LedgerEntry(kind=kind, reference=reference, transaction_id=transaction_id,
+                            description=description, posted_at=now)
+        db.add(entry)
+        db.flush()
+        # Accounts in a fixed order, so concurrent entries lock them without deadlocking
+        for account_id in sorted(amounts):
+            self._ensure_account(db, account_id, now)
+            balance = db.execute(
+                update(LedgerAccount)
+                .where(LedgerAccount.id == account_id)
+                .values(balance_kobo=LedgerAccount.balance_kobo + amounts[account_id], updated_at=now)
+                .returning(LedgerAccount.balance_kobo)
+                .execution_options(synchronize_session=False)
+            ).scalar_one()
+            db.add(LedgerPosting(entry_id=entry.id, account_id=account_id, amount_kobo=amounts[account_id],
+                                 balance_after_kobo=balance, posted_at=now))
+        db.flush()
+        return entry
+
+    def _ensure_account(self, db: Session, account_id: str, now: datetime):
+        if db.query(LedgerAccount.id).filter(LedgerAccount.id == account_id).first():
+            return
+        if account_id.startswith(FARMER_ACCOUNT_PREFIX):
+            account_type, owner_id = LedgerAccountType.LIABILITY, account_id[len(FARMER_ACCOUNT_PREFIX):]
+        else:
+            account_type, owner_id = PLATFORM_ACCOUNTS[account_id], None
+        db.add(LedgerAccount(id=account_id, account_type=account_type, owner_id=owner_id, balance_kobo=0,
+                             created_at=now, updated_at=now))
+        db.flush()
+
+    # Movements
+
+    def payment_received(self, db: Session, reference: str, amount_kobo: int, transaction_id: str,
+                         now: Optional[datetime] = None) -> Optional[LedgerEntry]:
+        """A buyer's payment landed in Paystack and is held for the deal"""
+        return self.post(db, LedgerEntryKind.PAYMENT_RECEIVED, reference, [
+            (PAYSTACK_ACCOUNT, amount_kobo), (ESCROW_ACCOUNT, -amount_kobo),
+        ], now, transaction_id=transaction_id, description=f"Payment for {transaction_id}")
+
+    def payout_settled(self, db: Session, payout: Payout, now: Optional[datetime] = None) -> Optional[LedgerEntry]:
+        """Delivered deals released from escrow to the farmer, less fees"""
+        return self.post(db, LedgerEntryKind.SETTLEMENT, payout.reference, [
+            (ESCROW_ACCOUNT, payout.gross_kobo),
+            (farmer_account(payout.farmer_id), -payout.net_kobo),
+            (FEES_ACCOUNT, -payout.fee_kobo),
+        ], now, description=f"Settlement for payout {payout.reference}")
+
+    def payout_reversed(self, db: Session, payout: Payout, now: Optional[datetime] = None) -> Optional[LedgerEntry]:
+        """The payout failed: its deals go back to escrow to be settled again"""
+        return self.post(db, LedgerEntryKind.SETTLEMENT_REVERSAL, payout.reference, [
+            (farmer_account(payout.farmer_id), payout.net_kobo),
+            (FEES_ACCOUNT, payout.fee_kobo),
+            (ESCROW_ACCOUNT, -payout.gross_kobo),
+        ], now, description=f"Failed payout {payout.reference}")
+
+    def payout_paid(self, db: Session, payout: Payout, now: Optional[datetime] = None) -> Optional[LedgerEntry]:
+        """The farmer's transfer left the Paystack balance"""
+        return self.post(db, LedgerEntryKind.PAYOUT, payout.reference, [
+            (farmer_account(payout.farmer_id), payout.net_kobo), (PAYSTACK_ACCOUNT, -payout.net_kobo),
+        ], now, description=f"Payout {payout.reference}")
+
+    # Balances and reports
+
+    def balance(self, db: Session, account_id: str) -> int:
+        """Current balance in kobo, debits minus credits"""
+        return db.query(LedgerAccount.balance_kobo).filter(LedgerAccount.id == account_id).scalar() or 0
+
+    def balance_at(self, db: Session, account_id: str, at: datetime) -> int:
+        """Balance just before `at`"""
+        return (
+            db.query(LedgerPosting.balance_after_kobo)
+            .filter(LedgerPosting.account_id == account_id, LedgerPosting.posted_at < at)
+            .order_by(LedgerPosting.posted_at.desc(), LedgerPosting.id.desc())
+            .limit(1)
+            .scalar()
+        ) or 0
+
+    def daily_report(self, db: Session, day: date) -> Dict:
+        """Debits, credits and opening/closing balances of every account that moved on `day`"""
+        start = datetime.combine(day, time.min)
+        end = start + timedelta(days=1)
+        in_day = (LedgerPosting.posted_at >= start, LedgerPosting.posted_at < end)
+        rows = (
+            db.query(
+                LedgerPosting.account_id,
+                func.count(LedgerPosting.id),
+                func.sum(case((LedgerPosting.amount_kobo > 0, LedgerPosting.amount_kobo), else_=0)),
+                func.sum(case((LedgerPosting.amount_kobo < 0, -LedgerPosting.amount_kobo), else_=0)),
+                func.max(LedgerPosting.id),
+            )
+            .filter(*in_day)
+            .group_by(LedgerPosting.account_id)
+            .order_by(LedgerPosting.account_id)
+            .all()
+        )
+        # The day's last posting per account carries its closing balance
+        closing = dict(
+            db.query(LedgerPosting.account_id, LedgerPosting.balance_after_kobo)
+            .filter(LedgerPosting.id.in_([row[4] for row in rows]))
+            .all()
+        ) if rows else {}
+        entries = db.query(func.count(LedgerEntry.id)).filter(
+            LedgerEntry.posted_at >= start, LedgerEntry.posted_at < end
+        ).scalar()
+
+        accounts = []
+        for account_id, count, debits, credits, _ in rows:
+            debits, credits = int(debits or 0), int(credits or 0)
+            accounts.append({
+                "account_id": account_id,
+                "postings": count,
+                "debits_kobo": debits,
+                "credits_kobo": credits,
+                "opening_kobo": closing[account_id] - (debits - credits),
+                "closing_kobo": closing[account_id],
+                "closing_naira": float(from_kobo(closing[account_id])),
+            })
+        return {
+            "day": day.isoformat(),
+            "entries": entries,
+            "accounts": accounts,
+            "balanced": sum(account["debits_kobo"] - account["credits_kobo"] for account in accounts) == 0,
+        }
+
+
+ledger_service = LedgerService()
@@ -0,0 +1,58 @@
+"""
+Listing State Service for produce listing status transitions.
+
+A listing moves AVAILABLE -> MATCHED once buyers have reserved all of its
+quantity, and MATCHED -> SOLD once every deal on it has completed. A
+cancelled deal hands its quantity back (MATCHED -> AVAILABLE). Expired
+listings can be relisted; SOLD and CANCELLED are final.
+
+Writes are guarded by optimistic concurrency rather than row locks: the
+listing and transaction `version` columns are compare-and-swapped on every
+update, and quantity is reserved by a single conditional UPDATE, so
+concurrent buyers never wait on each other and can never oversell.
+"""
+from typing import Dict, FrozenSet
+
+from app.schemas.produce import ListingStatus
+
+
+class ListingStateError(ValueError):
+    """A listing write that conflicts with the listing's current state"""
+
+
+class InvalidTransitionError(ListingStateError):
+    def __init__(self, current: ListingStatus, new: ListingStatus):
+        self.current = current
+        self.new = new
+        super().__init__(f"Cannot move a listing from {current.value} to {new.value}")
+
+
+class StaleVersionError(ListingStateError):
+    """The row changed since the caller read it"""
+
+
+class ListingUnavailableError(ListingStateError):
+    """Only AVAILABLE listings can be reserved"""
+
+
+class InsufficientQuantityError(ListingStateError):
+    """Less quantity left than requested"""
+
+
+LISTING_TRANSITIONS: Dict[ListingStatus, FrozenSet[ListingStatus]] = {
+    ListingStatus.AVAILABLE: frozenset({ListingStatus.MATCHED, ListingStatus.EXPIRED, ListingStatus.CANCELLED}),
+    ListingStatus.MATCHED: frozenset({ListingStatus.SOLD, ListingStatus.AVAILABLE, ListingStatus.CANCELLED}),
+    ListingStatus.EXPIRED: frozenset({ListingStatus.AVAILABLE, ListingStatus.CANCELLED}),
+    ListingStatus.SOLD: frozenset(),
+    ListingStatus.CANCELLED: frozenset(),
+}
+
+
+def can_transition(current: ListingStatus, new: ListingStatus) -> bool:
+    return current == new or new in LISTING_TRANSITIONS[current]
+
+
+def check_transition(current: ListingStatus, new: ListingStatus):
+    """Raise InvalidTransitionError unless `current` may move to `new`"""
+    if not can_transition(current, new):
+        raise InvalidTransitionError(current, new)
@@ -0,0 +1,179 @@
+"""
+Logistics Cost Service for route distances and transport quotes.
+
+The distance between a pickup and a drop-off point comes from the local
+road network (see road_network.py) when `LOGISTICS_ROAD_NETWORK_PATH` is
+set, otherwise from the haversine distance times `LOGISTICS_DETOUR_FACTOR`.
+
+Each TransportType has a capacity, a fare of base + per-km in kobo and a
+range (VEHICLE_RATES). A load gets the cheapest fleet that carries it. The
+candidates for each load are full vehicles of one type plus at most one
+vehicle of any type for the remainder. Their fixed and per-km parts are
+priced against the distance in one array expression. So quoting many
+origin/destination pairs takes a few numpy operations, not a loop per
+pair.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.money import from_kobo
+from app.models.logistics import TransportType
+from app.services.geo_service import haversine_km_pairs, point_coordinates
+from app.services.road_network import RoadNetwork
+
+Point = Tuple[float, float]  # (latitude, longitude)
+
+
+@dataclass(frozen=True)
+class VehicleRate:
+    capacity_kg: float
+    base_kobo: int  # Per trip: loading, driver, tolls
+    per_km_kobo: int
+    max_km: float = float("inf")  # Longest trip the vehicle takes
+
+
+VEHICLE_RATES: Dict[TransportType, VehicleRate] = {
+    TransportType.MOTORCYCLE: VehicleRate(100, 150_000, 12_000, max_km=60),
+    TransportType.VAN: VehicleRate(1_000, 600_000, 35_000),
+    TransportType.TRUCK_SMALL: VehicleRate(3_000, 1_500_000, 60_000),
+    TransportType.TRUCK_MEDIUM: VehicleRate(5_000, 2_200_000, 80_000),
+    TransportType.TRUCK_LARGE: VehicleRate(15_000, 3_500_000, 110_000),
+}
+
+VEHICLE_NAMES = {
+    TransportType.MOTORCYCLE: "motorcycle",
+    TransportType.VAN: "van",
+    TransportType.TRUCK_SMALL: "small truck",
+    TransportType.TRUCK_MEDIUM: "medium truck",
+    TransportType.TRUCK_LARGE: "large truck",
+}
+
+
+@dataclass
+class TransportQuote:
+    distance_km: float
+    quantity_kg: float
+    vehicles: Dict[TransportType, int]
+    cost_kobo: int
+
+    @property
+    def transport_type(self) -> TransportType:
+        """The largest vehicle in the fleet"""
+        return max(self.vehicles, key=lambda vehicle: VEHICLE_RATES[vehicle].capacity_kg)
+
+    @property
+    def cost(self) -> Decimal:
+        return from_kobo(self.cost_kobo)
+
+    def describe(self) -> str:
+        return ", ".join(
+            f"{count} {VEHICLE_NAMES[vehicle]}{'s' if count > 1 else ''}" for vehicle, count in self.vehicles.items()
+        )
+
+    def as_dict(self) -> Dict:
+        return {
+            "distance_km": round(self.distance_km, 1),
+            "quantity_kg": self.quantity_kg,
+            "transport_type": self.transport_type.value,
+            "vehicles": {vehicle.value: count for vehicle, count in self.vehicles.items()},
+            "cost_kobo": self.cost_kobo,
+            "cost": float(self.cost),
+        }
+
+
+class LogisticsCostService:
+    def __init__(self, rates: Optional[Dict[TransportType, VehicleRate]] = None,
+                 road_network: Optional[RoadNetwork] = None, detour_factor: Optional[float] = None):
+        self.detour_factor = detour_factor or settings.LOGISTICS_DETOUR_FACTOR
+        if road_network is None and settings.LOGISTICS_ROAD_NETWORK_PATH:
+            road_network = RoadNetwork.from_file(settings.LOGISTICS_ROAD_NETWORK_PATH, self.detour_factor)
+        self.road_network = road_network
+        rates = rates or VEHICLE_RATES
+        # Smallest first, so ties go to the smaller fleet
+        self.vehicles = sorted(rates, key=lambda vehicle: rates[vehicle].capacity_kg)
+        self.capacity = np.array([rates[vehicle].capacity_kg for vehicle in self.vehicles], dtype=float)
+        self.base = np.array([rates[vehicle].base_kobo for vehicle in self.vehicles], dtype=float)
+        self.per_km = np.array([rates[vehicle].per_km_kobo for vehicle in self.vehicles], dtype=float)
+        self.max_km = np.array([rates[vehicle].max_km for vehicle in self.vehicles], dtype=float)
+
+    def distances_km(self, origins: Sequence[Point], destinations: Sequence[Point]) -> np.ndarray:
+        """Road km between the i-th origin and the i-th destination"""
+        origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+        destinations = np.asarray(destinations, dtype=float).reshape(-1, 2)
+        if self.road_network is not None:
+            return self.road_network.distances_km(origins[:, 0], origins[:, 1], destinations[:, 0], destinations[:, 1])
+        return haversine_km_pairs(origins[:, 0], origins[:, 1], destinations[:, 0], destinations[:, 1]) * self.detour_factor
+
+    def candidate_fleets(self, quantities_kg) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vehicle counts (P, K, T) of K candidate fleets for each of P loads,
+        and which candidates (P, K) carry the load. Candidate (b, j) is as
+        many full vehicles of type b as fit, plus one vehicle of type j for
+        any remainder (j == T: no extra vehicle, valid only without a
+        remainder).
+        """
+        quantities = np.asarray(quantities_kg, dtype=float)
+        types = len(self.vehicles)
+        full = np.floor(quantities[:, None] / self.capacity[None, :])  # (P, b)
+        remainder = quantities[:, None] - full * self.capacity[None, :]
+
+        counts = np.zeros((len(quantities), types, types + 1, types))
+        counts += (full[:, :, None] * np.eye(types)[None, :, :])[:, :, None, :]
+        counts[:, :, :types, :] += np.eye(types)[None, None, :, :]
+
+        extra_fits = (remainder[:, :, None] > 0) & (self.capacity[None, None, :] >= remainder[:, :, None])
+        exact = (remainder == 0) & (full > 0)
+        valid = np.concatenate([extra_fits, exact[:, :, None]], axis=2)
+        return counts.reshape(len(quantities), -1, types), valid.reshape(len(quantities), -1)
+
+    def quote_distances(self, distances_km, quantities_kg) -> List[TransportQuote]:
+        """Cheapest fleet and cost for each (distance, load) pair"""
+        distances = np.asarray(distances_km, dtype=float)
+        quantities = np.asarray(quantities_kg, dtype=float)
+        if np.any(quantities <= 0) or not np.all(np.isfinite(quantities)):
+            raise ValueError("Quantities must be positive")
+        counts, valid = self.candidate_fleets(quantities)
+        fixed = counts @ self.base  # (P, K)
+        per_km = counts @ self.per_km
+        # A fleet only goes as far as its shortest-range vehicle
+        reach = np.where(counts > 0, self.max_km, np.inf).min(axis=2)
+        valid &= reach >= distances[:, None]
+        costs = np.where(valid, fixed + per_km * distances[:, None], np.inf)
+        best = np.argmin(costs, axis=1)
+        rows = np.arange(len(quantities))
+        fleets = counts[rows, best].astype(int)
+        cost_kobo = np.rint(costs[rows, best]).astype(np.int64)
+
+        return [
+            TransportQuote(
+                distance_km=float(distances[i]),
+                quantity_kg=float(quantities[i]),
+                vehicles={self.vehicles[t]: int(fleets[i, t]) for t in range(len(self.vehicles)) if fleets[i, t]},
+                cost_kobo=int(cost_kobo[i]),
+            )
+            for i in rows
+        ]
+
+    def quote_many(self, origins: Sequence[Point], destinations: Sequence[Point],
+                   quantities_kg: Sequence[float]) -> List[TransportQuote]:
+        """Quotes for many origin/destination pairs at once"""
+        if not len(quantities_kg):
+            return []
+        return self.quote_distances(self.distances_km(origins, destinations), quantities_kg)
+
+    def quote(self, origin: Point, destination: Point, quantity_kg: float) -> TransportQuote:
+        return self.quote_many([origin], [destination], [quantity_kg])[0]
+
+    def quote_points(self, pickup, dropoff, quantity_kg: float) -> Optional[TransportQuote]:
+        """Quote between two stored POINT geometries; None if either has no coordinates"""
+        origin, destination = point_coordinates(pickup), point_coordinates(dropoff)
+        if origin is None or destination is None:
+            return None
+        return self.quote(origin, destination, quantity_kg)
+
+
+logistics_cost_service = LogisticsCostService()
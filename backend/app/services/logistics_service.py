@@ -1,8 +1,24 @@
 """
 Logistics Service for transport and delivery management
 """
+import random
+import re
+import string
 from typing import Optional
 from app.models.user import User
+from app.services.entity_extraction import entity_extractor, ExtractedEntities, quantity_in_kg
+from app.services.logistics_cost_service import logistics_cost_service
+
+# States served at the regional rate from our northern hubs
+REGIONAL_STATES = {'kano', 'katsina', 'jigawa', 'kaduna'}
+
+# Units charged per bag
+BAG_UNITS = {'bag', 'basket', 'load'}
+
+# Load priced when a route is asked about without a quantity
+DEFAULT_QUOTE_KG = 100.0
+
+_ORDER_ID_PATTERN = re.compile(r'(?:order|delivery|track)\s*#?(\w+)')
 
 
 class LogisticsService:
@@ -30,14 +46,15 @@ class LogisticsService:
         Provide transport and logistics information based on user query
         """
         query_lower = query.lower().strip()
+        entities = entity_extractor.extract(query_lower)
         
-        if 'rate' in query_lower or 'price' in query_lower or 'cost' in query_lower:
-            return self._get_transport_rates(query_lower)
+        if entities.has_intent('logistics', 'rates'):
+            return self._get_transport_rates(entities)
         
-        elif 'track' in query_lower or 'status' in query_lower or 'delivery' in query_lower:
+        elif entities.has_intent('logistics', 'track'):
             return self._get_delivery_status(query_lower)
         
-        elif 'book' in query_lower or 'order' in query_lower or 'schedule' in query_lower:
+        elif entities.has_intent('logistics', 'book'):
             return self._book_transport_info()
         
         else:
@@ -53,22 +70,24 @@ class LogisticsService:
                        "- Reply 'book' to schedule pickup")
             return response
     
-    def _get_transport_rates(self, query: str):
+    def _get_transport_rates(self, entities: ExtractedEntities):
         """
         Get transport rates based on destination
         """
-        if 'local' in query:
+        places = list({place['name']: place for place in entities.locations}.values())
+        if len(places) >= 2:
+            return self._quote_route(places[0], places[-1], entities)
+        if entities.has_intent('logistics', 'scope_local'):
             return f"Local transport rate: ₦{self.transport_rates['local']} per bag"
-        elif 'regional' in query or any(region in query for region in ['kano', 'katsina', 'jigawa', 'kaduna']):
+        elif entities.has_intent('logistics', 'scope_regional') or REGIONAL_STATES.intersection(entities.states):
             return f"Regional transport rate: ₦{self.transport_rates['regional']} per bag"
-        elif 'national' in query or 'country' in query:
+        elif entities.has_intent('logistics', 'scope_national'):
             return f"National transport rate: ₦{self.transport_rates['national']} per bag"
         else:
             # Try to determine rate based on number of bags
-            import re
-            bags_match = re.search(r'(\d+)\s*(bags?|baskets?|loads?)', query)
-            if bags_match:
-                num_bags = int(bags_match.group(1))
+            bags = next((q for q in entities.quantities if q['unit'] in BAG_UNITS), None)
+            if bags:
+                num_bags = int(bags['value'])
                 rate = self.transport_rates['regional']  # default to regional
                 total = num_bags * rate
                 return (f"Transport rate: ₦{rate} per bag\n"
@@ -80,18 +99,33 @@ class LogisticsService:
                        f"• Regional: ₦{self.transport_rates['regional']} per bag\n"
                        f"• National: ₦{self.transport_rates['national']} per bag")
     
+    def _quote_route(self, origin, destination, entities: ExtractedEntities):
+        """
+        Price a route between two named places from the road distance and the
+        cheapest vehicles for the load
+        """
+        quantity_kg = next(
+            (kg for kg in (quantity_in_kg(q) for q in entities.quantities) if kg), DEFAULT_QUOTE_KG
+        )
+        quote = logistics_cost_service.quote(
+            (origin['lat'], origin['lon']), (destination['lat'], destination['lon']), quantity_kg
+        )
+        return (f"Transport from {origin['name'].title()} to {destination['name'].title()} "
+                f"(about {quote.distance_km:,.0f} km by road)\n"
+                f"Load: {quantity_kg:,.0f}kg by {quote.describe()}\n"
+                f"Estimated cost: ₦{quote.cost:,.0f}\n"
+                f"Reply 'book' to schedule pickup")
+    
     def _get_delivery_status(self, query: str):
         """
         Get delivery status based on order ID or user context
         """
-        import re
-        order_id_match = re.search(r'(?:order|delivery|track)\s*#?(\w+)', query)
+        order_id_match = _ORDER_ID_PATTERN.search(query)
         
         if order_id_match:
             order_id = order_id_match.group(1)
             # In a real system, this would look up the order in a database
             # For demo, return a random status
-            import random
             statuses = list(self.delivery_status.keys())
             status = random.choice(statuses)
             return f"Order #{order_id} status: {self.delivery_status[status]}"
@@ -116,8 +150,6 @@ class LogisticsService:
         Schedule a pickup for agricultural produce
         """
         # Generate a mock order ID
-        import random
-        import string
         order_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
         
         response = (f"🚛 *Transport Scheduled Successfully!*\n\n"
@@ -0,0 +1,403 @@
+"""
+Matching Service for pairing produce listings with buyers.
+
+Every buyer profile is loaded once into a column-oriented buyer matrix
+(NumPy arrays of coordinates, service radius, typical volume, reliability,
+crop preferences and the prices each buyer has paid per crop). A batch of
+listings is then scored against all buyers at once as an
+(listings x buyers) array, and the top-k buyers per listing are picked
+with argpartition rather than a full sort.
+
+Scores are a weighted sum of five components, each in 0-1:
+
+- crop: 1 for a preferred crop, 0.5 for buyers without preferences;
+  buyers who list other crops only are excluded
+- distance: 1 at the buyer's location falling to 0 at their service radius;
+  buyers whose radius does not reach the listing are excluded
+- volume: how close the listing quantity is to the buyer's typical purchase
+- price: 1 when the asking price is at or below what the buyer has paid
+  for the crop before
+- reliability: the buyer's reliability and payment timeliness ratings
+
+Missing data (no location, volume or purchase history) scores a neutral 0.5.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.matching import ListingMatch
+from app.models.produce import ProduceListing
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.user import BuyerProfile, User
+from app.schemas.produce import ListingStatus
+from app.services.entity_extraction import CROP_SYNONYMS
+from app.services.geo_service import LocationError, haversine_km_matrix, resolve_location
+
+logger = logging.getLogger(__name__)
+
+MATCH_WEIGHTS = {
+    "crop": 0.30,
+    "distance": 0.25,
+    "volume": 0.15,
+    "price": 0.15,
+    "reliability": 0.15,
+}
+NEUTRAL_SCORE = 0.5
+DEFAULT_SERVICE_RADIUS_KM = 50.0
+DEFAULT_RATING = 5.0
+
+_CROP_LOOKUP = {synonym: crop for crop, synonyms in CROP_SYNONYMS.items() for synonym in synonyms}
+
+
+def canonical_crop(name) -> str:
+    """Normalise a crop name or CropType so synonyms ("corn", "masara") compare equal"""
+    if hasattr(name, "value"):
+        name = name.value
+    name = str(name or "").strip().lower()
+    return _CROP_LOOKUP.get(name, name)
+
+
+@dataclass
+class BuyerMatch:
+    """A buyer ranked for one listing"""
+    buyer_id: str
+    score: float
+    rank: int
+    components: Dict[str, float]
+    distance_km: Optional[float] = None
+
+
+@dataclass
+class BuyerMatrix:
+    """Buyer attributes as aligned arrays, one row per buyer"""
+    buyer_ids: np.ndarray           # (B,) user ids
+    latitudes: np.ndarray           # (B,) NaN when unknown
+    longitudes: np.ndarray          # (B,)
+    service_radius_km: np.ndarray   # (B,)
+    volume_kg: np.ndarray           # (B,) NaN when unknown
+    reliability: np.ndarray         # (B,) 0-1
+    crop_index: Dict[str, int]      # crop -> column of the two matrices below
+    prefers_crop: np.ndarray        # (B, C) bool
+    paid_price: np.ndarray          # (B, C) mean price paid per kg, NaN when never bought
+    built_at: float = field(default_factory=time.monotonic)
+
+    def __len__(self) -> int:
+        return len(self.buyer_ids)
+
+    @property
+    def generalist(self) -> np.ndarray:
+        """Buyers without crop preferences, who are considered for every crop"""
+        return ~self.prefers_crop.any(axis=1)
+
+    @classmethod
+    def build(cls, db: Session) -> "BuyerMatrix":
+        """Load every buyer profile, its owner's location and purchase history"""
+        rows = (
+            db.query(BuyerProfile, User.location, User.village)
+            .join(User, User.id == BuyerProfile.user_id)
+            .order_by(BuyerProfile.user_id)
+            .all()
+        )
+        buyer_ids = [profile.user_id for profile, _, _ in rows]
+        position = {buyer_id: i for i, buyer_id in enumerate(buyer_ids)}
+
+        crop_index: Dict[str, int] = {}
+        preferences = []
+        for profile, _, _ in rows:
+            crops = {canonical_crop(crop) for crop in (profile.preferred_crops or []) if crop}
+            for crop in crops:
+                crop_index.setdefault(crop, len(crop_index))
+            preferences.append(crops)
+
+        history = (
+            db.query(Transaction.buyer_id, ProduceListing.crop_type, func.avg(Transaction.agreed_price_per_kg))
+            .join(ProduceListing, ProduceListing.id == Transaction.produce_listing_id)
+            .filter(Transaction.status != TransactionStatus.CANCELLED)
+            .group_by(Transaction.buyer_id, ProduceListing.crop_type)
+            .all()
+        )
+        history = [(buyer_id, canonical_crop(crop), price) for buyer_id, crop, price in history if buyer_id in position]
+        for _, crop, _ in history:
+            crop_index.setdefault(crop, len(crop_index))
+
+        n_buyers, n_crops = len(rows), len(crop_index)
+        prefers_crop = np.zeros((n_buyers, n_crops), dtype=bool)
+        for i, crops in enumerate(preferences):
+            prefers_crop[i, [crop_index[crop] for crop in crops]] = True
+
+        paid_price = np.full((n_buyers, n_crops), np.nan)
+        for buyer_id, crop, price in history:
+            if price is not None:
+                paid_price[position[buyer_id], crop_index[crop]] = float(price)
+
+        latitudes = np.full(n_buyers, np.nan)
+        longitudes = np.full(n_buyers, np.nan)
+        for i, (_, location, village) in enumerate(rows):
+            point = _buyer_location(location, village)
+            if point is not None:
+                latitudes[i], longitudes[i] = point.latitude, point.longitude
+
+        radius = np.array([p.service_radius_km or DEFAULT_SERVICE_RADIUS_KM for p, _, _ in rows], dtype=float)
+        volume = np.array(
+            [p.typical_purchase_volume_kg if p.typical_purchase_volume_kg else np.nan for p, _, _ in rows],
+            dtype=float
+        )
+        ratings = np.array(
+            [[p.reliability_score or DEFAULT_RATING, p.payment_timeliness_score or DEFAULT_RATING] for p, _, _ in rows],
+            dtype=float
+        ).reshape(n_buyers, 2)
+        # 1-5 ratings onto 0-1
+        reliability = np.clip((ratings.mean(axis=1) - 1.0) / 4.0, 0.0, 1.0)
+
+        return cls(
+            buyer_ids=np.array(buyer_ids, dtype=object),
+            latitudes=latitudes,
+            longitudes=longitudes,
+            service_radius_km=radius,
+            volume_kg=volume,
+            reliability=reliability,
+            crop_index=crop_index,
+            prefers_crop=prefers_crop,
+            paid_price=paid_price,
+        )
+
+
+def _buyer_location(location, village: Optional[str]):
+    """
+    Buyer coordinates from the user's point (EWKT text or a geometry) or,
+    failing that, their village name via the gazetteer.
+    """
+    candidates = []
+    if location is not None:
+        # PostGIS returns a WKBElement; SQLite stores the EWKT text
+        candidates.append(location if isinstance(location, str) else _geometry_to_ewkt(location))
+    if village:
+        candidates.append(village)
+    for candidate in candidates:
+        if not candidate:
+            continue
+        try:
+            return resolve_location(candidate)
+        except LocationError:
+            continue
+    return None
+
+
+def _geometry_to_ewkt(geometry) -> Optional[str]:
+    try:
+        from geoalchemy2.shape import to_shape
+        point = to_shape(geometry)
+        return f"SRID=4326;POINT({point.x} {point.y})"
+    except Exception:
+        return None
+
+
+def score_listings(matrix: BuyerMatrix, crops: Sequence[str], latitudes, longitudes,
+                   quantities, prices, farmer_ids: Sequence[str]):
+    """
+    Score every listing in the batch against every buyer.
+
+    Returns (scores, components, distances): scores is (L, B) with -inf for
+    excluded buyers, components maps each component name to an (L, B) array
+    and distances holds kilometres (NaN when either location is unknown).
+    """
+    n_listings, n_buyers = len(crops), len(matrix)
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    quantities = np.asarray(quantities, dtype=float)[:, None]
+    prices = np.asarray(prices, dtype=float)[:, None]
+
+    # Crop: look up each listing's crop column; unknown crops match generalists only
+    columns = np.array([matrix.crop_index.get(canonical_crop(crop), -1) for crop in crops])
+    known = columns >= 0
+    prefers = np.zeros((n_listings, n_buyers), dtype=bool)
+    paid = np.full((n_listings, n_buyers), np.nan)
+    if known.any():
+        prefers[known] = matrix.prefers_crop[:, columns[known]].T
+        paid[known] = matrix.paid_price[:, columns[known]].T
+    generalist = np.broadcast_to(matrix.generalist, (n_listings, n_buyers))
+    crop_score = np.where(prefers, 1.0, np.where(generalist, NEUTRAL_SCORE, 0.0))
+    eligible = prefers | generalist
+
+    # Distance within each buyer's service radius
+    distances = haversine_km_matrix(latitudes, longitudes, matrix.latitudes, matrix.longitudes)
+    located = ~np.isnan(distances)
+    radius = matrix.service_radius_km[None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        distance_score = np.where(located, np.clip(1.0 - distances / radius, 0.0, 1.0), NEUTRAL_SCORE)
+        eligible &= ~located | (distances <= radius)
+
+        # Volume fit: ratio of the smaller to the larger of listing and typical purchase
+        volume = matrix.volume_kg[None, :]
+        fit = np.minimum(quantities, volume) / np.maximum(quantities, volume)
+        volume_score = np.where(np.isnan(volume), NEUTRAL_SCORE, np.nan_to_num(fit, nan=0.0))
+
+        # Price against what the buyer has paid for this crop before
+        ratio = np.where(prices > 0, paid / prices, 1.0)
+        price_score = np.where(np.isnan(paid), NEUTRAL_SCORE, np.clip(ratio, 0.0, 1.0))
+
+    reliability_score = np.broadcast_to(matrix.reliability, (n_listings, n_buyers))
+
+    # Farmers who also buy never match their own listings
+    eligible &= matrix.buyer_ids[None, :] != np.asarray(farmer_ids, dtype=object)[:, None]
+
+    components = {
+        "crop": crop_score,
+        "distance": distance_score,
+        "volume": volume_score,
+        "price": price_score,
+        "reliability": reliability_score,
+    }
+    scores = sum(MATCH_WEIGHTS[name] * values for name, values in components.items())
+    scores = np.where(eligible, scores, -np.inf)
+    return scores, components, distances
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Column indices of the k best scores in each row, best first. Uses
+    argpartition so only the k winners are sorted.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=int)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+class MatchingService:
+    def __init__(self, top_k: int = None, batch_size: int = None, matrix_ttl_seconds: int = None):
+        self.top_k = top_k or settings.MATCHING_TOP_K
+        self.batch_size = batch_size or settings.MATCHING_BATCH_SIZE
+        self.matrix_ttl_seconds = (
+            settings.MATCHING_BUYER_MATRIX_TTL_SECONDS if matrix_ttl_seconds is None else matrix_ttl_seconds
+        )
+        self._matrix: Optional[BuyerMatrix] = None
+        self._lock = threading.Lock()
+
+    def buyer_matrix(self, db: Session) -> BuyerMatrix:
+        """The cached buyer matrix, rebuilt when older than the TTL or invalidated"""
+        with self._lock:
+            matrix = self._matrix
+            if matrix is None or time.monotonic() - matrix.built_at > self.matrix_ttl_seconds:
+                matrix = BuyerMatrix.build(db)
+                self._matrix = matrix
+                logger.info(f"Built buyer matrix: {len(matrix)} buyers, {len(matrix.crop_index)} crops")
+            return matrix
+
+    def invalidate(self):
+        """Drop the cached buyer matrix; call after buyer profiles change"""
+        with self._lock:
+            self._matrix = None
+
+    def match_listings(self, db: Session, listings: Sequence[ProduceListing],
+                       top_k: int = None) -> Dict[str, List[BuyerMatch]]:
+        """Top-k buyers for each listing, scored in batches"""
+        top_k = top_k or self.top_k
+        matrix = self.buyer_matrix(db)
+        results: Dict[str, List[BuyerMatch]] = {listing.id: [] for listing in listings}
+        if not listings or not len(matrix):
+            return results
+
+        for start in range(0, len(listings), self.batch_size):
+            batch = listings[start:start + self.batch_size]
+            scores, components, distances = score_listings(
+                matrix,
+                crops=[listing.crop_type for listing in batch],
+                latitudes=[np.nan if listing.latitude is None else listing.latitude for listing in batch],
+                longitudes=[np.nan if listing.longitude is None else listing.longitude for listing in batch],
+                quantities=[listing.quantity_kg or 0.0 for listing in batch],
+                prices=[listing.expected_price_per_kg or 0.0 for listing in batch],
+                farmer_ids=[listing.farmer_id for listing in batch],
+            )
+            best = top_k_indices(scores, top_k)
+            for row, listing in enumerate(batch):
+                matches = results[listing.id]
+                for column in best[row]:
+                    score = scores[row, column]
+                    if not np.isfinite(score):
+                        break
+                    distance = distances[row, column]
+                    matches.append(BuyerMatch(
+                        buyer_id=matrix.buyer_ids[column],
+                        score=round(float(score), 4),
+                        rank=len(matches) + 1,
+                        components={name: round(float(values[row, column]), 4) for name, values in components.items()},
+                        distance_km=None if np.isnan(distance) else round(float(distance), 3),
+                    ))
+        return results
+
+    def save_matches(self, db: Session, listing: ProduceListing, matches: List[BuyerMatch]):
+        """Replace the stored matches of a listing"""
+        db.query(ListingMatch).filter(ListingMatch.listing_id == listing.id).delete(synchronize_session=False)
+        db.add_all([
+            ListingMatch(
+                listing_id=listing.id,
+                buyer_id=match.buyer_id,
+                score=match.score,
+                rank=match.rank,
+                crop_score=match.components["crop"],
+                distance_score=match.components["distance"],
+                volume_score=match.components["volume"],
+                price_score=match.components["price"],
+                reliability_score=match.components["reliability"],
+                distance_km=match.distance_km,
+            )
+            for match in matches
+        ])
+
+    def match_and_store(self, db: Session, listings: Sequence[ProduceListing], top_k: int = None) -> int:
+        """Match and persist a set of listings; returns the number of matches stored"""
+        available = [listing for listing in listings if listing.status == ListingStatus.AVAILABLE]
+        for listing in listings:
+            if listing.status != ListingStatus.AVAILABLE:
+                # Sold, expired or cancelled listings keep no candidates
+                db.query(ListingMatch).filter(ListingMatch.listing_id == listing.id).delete(synchronize_session=False)
+
+        results = self.match_listings(db, available, top_k)
+        for listing in available:
+            self.save_matches(db, listing, results[listing.id])
+        # Bookkeeping only: a bulk UPDATE leaves the listing version alone, so
+        # a matching run never conflicts with a concurrent reservation
+        db.query(ProduceListing).filter(ProduceListing.id.in_([listing.id for listing in listings])).update(
+            {ProduceListing.matched_at: datetime.utcnow()}, synchronize_session="evaluate"
+        )
+        db.commit()
+        return sum(len(matches) for matches in results.values())
+
+    def pending_listings(self, db: Session, limit: int) -> List[ProduceListing]:
+        """Available listings not matched since they were created or last updated"""
+        return (
+            db.query(ProduceListing)
+            .filter(ProduceListing.matched_at.is_(None), ProduceListing.status == ListingStatus.AVAILABLE)
+            .order_by(ProduceListing.created_at, ProduceListing.id)
+            .limit(limit)
+            .all()
+        )
+
+    def match_pending(self, db: Session, top_k: int = None, max_listings: Optional[int] = None) -> Dict[str, int]:
+        """Incremental run: match only listings that are new or changed"""
+        listings_matched, matches_stored = 0, 0
+        while max_listings is None or listings_matched < max_listings:
+            limit = self.batch_size if max_listings is None else min(self.batch_size, max_listings - listings_matched)
+            batch = self.pending_listings(db, limit)
+            if not batch:
+                break
+            matches_stored += self.match_and_store(db, batch, top_k)
+            listings_matched += len(batch)
+        return {"listings": listings_matched, "matches": matches_stored}
+
+
+matching_service = MatchingService()
@@ -2,9 +2,59 @@
 Payment Service for handling transactions with Paystack integration
 """
 from typing import Optional, Dict, Any
-import requests
-from app.models.user import User
+import hashlib
+import random
+import re
+import string
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.money import from_kobo, to_kobo
+from app.crud.crud_transaction import (
+    AWAITING_PAYMENT_STATUSES, create_payment_record, get_transaction, get_user_payments, update_transaction_status
+)
+from app.db.session import SessionLocal
+from app.models.transaction import PaymentRecord, PaymentStatus, Transaction, TransactionStatus
+from app.models.user import User
+from app.schemas.payment import PaymentRecordCreate
+from app.services.cache_service import PAYMENTS_CACHE_NAMESPACE, response_cache, user_namespace
+from app.services.paystack_client import PaystackError, paystack_client
+from app.services.entity_extraction import entity_extractor
+
+# Transaction ids and Paystack references as this app generates them
+_PAYMENT_KEY_PATTERN = re.compile(r'\b((?:txn|pay)_\w+)')
+_PAGE_PATTERN = re.compile(r'\bpage\s*(\d+)')
+
+# Deals per payment history reply
+HISTORY_PAGE_SIZE = 5
+# User id the agents run with when the sender has no account
+ANONYMOUS_USER_ID = "anonymous"
+
+
+
+def payer_email(user_id: str) -> str:
+    """Email Paystack is given for a buyer (users have phone numbers, not emails)"""
+    return f"user_{user_id}@ShukaLink.com"
+
+
+def payment_idempotency_key(transaction_id: str, amount: float, attempt: int = 0) -> str:
+    """
+    Same deal, same key: a retried tool call maps onto the payment the first
+    call started, whatever the chat session or the wording. The amount is
+    compared in kobo; attempt (failed payments so far on the deal) lets the
+    buyer try again once a payment has failed.
+    """
+    raw = "|".join([transaction_id, str(to_kobo(amount)), str(attempt)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# PaymentStatus -> key of PaymentService.transaction_status
+_PAYMENT_STATUS_KEYS = {
+    PaymentStatus.PENDING: 'pending',
+    PaymentStatus.SUCCESS: 'confirmed',
+    PaymentStatus.FAILED: 'failed',
+    PaymentStatus.REFUNDED: 'refunded',
+}
 
 
 class PaymentService:
@@ -22,9 +72,8 @@ class PaymentService:
             'refunded': 'Payment refunded to your account'
         }
         
-        # Paystack configuration
-        self.paystack_secret_key = settings.PAYSTACK_SECRET_KEY
-        self.paystack_base_url = "https://api.paystack.co"
+        # Paystack API calls go through the shared pooled client
+        self.paystack = paystack_client
         
         # Mock payment gateway configuration (kept for chat info)
         self.payment_gateways = {
@@ -32,7 +81,7 @@ class PaymentService:
             'flutterwave': {'enabled': True, 'fees': 1.4},  # 1.4% fee
         }
     
-    def initialize_transaction(self, email: str, amount: int, reference: str, callback_url: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def initialize_transaction(self, email: str, amount: int, reference: str, callback_url: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Initialize a transaction with Paystack
         
@@ -46,7 +95,7 @@ class PaymentService:
         Returns:
             Dictionary containing authorization_url, access_code, and reference
         """
-        if not self.paystack_secret_key:
+        if not self.paystack.configured:
             # Fallback for development/testing without keys
             print("WARNING: PAYSTACK_SECRET_KEY not set. Returning mock response.")
             return {
@@ -58,39 +107,20 @@ class PaymentService:
                     "reference": reference
                 }
             }
-            
-        headers = {
-            "Authorization": f"Bearer {self.paystack_secret_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "email": email,
-            "amount": amount,
-            "reference": reference,
-            "callback_url": callback_url,
-            "metadata": metadata or {}
-        }
         
         try:
-            response = requests.post(
-                f"{self.paystack_base_url}/transaction/initialize",
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return await self.paystack.initialize_transaction(email, amount, reference, callback_url, metadata)
+        except PaystackError as e:
             print(f"Error initializing Paystack transaction: {e}")
-            if hasattr(e, 'response') and e.response:
-                print(f"Response: {e.response.text}")
-            raise Exception(f"Payment initialization failed: {str(e)}")
+            if e.response:
+                print(f"Response: {e.response}")
+            raise Exception(f"Payment initialization failed: {str(e)}") from e
 
-    def verify_transaction(self, reference: str) -> Dict[str, Any]:
+    async def verify_transaction(self, reference: str) -> Dict[str, Any]:
         """
         Verify a transaction with Paystack
         """
-        if not self.paystack_secret_key:
+        if not self.paystack.configured:
             # Fallback for development
             return {
                 "status": True,
@@ -102,40 +132,160 @@ class PaymentService:
                     "gateway_response": "Successful"
                 }
             }
-            
-        headers = {
-            "Authorization": f"Bearer {self.paystack_secret_key}",
-        }
         
         try:
-            response = requests.get(
-                f"{self.paystack_base_url}/transaction/verify/{reference}",
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return await self.paystack.verify_transaction(reference)
+        except PaystackError as e:
             print(f"Error verifying Paystack transaction: {e}")
-            raise Exception(f"Payment verification failed: {str(e)}")
+            raise Exception(f"Payment verification failed: {str(e)}") from e
 
-    # ... (Keep existing chat helper methods: get_payment_info, _get_payment_status, etc.) ...
-    
-    def get_payment_info(self, query: str, user: Optional[User] = None):
+    async def create_payment_link(self, db: Session, user_id: str, amount: float, description: str,
+                                  session_id: Optional[str] = None, transaction_id: Optional[str] = None) -> Dict[str, Any]:
         """
-        Provide payment information based on user query
+        Start paying for one of the buyer's open deals: a PENDING
+        PaymentRecord, a Paystack transaction and the checkout link.
+
+        The deal is transaction_id, or else the buyer's latest deal awaiting
+        payment for exactly this amount. A PENDING payment already open for
+        the deal (from an earlier call or /payments/initialize) is returned
+        as is. Otherwise the payment reference is derived from the
+        idempotency key and is unique, so a repeated call (an LLM retrying
+        the tool) gets the first call's link instead of a second Paystack
+        transaction; Paystack also rejects a reused reference.
+
+        Returns {"status", "message"} plus "authorization_url", "reference"
+        and "transaction_id" when there is a link.
+        """
+        deal = self._payable_deal(db, user_id, amount, transaction_id)
+        if deal is None:
+            return {"status": False, "message": (
+                f"You have no deal awaiting a payment of ₦{amount:,.2f}. "
+                "Reserve produce first, or check the amount with 'history'."
+            )}
+        if deal.total_amount_kobo != to_kobo(amount):
+            return {"status": False, "message": (
+                f"Transaction {deal.id} is for ₦{deal.total_amount:,.2f}, not ₦{amount:,.2f}."
+            )}
+
+        existing = (
+            db.query(PaymentRecord)
+            .filter(
+                PaymentRecord.transaction_id == deal.id,
+                PaymentRecord.status == PaymentStatus.PENDING,
+                PaymentRecord.amount_kobo == deal.total_amount_kobo,
+            )
+            .order_by(PaymentRecord.created_at.desc())
+            .first()
+        )
+        if existing is not None:
+            return self._existing_payment_link(existing)
+
+        failed = db.query(PaymentRecord).filter(
+            PaymentRecord.transaction_id == deal.id, PaymentRecord.status == PaymentStatus.FAILED
+        ).count()
+        key = payment_idempotency_key(deal.id, amount, failed)
+        reference = f"pay_{key[:20]}"
+        existing = db.query(PaymentRecord).filter(PaymentRecord.reference == reference).first()
+        if existing is None:
+            try:
+                # The unique reference is the lock: only one call gets to insert it
+                record = create_payment_record(db, PaymentRecordCreate(
+                    transaction_id=deal.id,
+                    payment_method="PAYSTACK",
+                    amount=deal.total_amount,
+                    currency="NGN",
+                    reference=reference,
+                    status="PENDING",
+                    paystack_data={"idempotency_key": key, "description": description, "session_id": session_id},
+                ), deal.id)
+            except IntegrityError:
+                db.rollback()
+                existing = db.query(PaymentRecord).filter(PaymentRecord.reference == reference).first()
+        if existing is not None:
+            return self._existing_payment_link(existing)
+
+        try:
+            response = await self.initialize_transaction(
+                email=payer_email(user_id),
+                amount=deal.total_amount_kobo,
+                reference=reference,
+                callback_url=f"{settings.API_V1_STR}/payments/callback",
+                metadata={"transaction_id": deal.id, "description": description},
+            )
+        except Exception:
+            # Nothing to pay yet: free the reference so a retry can start over
+            db.delete(record)
+            db.commit()
+            raise
+        data = response.get("data") or {}
+        record.paystack_data = {**record.paystack_data, "access_code": data.get("access_code"),
+                                "authorization_url": data.get("authorization_url")}
+        db.commit()
+        if deal.status == TransactionStatus.PENDING:
+            update_transaction_status(db, deal.id, TransactionStatus.PAYMENT_INITIATED)
+        return {
+            "status": True,
+            "message": "Payment initialized",
+            "authorization_url": data.get("authorization_url"),
+            "reference": reference,
+            "transaction_id": deal.id,
+        }
+
+    def _payable_deal(self, db: Session, user_id: str, amount: float, transaction_id: Optional[str]) -> Optional[Transaction]:
+        if transaction_id:
+            deal = get_transaction(db, transaction_id)
+            if deal is None or deal.buyer_id != user_id or deal.status not in AWAITING_PAYMENT_STATUSES:
+                return None
+            return deal
+        return (
+            db.query(Transaction)
+            .filter(
+                Transaction.buyer_id == user_id,
+                Transaction.status.in_(AWAITING_PAYMENT_STATUSES),
+                Transaction.total_amount_kobo == to_kobo(amount),
+            )
+            .order_by(Transaction.matched_at.desc(), Transaction.id.desc())
+            .first()
+        )
+
+    def _existing_payment_link(self, record: PaymentRecord) -> Dict[str, Any]:
+        """Answer a repeated call from the payment the first call started"""
+        link = {"reference": record.reference, "transaction_id": record.transaction_id}
+        if record.status == PaymentStatus.SUCCESS:
+            return {**link, "status": False, "message": "This payment has already been made."}
+        paystack_data = record.paystack_data or {}
+        authorization_url = paystack_data.get("authorization_url")
+        if authorization_url is None and paystack_data.get("access_code"):
+            # Records from /payments/initialize kept only the access code
+            authorization_url = f"https://checkout.paystack.com/{paystack_data['access_code']}"
+        if authorization_url is None:
+            return {**link, "status": False, "message": "Your payment link is being prepared. Please try again shortly."}
+        return {**link, "status": True, "message": "Payment already initialized", "authorization_url": authorization_url}
+
+    def get_payment_info(self, query: str, user: Optional[User] = None, user_id: Optional[str] = None,
+                         db: Optional[Session] = None):
+        """
+        Provide payment information based on user query. Status and history
+        come from the user's own deals (user, or user_id when only the id is
+        known), cached per user until one of their payments changes.
         """
         query_lower = query.lower().strip()
+        entities = entity_extractor.extract(query_lower)
+        user_id = user_id or (user.id if user is not None else None)
+        if user_id == ANONYMOUS_USER_ID:
+            user_id = None
         
-        if 'status' in query_lower or 'confirm' in query_lower or 'verify' in query_lower:
-            return self._get_payment_status(query_lower)
+        if entities.has_intent('payment', 'status'):
+            return self._get_payment_status(query_lower, user_id, db)
         
-        elif 'make' in query_lower or 'pay' in query_lower or 'process' in query_lower:
+        elif entities.has_intent('payment', 'make'):
             return self._make_payment_info()
         
-        elif 'history' in query_lower or 'past' in query_lower or 'previous' in query_lower:
-            return self._get_payment_history()
+        elif entities.has_intent('payment', 'history'):
+            page_match = _PAGE_PATTERN.search(query_lower)
+            return self._get_payment_history(user_id, int(page_match.group(1)) if page_match else 1, db)
         
-        elif 'method' in query_lower or 'option' in query_lower or 'gateway' in query_lower:
+        elif entities.has_intent('payment', 'methods'):
             return self._get_payment_methods()
         
         else:
@@ -152,24 +302,54 @@ class PaymentService:
                        "- Reply 'history' to view payment history")
             return response
     
-    def _get_payment_status(self, query: str):
+    def _cached_answer(self, user_id: str, kind: str, params: Dict[str, Any], build, db: Optional[Session]) -> str:
+        """A user's answer from the cache, or built from one query and cached"""
+        def build_body():
+            session = db or SessionLocal()
+            try:
+                return build(session).encode("utf-8"), {}
+            finally:
+                if db is None:
+                    session.close()
+
+        namespace = user_namespace(PAYMENTS_CACHE_NAMESPACE, user_id)
+        return response_cache.get_or_build(namespace, kind, params, build_body).body.decode("utf-8")
+    
+    def _payment_label(self, payment_status: Optional[PaymentStatus]) -> str:
+        if payment_status is None:
+            return "Not started"
+        return self.transaction_status[_PAYMENT_STATUS_KEYS[payment_status]]
+    
+    def _get_payment_status(self, query: str, user_id: Optional[str] = None, db: Optional[Session] = None):
         """
-        Get payment status based on transaction ID
+        Get the payment status of one of the user's deals, by transaction ID
+        or payment reference; the latest deal if none is given
         """
-        import re
-        transaction_id_match = re.search(r'(?:transaction|payment|tx)\s*#?(\w+)', query)
+        if user_id is None:
+            return ("We couldn't find your account. Please message us from your registered "
+                    "phone number to check a payment.")
         
-        if transaction_id_match:
-            tx_id = transaction_id_match.group(1)
-            # In a real system, this would look up the transaction in a database
-            # For demo, return a random status
-            import random
-            statuses = list(self.transaction_status.keys())
-            status = random.choice(statuses)
-            return f"Transaction #{tx_id} status: {self.transaction_status[status]}"
-        else:
-            return ("To check payment status, reply with 'status [transaction ID]'\n"
-                   "Example: 'status TX123ABC'")
+        key_match = _PAYMENT_KEY_PATTERN.search(query)
+        key = key_match.group(1) if key_match else None
+
+        def build(session: Session) -> str:
+            rows = get_user_payments(session, user_id, limit=1, key=key)
+            if not rows:
+                if key:
+                    return f"We couldn't find a transaction {key} on your account."
+                return ("You have no transactions yet. To check a payment status later, reply with "
+                        "'status [transaction ID]'\nExample: 'status txn_1a2b3c4d'")
+            row = rows[0]
+            lines = [
+                f"Transaction {row.id}: {row.quantity_kg:g}kg {row.crop_type} for ₦{from_kobo(row.total_amount_kobo):,.0f}",
+                f"Deal: {row.status.value.replace('_', ' ').lower()}",
+                f"Payment: {self._payment_label(row.payment_status)}",
+            ]
+            if row.payment_reference:
+                lines.append(f"Reference: {row.payment_reference}")
+            return "\n".join(lines)
+
+        return self._cached_answer(user_id, "status", {"key": key}, build, db)
     
     def _make_payment_info(self):
         """
@@ -185,18 +365,33 @@ class PaymentService:
                "- Cash on Delivery\n\n"
                "Example: 'Pay ₦5,000 for transport service via mobile money'")
     
-    def _get_payment_history(self, user: Optional[User] = None):
-        """
-        Get payment history for a user
-        """
-        # In a real system, this would fetch from a database
-        # For demo, return mock history
-        history = ("📊 *Payment History*\n\n"
-                  "1. TX-789012 - ₦15,000 - Transport Service - 2 days ago - Confirmed\n"
-                  "2. TX-654321 - ₦8,500 - Advisory Service - 1 week ago - Confirmed\n"
-                  "3. TX-112233 - ₦25,000 - Logistics Service - 2 weeks ago - Confirmed\n\n"
-                  "For detailed history, visit our web portal or contact support.")
-        return history
+    def _get_payment_history(self, user_id: Optional[str] = None, page: int = 1, db: Optional[Session] = None):
+        """
+        Get one page of payment history for a user
+        """
+        if user_id is None:
+            return ("📊 *Payment History*\n\n"
+                    "We couldn't find your account. Please message us from your registered phone number "
+                    "to see your payments.")
+        page = max(page, 1)
+
+        def build(session: Session) -> str:
+            # One row past the page tells whether there is a next page
+            rows = get_user_payments(session, user_id, skip=(page - 1) * HISTORY_PAGE_SIZE, limit=HISTORY_PAGE_SIZE + 1)
+            if not rows:
+                return "📊 *Payment History*\n\n" + ("No more transactions." if page > 1 else "You have no transactions yet.")
+            lines = ["📊 *Payment History*" + (f" (page {page})" if page > 1 else ""), ""]
+            for number, row in enumerate(rows[:HISTORY_PAGE_SIZE], start=(page - 1) * HISTORY_PAGE_SIZE + 1):
+                role = "Bought" if row.buyer_id == user_id else "Sold"
+                lines.append(
+                    f"{number}. {row.id} - ₦{from_kobo(row.total_amount_kobo):,.0f} - {role} {row.quantity_kg:g}kg {row.crop_type} - "
+                    f"{row.matched_at:%d %b %Y} - {self._payment_label(row.payment_status)}"
+                )
+            if len(rows) > HISTORY_PAGE_SIZE:
+                lines += ["", f"Reply 'history page {page + 1}' for more."]
+            return "\n".join(lines)
+
+        return self._cached_answer(user_id, "history", {"page": page}, build, db)
     
     def _get_payment_methods(self):
         """
@@ -229,8 +424,6 @@ class PaymentService:
         total_amount = amount + fee
         
         # Generate mock transaction ID
-        import random
-        import string
         transaction_id = 'TX-' + ''.join(random.choices(string.digits, k=6))
         
         response = (f"💳 *Payment Processing*\n\n"
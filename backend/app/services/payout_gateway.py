@@ -0,0 +1,122 @@
+"""
+Payout gateways that send farmers their money in bulk transfers.
+
+A gateway takes a whole batch of transfers in one call and answers, per
+transfer reference, a TransferResult: "success", "pending" (still being
+processed; ask again later with transfer_statuses) or "failed". Transfer
+references are the idempotency keys: submitting a batch again after a
+timeout must return the earlier outcome rather than pay again.
+
+- "paystack": Paystack's bulk transfer API, from the platform balance
+- "local": marks every transfer paid without moving money, for development
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.services.paystack_client import PaystackClient, PaystackError, PaystackUnavailableError, paystack_client
+
+logger = logging.getLogger(__name__)
+
+SUCCESS = "success"
+PENDING = "pending"
+FAILED = "failed"
+
+# Paystack transfer statuses that are final failures; anything else but "success" is still in progress
+PAYSTACK_FAILED_STATUSES = {"failed", "reversed", "abandoned", "rejected", "blocked"}
+
+
+@dataclass
+class TransferResult:
+    status: str  # SUCCESS, PENDING or FAILED
+    transfer_code: Optional[str] = None
+    reason: Optional[str] = None
+
+
+class PaystackPayoutGateway:
+    name = "paystack"
+
+    def __init__(self, client: Optional[PaystackClient] = None, concurrency: int = 8):
+        self.client = client or paystack_client
+        self.concurrency = concurrency
+
+    @property
+    def configured(self) -> bool:
+        return self.client.configured
+
+    @staticmethod
+    def _result(data: Dict) -> TransferResult:
+        status = (data.get("status") or "").lower()
+        if status == "success":
+            outcome = SUCCESS
+        elif status in PAYSTACK_FAILED_STATUSES:
+            outcome = FAILED
+        else:
+            outcome = PENDING
+        return TransferResult(outcome, data.get("transfer_code"), data.get("reason") if outcome == FAILED else None)
+
+    async def bulk_transfer(self, batch_reference: str, transfers: List[Dict]) -> Dict[str, TransferResult]:
+        """
+        Send every transfer of a batch in one call. Each transfer is
+        {"reference", "recipient", "amount" (kobo), "reason"}. The bulk API
+        takes no batch reference, so `batch_reference` is only logged;
+        Paystack dedupes on each transfer's reference alone.
+        """
+        logger.info(f"Submitting payout batch {batch_reference} ({len(transfers)} transfers)")
+        response = await self.client.request("POST", "/transfer/bulk", json={
+            "currency": "NGN",
+            "source": "balance",
+            "transfers": transfers,
+        })
+        return {item["reference"]: self._result(item) for item in response.get("data") or []}
+
+    async def transfer_statuses(self, references: List[str]) -> Dict[str, TransferResult]:
+        """Current result of earlier transfers; references that could not be checked are left out"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def verify(reference: str):
+            async with semaphore:
+                try:
+                    response = await self.client.request("GET", f"/transfer/verify/{reference}")
+                except PaystackError as e:
+                    if not isinstance(e, PaystackUnavailableError) and e.status_code in (400, 404):
+                        return reference, TransferResult(FAILED, reason="Transfer not found at Paystack")
+                    logger.warning(f"Could not verify transfer {reference}: {e}")
+                    return reference, None
+                return reference, self._result(response.get("data") or {})
+
+        results = await asyncio.gather(*(verify(reference) for reference in references))
+        return {reference: result for reference, result in results if result is not None}
+
+
+class LocalPayoutGateway:
+    """Pays every transfer at once and remembers it, so resubmitting is a no-op"""
+    name = "local"
+    configured = True
+
+    def __init__(self):
+        self.transfers: Dict[str, Dict] = {}  # reference -> transfer as submitted
+        self.calls: List[str] = []  # Batch reference of every bulk call
+
+    async def bulk_transfer(self, batch_reference: str, transfers: List[Dict]) -> Dict[str, TransferResult]:
+        self.calls.append(batch_reference)
+        for transfer in transfers:
+            self.transfers.setdefault(transfer["reference"], dict(transfer))
+        return {transfer["reference"]: TransferResult(SUCCESS, f"local_{transfer['reference']}") for transfer in transfers}
+
+    async def transfer_statuses(self, references: List[str]) -> Dict[str, TransferResult]:
+        return {
+            reference: TransferResult(SUCCESS, f"local_{reference}") if reference in self.transfers
+            else TransferResult(FAILED, reason="Unknown transfer")
+            for reference in references
+        }
+
+
+def create_payout_gateway(name: str):
+    """Build a payout gateway from its configured name"""
+    if name == "paystack":
+        return PaystackPayoutGateway()
+    if name == "local":
+        return LocalPayoutGateway()
+    raise ValueError(f"Unknown payout gateway: {name}")
@@ -0,0 +1,202 @@
+"""
+Async Paystack API client.
+
+One httpx.AsyncClient per event loop keeps a pool of keep-alive connections
+to Paystack, so calls skip the TCP/TLS handshake and never block the loop.
+Every request has explicit connect and read timeouts. 5xx responses and
+network errors are retried with exponential backoff and full jitter; 4xx
+responses are the caller's problem and are raised at once.
+
+A circuit breaker guards the pool: after `PAYSTACK_CIRCUIT_FAILURE_THRESHOLD`
+consecutive failed attempts calls fail fast with PaystackUnavailableError
+for `PAYSTACK_CIRCUIT_RESET_SECONDS`, then a single probe decides whether
+Paystack is back.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cap on a single backoff sleep
+MAX_RETRY_DELAY_SECONDS = 8.0
+
+
+class PaystackError(Exception):
+    """Paystack rejected the request (4xx) or could not be reached"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, response: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+class PaystackUnavailableError(PaystackError):
+    """Paystack kept failing (5xx or network) or the circuit is open"""
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures -> half-open after `reset_seconds`"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may go out now; in half-open only one probe at a time"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            # A failed probe re-opens the circuit for another full window
+            self.opened_at = time.monotonic()
+
+
+class PaystackClient:
+    def __init__(
+        self,
+        secret_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_seconds: Optional[float] = None,
+        failure_threshold: Optional[int] = None,
+        reset_seconds: Optional[float] = None,
+    ):
+        self.secret_key = settings.PAYSTACK_SECRET_KEY if secret_key is None else secret_key
+        self.base_url = (base_url or settings.PAYSTACK_BASE_URL).rstrip("/")
+        self.timeout = httpx.Timeout(
+            settings.PAYSTACK_READ_TIMEOUT_SECONDS if read_timeout is None else read_timeout,
+            connect=settings.PAYSTACK_CONNECT_TIMEOUT_SECONDS if connect_timeout is None else connect_timeout,
+        )
+        max_connections = settings.PAYSTACK_MAX_CONNECTIONS if max_connections is None else max_connections
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_retries = settings.PAYSTACK_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_seconds = settings.PAYSTACK_RETRY_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+        self.breaker = CircuitBreaker(
+            settings.PAYSTACK_CIRCUIT_FAILURE_THRESHOLD if failure_threshold is None else failure_threshold,
+            settings.PAYSTACK_CIRCUIT_RESET_SECONDS if reset_seconds is None else reset_seconds,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.secret_key)
+
+    def _http(self) -> httpx.AsyncClient:
+        """The pooled client, created per event loop (pooled connections belong to the loop that opened them)"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.secret_key}"},
+                timeout=self.timeout,
+                limits=self.limits,
+            )
+            self._loop = loop
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+    def retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given (1-based) attempt"""
+        return random.uniform(0, min(MAX_RETRY_DELAY_SECONDS, self.backoff_seconds * (2 ** (attempt - 1))))
+
+    async def request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Send a request, retrying 5xx responses and network errors. Only call
+        this for idempotent operations: Paystack dedupes initialisations on
+        the transaction reference, and reads are safe to repeat.
+        """
+        last_error: Optional[str] = None
+        for attempt in range(1, self.max_retries + 2):
+            if not self.breaker.allow():
+                raise PaystackUnavailableError(
+                    f"Paystack circuit open after {self.breaker.failures} consecutive failures"
+                    + (f"; last error: {last_error}" if last_error else "")
+                )
+            try:
+                response = await self._http().request(method, path, json=json)
+            except httpx.TransportError as e:
+                last_error = f"{type(e).__name__}: {e}"
+                self.breaker.record_failure()
+            else:
+                if response.status_code < 500:
+                    # Paystack answered: the service is healthy even if the request was bad
+                    self.breaker.record_success()
+                    body = _json_body(response)
+                    if response.is_error:
+                        raise PaystackError(
+                            body.get("message") or f"Paystack returned {response.status_code}",
+                            status_code=response.status_code, response=body,
+                        )
+                    return body
+                last_error = f"HTTP {response.status_code}"
+                self.breaker.record_failure()
+
+            if attempt <= self.max_retries:
+                delay = self.retry_delay(attempt)
+                logger.warning(f"Paystack {method} {path} failed ({last_error}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        raise PaystackUnavailableError(f"Paystack {method} {path} failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def initialize_transaction(self, email: str, amount: int, reference: str, callback_url: str,
+                                     metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.request("POST", "/transaction/initialize", json={
+            "email": email,
+            "amount": amount,
+            "reference": reference,
+            "callback_url": callback_url,
+            "metadata": metadata or {},
+        })
+
+    async def verify_transaction(self, reference: str) -> Dict[str, Any]:
+        return await self.request("GET", f"/transaction/verify/{reference}")
+
+
+def _json_body(response: httpx.Response) -> Dict[str, Any]:
+    try:
+        body = response.json()
+    except ValueError:
+        return {"message": response.text[:200]}
+    return body if isinstance(body, dict) else {"data": body}
+
+
+paystack_client = PaystackClient()
@@ -0,0 +1,261 @@
+"""
+Price Alert Service for evaluating price alert subscriptions in batch.
+
+Active subscriptions are held in an AlertBook: for every (crop, source,
+direction, region) their thresholds are kept sorted in a NumPy array. A
+price then selects the subscriptions it satisfies with one binary search
+(every ABOVE threshold at or below the price, every BELOW threshold at or
+above it), so evaluation cost grows with the number of alerts that fire,
+not with the number of subscriptions.
+
+Deal alerts ("transaction") are evaluated when the price index refreshes
+today's rows; listing alerts ("listing") when new listings are created.
+Each subscription fires at most once per `PRICE_ALERT_COOLDOWN_HOURS`: an
+alert is claimed by a conditional UPDATE on its last_triggered_at, so only
+one worker fires it, and fired alerts are enqueued as PENDING PRICE_ALERT
+notifications.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+import numpy as np
+from sqlalchemy import case, insert, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.market import ALL_REGIONS, LISTING_SOURCE, TRANSACTION_SOURCE, PriceAlert, PriceAlertDirection
+from app.models.notification import Notification, NotificationPriority, NotificationStatus, NotificationType
+
+logger = logging.getLogger(__name__)
+
+# Alert ids per IN (...) query
+CLAIM_CHUNK_SIZE = 5000
+
+BookKey = Tuple[str, str, PriceAlertDirection, str]
+
+
+@dataclass(frozen=True)
+class PriceObservation:
+    """A price to test the subscriptions against"""
+    source: str
+    crop_type: str
+    region: Optional[str]
+    price: float
+    listing_id: Optional[str] = None
+
+
+@dataclass
+class AlertBook:
+    # (crop, source, direction, region) -> thresholds (ascending), alert ids, last triggered (epoch seconds)
+    entries: Dict[BookKey, Tuple[np.ndarray, np.ndarray, np.ndarray]] = field(default_factory=dict)
+    built_at: float = field(default_factory=time.monotonic)
+
+    def __len__(self) -> int:
+        return sum(len(thresholds) for thresholds, _, _ in self.entries.values())
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> "AlertBook":
+        """Rows of (id, crop, source, direction, region, threshold, last_triggered_at)"""
+        grouped = defaultdict(lambda: ([], [], []))
+        for alert_id, crop, source, direction, region, threshold, last_triggered_at in rows:
+            ids, thresholds, last = grouped[(crop, source, direction, region or ALL_REGIONS)]
+            ids.append(alert_id)
+            thresholds.append(threshold)
+            last.append(last_triggered_at.timestamp() if last_triggered_at else -np.inf)
+
+        book = cls()
+        for key, (ids, thresholds, last) in grouped.items():
+            thresholds = np.asarray(thresholds, dtype=float)
+            order = np.argsort(thresholds, kind="stable")
+            book.entries[key] = (thresholds[order], np.asarray(ids, dtype=object)[order],
+                                 np.asarray(last, dtype=float)[order])
+        return book
+
+    @classmethod
+    def build(cls, db: Session) -> "AlertBook":
+        rows = db.query(
+            PriceAlert.id, PriceAlert.crop_type, PriceAlert.source, PriceAlert.direction,
+            PriceAlert.region, PriceAlert.threshold_price, PriceAlert.last_triggered_at
+        ).filter(PriceAlert.active.is_(True))
+        return cls.from_rows(rows.yield_per(10000))
+
+    def triggered(self, observation: PriceObservation, cutoff: float) -> List[Tuple[str, PriceAlertDirection, float, tuple]]:
+        """
+        (alert id, direction, threshold, position) of every alert the price
+        satisfies and that has not fired since `cutoff`
+        """
+        fired = []
+        if observation.source == LISTING_SOURCE:
+            # Any listing counts for alerts on its region and national alerts
+            regions = {observation.region, ALL_REGIONS} - {None}
+        else:
+            # Index prices are already per region, with their own national row
+            regions = {observation.region or ALL_REGIONS}
+        for region in regions:
+            for direction in PriceAlertDirection:
+                entry = self.entries.get((observation.crop_type, observation.source, direction, region))
+                if entry is None:
+                    continue
+                thresholds, ids, last = entry
+                if direction == PriceAlertDirection.ABOVE:
+                    hits = slice(0, np.searchsorted(thresholds, observation.price, side="right"))
+                else:
+                    hits = slice(np.searchsorted(thresholds, observation.price, side="left"), len(thresholds))
+                ready = np.flatnonzero(last[hits] < cutoff) + (hits.start or 0)
+                key = (observation.crop_type, observation.source, direction, region)
+                fired.extend(
+                    (alert_id, direction, threshold, (key, position))
+                    for alert_id, threshold, position in zip(ids[ready], thresholds[ready], ready)
+                )
+        return fired
+
+    def mark_triggered(self, positions: Iterable[tuple], at: float):
+        """Record fired alerts so the cached book honours the cooldown too"""
+        for key, position in positions:
+            self.entries[key][2][position] = at
+
+
+def alert_message(observation: PriceObservation, direction: PriceAlertDirection, threshold: float) -> Tuple[str, str]:
+    """Notification title and message for one fired alert"""
+    crop = observation.crop_type.title()
+    place = f" in {observation.region.title()}" if observation.region not in (None, ALL_REGIONS) else ""
+    condition = "at or above" if direction == PriceAlertDirection.ABOVE else "at or below"
+    if observation.source == LISTING_SOURCE:
+        title = f"{crop} listed at ₦{observation.price:,.0f}/kg"
+        message = f"A new {observation.crop_type} listing{place} is asking ₦{observation.price:,.0f}/kg"
+        if observation.listing_id:
+            message += f" (listing {observation.listing_id})"
+    else:
+        title = f"{crop} price alert"
+        message = f"{crop} deals{place} reached a median of ₦{observation.price:,.0f}/kg today"
+    return title, f"{message}. Your alert: {condition} ₦{threshold:,.0f}/kg."
+
+
+class PriceAlertService:
+    def __init__(self, cooldown_hours: int = None, book_ttl_seconds: int = None):
+        self.cooldown = timedelta(hours=settings.PRICE_ALERT_COOLDOWN_HOURS if cooldown_hours is None else cooldown_hours)
+        self.book_ttl_seconds = settings.PRICE_ALERT_BOOK_TTL_SECONDS if book_ttl_seconds is None else book_ttl_seconds
+        self._book: Optional[AlertBook] = None
+        self._lock = threading.Lock()
+
+    def book(self, db: Session) -> AlertBook:
+        """The cached alert book, rebuilt when older than the TTL or invalidated"""
+        with self._lock:
+            book = self._book
+            if book is None or time.monotonic() - book.built_at > self.book_ttl_seconds:
+                book = AlertBook.build(db)
+                self._book = book
+                logger.info(f"Built price alert book: {len(book)} alerts in {len(book.entries)} groups")
+            return book
+
+    def invalidate(self):
+        """Drop the cached book; call after subscriptions change"""
+        with self._lock:
+            self._book = None
+
+    def _claim(self, db: Session, prices: Dict[str, float], now: datetime, cutoff: datetime) -> Dict[str, str]:
+        """
+        Alert id -> user id for the candidates (alert id -> price) this call
+        fired. One conditional UPDATE ... RETURNING per chunk stamps only the
+        alerts still outside their cooldown, so when workers race on the
+        same observations each alert is claimed by exactly one of them.
+        """
+        alert_ids = list(prices)
+        claimed = {}
+        for start in range(0, len(alert_ids), CLAIM_CHUNK_SIZE):
+            chunk = alert_ids[start:start + CLAIM_CHUNK_SIZE]
+            claimed.update(db.execute(
+                update(PriceAlert)
+                .where(
+                    PriceAlert.id.in_(chunk),
+                    PriceAlert.active.is_(True),
+                    or_(PriceAlert.last_triggered_at.is_(None), PriceAlert.last_triggered_at < cutoff),
+                )
+                .values(
+                    last_triggered_at=now,
+                    last_triggered_price=case({alert_id: prices[alert_id] for alert_id in chunk}, value=PriceAlert.id),
+                )
+                .returning(PriceAlert.id, PriceAlert.user_id)
+                .execution_options(synchronize_session=False)
+            ).all())
+        return claimed
+
+    def evaluate(self, db: Session, observations: Sequence[PriceObservation], now: Optional[datetime] = None) -> int:
+        """Fire every subscription the observed prices satisfy; returns notifications enqueued"""
+        if not observations:
+            return 0
+        now = now or datetime.utcnow()
+        cutoff = now - self.cooldown
+        book = self.book(db)
+
+        # One notification per alert: the most extreme price in its direction wins
+        candidates: Dict[str, tuple] = {}
+        positions: Dict[str, tuple] = {}
+        for observation in observations:
+            for alert_id, direction, threshold, position in book.triggered(observation, cutoff.timestamp()):
+                best = candidates.get(alert_id)
+                better = best is None or (
+                    observation.price > best[0].price if direction == PriceAlertDirection.ABOVE
+                    else observation.price < best[0].price
+                )
+                if better:
+                    candidates[alert_id] = (observation, direction, threshold)
+                    positions[alert_id] = position
+        if not candidates:
+            return 0
+
+        fired = self._claim(db, {alert_id: candidate[0].price for alert_id, candidate in candidates.items()},
+                            now, cutoff)
+        if fired:
+            notifications = []
+            for alert_id in fired:
+                title, message = alert_message(*candidates[alert_id])
+                notifications.append({
+                    # Longer than the model default: a busy day enqueues many at once
+                    "id": f"notif_{uuid4().hex[:12]}",
+                    "user_id": fired[alert_id],
+                    "notification_type": NotificationType.PRICE_ALERT,
+                    "title": title,
+                    "message": message,
+                    "status": NotificationStatus.PENDING,
+                    "priority": NotificationPriority.MEDIUM,
+                    "delivery_attempts": 0,
+                })
+            db.execute(insert(Notification), notifications)
+        db.commit()
+        book.mark_triggered(positions.values(), now.timestamp())
+        logger.info(f"Price alerts: {len(candidates)} triggered, {len(fired)} notifications enqueued")
+        return len(fired)
+
+    def evaluate_index_rows(self, db: Session, rows: Iterable[Dict], today=None) -> int:
+        """Deal alerts for freshly computed price index rows (as dicts); only today's prices fire alerts"""
+        today = today or datetime.utcnow().date()
+        return self.evaluate(db, [
+            PriceObservation(TRANSACTION_SOURCE, row["crop_type"], row["region"], row["median_price"])
+            for row in rows if row["source"] == TRANSACTION_SOURCE and row["day"] == today
+        ])
+
+    def evaluate_listings(self, db: Session, listings: Iterable[Tuple[str, str, Optional[str], float]]) -> int:
+        """
+        Listing alerts for new listings given as (id, crop, region, asking
+        price per kg). Runs after the listings are committed, so failures are
+        logged, not raised.
+        """
+        try:
+            return self.evaluate(db, [
+                PriceObservation(LISTING_SOURCE, crop, region, price, listing_id)
+                for listing_id, crop, region, price in listings
+            ])
+        except Exception as e:
+            logger.error(f"Error evaluating listing price alerts: {e}", exc_info=True)
+            db.rollback()
+            return 0
+
+
+price_alert_service = PriceAlertService()
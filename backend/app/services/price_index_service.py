@@ -0,0 +1,216 @@
+"""
+Price Index Service for market prices by crop, region and day.
+
+Agreed deal prices (Transaction.agreed_price_per_kg) and asking prices
+(ProduceListing.expected_price_per_kg) are rolled up into PriceIndexDaily
+rows holding the median, quartiles, volume weighted average and traded
+volume of each crop, region and day, plus a national ("all") row. Deals
+count once payment is confirmed; cancelled or disputed deals drop out.
+
+Rows are maintained incrementally: when a transaction or listing is
+written, only the crop-days it touches are recomputed (quartiles cannot be
+merged, so a touched crop-day is re-aggregated from its samples). Reads
+only ever hit the precomputed table. `rebuild()` backfills a date range.
+Refreshed deal prices for today are passed on to the price alerts.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.market import ALL_REGIONS, LISTING_SOURCE, TRANSACTION_SOURCE, PriceIndexDaily
+from app.models.produce import ProduceListing
+from app.models.transaction import Transaction, TransactionStatus
+from app.services.price_alert_service import price_alert_service
+from app.services.search_service import normalize_crop_name
+
+logger = logging.getLogger(__name__)
+
+SOURCES = (TRANSACTION_SOURCE, LISTING_SOURCE)
+
+# Deals whose price stands: paid for, whatever happened after
+PRICED_STATUSES = (
+    TransactionStatus.PAYMENT_CONFIRMED,
+    TransactionStatus.IN_LOGISTICS,
+    TransactionStatus.DELIVERED,
+    TransactionStatus.COMPLETED,
+)
+
+CropDay = Tuple[str, date]
+
+
+def price_stats(prices: Sequence[float], volumes: Sequence[float]) -> Dict[str, float]:
+    """Quartiles, range and volume weighted average of one bucket's prices"""
+    prices = np.asarray(prices, dtype=float)
+    volumes = np.asarray(volumes, dtype=float)
+    p25, median, p75 = np.percentile(prices, [25, 50, 75])
+    volume = float(volumes.sum())
+    avg = float(np.average(prices, weights=volumes)) if volume > 0 else float(prices.mean())
+    return {
+        "median_price": round(float(median), 2),
+        "p25_price": round(float(p25), 2),
+        "p75_price": round(float(p75), 2),
+        "min_price": round(float(prices.min()), 2),
+        "max_price": round(float(prices.max()), 2),
+        "avg_price": round(avg, 2),
+        "sample_count": int(prices.size),
+        "volume_kg": round(volume, 2),
+    }
+
+
+def rollup(samples: Iterable[Tuple[str, Optional[str], datetime, float, float]]) -> Dict[Tuple[str, str, date], Dict]:
+    """
+    (crop, region, time, price, volume) samples -> stats per (crop, region, day),
+    with every sample also counted in its crop's national ("all") bucket.
+    """
+    buckets = defaultdict(lambda: ([], []))
+    for crop, region, at, price, volume in samples:
+        if price is None or price <= 0:
+            continue
+        day = at.date()
+        regions = (region, ALL_REGIONS) if region else (ALL_REGIONS,)
+        for bucket_region in regions:
+            prices, volumes = buckets[(crop, bucket_region, day)]
+            prices.append(price)
+            volumes.append(volume or 0.0)
+    return {key: price_stats(prices, volumes) for key, (prices, volumes) in buckets.items()}
+
+
+def transaction_crop_day(transaction: Transaction) -> Optional[CropDay]:
+    """The deal-price index bucket a transaction counts in"""
+    if transaction.produce_listing is None or transaction.matched_at is None:
+        return None
+    return transaction.produce_listing.crop_type, transaction.matched_at.date()
+
+
+def _day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day)
+
+
+class PriceIndexService:
+    def _samples(self, db: Session, source: str, start: datetime, end: datetime, crops: Optional[Set[str]] = None):
+        if source == TRANSACTION_SOURCE:
+            query = (
+                db.query(ProduceListing.crop_type, ProduceListing.region, Transaction.matched_at,
+                         Transaction.agreed_price_per_kg, Transaction.quantity_kg)
+                .join(Transaction.produce_listing)
+                .filter(Transaction.status.in_(PRICED_STATUSES))
+                .filter(Transaction.matched_at >= start, Transaction.matched_at < end)
+            )
+        elif source == LISTING_SOURCE:
+            query = (
+                db.query(ProduceListing.crop_type, ProduceListing.region, ProduceListing.created_at,
+                         ProduceListing.expected_price_per_kg, ProduceListing.quantity_kg)
+                .filter(ProduceListing.created_at >= start, ProduceListing.created_at < end)
+            )
+        else:
+            raise ValueError(f"Unknown price source '{source}'")
+        if crops is not None:
+            query = query.filter(ProduceListing.crop_type.in_(crops))
+        return query.all()
+
+    def _replace(self, db: Session, source: str, start: date, end: date,
+                 crops: Optional[Set[str]] = None) -> List[Dict]:
+        """Re-aggregate [start, end) for the crops (all crops if None) and return the rows; does not commit"""
+        samples = self._samples(db, source, _day_start(start), _day_start(end), crops)
+        stale = db.query(PriceIndexDaily).filter(
+            PriceIndexDaily.source == source, PriceIndexDaily.day >= start, PriceIndexDaily.day < end
+        )
+        if crops is not None:
+            stale = stale.filter(PriceIndexDaily.crop_type.in_(crops))
+        stale.delete(synchronize_session=False)
+
+        rows = [
+            {"crop_type": crop, "region": region, "source": source, "day": day, **stats}
+            for (crop, region, day), stats in rollup(samples).items()
+        ]
+        for row in rows:
+            db.add(PriceIndexDaily(**row))
+        return rows
+
+    def refresh(self, db: Session, source: str, crop_days: Iterable[CropDay]):
+        """
+        Recompute the touched crop-days and commit. Called after the write
+        that touched them has committed, so failures are logged, not raised.
+        """
+        by_day = defaultdict(set)
+        for crop, day in filter(None, crop_days):
+            by_day[day].add(crop)
+        if not by_day:
+            return
+        try:
+            rows = []
+            for day, crops in by_day.items():
+                rows.extend(self._replace(db, source, day, day + timedelta(days=1), crops))
+            db.commit()
+            if source == TRANSACTION_SOURCE:
+                price_alert_service.evaluate_index_rows(db, rows)
+        except Exception as e:
+            logger.error(f"Error refreshing {source} price index: {e}", exc_info=True)
+            db.rollback()
+
+    def refresh_transactions(self, db: Session, transactions: Sequence[Transaction]):
+        self.refresh(db, TRANSACTION_SOURCE, [transaction_crop_day(t) for t in transactions])
+
+    def refresh_listings(self, db: Session, crop_days: Iterable[CropDay]):
+        self.refresh(db, LISTING_SOURCE, crop_days)
+
+    def rebuild(self, db: Session, start: date, end: date) -> int:
+        """Recompute every bucket in [start, end) from scratch; returns rows written"""
+        count = sum(len(self._replace(db, source, start, end)) for source in SOURCES)
+        db.commit()
+        return count
+
+    def price_history(self, db: Session, crop: str, region: Optional[str] = None, days: int = 30,
+                      source: Optional[str] = None, today: Optional[date] = None) -> List[PriceIndexDaily]:
+        """Daily rows for a crop (local names accepted), latest first; region None is national"""
+        today = today or datetime.utcnow().date()
+        crop = normalize_crop_name(crop) or crop.strip().lower()
+        query = db.query(PriceIndexDaily).filter(
+            PriceIndexDaily.crop_type == crop,
+            PriceIndexDaily.region == (region.strip().lower() if region else ALL_REGIONS),
+            PriceIndexDaily.day > today - timedelta(days=days),
+            PriceIndexDaily.day <= today,
+        )
+        if source:
+            query = query.filter(PriceIndexDaily.source == source)
+        return query.order_by(PriceIndexDaily.day.desc(), PriceIndexDaily.source).all()
+
+    def summary(self, db: Session, crop: str, region: Optional[str] = None, days: int = 14,
+                today: Optional[date] = None) -> Dict:
+        """
+        Per source: window totals and volume weighted average, plus the
+        quartiles of the latest day with data.
+        """
+        rows = self.price_history(db, crop, region, days, today=today)
+        result = {
+            "crop_type": normalize_crop_name(crop) or crop.strip().lower(),
+            "region": region.strip().lower() if region else ALL_REGIONS,
+            "days": days,
+        }
+        for source in SOURCES:
+            source_rows = [row for row in rows if row.source == source]
+            if not source_rows:
+                result[source] = None
+                continue
+            latest = source_rows[0]
+            volume = sum(row.volume_kg for row in source_rows)
+            weights = [row.volume_kg if volume > 0 else row.sample_count for row in source_rows]
+            result[source] = {
+                "sample_count": sum(row.sample_count for row in source_rows),
+                "volume_kg": round(volume, 2),
+                "avg_price": round(float(np.average([row.avg_price for row in source_rows], weights=weights)), 2),
+                "min_price": min(row.min_price for row in source_rows),
+                "max_price": max(row.max_price for row in source_rows),
+                "latest_day": latest.day,
+                "median_price": latest.median_price,
+                "p25_price": latest.p25_price,
+                "p75_price": latest.p75_price,
+            }
+        return result
+
+
+price_index_service = PriceIndexService()
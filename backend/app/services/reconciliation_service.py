@@ -0,0 +1,181 @@
+"""
+Reconciliation Service for payments whose Paystack webhook never arrived.
+
+PaymentRecords still PENDING after `RECONCILE_STALE_AFTER_MINUTES` are
+fetched in keyset batches and verified against Paystack concurrently, at
+most `RECONCILE_CONCURRENCY` calls in flight. Drift is corrected:
+
+- success: replayed through the webhook inbox as a charge.success event
+  (same dedup key as the lost webhook), so the payment, transaction,
+  notifications and logistics are updated exactly as a webhook would;
+- failed: FAILED; reversed: REFUNDED (one UPDATE per outcome per batch);
+- abandoned, or unknown to Paystack, for over `RECONCILE_ABANDON_AFTER_HOURS`:
+  FAILED. Anything else stays PENDING for the next run.
+
+A dry run verifies and reports the drift without writing anything.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_transaction import invalidate_payment_summaries_for_references
+from app.models.payment_event import PaymentEventStatus
+from app.models.transaction import PaymentMethod, PaymentRecord, PaymentStatus
+from app.services.payment_service import PaymentService
+from app.services.paystack_client import PaystackError, PaystackUnavailableError
+from app.workers.payment_events import apply_payment_event, payment_event_id, store_payment_event
+
+logger = logging.getLogger(__name__)
+
+# Paystack verify statuses that settle a payment, and the local status they map to
+SETTLED_STATUSES = {
+    "failed": PaymentStatus.FAILED,
+    "reversed": PaymentStatus.REFUNDED,
+}
+# Never completed by the customer; final once old enough
+ABANDONED = "abandoned"
+# Paystack has no such reference
+MISSING = "missing"
+
+
+@dataclass
+class ReconciliationReport:
+    dry_run: bool
+    checked: int = 0
+    confirmed: int = 0
+    failed: int = 0
+    refunded: int = 0
+    unchanged: int = 0
+    ignored: int = 0  # Paid at Paystack but rejected on replay (e.g. amount mismatch)
+    errors: int = 0  # Could not verify this run
+    drift: Dict[str, str] = field(default_factory=dict)  # reference -> Paystack status, for every correction
+
+    @property
+    def drift_found(self) -> int:
+        return len(self.drift)
+
+    def as_dict(self) -> Dict:
+        return {**asdict(self), "drift_found": self.drift_found}
+
+
+class ReconciliationService:
+    def __init__(self, payment_service: Optional[PaymentService] = None, concurrency: Optional[int] = None,
+                 batch_size: Optional[int] = None):
+        self.payment_service = payment_service or PaymentService()
+        self.concurrency = concurrency or settings.RECONCILE_CONCURRENCY
+        self.batch_size = batch_size or settings.RECONCILE_BATCH_SIZE
+        self.stale_after = timedelta(minutes=settings.RECONCILE_STALE_AFTER_MINUTES)
+        self.abandon_after = timedelta(hours=settings.RECONCILE_ABANDON_AFTER_HOURS)
+
+    def stale_batch(self, db: Session, cutoff: datetime, after: Optional[Tuple[datetime, str]] = None) -> List[Tuple[str, str, datetime]]:
+        """(id, reference, created_at) of the next batch of stale pending Paystack payments, oldest first"""
+        query = db.query(PaymentRecord.id, PaymentRecord.reference, PaymentRecord.created_at).filter(
+            PaymentRecord.status == PaymentStatus.PENDING,
+            PaymentRecord.payment_method == PaymentMethod.PAYSTACK,
+            PaymentRecord.created_at < cutoff,
+        )
+        if after is not None:
+            query = query.filter(tuple_(PaymentRecord.created_at, PaymentRecord.id) > tuple_(*after))
+        return query.order_by(PaymentRecord.created_at, PaymentRecord.id).limit(self.batch_size).all()
+
+    async def verify_many(self, references: List[str]) -> Dict[str, Tuple[Optional[str], Optional[Dict]]]:
+        """reference -> (Paystack status, verify data); status None if verification failed"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def verify(reference: str):
+            async with semaphore:
+                try:
+                    response = await self.payment_service.verify_transaction(reference)
+                except Exception as e:
+                    cause = e.__cause__
+                    if isinstance(cause, PaystackError) and not isinstance(cause, PaystackUnavailableError) \
+                            and cause.status_code in (400, 404):
+                        return reference, (MISSING, None)
+                    logger.warning(f"Could not verify payment {reference}: {e}")
+                    return reference, (None, None)
+                data = response.get("data") or {}
+                return reference, (data.get("status"), data)
+
+        return dict(await asyncio.gather(*(verify(reference) for reference in references)))
+
+    async def reconcile(self, db: Session, dry_run: bool = False, now: Optional[datetime] = None,
+                        max_records: Optional[int] = None) -> ReconciliationReport:
+        """Verify every stale pending payment and correct the drift; returns what was found"""
+        now = now or datetime.utcnow()
+        report = ReconciliationReport(dry_run=dry_run)
+        if not self.payment_service.paystack.configured:
+            # The development fallback answers "success" for everything
+            logger.warning("PAYSTACK_SECRET_KEY not set; skipping payment reconciliation")
+            return report
+
+        after = None
+        while max_records is None or report.checked < max_records:
+            batch = self.stale_batch(db, now - self.stale_after, after)
+            if max_records is not None:
+                batch = batch[:max_records - report.checked]
+            if not batch:
+                break
+            after = (batch[-1].created_at, batch[-1].id)
+            results = await self.verify_many([row.reference for row in batch])
+            self._apply_batch(db, batch, results, now, report)
+            report.checked += len(batch)
+
+        logger.info(f"Payment reconciliation{' (dry run)' if dry_run else ''}: {report.as_dict()}")
+        return report
+
+    def _apply_batch(self, db: Session, batch, results, now: datetime, report: ReconciliationReport):
+        settled: Dict[PaymentStatus, List[str]] = {PaymentStatus.FAILED: [], PaymentStatus.REFUNDED: []}
+        paid: List[Tuple[str, Dict]] = []
+        for row in batch:
+            status, data = results[row.reference]
+            if status is None:
+                report.errors += 1
+            elif status == "success":
+                paid.append((row.reference, data))
+            elif status in SETTLED_STATUSES:
+                settled[SETTLED_STATUSES[status]].append(row.reference)
+            elif status in (ABANDONED, MISSING) and now - row.created_at > self.abandon_after:
+                settled[PaymentStatus.FAILED].append(row.reference)
+            else:
+                # Still in progress at Paystack, or abandoned too recently to call
+                report.unchanged += 1
+                continue
+            if status is not None:
+                report.drift[row.reference] = status
+
+        report.failed += len(settled[PaymentStatus.FAILED])
+        report.refunded += len(settled[PaymentStatus.REFUNDED])
+        if report.dry_run:
+            report.confirmed += len(paid)
+            return
+
+        for new_status, references in settled.items():
+            if references:
+                # Guarded on PENDING: a webhook may have landed since the batch was read
+                db.query(PaymentRecord).filter(
+                    PaymentRecord.reference.in_(references), PaymentRecord.status == PaymentStatus.PENDING
+                ).update({PaymentRecord.status: new_status}, synchronize_session=False)
+        db.commit()
+        invalidate_payment_summaries_for_references(
+            db, [reference for references in settled.values() for reference in references]
+        )
+
+        for reference, data in paid:
+            payload = {"event": "charge.success", "data": data, "source": "reconciliation"}
+            event_id = payment_event_id(payload, json.dumps(payload, sort_keys=True).encode())
+            store_payment_event(db, event_id, payload)
+            status, _ = apply_payment_event(db, event_id, now)
+            if status == PaymentEventStatus.PROCESSED:
+                report.confirmed += 1
+            else:
+                report.ignored += 1
+
+
+reconciliation_service = ReconciliationService()
@@ -0,0 +1,88 @@
+"""
+Revenue Service for the admin revenue report.
+
+Every figure is a SUM/COUNT over the integer kobo columns computed by the
+database, grouped in SQL, so a report is a handful of aggregate queries
+whatever the number of payments, and totals are exact. Amounts are
+returned in kobo with the naira value alongside for display.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.money import from_kobo
+from app.models.produce import ProduceListing
+from app.models.transaction import PaymentRecord, PaymentStatus, Transaction
+from app.services.price_index_service import PRICED_STATUSES
+
+
+def _amount(kobo) -> Dict:
+    kobo = int(kobo or 0)
+    return {"kobo": kobo, "naira": float(from_kobo(kobo))}
+
+
+class RevenueService:
+    def report(self, db: Session, start: datetime, end: Optional[datetime] = None) -> Dict:
+        """Payments and deal value between start and end (default: now)"""
+        end = end or datetime.utcnow()
+        return {
+            "start": start,
+            "end": end,
+            "payments": self.payments_by_status(db, start, end),
+            "collected_by_day": self.collected_by_day(db, start, end),
+            "deal_value_by_crop": self.deal_value_by_crop(db, start, end),
+        }
+
+    def payments_by_status(self, db: Session, start: datetime, end: datetime) -> Dict[str, Dict]:
+        """Count and amount of payments started in the period, per status"""
+        rows = (
+            db.query(PaymentRecord.status, func.count(PaymentRecord.id), func.sum(PaymentRecord.amount_kobo))
+            .filter(PaymentRecord.created_at >= start, PaymentRecord.created_at < end)
+            .group_by(PaymentRecord.status)
+            .all()
+        )
+        by_status = {status.value: {"count": 0, **_amount(0)} for status in PaymentStatus}
+        for status, count, kobo in rows:
+            by_status[status.value] = {"count": count, **_amount(kobo)}
+        return by_status
+
+    def collected_by_day(self, db: Session, start: datetime, end: datetime) -> List[Dict]:
+        """Successful payments per day they were confirmed"""
+        day = func.date(PaymentRecord.confirmed_at)
+        rows = (
+            db.query(day, func.count(PaymentRecord.id), func.sum(PaymentRecord.amount_kobo))
+            .filter(
+                PaymentRecord.status == PaymentStatus.SUCCESS,
+                PaymentRecord.confirmed_at >= start,
+                PaymentRecord.confirmed_at < end,
+            )
+            .group_by(day)
+            .order_by(day)
+            .all()
+        )
+        return [{"day": str(row_day), "count": count, **_amount(kobo)} for row_day, count, kobo in rows]
+
+    def deal_value_by_crop(self, db: Session, start: datetime, end: datetime) -> List[Dict]:
+        """Paid deal value and volume per crop, largest first"""
+        value = func.sum(Transaction.total_amount_kobo)
+        rows = (
+            db.query(ProduceListing.crop_type, func.count(Transaction.id), value, func.sum(Transaction.quantity_kg))
+            .join(ProduceListing, ProduceListing.id == Transaction.produce_listing_id)
+            .filter(
+                Transaction.status.in_(PRICED_STATUSES),
+                Transaction.matched_at >= start,
+                Transaction.matched_at < end,
+            )
+            .group_by(ProduceListing.crop_type)
+            .order_by(value.desc())
+            .all()
+        )
+        return [
+            {"crop_type": crop, "deals": count, "volume_kg": float(volume or 0), **_amount(kobo)}
+            for crop, count, kobo, volume in rows
+        ]
+
+
+revenue_service = RevenueService()
@@ -0,0 +1,86 @@
+"""
+Local road network for route distances.
+
+A graph of towns and junctions (nodes with coordinates) joined by roads
+with their length in km, loaded from a JSON file:
+
+    {"nodes": {"kano": [12.0022, 8.5920], "zaria": [11.0855, 7.7199], ...},
+     "roads": [["kano", "zaria", 146.0], ["zaria", "kaduna"], ...]}
+
+A road without a length counts as the straight line times the detour
+factor. Points are snapped to their nearest node (one haversine matrix for
+the whole batch), shortest paths run once per distinct origin node and are
+cached, and the legs to and from the network count as straight lines times
+the detour factor. Pairs snapped to the same node, or that the network
+cannot connect, are straight lines times the detour factor.
+"""
+import heapq
+import json
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.geo_service import haversine_km, haversine_km_matrix, haversine_km_pairs
+
+
+class RoadNetwork:
+    def __init__(self, nodes: Dict[str, Sequence[float]], roads: Iterable[Sequence], detour_factor: float):
+        self.names = list(nodes)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.latitudes = np.array([nodes[name][0] for name in self.names], dtype=float)
+        self.longitudes = np.array([nodes[name][1] for name in self.names], dtype=float)
+        self.detour_factor = detour_factor
+        self.adjacency: List[List[Tuple[int, float]]] = [[] for _ in self.names]
+        for road in roads:
+            a, b = self.index[road[0]], self.index[road[1]]
+            km = road[2] if len(road) > 2 and road[2] is not None else detour_factor * haversine_km(
+                self.latitudes[a], self.longitudes[a], self.latitudes[b], self.longitudes[b]
+            )
+            self.adjacency[a].append((b, float(km)))
+            self.adjacency[b].append((a, float(km)))
+        self._shortest: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def from_file(cls, path: str, detour_factor: float) -> "RoadNetwork":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["nodes"], data.get("roads", []), detour_factor)
+
+    def shortest_from(self, source: int) -> np.ndarray:
+        """Road km from a node to every node (inf where unreachable)"""
+        distances = self._shortest.get(source)
+        if distances is not None:
+            return distances
+        distances = np.full(len(self.names), np.inf)
+        distances[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            km, node = heapq.heappop(heap)
+            if km > distances[node]:
+                continue
+            for neighbour, length in self.adjacency[node]:
+                if km + length < distances[neighbour]:
+                    distances[neighbour] = km + length
+                    heapq.heappush(heap, (km + length, neighbour))
+        self._shortest[source] = distances
+        return distances
+
+    def snap(self, latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest node of each point and the straight-line km to it"""
+        to_nodes = haversine_km_matrix(latitudes, longitudes, self.latitudes, self.longitudes)
+        nearest = np.argmin(to_nodes, axis=1)
+        return nearest, to_nodes[np.arange(len(nearest)), nearest]
+
+    def distances_km(self, lat1, lon1, lat2, lon2) -> np.ndarray:
+        """Road km between the i-th origin and the i-th destination"""
+        origins, origin_km = self.snap(lat1, lon1)
+        destinations, destination_km = self.snap(lat2, lon2)
+        network_km = np.empty(len(origins))
+        for source in np.unique(origins):
+            pairs = origins == source
+            network_km[pairs] = self.shortest_from(int(source))[destinations[pairs]]
+
+        direct = haversine_km_pairs(lat1, lon1, lat2, lon2) * self.detour_factor
+        routed = (origin_km + destination_km) * self.detour_factor + network_km
+        use_direct = (origins == destinations) | ~np.isfinite(routed)
+        return np.where(use_direct, direct, routed)
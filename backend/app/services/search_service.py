@@ -0,0 +1,214 @@
+"""
+Search Service for free-text produce search.
+
+Query text is normalised first: local crop names and synonyms ("masara",
+"tumatir") map to the canonical crop, and misspelt crop names ("tomatos")
+snap to the closest known name by trigram similarity. Each recognised crop
+expands to all of its names so Hausa transcriptions match English queries
+and vice versa.
+
+On PostgreSQL, listings carry a generated `search_vector` tsvector over the
+crop and voice transcription (GIN indexed) plus pg_trgm GIN indexes on both
+columns, so matching and typo tolerance run in the database and results are
+ranked with ts_rank_cd and word_similarity.
+
+Other databases (SQLite in tests and local development) use an in-process
+inverted index of words and trigrams, rebuilt whenever produce listings
+change.
+"""
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import case, func, literal, literal_column, or_
+from sqlalchemy.orm import Session
+
+from app.models.produce import ProduceListing
+from app.services.cache_service import PRODUCE_CACHE_NAMESPACE, response_cache
+from app.services.entity_extraction import CROP_SYNONYMS
+
+# pg_trgm's default similarity threshold
+SIMILARITY_THRESHOLD = 0.3
+# Stricter bar for snapping a query word onto a crop name
+CROP_NAME_THRESHOLD = 0.45
+MAX_QUERY_TERMS = 8
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"a", "an", "and", "the", "of", "for", "in", "to", "with", "i", "have", "sell", "selling", "da", "na", "ina"}
+
+_CROP_NAMES = {synonym: crop for crop, synonyms in CROP_SYNONYMS.items() for synonym in synonyms}
+
+
+def words(text: Optional[str]) -> List[str]:
+    return _WORD_PATTERN.findall((text or "").lower())
+
+
+def trigrams(word: str) -> Set[str]:
+    """Trigrams of one word, padded the way pg_trgm pads them"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: str, b: str) -> float:
+    """pg_trgm-style similarity of two words: shared trigrams over all trigrams"""
+    ta, tb = trigrams(a), trigrams(b)
+    return len(ta & tb) / len(ta | tb) if ta and tb else 0.0
+
+
+def normalize_crop_name(name: Optional[str]) -> Optional[str]:
+    """Canonical crop for a name, local synonym or near-miss spelling; None if unknown"""
+    name = " ".join(words(name))
+    if not name:
+        return None
+    if name in _CROP_NAMES:
+        return _CROP_NAMES[name]
+    best, score = None, CROP_NAME_THRESHOLD
+    for synonym, crop in _CROP_NAMES.items():
+        candidate = similarity(name, synonym)
+        if candidate >= score:
+            best, score = crop, candidate
+    return best
+
+
+@dataclass
+class SearchQuery:
+    """A normalised query: each group holds alternative spellings of one term"""
+    text: str
+    crops: List[str] = field(default_factory=list)
+    terms: List[str] = field(default_factory=list)
+
+    @property
+    def groups(self) -> List[List[str]]:
+        crop_groups = [sorted({crop, *(w for s in CROP_SYNONYMS.get(crop, []) for w in words(s))}) for crop in self.crops]
+        return crop_groups + [[term] for term in self.terms]
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.crops and not self.terms
+
+
+def parse_query(text: str) -> SearchQuery:
+    """Split a query into recognised crops and remaining free-text terms"""
+    query = SearchQuery(text=text)
+    tokens = [token for token in words(text) if token not in _STOPWORDS]
+    i = 0
+    while i < len(tokens):
+        # Two-word names first ("guinea corn", "soya beans")
+        pair = " ".join(tokens[i:i + 2])
+        if i + 1 < len(tokens) and pair in _CROP_NAMES:
+            crop, i = _CROP_NAMES[pair], i + 2
+        else:
+            crop = normalize_crop_name(tokens[i]) if len(tokens[i]) > 2 else None
+            if crop is None and tokens[i] not in query.terms:
+                query.terms.append(tokens[i])
+            i += 1
+        if crop and crop not in query.crops:
+            query.crops.append(crop)
+    query.terms = query.terms[:MAX_QUERY_TERMS]
+    return query
+
+
+class InMemorySearchIndex:
+    """
+    Inverted index from words to listing ids, with a trigram index over the
+    vocabulary so misspelt words find their neighbours without a full scan.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        self.word_trigrams: Dict[str, Set[str]] = {}
+
+    def add(self, listing_id: str, *texts: Optional[str]):
+        for text in texts:
+            for word in words(text):
+                if word not in self.postings:
+                    self.postings[word] = set()
+                    for trigram in trigrams(word):
+                        self.word_trigrams.setdefault(trigram, set()).add(word)
+                self.postings[word].add(listing_id)
+
+    def similar_words(self, term: str) -> Dict[str, float]:
+        """Indexed words at or above the similarity threshold, with their similarity"""
+        candidates = set()
+        for trigram in trigrams(term):
+            candidates |= self.word_trigrams.get(trigram, set())
+        matches = {}
+        for word in candidates:
+            score = 1.0 if word == term else similarity(term, word)
+            if score >= SIMILARITY_THRESHOLD:
+                matches[word] = score
+        return matches
+
+    def search(self, query: SearchQuery) -> Dict[str, float]:
+        """Listing id -> rank (0-1): the mean over term groups of the best word match"""
+        groups = query.groups
+        if not groups:
+            return {}
+        totals: Dict[str, float] = {}
+        for group in groups:
+            best: Dict[str, float] = {}
+            for alternative in group:
+                for word, score in self.similar_words(alternative).items():
+                    for listing_id in self.postings[word]:
+                        if score > best.get(listing_id, 0.0):
+                            best[listing_id] = score
+            for listing_id, score in best.items():
+                totals[listing_id] = totals.get(listing_id, 0.0) + score
+        return {listing_id: round(total / len(groups), 4) for listing_id, total in totals.items()}
+
+
+class SearchService:
+    def __init__(self):
+        self._index: Optional[InMemorySearchIndex] = None
+        self._index_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def fallback_index(self, db: Session) -> InMemorySearchIndex:
+        """The in-process index, rebuilt when the produce cache namespace has moved on"""
+        version = response_cache.version(PRODUCE_CACHE_NAMESPACE)
+        with self._lock:
+            if self._index is None or self._index_version != version:
+                index = InMemorySearchIndex()
+                rows = db.query(ProduceListing.id, ProduceListing.crop_type, ProduceListing.transcription)
+                for listing_id, crop_type, transcription in rows:
+                    index.add(listing_id, crop_type, transcription)
+                self._index, self._index_version = index, version
+            return self._index
+
+    def apply(self, db: Session, query, text: str):
+        """
+        Restrict a listing query to matches of `text`. Returns the filtered
+        query and either a SQL rank expression (PostgreSQL) or a dict of
+        listing id -> rank computed in process.
+        """
+        search = parse_query(text)
+        if search.is_empty:
+            return query.filter(literal(False)), {}
+        if db.get_bind().dialect.name == "postgresql":
+            condition, rank = self._postgres_match(search)
+            return query.filter(condition), rank
+        ranks = self.fallback_index(db).search(search)
+        return query.filter(ProduceListing.id.in_(list(ranks))), ranks
+
+    def _postgres_match(self, search: SearchQuery) -> Tuple:
+        search_vector = literal_column("produce_listings.search_vector")
+        # Any spelling of any group; free terms also match as prefixes
+        alternatives = [word for group in search.groups for word in group]
+        ts_terms = [f"{word}:*" if word in search.terms else word for word in alternatives]
+        ts_query = func.to_tsquery("simple", " | ".join(ts_terms))
+
+        conditions = [search_vector.op("@@")(ts_query)]
+        rank = func.ts_rank_cd(search_vector, ts_query)
+        if search.crops:
+            conditions.append(ProduceListing.crop_type.in_(search.crops))
+            rank = rank + case((ProduceListing.crop_type.in_(search.crops), 1.0), else_=0.0)
+        for term in search.terms:
+            # Trigram operators are served by the gin_trgm_ops indexes
+            conditions.append(ProduceListing.crop_type.op("%")(term))
+            conditions.append(literal(term).op("<%")(ProduceListing.transcription))
+            rank = rank + func.coalesce(func.word_similarity(term, ProduceListing.transcription), 0.0)
+        return or_(*conditions), rank
+
+
+search_service = SearchService()
@@ -0,0 +1,292 @@
+"""
+Settlement Service that pays farmers for delivered deals.
+
+Each run:
+
+1. Checks transfers still processing at the gateway from earlier runs.
+2. Collects DELIVERED deals that are not yet settled (at most
+   `PAYOUT_MAX_TRANSACTIONS`), groups them per farmer and writes one
+   Payout per farmer: the deals' total less the payment gateway fee
+   (`PaymentService.payment_gateways[PAYOUT_FEE_GATEWAY]`), with one
+   settlement_ledger row per deal. Payouts are packed into batches of up to
+   `PAYOUT_BATCH_SIZE` transfers.
+3. Submits every pending batch to the payout gateway in one bulk call.
+
+A deal has a single open ledger row, so a deal is never in two payouts; a
+batch that fails to submit keeps its references and is resent next run.
+After `PAYOUT_MAX_ATTEMPTS` the batch is FAILED, but its transfers are
+first looked up at the gateway: only confirmed failures release their
+deals, and transfers it cannot confirm stay PROCESSING.
+Paid payouts move their deals to COMPLETED, and a listing whose last open
+deal completes to SOLD; failed ones release their ledger rows so the deals
+are settled again once the farmer's retry window
+(`PAYOUT_RETRY_FAILED_AFTER_HOURS`) has passed. Farmers without a Paystack
+recipient code are skipped until they have one. Settlements, payouts and
+reversals are posted to the double-entry ledger in the same commit.
+"""
+import logging
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import groupby
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.money import percent_kobo
+from app.crud.crud_produce import settle_produce_listing
+from app.crud.crud_transaction import invalidate_payment_summaries
+from app.models.payout import Payout, PayoutBatch, PayoutBatchStatus, PayoutStatus, SettlementEntry
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.user import FarmerProfile
+from app.services.cache_service import PRODUCE_CACHE_NAMESPACE, response_cache
+from app.services.ledger_service import ledger_service
+from app.services.payment_service import PaymentService
+from app.services.payout_gateway import FAILED, SUCCESS, TransferResult, create_payout_gateway
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SettlementReport:
+    transactions: int = 0  # Deals put into new payouts
+    batches: int = 0  # Batches built
+    submitted: int = 0  # Batches accepted by the gateway
+    paid: int = 0  # Payouts paid
+    failed: int = 0  # Payouts whose transfer failed
+    processing: int = 0  # Payouts still processing at the gateway
+    errors: int = 0  # Batch submissions that failed this run
+    paid_kobo: int = 0
+    fee_kobo: int = 0  # Fees on the payouts paid
+    farmers_without_account: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+class SettlementService:
+    def __init__(self, gateway=None, payment_service: Optional[PaymentService] = None,
+                 batch_size: Optional[int] = None, max_transactions: Optional[int] = None):
+        self.gateway = gateway or create_payout_gateway(settings.PAYOUT_GATEWAY)
+        payment_service = payment_service or PaymentService()
+        self.fee_percent = Decimal(str(payment_service.payment_gateways[settings.PAYOUT_FEE_GATEWAY]['fees']))
+        self.batch_size = batch_size or settings.PAYOUT_BATCH_SIZE
+        self.max_transactions = max_transactions or settings.PAYOUT_MAX_TRANSACTIONS
+        self.max_attempts = settings.PAYOUT_MAX_ATTEMPTS
+        self.retry_failed_after = timedelta(hours=settings.PAYOUT_RETRY_FAILED_AFTER_HOURS)
+
+    def fee_kobo(self, gross_kobo: int) -> int:
+        """Fee taken from one deal's total"""
+        return percent_kobo(gross_kobo, self.fee_percent)
+
+    def unsettled_deals(self, db: Session, now: datetime):
+        """(id, seller_id, total_amount_kobo, recipient_code) of delivered deals to settle, by farmer"""
+        open_entry = exists().where(
+            SettlementEntry.transaction_id == Transaction.id, SettlementEntry.released_at.is_(None)
+        )
+        recent_failure = exists().where(
+            Payout.farmer_id == Transaction.seller_id,
+            Payout.status == PayoutStatus.FAILED,
+            Payout.created_at > now - self.retry_failed_after,
+        )
+        return (
+            db.query(Transaction.id, Transaction.seller_id, Transaction.total_amount_kobo,
+                     FarmerProfile.paystack_recipient_code)
+            .outerjoin(FarmerProfile, FarmerProfile.user_id == Transaction.seller_id)
+            .filter(Transaction.status == TransactionStatus.DELIVERED, ~open_entry, ~recent_failure)
+            .order_by(Transaction.seller_id, Transaction.id)
+            .limit(self.max_transactions)
+            .all()
+        )
+
+    def build_batches(self, db: Session, now: datetime, report: SettlementReport) -> int:
+        """Write payouts and ledger rows for unsettled deals; returns the number of batches built"""
+        payouts = []
+        for farmer_id, deals in groupby(self.unsettled_deals(db, now), key=lambda row: row.seller_id):
+            deals = list(deals)
+            if not deals[0].paystack_recipient_code:
+                report.farmers_without_account.append(farmer_id)
+                continue
+            entries = [
+                SettlementEntry(transaction_id=deal.id, farmer_id=farmer_id, gross_kobo=deal.total_amount_kobo,
+                                fee_kobo=self.fee_kobo(deal.total_amount_kobo), created_at=now)
+                for deal in deals
+            ]
+            for entry in entries:
+                entry.net_kobo = entry.gross_kobo - entry.fee_kobo
+            payout_id = f"po_{uuid4().hex[:12]}"
+            payouts.append(Payout(
+                id=payout_id, reference=payout_id, farmer_id=farmer_id, recipient_code=deals[0].paystack_recipient_code,
+                gross_kobo=sum(entry.gross_kobo for entry in entries),
+                fee_kobo=sum(entry.fee_kobo for entry in entries),
+                net_kobo=sum(entry.net_kobo for entry in entries),
+                status=PayoutStatus.PENDING, created_at=now, entries=entries,
+            ))
+
+        built = 0
+        for start in range(0, len(payouts), self.batch_size):
+            chunk = payouts[start:start + self.batch_size]
+            batch = PayoutBatch(
+                reference=f"pob_{uuid4().hex}", gateway=self.gateway.name, status=PayoutBatchStatus.PENDING,
+                transfer_count=len(chunk), created_at=now,
+                gross_kobo=sum(payout.gross_kobo for payout in chunk),
+                fee_kobo=sum(payout.fee_kobo for payout in chunk),
+                net_kobo=sum(payout.net_kobo for payout in chunk),
+            )
+            for payout in chunk:
+                payout.batch = batch
+            deal_count = sum(len(payout.entries) for payout in chunk)
+            db.add(batch)
+            try:
+                for payout in chunk:
+                    ledger_service.payout_settled(db, payout, now)
+                db.commit()
+            except IntegrityError:
+                # Another run settled some of these deals first; they are picked up correctly next run
+                db.rollback()
+                logger.warning("Deals were settled concurrently; skipping a payout batch")
+                continue
+            built += 1
+            report.transactions += deal_count
+        report.batches += built
+        return built
+
+    async def submit_batch(self, db: Session, batch: PayoutBatch, now: datetime, report: SettlementReport):
+        """Send a pending batch in one bulk call and record the outcome"""
+        payouts = [payout for payout in batch.payouts if payout.status == PayoutStatus.PENDING]
+        transfers = [
+            {"reference": payout.reference, "recipient": payout.recipient_code, "amount": payout.net_kobo,
+             "reason": f"AgriLink payout {payout.reference}"}
+            for payout in payouts
+        ]
+        batch.attempts += 1
+        try:
+            results = await self.gateway.bulk_transfer(batch.reference, transfers)
+        except Exception as e:
+            report.errors += 1
+            batch.last_error = str(e)
+            if batch.attempts >= self.max_attempts:
+                logger.error(f"Giving up on payout batch {batch.reference} after {batch.attempts} attempts: {e}")
+                batch.status = PayoutBatchStatus.FAILED
+                # A lost response may hide transfers that went through: only
+                # outcomes the gateway confirms are applied, the rest stay
+                # PROCESSING and are checked again next run
+                self._apply_results(db, payouts, await self._confirmed_results(payouts), now, report)
+            else:
+                logger.warning(f"Payout batch {batch.reference} not submitted (attempt {batch.attempts}): {e}")
+                db.commit()
+            return
+
+        batch.submitted_at = batch.submitted_at or now
+        batch.last_error = None
+        report.submitted += 1
+        self._apply_results(db, payouts, results, now, report)
+
+    async def _confirmed_results(self, payouts: List[Payout]) -> Dict[str, TransferResult]:
+        """Final outcomes the gateway reports for these payouts; empty if it cannot be asked"""
+        try:
+            results = await self.gateway.transfer_statuses([payout.reference for payout in payouts])
+        except Exception as e:
+            logger.warning(f"Could not check transfers of a failed payout batch: {e}")
+            return {}
+        return {reference: result for reference, result in results.items() if result.status in (SUCCESS, FAILED)}
+
+    async def refresh_processing(self, db: Session, now: datetime, report: SettlementReport):
+        """Record the outcome of transfers the gateway was still processing"""
+        payouts = db.query(Payout).filter(Payout.status == PayoutStatus.PROCESSING).all()
+        if payouts:
+            results = await self.gateway.transfer_statuses([payout.reference for payout in payouts])
+            self._apply_results(db, payouts, results, now, report)
+
+    async def settle(self, db: Session, now: Optional[datetime] = None) -> SettlementReport:
+        """Pay farmers for their delivered deals; returns what was done"""
+        now = now or datetime.utcnow()
+        report = SettlementReport()
+        if not self.gateway.configured:
+            logger.warning(f"Payout gateway {self.gateway.name} is not configured; skipping settlement")
+            return report
+
+        await self.refresh_processing(db, now, report)
+        self.build_batches(db, now, report)
+        pending = (
+            db.query(PayoutBatch)
+            .filter(PayoutBatch.status == PayoutBatchStatus.PENDING)
+            .order_by(PayoutBatch.created_at, PayoutBatch.id)
+            .all()
+        )
+        for batch in pending:
+            await self.submit_batch(db, batch, now, report)
+        report.processing = db.query(Payout).filter(Payout.status == PayoutStatus.PROCESSING).count()
+
+        logger.info(f"Farmer settlement: {report.as_dict()}")
+        return report
+
+    def _apply_results(self, db: Session, payouts: List[Payout], results: Dict[str, TransferResult],
+                       now: datetime, report: SettlementReport):
+        paid, failed = [], []
+        for payout in payouts:
+            result = results.get(payout.reference)
+            if result is None:
+                # Not in the gateway's answer; checked again next run
+                payout.status = PayoutStatus.PROCESSING
+                continue
+            payout.transfer_code = result.transfer_code or payout.transfer_code
+            if result.status == SUCCESS:
+                payout.status, payout.paid_at = PayoutStatus.PAID, now
+                paid.append(payout.id)
+                ledger_service.payout_paid(db, payout, now)
+                report.paid += 1
+                report.paid_kobo += payout.net_kobo
+                report.fee_kobo += payout.fee_kobo
+            elif result.status == FAILED:
+                payout.status, payout.failure_reason = PayoutStatus.FAILED, result.reason
+                failed.append(payout.id)
+                ledger_service.payout_reversed(db, payout, now)
+                report.failed += 1
+            else:
+                payout.status = PayoutStatus.PROCESSING
+
+        settled = db.query(SettlementEntry.transaction_id).filter(SettlementEntry.payout_id.in_(paid))
+        if paid:
+            # Guarded on DELIVERED: a deal disputed meanwhile keeps its status
+            db.query(Transaction).filter(
+                Transaction.id.in_(settled.scalar_subquery()), Transaction.status == TransactionStatus.DELIVERED
+            ).update({
+                Transaction.status: TransactionStatus.COMPLETED,
+                Transaction.completed_at: now,
+                Transaction.version: Transaction.version + 1,
+            }, synchronize_session=False)
+            # A listing is sold once its last open deal completes
+            listing_ids = db.query(Transaction.produce_listing_id).filter(
+                Transaction.id.in_(settled.scalar_subquery())
+            ).distinct().all()
+            for (listing_id,) in listing_ids:
+                settle_produce_listing(db, listing_id)
+        if failed:
+            db.query(SettlementEntry).filter(
+                SettlementEntry.payout_id.in_(failed), SettlementEntry.released_at.is_(None)
+            ).update({SettlementEntry.released_at: now}, synchronize_session=False)
+
+        for batch in {payout.batch for payout in payouts}:
+            open_payouts = [p for p in batch.payouts if p.status in (PayoutStatus.PENDING, PayoutStatus.PROCESSING)]
+            if batch.status == PayoutBatchStatus.FAILED:
+                batch.completed_at = None if open_payouts else now
+            elif open_payouts:
+                batch.status = PayoutBatchStatus.SUBMITTED
+            else:
+                batch.status, batch.completed_at = PayoutBatchStatus.COMPLETED, now
+        db.commit()
+
+        if paid:
+            parties = db.query(Transaction.buyer_id, Transaction.seller_id).filter(
+                Transaction.id.in_(settled.scalar_subquery())
+            ).all()
+            invalidate_payment_summaries(user_id for row in parties for user_id in row)
+            response_cache.invalidate(PRODUCE_CACHE_NAMESPACE)
+
+
+settlement_service = SettlementService()
@@ -0,0 +1,201 @@
+"""
+Text-to-Speech Service for spoken replies to low-literacy farmers.
+
+Audio is synthesized with a local engine and stored in a content-addressed
+on-disk cache keyed by (text hash, language, voice), so a repeated advisory
+answer is synthesized once and then served from disk.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# eSpeak NG voice per detected language. Pidgin and mixed replies are read with
+# the English voice since there is no Pidgin voice.
+DEFAULT_VOICES = {
+    "english": "en",
+    "hausa": "ha",
+    "pidgin": "en",
+    "mixed": "ha",
+}
+
+# Markdown emphasis and emoji that agents use in chat replies but should not be read aloud
+_MARKUP_PATTERN = re.compile(r"[*_`#>~]")
+_EMOJI_PATTERN = re.compile(
+    "[\U0001F300-\U0001FAFF\U00002600-\U000027BF\U0001F000-\U0001F2FF\U0000FE0F\U0000200D]+",
+    re.UNICODE
+)
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_AUDIO_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class TTSError(Exception):
+    """Raised when the TTS engine fails to produce audio"""
+
+
+def normalize_tts_text(text: str, max_chars: int = 1500) -> str:
+    """Strip chat markup and emoji so only speakable text reaches the engine"""
+    text = _EMOJI_PATTERN.sub(" ", text or "")
+    text = _MARKUP_PATTERN.sub("", text)
+    text = _WHITESPACE_PATTERN.sub(" ", text).strip()
+    return text[:max_chars]
+
+
+class EspeakEngine:
+    """
+    Local TTS engine using the eSpeak NG command line tool
+    """
+
+    name = "espeak"
+    extension = ".wav"
+    media_type = "audio/wav"
+
+    def __init__(self, binary: Optional[str] = None, speed_wpm: int = 150):
+        self.binary = binary or shutil.which("espeak-ng") or shutil.which("espeak")
+        self.speed_wpm = speed_wpm
+
+    @property
+    def available(self) -> bool:
+        return self.binary is not None
+
+    def synthesize(self, text: str, voice: str, output_path: str):
+        """Write a WAV rendering of `text` to `output_path`"""
+        if not self.available:
+            raise TTSError("espeak-ng is not installed")
+        result = subprocess.run(
+            [self.binary, "-v", voice, "-s", str(self.speed_wpm), "-w", output_path, "--stdin"],
+            input=text.encode("utf-8"),
+            capture_output=True,
+            timeout=60
+        )
+        if result.returncode != 0:
+            raise TTSError(f"espeak-ng failed ({result.returncode}): {result.stderr.decode(errors='ignore')}")
+
+
+class AudioCache:
+    """
+    Content-addressed audio store on local disk.
+    Files live at <root>/<key[:2]>/<key><ext> and are written atomically.
+    """
+
+    def __init__(self, root: str, extension: str = ".wav"):
+        self.root = Path(root)
+        self.extension = extension
+
+    @staticmethod
+    def make_key(text: str, language: str, voice: str, engine: str = "") -> str:
+        digest = hashlib.sha256()
+        for part in (engine, language, voice, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def is_valid_key(key: str) -> bool:
+        return bool(_AUDIO_KEY_PATTERN.match(key or ""))
+
+    def path_for(self, key: str) -> Path:
+        if not self.is_valid_key(key):
+            raise ValueError(f"Invalid audio key: {key}")
+        return self.root / key[:2] / f"{key}{self.extension}"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path_for(key)
+        return path if path.exists() else None
+
+    def put_from(self, key: str, write_audio) -> Path:
+        """
+        Create the cache entry by calling write_audio(tmp_path), then atomically
+        moving the temp file into place so readers never see partial audio.
+        """
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        os.close(fd)
+        try:
+            write_audio(tmp_path)
+            if os.path.getsize(tmp_path) == 0:
+                raise TTSError("TTS engine produced an empty file")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+
+class TTSService:
+    """
+    Generates and caches spoken versions of AI replies
+    """
+
+    def __init__(self, engine=None, cache: Optional[AudioCache] = None, voices: Optional[Dict[str, str]] = None):
+        self.engine = engine or EspeakEngine(speed_wpm=settings.TTS_SPEED_WPM)
+        self.cache = cache or AudioCache(settings.TTS_CACHE_DIR, self.engine.extension)
+        self.voices = voices or DEFAULT_VOICES
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.TTS_ENABLED and getattr(self.engine, "available", True)
+
+    def voice_for(self, language: Optional[str]) -> str:
+        return self.voices.get(language or "english", self.voices["english"])
+
+    def audio_url(self, key: str) -> str:
+        return f"{settings.API_V1_STR}/chat/tts/{key}"
+
+    def cache_key(self, text: str, language: str, voice: Optional[str] = None) -> Tuple[str, str]:
+        """Return (key, normalized_text) for a reply"""
+        normalized = normalize_tts_text(text)
+        voice = voice or self.voice_for(language)
+        return self.cache.make_key(normalized, language or "english", voice, self.engine.name), normalized
+
+    async def generate(self, text: str, language: Optional[str] = "english", voice: Optional[str] = None) -> Optional[str]:
+        """
+        Return the URL of a spoken rendering of `text`, synthesizing it only on a cache miss.
+        Concurrent requests for the same audio share a single synthesis.
+        """
+        if not self.enabled:
+            return None
+
+        language = language or "english"
+        voice = voice or self.voice_for(language)
+        key, normalized = self.cache_key(text, language, voice)
+        if not normalized:
+            return None
+
+        if self.cache.get(key):
+            return self.audio_url(key)
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                # Another task may have produced it while we waited
+                if not self.cache.get(key):
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(
+                        None,
+                        self.cache.put_from,
+                        key,
+                        lambda tmp_path: self.engine.synthesize(normalized, voice, tmp_path)
+                    )
+                    logger.info(f"Synthesized TTS audio {key[:12]} ({language}/{voice}, {len(normalized)} chars)")
+        finally:
+            if not lock.locked():
+                self._locks.pop(key, None)
+
+        return self.audio_url(key)
+
+
+# Shared TTS service instance
+tts_service = TTSService()
@@ -9,9 +9,11 @@ import os
 from typing import Optional
 from pathlib import Path
 from groq import Groq
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
 from app.models.conversation import VoiceMessage
 from app.db.session import SessionLocal
+from app.services.entity_extraction import entity_extractor
 
 
 class VoiceService:
@@ -29,24 +31,29 @@ class VoiceService:
         # Use Groq's fastest Whisper model
         self.whisper_model = "whisper-large-v3-turbo"
     
-    async def transcribe_voice_note(self, audio_path: str, language: str = "en") -> Optional[str]:
+    async def transcribe_voice_note(self, audio_path: str, language: Optional[str] = "en") -> Optional[str]:
         """
         Transcribe a voice note using Groq Whisper API
         Args:
             audio_path: URL or local file path to audio
-            language: Language code (default: "en")
+            language: Whisper language code (default: "en"); None lets Whisper auto-detect
+
+        The download and the Groq call block, so they run in the threadpool
+        rather than on the event loop.
         """
         if not self.client:
             print("Groq API key not configured")
             return None
-            
+        return await run_in_threadpool(self._transcribe, audio_path, language)
+
+    def _transcribe(self, audio_path: str, language: Optional[str]) -> Optional[str]:
         try:
             # Check if it's a URL or local file path
             is_url = audio_path.startswith("http://") or audio_path.startswith("https://")
             
             if is_url:
                 # Download the audio file
-                response = requests.get(audio_path)
+                response = requests.get(audio_path, timeout=30)
                 if response.status_code != 200:
                     print(f"Failed to download audio: {response.status_code}")
                     return None
@@ -61,11 +68,12 @@ class VoiceService:
             
             # Transcribe using Groq Whisper
             with open(temp_file_path, "rb") as audio_file:
+                options = {"language": language} if language else {}
                 transcription = self.client.audio.transcriptions.create(
                     file=audio_file,
                     model=self.whisper_model,
-                    language=language,
-                    response_format="text"
+                    response_format="text",
+                    **options
                 )
             
             # Clean up temporary file (only if we downloaded it)
@@ -96,6 +104,7 @@ class VoiceService:
                 audio_file_url=audio_url,
                 audio_duration_seconds=0,  # Should calculate from audio file
                 transcription=transcription,
+                entities_extracted=entity_extractor.extract(transcription).to_dict() if transcription else None,
                 processing_status="completed" if transcription else "pending"
             )
             db.add(voice_message)
@@ -4,6 +4,7 @@ Main WhatsApp Service that integrates with Twilio and AI Agent
 from typing import Optional
 from app.services.ai_agent import AIAgent
 from app.services.voice_service import VoiceService
+from app.services.language_service import language_detector, normalize_language
 
 
 class WhatsAppService:
@@ -21,12 +22,17 @@ class WhatsAppService:
         """
 
         print("Processing message:", message, media_url, media_content_type)
+        preferred_language = normalize_language(getattr(user, "language_preference", None))
+        
         # Handle voice notes
         if media_url and media_content_type:
             if 'audio' in media_content_type.lower() or 'voice' in media_content_type.lower():
                 try:
-                    # Transcribe using Groq
-                    transcribed_text = await self.voice_service.transcribe_voice_note(media_url)
+                    # Transcribe using Groq, hinting Whisper with the user's language
+                    transcribed_text = await self.voice_service.transcribe_voice_note(
+                        media_url,
+                        language=language_detector.whisper_hint(preferred_language)
+                    )
                     
                     if transcribed_text:
                         message = transcribed_text
@@ -40,9 +46,10 @@ class WhatsAppService:
         if message.lower().strip() in ['start', 'menu', 'help']:
             return self._show_menu(user)
         
-        # Use AI agent for all other messages
+        # Use AI agent for all other messages, answering in the language the user wrote/spoke in
+        detection = language_detector.detect(message, default=preferred_language or "english")
         try:
-            response = await self.ai_agent.process_query(message, user=user)
+            response = await self.ai_agent.process_query(message, user=user, language=detection.language)
             return response if response else "I'm here to help! What would you like to know about farming, logistics, or payments?"
         except Exception as e:
             print(f"Error processing message with AI: {e}")
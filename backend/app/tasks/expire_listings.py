@@ -0,0 +1,35 @@
+"""
+Background task to expire produce listings past their expires_at
+Run this periodically using a task scheduler (cron, celery, etc.)
+"""
+from app.db.session import SessionLocal
+from app.crud.crud_produce import expire_produce_listings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def expire_listings():
+    """
+    Flip every available listing past its expiry date to EXPIRED with a single UPDATE
+    """
+    db = SessionLocal()
+    try:
+        count = expire_produce_listings(db)
+        if count > 0:
+            logger.info(f"Expired {count} produce listings")
+        else:
+            logger.info("No produce listings to expire")
+        return count
+
+    except Exception as e:
+        logger.error(f"Error expiring produce listings: {e}", exc_info=True)
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # Can be run directly or scheduled
+    expire_listings()
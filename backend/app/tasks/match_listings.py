@@ -0,0 +1,67 @@
+"""
+Background task to match produce listings with buyers
+Runs incrementally: only listings created or updated since their last match
+are scored. Run this periodically using a task scheduler (cron, celery, etc.);
+the produce endpoints also match a listing right after it is created or updated.
+"""
+from app.db.session import SessionLocal
+from app.models.produce import ProduceListing
+from app.services.matching_service import matching_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def match_new_listings(max_listings: int = None, top_k: int = None):
+    """
+    Match every pending listing (new or changed since its last match)
+
+    Args:
+        max_listings: Stop after this many listings (default: all pending)
+        top_k: Buyers to keep per listing (default: settings.MATCHING_TOP_K)
+    """
+    db = SessionLocal()
+    try:
+        stats = matching_service.match_pending(db, top_k=top_k, max_listings=max_listings)
+        if stats["listings"]:
+            logger.info(f"Matched {stats['listings']} listings with {stats['matches']} buyer matches")
+        else:
+            logger.info("No pending listings to match")
+        return stats
+
+    except Exception as e:
+        logger.error(f"Error matching listings: {e}", exc_info=True)
+        db.rollback()
+        return {"listings": 0, "matches": 0}
+    finally:
+        db.close()
+
+
+def match_listing(listing_id: str, top_k: int = None):
+    """
+    Match a single listing, e.g. right after it was created or updated
+
+    Args:
+        listing_id: Produce listing to match
+        top_k: Buyers to keep (default: settings.MATCHING_TOP_K)
+    """
+    db = SessionLocal()
+    try:
+        listing = db.query(ProduceListing).filter(ProduceListing.id == listing_id).first()
+        if not listing:
+            logger.warning(f"Listing {listing_id} not found for matching")
+            return 0
+        return matching_service.match_and_store(db, [listing], top_k)
+
+    except Exception as e:
+        # The listing stays pending and is picked up by the next match_new_listings run
+        logger.error(f"Error matching listing {listing_id}: {e}", exc_info=True)
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # Can be run directly or scheduled
+    match_new_listings()
@@ -0,0 +1,35 @@
+"""
+Background task to rebuild the daily market price index
+Run this nightly using a task scheduler (cron, celery, etc.); writes keep
+the index current during the day, this catches anything they missed
+"""
+from datetime import datetime, timedelta
+from app.db.session import SessionLocal
+from app.services.price_index_service import price_index_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_price_index(days: int = 7):
+    """
+    Recompute the price index for the last `days` days, today included
+    """
+    db = SessionLocal()
+    try:
+        end = datetime.utcnow().date() + timedelta(days=1)
+        count = price_index_service.rebuild(db, end - timedelta(days=days), end)
+        logger.info(f"Rebuilt price index for the last {days} days: {count} rows")
+        return count
+
+    except Exception as e:
+        logger.error(f"Error rebuilding price index: {e}", exc_info=True)
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # Can be run directly or scheduled
+    rebuild_price_index()
@@ -0,0 +1,43 @@
+"""
+Background task to reconcile pending payments with Paystack
+Run this periodically using a task scheduler (cron, celery, etc.); it
+recovers payments whose webhook was lost. Pass --dry-run to only report
+the drift.
+"""
+import asyncio
+import sys
+from app.db.session import SessionLocal
+from app.services.reconciliation_service import ReconciliationReport, reconciliation_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def reconcile_payments(dry_run: bool = False, max_records: int = None):
+    """
+    Verify stale pending payments with Paystack and correct their status
+
+    Args:
+        dry_run: Report the drift without writing anything
+        max_records: Stop after this many payments (default: all stale)
+    """
+    db = SessionLocal()
+    try:
+        report = asyncio.run(reconciliation_service.reconcile(db, dry_run=dry_run, max_records=max_records))
+        if report.drift_found:
+            logger.warning(f"Payment drift found for {report.drift_found} of {report.checked} pending payments")
+        else:
+            logger.info(f"No payment drift in {report.checked} pending payments")
+        return report
+
+    except Exception as e:
+        logger.error(f"Error reconciling payments: {e}", exc_info=True)
+        db.rollback()
+        return ReconciliationReport(dry_run=dry_run)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # Can be run directly or scheduled
+    reconcile_payments(dry_run="--dry-run" in sys.argv[1:])
@@ -0,0 +1,39 @@
+"""
+Background task to pay farmers for delivered deals
+Run this periodically using a task scheduler (cron, celery, etc.); each run
+groups the unsettled deals per farmer and sends the payouts in a few bulk
+transfer calls.
+"""
+import asyncio
+from app.db.session import SessionLocal
+from app.services.settlement_service import SettlementReport, settlement_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def settle_payouts():
+    """
+    Settle delivered deals and submit the pending payout batches
+    """
+    db = SessionLocal()
+    try:
+        report = asyncio.run(settlement_service.settle(db))
+        if report.farmers_without_account:
+            logger.warning(f"{len(report.farmers_without_account)} farmers have delivered deals but no payout account")
+        if report.failed or report.errors:
+            logger.warning(f"{report.failed} payouts failed and {report.errors} batches could not be submitted")
+        logger.info(f"Paid {report.paid} payouts from {report.transactions} newly settled deals")
+        return report
+
+    except Exception as e:
+        logger.error(f"Error settling payouts: {e}", exc_info=True)
+        db.rollback()
+        return SettlementReport()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # Can be run directly or scheduled
+    settle_payouts()
@@ -0,0 +1,318 @@
+"""
+Background worker for Paystack webhook events.
+
+`/payments/verify` checks the signature, stores the raw event in the
+payment_events inbox (deduplicated on its Paystack id), enqueues it and
+acknowledges at once. The worker then applies the event in a single
+database transaction: the PaymentRecord, the Transaction, notifications for
+buyer and seller and, for a confirmed payment, the logistics request.
+Events still RECEIVED when the worker starts are replayed, so a job lost
+with the process is picked up again, and a redelivery of an event still
+RECEIVED (say, one that could not be queued) is queued again.
+"""
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.crud_transaction import invalidate_payment_summaries_for_references
+from app.db.session import SessionLocal
+from app.models.logistics import LogisticsRequest, LogisticsStatus
+from app.models.notification import Notification, NotificationPriority, NotificationType
+from app.models.payment_event import PaymentEvent, PaymentEventStatus
+from app.models.transaction import PaymentRecord, PaymentStatus, Transaction, TransactionStatus
+from app.models.user import User
+from app.services.ledger_service import ledger_service
+from app.services.logistics_cost_service import logistics_cost_service
+from app.services.price_index_service import price_index_service
+from app.services.websocket_manager import manager
+from app.workers.queue import JobQueue, create_queue_backend
+
+logger = logging.getLogger(__name__)
+
+# Paystack events the worker applies; anything else is stored and ignored
+HANDLED_EVENTS = ("charge.success", "charge.failed")
+
+# Payment was confirmed for these; a late charge.failed must not undo it
+PAID_STATUSES = (
+    TransactionStatus.PAYMENT_CONFIRMED,
+    TransactionStatus.IN_LOGISTICS,
+    TransactionStatus.DELIVERED,
+    TransactionStatus.COMPLETED,
+)
+
+def payment_event_id(payload: dict, body: bytes) -> str:
+    """
+    Dedup key of a webhook. Paystack sends no event id of its own, but
+    data.id identifies the charge, so (event, data.id) is stable across
+    redeliveries; the body hash covers payloads without one.
+    """
+    event = payload.get("event") or "unknown"
+    data = payload.get("data") or {}
+    if data.get("id") is not None:
+        return f"{event}:{data['id']}"
+    return f"{event}:{hashlib.sha256(body).hexdigest()[:32]}"
+
+
+def store_payment_event(db: Session, event_id: str, payload: dict) -> Optional[PaymentEvent]:
+    """Append a webhook to the inbox; None if it was already received"""
+    if db.get(PaymentEvent, event_id) is not None:
+        return None
+    data = payload.get("data") or {}
+    db_event = PaymentEvent(
+        id=event_id,
+        event=payload.get("event") or "unknown",
+        reference=data.get("reference"),
+        payload=payload,
+    )
+    db.add(db_event)
+    try:
+        db.commit()
+    except Exception:
+        # Lost the insert race to a concurrent delivery of the same event
+        db.rollback()
+        if db.get(PaymentEvent, event_id) is not None:
+            return None
+        raise
+    return db_event
+
+
+def _notification(user_id: str, transaction: Transaction, title: str, message: str,
+                  notification_type=NotificationType.PAYMENT_CONFIRMATION, logistics_id: Optional[str] = None) -> Notification:
+    return Notification(
+        user_id=user_id,
+        transaction_id=transaction.id,
+        logistics_id=logistics_id,
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        priority=NotificationPriority.HIGH,
+    )
+
+
+def _schedule_logistics(db: Session, transaction: Transaction, now: datetime) -> Optional[LogisticsRequest]:
+    """Request a pickup from the farm to the buyer unless one exists"""
+    if transaction.logistics_request is not None:
+        return None
+    listing = transaction.produce_listing
+    if listing is None or listing.location is None:
+        logger.warning(f"Transaction {transaction.id} has no pickup location; logistics not requested")
+        return None
+    buyer_location, buyer_village = db.query(User.location, User.village).filter(
+        User.id == transaction.buyer_id
+    ).first() or (None, None)
+    # Without a buyer location the drop-off is confirmed with the buyer later,
+    # so there is no route to price yet
+    dropoff = buyer_location if buyer_location is not None else listing.location
+    quote = None
+    if buyer_location is not None:
+        quote = logistics_cost_service.quote_points(listing.location, dropoff, transaction.quantity_kg)
+    if quote is None:
+        # Unpriced; the fleet for the load at any distance
+        quote = logistics_cost_service.quote_distances([0.0], [transaction.quantity_kg])[0]
+        estimated_cost = None
+    else:
+        estimated_cost = float(quote.cost)
+    logistics = LogisticsRequest(
+        transaction_id=transaction.id,
+        pickup_location=listing.location,
+        pickup_description=f"{listing.crop_type.title()} pickup" + (f", {listing.region.title()}" if listing.region else ""),
+        dropoff_location=dropoff,
+        dropoff_description=buyer_village or "To be confirmed with buyer",
+        scheduled_pickup=now + timedelta(days=1),
+        transport_type=quote.transport_type,
+        estimated_cost=estimated_cost,
+        notes=f"Vehicles: {quote.describe()}",
+        status=LogisticsStatus.REQUESTED,
+    )
+    db.add(logistics)
+    db.flush()
+    return logistics
+
+
+def apply_payment_event(db: Session, event_id: str, now: Optional[datetime] = None) -> Tuple[PaymentEventStatus, List[Dict]]:
+    """
+    Apply one inbox event in a single database transaction. Returns the
+    event's final status and the live messages to push once committed.
+    The claim (RECEIVED -> final status) is a conditional UPDATE, so two
+    workers never apply the same event.
+    """
+    now = now or datetime.utcnow()
+    db_event = db.get(PaymentEvent, event_id)
+    if db_event is None or db_event.status != PaymentEventStatus.RECEIVED:
+        return (db_event.status if db_event else PaymentEventStatus.IGNORED), []
+
+    reference = db_event.reference
+    status, error, pushes, transaction = _apply(db, db_event, now)
+    claimed = (
+        db.query(PaymentEvent)
+        .filter(PaymentEvent.id == event_id, PaymentEvent.status == PaymentEventStatus.RECEIVED)
+        .update({
+            PaymentEvent.status: status,
+            PaymentEvent.processed_at: now,
+            PaymentEvent.attempts: PaymentEvent.attempts + 1,
+            PaymentEvent.last_error: error,
+        }, synchronize_session=False)
+    )
+    if not claimed:
+        db.rollback()
+        return db.get(PaymentEvent, event_id, populate_existing=True).status, []
+    db.commit()
+    if status == PaymentEventStatus.PROCESSED:
+        invalidate_payment_summaries_for_references(db, [reference])
+    if transaction is not None:
+        # A confirmed deal price enters the index
+        price_index_service.refresh_transactions(db, [transaction])
+    return status, pushes
+
+
+def _apply(db: Session, db_event: PaymentEvent, now: datetime):
+    """(status, error, pushes, transaction) for an event; writes are flushed, not committed"""
+    if db_event.event not in HANDLED_EVENTS:
+        return PaymentEventStatus.IGNORED, f"Unhandled event {db_event.event}", [], None
+
+    record = db.query(PaymentRecord).filter(PaymentRecord.reference == db_event.reference).first() if db_event.reference else None
+    if record is None:
+        logger.error(f"Payment record not found for reference: {db_event.reference}")
+        return PaymentEventStatus.IGNORED, "Payment record not found", [], None
+    transaction = record.transaction
+    data = db_event.payload.get("data") or {}
+
+    if db_event.event == "charge.failed":
+        if record.status == PaymentStatus.SUCCESS:
+            return PaymentEventStatus.IGNORED, "Payment already succeeded", [], None
+        record.status = PaymentStatus.FAILED
+        record.paystack_data = db_event.payload
+        notice = _notification(
+            transaction.buyer_id, transaction, "Payment failed",
+            f"Your payment of ₦{record.amount:,.0f} for transaction {transaction.id} did not go through. Please try again."
+        )
+        db.add(notice)
+        db.flush()
+        return PaymentEventStatus.PROCESSED, None, [(transaction.buyer_id, {
+            "type": "payment_failed", "transaction_id": transaction.id, "reference": record.reference,
+        })], None
+
+    # charge.success: Paystack amounts are in kobo
+    paid_kobo = data.get("amount")
+    if paid_kobo is not None and paid_kobo != record.amount_kobo:
+        logger.warning(f"Amount mismatch for {record.reference}: paid {paid_kobo} kobo, expected {record.amount}")
+        return PaymentEventStatus.IGNORED, f"Amount mismatch: paid {paid_kobo} kobo for {record.amount}", [], None
+
+    if record.status != PaymentStatus.SUCCESS:
+        # Committed with the payment status, or not at all
+        ledger_service.payment_received(db, record.reference, record.amount_kobo, transaction.id, now)
+    record.status = PaymentStatus.SUCCESS
+    record.confirmed_at = now
+    record.paystack_data = db_event.payload
+    if transaction.status in PAID_STATUSES:
+        db.flush()
+        return PaymentEventStatus.PROCESSED, None, [], None
+    transaction.status = TransactionStatus.PAYMENT_CONFIRMED
+    transaction.payment_confirmed_at = now
+
+    logistics = _schedule_logistics(db, transaction, now)
+    logistics_id = logistics.id if logistics else None
+    db.add_all([
+        _notification(
+            transaction.buyer_id, transaction, "Payment confirmed",
+            f"We received your payment of ₦{record.amount:,.0f} for transaction {transaction.id}."
+            + (" Pickup is being arranged." if logistics else ""),
+            logistics_id=logistics_id,
+        ),
+        _notification(
+            transaction.seller_id, transaction, "Buyer has paid",
+            f"Payment of ₦{record.amount:,.0f} for {transaction.quantity_kg:g}kg is confirmed (transaction {transaction.id})."
+            + (" A pickup is scheduled for tomorrow." if logistics else ""),
+            logistics_id=logistics_id,
+        ),
+    ])
+    # Flush the Transaction here so a concurrent writer fails the version check now
+    db.flush()
+    message = {"type": "payment_confirmed", "transaction_id": transaction.id, "reference": record.reference,
+               "logistics_id": logistics_id}
+    logger.info(f"Payment confirmed for transaction {transaction.id}")
+    return PaymentEventStatus.PROCESSED, None, [(transaction.buyer_id, message), (transaction.seller_id, message)], transaction
+
+
+class PaymentEventProcessor:
+    """
+    Applies Paystack events from the payment event queue
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self.queue = JobQueue(
+            "payment_events",
+            self.process_job,
+            backend=create_queue_backend(settings.PAYMENT_EVENT_QUEUE_BACKEND, "payment_events", settings.REDIS_URL),
+            concurrency=settings.PAYMENT_EVENT_WORKER_CONCURRENCY,
+            max_retries=settings.PAYMENT_EVENT_MAX_RETRIES,
+            backoff_seconds=settings.PAYMENT_EVENT_RETRY_BACKOFF_SECONDS,
+            on_failure=self.mark_failed
+        )
+
+    async def start(self):
+        await self.queue.start()
+        await self.replay_pending()
+
+    async def stop(self):
+        await self.queue.stop()
+
+    async def submit(self, event_id: str):
+        await self.queue.enqueue({"event_id": event_id})
+
+    async def replay_pending(self) -> int:
+        """Enqueue inbox events the worker never finished (e.g. the process died)"""
+        db = self.session_factory()
+        try:
+            pending = [event_id for (event_id,) in db.query(PaymentEvent.id).filter(
+                PaymentEvent.status == PaymentEventStatus.RECEIVED
+            ).order_by(PaymentEvent.received_at)]
+        except Exception as e:
+            logger.error(f"Could not read pending payment events: {e}")
+            return 0
+        finally:
+            db.close()
+        for event_id in pending:
+            await self.submit(event_id)
+        if pending:
+            logger.info(f"Replaying {len(pending)} pending payment events")
+        return len(pending)
+
+    async def process_job(self, job: dict):
+        """Apply one event and push the results to connected users"""
+        db = self.session_factory()
+        try:
+            status, pushes = apply_payment_event(db, job["event_id"])
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        logger.info(f"Payment event {job['event_id']}: {status.value}")
+        for user_id, message in pushes:
+            if manager.is_connected(user_id):
+                await manager.send_personal_message(message, user_id)
+
+    async def mark_failed(self, job: dict, error: Exception):
+        """Record an event that kept failing so it is not replayed forever"""
+        db = self.session_factory()
+        try:
+            db.query(PaymentEvent).filter(
+                PaymentEvent.id == job["event_id"], PaymentEvent.status == PaymentEventStatus.RECEIVED
+            ).update({
+                PaymentEvent.status: PaymentEventStatus.FAILED,
+                PaymentEvent.attempts: job.get("attempt", 0),
+                PaymentEvent.last_error: str(error)[:1000],
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+# Global payment event processor instance
+payment_event_processor = PaymentEventProcessor()
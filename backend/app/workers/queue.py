@@ -0,0 +1,188 @@
+"""
+Async job queue used by background workers.
+
+Jobs are plain JSON-serializable dicts so they can travel through an external
+broker. The default backend is an in-process asyncio queue; set the backend to
+"redis" to share work across API processes.
+"""
+import asyncio
+import json
+import logging
+import random
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Awaitable[None]]
+FailureHandler = Callable[[dict, Exception], Awaitable[None]]
+
+
+class MemoryQueueBackend:
+    """In-process queue backed by asyncio.Queue"""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def put(self, job: dict):
+        await self.queue.put(job)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        pass
+
+
+class RedisQueueBackend:
+    """Queue backed by a Redis list (LPUSH / BRPOP)"""
+
+    def __init__(self, url: str, name: str):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.key = f"shukalink:queue:{name}"
+
+    async def put(self, job: dict):
+        await self.client.lpush(self.key, json.dumps(job))
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        item = await self.client.brpop(self.key, timeout=max(1, int(timeout)))
+        if item is None:
+            return None
+        return json.loads(item[1])
+
+    async def close(self):
+        await self.client.close()
+
+
+def create_queue_backend(backend: str, name: str, redis_url: Optional[str] = None):
+    """Build a queue backend from its configured name"""
+    if backend == "redis":
+        if not redis_url:
+            raise ValueError("REDIS_URL must be set to use the redis queue backend")
+        return RedisQueueBackend(redis_url, name)
+    if backend != "memory":
+        raise ValueError(f"Unknown queue backend: {backend}")
+    return MemoryQueueBackend()
+
+
+class JobQueue:
+    """
+    Runs a pool of asyncio workers that pull jobs from a backend and retry
+    failed jobs with exponential backoff and jitter.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: JobHandler,
+        backend=None,
+        concurrency: int = 2,
+        max_retries: int = 3,
+        backoff_seconds: float = 2.0,
+        on_failure: Optional[FailureHandler] = None,
+        poll_timeout: float = 1.0
+    ):
+        self.name = name
+        self.handler = handler
+        self.backend = backend or MemoryQueueBackend()
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.on_failure = on_failure
+        self.poll_timeout = poll_timeout
+        self._workers = []
+        self._pending_retries = set()
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def enqueue(self, job: dict):
+        """Add a job to the queue"""
+        job.setdefault("attempt", 0)
+        await self.backend.put(job)
+        logger.debug(f"[{self.name}] Enqueued job {job}")
+
+    async def start(self):
+        """Start the worker pool"""
+        if self._running:
+            return
+        self._running = True
+        self._workers = [
+            asyncio.create_task(self._worker(index), name=f"{self.name}-worker-{index}")
+            for index in range(self.concurrency)
+        ]
+        logger.info(f"[{self.name}] Started {self.concurrency} workers")
+
+    async def stop(self):
+        """Stop the workers; jobs still in the backend are left for the next start"""
+        self._running = False
+        for task in list(self._workers) + list(self._pending_retries):
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._pending_retries, return_exceptions=True)
+        self._workers = []
+        self._pending_retries = set()
+        await self.backend.close()
+        logger.info(f"[{self.name}] Stopped")
+
+    def retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given (1-based) attempt"""
+        return random.uniform(0, self.backoff_seconds * (2 ** (attempt - 1)))
+
+    async def _worker(self, index: int):
+        while self._running:
+            try:
+                job = await self.backend.get(self.poll_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[{self.name}] Worker {index} failed to read from queue: {e}")
+                await asyncio.sleep(self.poll_timeout)
+                continue
+
+            if job is None:
+                continue
+
+            await self.run_job(job)
+
+    async def run_job(self, job: dict):
+        """Run a single job, scheduling a retry or reporting failure on error"""
+        try:
+            await self.handler(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job["attempt"] = job.get("attempt", 0) + 1
+            if job["attempt"] <= self.max_retries:
+                delay = self.retry_delay(job["attempt"])
+                logger.warning(
+                    f"[{self.name}] Job failed (attempt {job['attempt']}/{self.max_retries}), "
+                    f"retrying in {delay:.1f}s: {e}"
+                )
+                # Re-enqueue after the delay without holding a worker slot
+                task = asyncio.create_task(self._requeue_later(job, delay))
+                self._pending_retries.add(task)
+                task.add_done_callback(self._pending_retries.discard)
+            else:
+                logger.error(f"[{self.name}] Job failed permanently after {job['attempt']} attempts: {e}", exc_info=True)
+                if self.on_failure:
+                    try:
+                        await self.on_failure(job, e)
+                    except Exception as hook_error:
+                        logger.error(f"[{self.name}] Failure handler raised: {hook_error}", exc_info=True)
+
+    async def _requeue_later(self, job: dict, delay: float):
+        await asyncio.sleep(delay)
+        await self.backend.put(job)
@@ -0,0 +1,284 @@
+"""
+Background worker for voice notes.
+
+`/chat/voice` stores the upload, creates a pending VoiceMessage and enqueues a
+job. The worker transcribes the note, runs the AI agent and pushes progress
+and results to the user over the WebSocket, moving `processing_status`
+through processing -> completed / failed. The spoken reply is synthesized
+after the text reply has been sent and announced with a `tts_ready` message.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.crud.crud_conversation import get_conversation_history, append_conversation_turn
+from app.models.conversation import ChatSession, VoiceMessage
+from app.models.user import User
+from app.services.entity_extraction import entity_extractor
+from app.services.language_service import language_detector, normalize_language
+from app.services.tts_service import tts_service
+from app.services.voice_service import VoiceService
+from app.services.websocket_manager import manager
+from app.workers.queue import JobQueue, create_queue_backend
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionError(Exception):
+    """Raised when Whisper returns no text for a voice note"""
+
+
+def get_whisper_language_hint(db, user: User) -> Optional[str]:
+    """Pick the Whisper language code from the user's last voice note and profile preference"""
+    recent = db.query(VoiceMessage.language_detected, VoiceMessage.language_confidence).filter(
+        VoiceMessage.user_id == user.id,
+        VoiceMessage.processing_status == "completed"
+    ).order_by(VoiceMessage.created_at.desc()).first()
+    recent_language, recent_confidence = recent if recent else (None, None)
+    return language_detector.whisper_hint(user.language_preference, recent_language, recent_confidence)
+
+
+class VoiceProcessor:
+    """
+    Processes voice note jobs from the voice queue
+    """
+
+    def __init__(self):
+        self.voice_service = VoiceService()
+        self._ai_agent = None
+        self._tts_tasks = set()
+        self.queue = JobQueue(
+            "voice",
+            self.process_job,
+            backend=create_queue_backend(settings.VOICE_QUEUE_BACKEND, "voice", settings.REDIS_URL),
+            concurrency=settings.VOICE_WORKER_CONCURRENCY,
+            max_retries=settings.VOICE_WORKER_MAX_RETRIES,
+            backoff_seconds=settings.VOICE_WORKER_RETRY_BACKOFF_SECONDS,
+            on_failure=self.mark_failed
+        )
+
+    @property
+    def ai_agent(self):
+        # Built on first use so importing the worker doesn't compile the agent graph
+        if self._ai_agent is None:
+            from app.services.ai_agent import AIAgent
+            self._ai_agent = AIAgent()
+        return self._ai_agent
+
+    async def start(self):
+        await self.queue.start()
+
+    async def stop(self):
+        await self.queue.stop()
+        for task in list(self._tts_tasks):
+            task.cancel()
+        await asyncio.gather(*self._tts_tasks, return_exceptions=True)
+        self._tts_tasks = set()
+
+    async def submit(self, voice_message_id: str, session_id: str, user_id: str):
+        """Queue a pending voice message for processing"""
+        await self.queue.enqueue({
+            "voice_message_id": voice_message_id,
+            "session_id": session_id,
+            "user_id": user_id
+        })
+
+    async def notify(self, user_id: str, message: dict):
+        """Push a message to the user if they have a live WebSocket"""
+        if manager.is_connected(user_id):
+            await manager.send_personal_message(message, user_id)
+
+    def _start_job(self, db, job: dict):
+        """Load a job's rows and mark it processing; None if there is nothing left to do"""
+        voice_message = db.query(VoiceMessage).filter(VoiceMessage.id == job["voice_message_id"]).first()
+        if not voice_message:
+            logger.warning(f"Voice message {job['voice_message_id']} no longer exists, dropping job")
+            return None
+        if voice_message.processing_status == "completed":
+            # Already handled (e.g. a redelivered job)
+            return None
+
+        user = db.query(User).filter(User.id == job["user_id"]).first()
+        session = db.query(ChatSession).filter(ChatSession.id == job["session_id"]).first()
+        if not user or not session:
+            raise ValueError(f"User or session missing for voice message {voice_message.id}")
+
+        voice_message.processing_status = "processing"
+        # Hint Whisper with the language the user usually speaks
+        whisper_language = get_whisper_language_hint(db, user)
+        db.commit()
+        return voice_message, user, session, whisper_language
+
+    def _store_transcription(self, db, voice_message: VoiceMessage, user: User, transcription: str):
+        detection = language_detector.detect(
+            transcription,
+            default=normalize_language(user.language_preference) or "english"
+        )
+        voice_message.transcription = transcription
+        voice_message.transcription_confidence = 0.95
+        voice_message.language_detected = detection.language
+        voice_message.language_confidence = detection.confidence
+        voice_message.entities_extracted = entity_extractor.extract(transcription).to_dict()
+        db.commit()
+        return detection
+
+    def _store_reply(self, db, voice_message: VoiceMessage, session: ChatSession, transcription: str,
+                     ai_response: str):
+        append_conversation_turn(session, transcription, ai_response)
+        session.voice_message_id = voice_message.id
+        voice_message.session_id = session.id
+        voice_message.ai_response = ai_response
+        voice_message.processing_status = "completed"
+        voice_message.processed_at = datetime.utcnow()
+        db.commit()
+
+    async def process_job(self, job: dict):
+        """
+        Transcribe a voice note, run the AI agent and store the results.
+        Database work and transcription run in the threadpool so a voice
+        note never blocks the event loop the API and WebSockets share.
+        """
+        # Not expired on commit: the rows are read on the event loop between database calls
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            started = await run_in_threadpool(self._start_job, db, job)
+            if started is None:
+                return
+            voice_message, user, session, whisper_language = started
+            await self.notify(user.id, {
+                "type": "voice_status",
+                "voice_message_id": voice_message.id,
+                "status": "processing",
+                "attempt": job.get("attempt", 0) + 1,
+                "session_id": session.id
+            })
+
+            transcription = await self.voice_service.transcribe_voice_note(
+                voice_message.audio_file_url, language=whisper_language
+            )
+            if not transcription:
+                raise TranscriptionError(f"Transcription failed for {voice_message.id}")
+            detection = await run_in_threadpool(self._store_transcription, db, voice_message, user, transcription)
+
+            await self.notify(user.id, {
+                "type": "voice_transcription",
+                "voice_message_id": voice_message.id,
+                "transcription": transcription,
+                "confidence": voice_message.transcription_confidence,
+                "language": detection.language,
+                "entities": voice_message.entities_extracted,
+                "session_id": session.id
+            })
+
+            # Process with AI agent (with context)
+            conversation_history = get_conversation_history(session)
+            ai_response = await self.ai_agent.process_query(
+                transcription,
+                user=user,
+                conversation_history=conversation_history,
+                language=detection.language,
+                session_id=session.id
+            )
+            await run_in_threadpool(self._store_reply, db, voice_message, session, transcription, ai_response)
+
+            await self.notify(user.id, {
+                "type": "ai_message",
+                "voice_message_id": voice_message.id,
+                "content": ai_response,
+                "session_id": session.id,
+                "tts_audio_url": None,
+                "language": detection.language,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+
+            self._remove_audio(voice_message.audio_file_url)
+            logger.info(f"Processed voice message {voice_message.id}")
+
+            # Synthesize the spoken reply without holding up the text reply or the worker slot
+            task = asyncio.create_task(self.generate_voice_reply(
+                session.id, voice_message.id, user.id, ai_response, detection.language
+            ))
+            self._tts_tasks.add(task)
+            task.add_done_callback(self._tts_tasks.discard)
+        except Exception:
+            await run_in_threadpool(db.rollback)
+            raise
+        finally:
+            await run_in_threadpool(db.close)
+
+    async def generate_voice_reply(self, session_id: str, voice_message_id: str, user_id: str,
+                                   text: str, language: Optional[str]):
+        """Synthesize the AI reply, store its URL on the voice note and push it to the user"""
+        try:
+            audio_url = await tts_service.generate(text, language)
+        except Exception as e:
+            # Text reply was already delivered; a missing audio reply is not fatal
+            logger.error(f"TTS generation failed for voice message {voice_message_id}: {e}")
+            return
+        if not audio_url:
+            return
+
+        await run_in_threadpool(self._store_voice_reply, session_id, voice_message_id, audio_url)
+        await self.notify(user_id, {
+            "type": "tts_ready",
+            "voice_message_id": voice_message_id,
+            "session_id": session_id,
+            "tts_audio_url": audio_url,
+            "language": language
+        })
+
+    def _store_voice_reply(self, session_id: str, voice_message_id: str, audio_url: str):
+        db = SessionLocal()
+        try:
+            db.query(VoiceMessage).filter(VoiceMessage.id == voice_message_id).update(
+                {VoiceMessage.ai_voice_response_url: audio_url}, synchronize_session=False
+            )
+            # The session keeps the reply to its latest note
+            db.query(ChatSession).filter(
+                ChatSession.id == session_id, ChatSession.voice_message_id == voice_message_id
+            ).update({ChatSession.ai_voice_response_url: audio_url}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    async def mark_failed(self, job: dict, error: Exception):
+        """Record a permanently failed job and tell the user"""
+        await run_in_threadpool(self._store_failure, job["voice_message_id"])
+        await self.notify(job["user_id"], {
+            "type": "error",
+            "error": "Failed to process voice note",
+            "details": str(error),
+            "voice_message_id": job["voice_message_id"],
+            "session_id": job.get("session_id")
+        })
+
+    def _store_failure(self, voice_message_id: str):
+        db = SessionLocal()
+        try:
+            voice_message = db.query(VoiceMessage).filter(VoiceMessage.id == voice_message_id).first()
+            if voice_message:
+                voice_message.processing_status = "failed"
+                voice_message.processed_at = datetime.utcnow()
+                db.commit()
+                self._remove_audio(voice_message.audio_file_url)
+        finally:
+            db.close()
+
+    def _remove_audio(self, path: str):
+        """Delete the uploaded audio once it is no longer needed"""
+        if not path or path.startswith(("http://", "https://")):
+            return
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Global voice processor instance
+voice_processor = VoiceProcessor()
@@ -4,6 +4,9 @@ from app.api.api_v1 import api_router
 from app.core.config import settings
 from app.db.session import engine
 from app.db.base_class import Base
+from app.services.paystack_client import paystack_client
+from app.workers.payment_events import payment_event_processor
+from app.workers.voice_processor import voice_processor
 
 # Create tables in database
 Base.metadata.create_all(bind=engine)
@@ -27,6 +30,17 @@ app.add_middleware(
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+async def start_workers():
+    await voice_processor.start()
+    await payment_event_processor.start()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await voice_processor.stop()
+    await payment_event_processor.stop()
+    await paystack_client.aclose()
+
 @app.get("/")
 def read_root():
     return {"message": "ShukaLink CRM - WhatsApp AI Agent for Smallholder Farmers"}
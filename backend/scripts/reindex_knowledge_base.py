@@ -0,0 +1,39 @@
+"""
+Re-index the advisory knowledge base.
+
+Usage (from the backend directory):
+    python scripts/reindex_knowledge_base.py          # embed new and changed documents only
+    python scripts/reindex_knowledge_base.py --full   # re-embed every document
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.knowledge_base import KnowledgeBase
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-index the advisory knowledge base")
+    parser.add_argument("--full", action="store_true", help="re-embed all documents, not just changed ones")
+    parser.add_argument("--documents-dir", help="override settings.KNOWLEDGE_BASE_DIR")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    kb = KnowledgeBase(documents_dir=args.documents_dir)
+    if not kb.available:
+        print("ChromaDB and sentence-transformers are required to build the index.")
+        sys.exit(1)
+
+    stats = kb.reindex(full=args.full)
+    print(
+        f"Indexed {stats['chunks']} chunks: {stats['added']} added, {stats['updated']} updated, "
+        f"{stats['unchanged']} unchanged, {stats['removed']} removed. Index now holds {kb.count()} chunks."
+    )
+
+
+if __name__ == "__main__":
+    main()
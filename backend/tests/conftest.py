@@ -0,0 +1,46 @@
+"""
+Test setup loaded by pytest before any test module.
+
+Swaps PostGIS Geometry and PostgreSQL ARRAY for string columns (as
+test_payment_flow does) before anything imports `app.models`, so the full
+schema can be created in SQLite (see sqlite_models.py) whatever order the
+test modules are collected in.
+"""
+import json
+
+import geoalchemy2
+import sqlalchemy
+from sqlalchemy.types import TypeDecorator, String
+
+
+class MockGeometry(TypeDecorator):
+    impl = String
+    cache_ok = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+
+    def load_dialect_impl(self, dialect):
+        return dialect.type_descriptor(String)
+
+
+class MockArray(TypeDecorator):
+    """Lists stored as JSON text"""
+    impl = String
+    cache_ok = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+
+    def load_dialect_impl(self, dialect):
+        return dialect.type_descriptor(String)
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else json.dumps(list(value))
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else json.loads(value)
+
+
+geoalchemy2.Geometry = MockGeometry
+sqlalchemy.ARRAY = MockArray
@@ -0,0 +1,194 @@
+"""
+A local fake Paystack API for tests.
+
+Serves /transaction/initialize, /transaction/verify/<reference>,
+/transfer/bulk and /transfer/verify/<reference> over real HTTP/1.1 with keep-alive on 127.0.0.1, so the client's pooling, timeouts and
+retries run against an actual socket. Failures are scripted per request:
+
+    with FakePaystack() as fake:
+        fake.fail_next(2, status=502)   # next two requests get a 502
+        fake.delay_next(1, seconds=0.5) # then one slow response
+        client = PaystackClient(secret_key=fake.secret_key, base_url=fake.url)
+"""
+import json
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+VERIFY_PATH = re.compile(r"^/transaction/verify/([\w.=-]+)$")
+TRANSFER_VERIFY_PATH = re.compile(r"^/transfer/verify/([\w.=-]+)$")
+
+
+class FakePaystack:
+    def __init__(self, secret_key: str = "sk_test_fake"):
+        self.secret_key = secret_key
+        self.transactions = {}
+        self.transfers = {}  # reference -> transfer; new ones stay "pending" until set_transfer_status
+        self.failing_recipients = set()  # Transfers to these recipient codes fail at once
+        self.requests = []  # (method, path, client port) per request received
+        self.latency = 0.0  # Seconds added to every response
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._script = deque()  # ("fail", status) or ("delay", seconds), one per upcoming request
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def fail_next(self, count: int = 1, status: int = 500):
+        with self._lock:
+            self._script.extend([("fail", status)] * count)
+
+    def delay_next(self, count: int = 1, seconds: float = 1.0):
+        with self._lock:
+            self._script.extend([("delay", seconds)] * count)
+
+    def add_transaction(self, reference: str, amount: int, status: str = "abandoned", email: str = "buyer@example.com"):
+        """Seed a transaction as if it had been initialised earlier"""
+        with self._lock:
+            self.transactions[reference] = {
+                "id": 100000 + len(self.transactions), "amount": amount, "email": email,
+                "metadata": {}, "status": status,
+            }
+
+    def pay(self, reference: str):
+        """Mark an initialised transaction as paid"""
+        self.set_status(reference, "success")
+
+    def set_status(self, reference: str, status: str):
+        self.transactions[reference]["status"] = status
+
+    def set_transfer_status(self, reference: str, status: str):
+        self.transfers[reference]["status"] = status
+
+    def connections(self) -> int:
+        """Distinct client connections seen (keep-alive reuses one)"""
+        return len({port for _, _, port in self.requests})
+
+    def _next_step(self):
+        with self._lock:
+            return self._script.popleft() if self._script else None
+
+    def _handle(self, method: str, path: str, headers, body: bytes):
+        """(status, payload) for one request"""
+        step = self._next_step()
+        if self.latency:
+            time.sleep(self.latency)
+        if step and step[0] == "fail":
+            return step[1], {"status": False, "message": "Gateway error"}
+        if step and step[0] == "delay":
+            time.sleep(step[1])
+
+        if headers.get("Authorization") != f"Bearer {self.secret_key}":
+            return 401, {"status": False, "message": "Invalid key"}
+
+        if method == "POST" and path == "/transaction/initialize":
+            payload = json.loads(body or b"{}")
+            missing = [field for field in ("email", "amount", "reference") if not payload.get(field)]
+            if missing:
+                return 400, {"status": False, "message": f"Missing {', '.join(missing)}"}
+            reference = payload["reference"]
+            with self._lock:
+                if reference in self.transactions:
+                    return 400, {"status": False, "message": "Duplicate Transaction Reference"}
+                self.transactions[reference] = {
+                    "id": 100000 + len(self.transactions), "amount": payload["amount"], "email": payload["email"],
+                    "metadata": payload.get("metadata") or {}, "status": "abandoned",
+                }
+            return 200, {"status": True, "message": "Authorization URL created", "data": {
+                "authorization_url": f"https://checkout.paystack.com/{reference}",
+                "access_code": f"ac_{reference}",
+                "reference": reference,
+            }}
+
+        if method == "POST" and path == "/transfer/bulk":
+            payload = json.loads(body or b"{}")
+            results = []
+            with self._lock:
+                for transfer in payload.get("transfers") or []:
+                    # Resending a reference returns the existing transfer
+                    existing = self.transfers.setdefault(transfer["reference"], {
+                        **transfer,
+                        "transfer_code": f"TRF_{len(self.transfers) + 1}",
+                        "status": "failed" if transfer["recipient"] in self.failing_recipients else "pending",
+                    })
+                    results.append({key: existing[key] for key in
+                                    ("reference", "recipient", "amount", "transfer_code", "status")})
+            return 200, {"status": True, "message": f"{len(results)} transfers queued.", "data": results}
+
+        match = TRANSFER_VERIFY_PATH.match(path)
+        if method == "GET" and match:
+            transfer = self.transfers.get(match.group(1))
+            if transfer is None:
+                return 400, {"status": False, "message": "Transfer not found"}
+            return 200, {"status": True, "message": "Transfer retrieved", "data": {
+                "reference": match.group(1), "amount": transfer["amount"],
+                "transfer_code": transfer["transfer_code"], "status": transfer["status"],
+            }}
+
+        match = VERIFY_PATH.match(path)
+        if method == "GET" and match:
+            transaction = self.transactions.get(match.group(1))
+            if transaction is None:
+                return 400, {"status": False, "message": "Transaction reference not found"}
+            return 200, {"status": True, "message": "Verification successful", "data": {
+                "id": transaction["id"],
+                "status": transaction["status"],
+                "reference": match.group(1),
+                "amount": transaction["amount"],
+                "gateway_response": "Successful" if transaction["status"] == "success" else "The transaction was not completed",
+                "metadata": transaction["metadata"],
+            }}
+        return 404, {"status": False, "message": "Not found"}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                fake.requests.append((self.command, self.path, self.client_address[1]))
+                with fake._lock:
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    status, payload = fake._handle(self.command, self.path, self.headers, body)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (read timeout) before the answer
+                    self.close_connection = True
+
+            do_GET = _serve
+            do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,33 @@
+"""
+SQLite support for model tests.
+
+The full schema in an in-memory SQLite database. PostGIS Geometry and
+PostgreSQL ARRAY are swapped for string columns by conftest.py, which pytest
+loads before any test module imports the models.
+"""
+import os
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import app.models.init  # noqa: E402,F401  (registers every table on Base.metadata)
+from app.db.base_class import Base  # noqa: E402
+
+
+def make_engine():
+    """In-memory SQLite engine with the full schema created"""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def make_session_factory(engine=None):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine or make_engine())
@@ -0,0 +1,161 @@
+"""
+Tests for bulk produce listing import
+"""
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from sqlite_models import make_engine, make_session_factory
+
+from app.api.deps import get_current_user
+from app.api.endpoints import produce
+from app.models.produce import ProduceListing
+from app.models.user import User, UserType
+
+ROW = {
+    "crop_type": "maize",
+    "quantity_kg": 500,
+    "harvest_date": "2025-06-01T00:00:00",
+    "expected_price_per_kg": 450,
+    "expires_at": "2025-07-01T00:00:00",
+    "location": "Kano",
+}
+
+
+@pytest.fixture
+def engine():
+    return make_engine()
+
+
+@pytest.fixture
+def db(engine):
+    session = make_session_factory(engine)()
+    session.add_all([
+        User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+        User(id="farmer2", phone_number="+2348000000002", user_type=UserType.FARMER),
+        User(id="agg1", phone_number="+2348000000003", user_type=UserType.AGGREGATOR),
+        User(id="buyer1", phone_number="+2348000000004", user_type=UserType.BUYER),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def make_client(db, user_id):
+    app = FastAPI()
+    app.include_router(produce.router, prefix="/produce")
+    app.dependency_overrides[produce.get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: db.get(User, user_id)
+    return TestClient(app)
+
+
+def post(client, body, content_type, **params):
+    return client.post("/produce/bulk", content=body, headers={"Content-Type": content_type}, params=params)
+
+
+def test_json_array_reports_row_errors_and_creates_the_rest(db):
+    client = make_client(db, "farmer1")
+    rows = [ROW, {**ROW, "quantity_kg": "lots"}, {**ROW, "location": "nowhere at all"}, "nope", {**ROW, "crop_type": "Rice"}]
+    response = post(client, json.dumps(rows), "application/json")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 2
+    assert [error["row"] for error in body["errors"]] == [2, 3, 4]
+    assert body["errors"][0]["errors"][0].startswith("quantity_kg:")
+    listings = db.query(ProduceListing).order_by(ProduceListing.crop_type).all()
+    assert sorted(body["ids"]) == sorted(listing.id for listing in listings)
+    assert [(listing.crop_type, listing.region, listing.farmer_id) for listing in listings] == [
+        ("maize", "kano", "farmer1"), ("rice", "kano", "farmer1")
+    ]
+    assert all(listing.matched_at is None for listing in listings)
+
+
+def test_csv_stream_with_quoted_newlines(db):
+    client = make_client(db, "farmer1")
+    header = ",".join(list(ROW) + ["transcription", "shelf_life_days"])
+    values = ",".join(str(value) for value in ROW.values())
+    csv_body = "\r\n".join([
+        header,
+        values + ',"Fresh maize,\nsun dried",14',
+        values + ",,",
+        "maize,abc," + ",".join(str(v) for v in list(ROW.values())[2:]) + ",,",
+    ]) + "\r\n"
+    response = post(client, csv_body.encode(), "text/csv; charset=utf-8")
+
+    body = response.json()
+    assert body["created"] == 2
+    assert [error["row"] for error in body["errors"]] == [3]
+    transcriptions = {listing.transcription for listing in db.query(ProduceListing)}
+    assert transcriptions == {"Fresh maize,\nsun dried", None}
+
+
+def test_aggregator_can_import_for_farmers_but_farmers_cannot(db):
+    ndjson = "\n".join([
+        json.dumps({**ROW, "farmer_id": "farmer2"}),
+        "{not json",
+        json.dumps({**ROW, "farmer_id": "buyer1"}),
+        json.dumps(ROW),
+        json.dumps({**ROW, "farmer_id": "agg1"}),
+        json.dumps({**ROW, "farmer_id": "farmer1"}),
+    ])
+    body = post(make_client(db, "agg1"), ndjson, "application/x-ndjson").json()
+    assert body["created"] == 2
+    messages = [(error["row"], error["errors"][0]) for error in body["errors"]]
+    assert [row for row, _ in messages] == [2, 3, 4, 5]
+    assert messages[0][1].startswith("invalid JSON:")
+    assert messages[1][1] == messages[3][1].replace("agg1", "buyer1") == "farmer_id: no farmer with id 'buyer1'"
+    assert messages[2][1] == "farmer_id: required when importing for farmers"
+    # Listings are only ever owned by farmers
+    assert {listing.farmer_id for listing in db.query(ProduceListing)} == {"farmer2", "farmer1"}
+
+    body = post(make_client(db, "farmer1"), json.dumps({**ROW, "farmer_id": "farmer2"}), "application/x-ndjson").json()
+    assert body["created"] == 0
+    assert "only aggregators" in body["errors"][0]["errors"][0]
+
+    assert post(make_client(db, "buyer1"), "[]", "application/json").status_code == 403
+
+
+def test_atomic_import_creates_nothing_on_error(db):
+    client = make_client(db, "farmer1")
+    response = post(client, json.dumps([ROW, {**ROW, "expires_at": None}]), "application/json", atomic="true")
+    assert response.status_code == 422
+    assert response.json()["detail"]["errors"][0]["row"] == 2
+    assert db.query(ProduceListing).count() == 0
+
+
+def test_rejects_unknown_formats_and_oversized_imports(db, monkeypatch):
+    client = make_client(db, "farmer1")
+    assert post(client, "<xml/>", "application/xml").status_code == 415
+    assert post(client, '{"a": 1}', "application/json").status_code == 400
+
+    monkeypatch.setattr(produce.bulk_import_service, "max_rows", 2)
+    assert post(client, json.dumps([ROW] * 3), "application/json").status_code == 413
+    assert db.query(ProduceListing).count() == 0
+
+
+def test_ten_thousand_rows_use_chunked_multi_row_inserts(engine, db):
+    client = make_client(db, "farmer1")
+    row = {**ROW, "location": "12.0022,8.5920"}
+    ndjson = "\n".join(json.dumps(row) for _ in range(10000))
+
+    inserts = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO PRODUCE_LISTINGS"):
+            inserts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    try:
+        body = post(client, ndjson, "application/x-ndjson").json()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_execute)
+
+    assert body["created"] == 10000
+    assert body["errors"] == []
+    assert len(set(body["ids"])) == 10000
+    assert len(inserts) == 10000 // produce.bulk_import_service.chunk_size
+    assert db.query(ProduceListing).count() == 10000
@@ -0,0 +1,83 @@
+"""
+Tests for single-pass crop, place, unit and intent extraction
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.entity_extraction import AhoCorasick, EntityExtractor, quantity_in_kg
+from app.services.logistics_service import LogisticsService
+from app.services.payment_service import PaymentService
+
+
+class TestEntityExtractor:
+    """
+    Test cases for EntityExtractor
+    """
+
+    def setup_method(self):
+        self.extractor = EntityExtractor()
+
+    def test_crop_synonyms_in_three_languages(self):
+        assert self.extractor.extract("I want to sell my corn").crops == ["maize"]
+        assert self.extractor.extract("Ina da shinkafa da masara").crops == ["rice", "maize"]
+        assert self.extractor.extract("my tumatir dey spoil").crops == ["tomatoes"]
+
+    def test_longest_match_wins(self):
+        entities = self.extractor.extract("20 bags of guinea corn")
+        assert entities.crops == ["sorghum"]
+
+    def test_whole_words_only(self):
+        # "rice" inside "price" and "kano" inside "kanon" are not matches
+        entities = self.extractor.extract("what is the price at kanon")
+        assert entities.crops == []
+        assert entities.locations == []
+
+    def test_locations_resolve_to_state_and_coordinates(self):
+        entities = self.extractor.extract("Take it from Zaria to Dawanau market")
+        assert [location["name"] for location in entities.locations] == ["zaria", "dawanau market"]
+        assert entities.states == ["kaduna", "kano"]
+        assert entities.locations[1]["lat"] == 12.0667
+
+    def test_quantities(self):
+        assert self.extractor.extract("I have 50 bags of maize").quantities == [{"value": 50.0, "unit": "bag"}]
+        assert self.extractor.extract("20bags").quantities == [{"value": 20.0, "unit": "bag"}]
+        # Hausa puts the number after the unit
+        assert self.extractor.extract("buhu hamsin na masara").quantities == [{"value": 50, "unit": "bag"}]
+        # "mile 12" is a market, not a quantity of 12
+        entities = self.extractor.extract("3 baskets to mile 12")
+        assert entities.quantities == [{"value": 3.0, "unit": "basket"}]
+        assert entities.locations[0]["name"] == "mile 12 market"
+
+    def test_to_dict_is_json_ready(self):
+        data = self.extractor.extract("sell 2 tonnes of rice in Kano, how much?").to_dict()
+        assert data["crop_type"] == "rice"
+        assert data["quantity"] == "2 tonne"
+        assert data["intents"] == {"logistics": ["rates"]}
+        assert data["locations"][0]["state"] == "kano"
+
+
+def test_automaton_reports_overlapping_patterns():
+    automaton = AhoCorasick()
+    for word in ["he", "she", "hers"]:
+        automaton.add(word, word)
+    automaton.build()
+    assert [payload for _, _, payload in automaton.iter_matches("she")] == ["she"]
+    assert [payload for _, _, payload in automaton.iter_matches("he hers")] == ["he", "hers"]
+
+
+def test_quantity_in_kg():
+    assert quantity_in_kg({"value": 2, "unit": "bag"}) == 200.0
+    assert quantity_in_kg({"value": 3, "unit": "basket"}) is None
+
+
+def test_services_route_on_extracted_intents():
+    logistics = LogisticsService()
+    assert "Regional transport rate" in logistics.get_transport_info("what is the cost to Katsina")
+    assert "Total for 10 bags: ₦15000" in logistics.get_transport_info("price for 10 bags")
+    assert "To book transport" in logistics.get_transport_info("I want to book a truck")
+
+    payments = PaymentService()
+    assert "Payment History" in payments.get_payment_info("show my payment history")
+    assert "Available Payment Methods" in payments.get_payment_info("what options do I have")
@@ -0,0 +1,123 @@
+"""
+Tests for listing freshness in SQL and NumPy, and the bulk expiry job
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+
+from sqlite_models import make_engine, make_session_factory
+
+from app.crud.crud_produce import expire_produce_listings, search_produce_listings
+from app.models.matching import ListingMatch
+from app.models.produce import ProduceListing
+from app.models.user import User
+from app.schemas.produce import ListingStatus
+from app.services.freshness_service import batch_freshness_scores, listing_freshness_scores, rank_by_freshness
+
+NOW = datetime.utcnow()
+
+# (days since harvest, shelf life): fresh, half-way, spoilt, unknown shelf life, harvested in the future
+CASES = [(0, 10), (5, 10), (2.5, 5), (30, 10), (3, None), (3, 0), (-1.5, 10)]
+
+
+@pytest.fixture
+def engine():
+    return make_engine()
+
+
+@pytest.fixture
+def db(engine):
+    session = make_session_factory(engine)()
+    session.add(User(id="farmer1", phone_number="+2348000000001", user_type="farmer"))
+    for i, (age_days, shelf_life) in enumerate(CASES):
+        session.add(ProduceListing(
+            id=f"prod_{i}",
+            farmer_id="farmer1",
+            crop_type="tomatoes",
+            quantity_kg=100,
+            expected_price_per_kg=400,
+            harvest_date=NOW - timedelta(days=age_days),
+            shelf_life_days=shelf_life,
+            created_at=NOW - timedelta(minutes=i),
+            expires_at=NOW + timedelta(days=3 - i),
+            status=ListingStatus.SOLD if i == 6 else ListingStatus.AVAILABLE,
+            location="SRID=4326;POINT(8.5920 12.0022)",
+        ))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_sql_expression_matches_python_property(db):
+    rows = db.execute(select(ProduceListing, ProduceListing.freshness_score)).all()
+    assert len(rows) == len(CASES)
+    for listing, sql_score in rows:
+        assert sql_score == pytest.approx(listing.freshness_score, abs=1e-9), listing.id
+
+
+def test_postgresql_compiles_with_greatest_and_utc_clock():
+    sql = str(select(ProduceListing.freshness_score).compile(dialect=postgresql.dialect()))
+    assert "GREATEST(" in sql
+    assert "TIMEZONE('utc', NOW())" in sql
+
+
+def test_search_filters_and_orders_by_freshness_in_sql(db):
+    fresh = search_produce_listings(db, status=ListingStatus.AVAILABLE, min_freshness=0.4)
+    assert [listing.id for listing in fresh] == ["prod_0", "prod_1", "prod_2"]
+
+    freshest = search_produce_listings(db, status=ListingStatus.AVAILABLE, sort="freshest", limit=3)
+    assert [listing.id for listing in freshest] == ["prod_0", "prod_2", "prod_1"]
+
+    with pytest.raises(ValueError):
+        search_produce_listings(db, sort="cheapest")
+
+
+def test_numpy_batch_matches_python_property(db):
+    listings = db.query(ProduceListing).order_by(ProduceListing.id).all()
+    scores = listing_freshness_scores(listings, now=NOW)
+    assert list(scores) == pytest.approx([listing.freshness_score for listing in listings], abs=1e-9)
+    assert list(batch_freshness_scores([NOW], [None], now=NOW)) == [0.0]
+
+
+def test_rank_by_freshness(db):
+    listings = db.query(ProduceListing).order_by(ProduceListing.id.desc()).all()
+    ranked = rank_by_freshness(listings, now=NOW)
+    assert [listing.id for listing in ranked][:3] == ["prod_6", "prod_0", "prod_2"]
+    assert [listing.id for listing in rank_by_freshness(listings, top_k=2, min_score=0.5, now=NOW)] == ["prod_6", "prod_0"]
+    assert rank_by_freshness([]) == []
+
+
+def test_expiry_is_a_single_update_and_clears_matches(engine, db):
+    db.add(ListingMatch(listing_id="prod_5", buyer_id="farmer1", score=1, rank=1, crop_score=1,
+                        distance_score=1, volume_score=1, price_score=1, reliability_score=1))
+    db.add(ListingMatch(listing_id="prod_0", buyer_id="farmer1", score=1, rank=1, crop_score=1,
+                        distance_score=1, volume_score=1, price_score=1, reliability_score=1))
+    db.commit()
+
+    updates = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            updates.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    try:
+        assert expire_produce_listings(db, now=NOW) == 2
+    finally:
+        event.remove(engine, "before_cursor_execute", before_execute)
+
+    assert len(updates) == 1
+    statuses = dict(db.query(ProduceListing.id, ProduceListing.status).all())
+    # prod_4 and prod_5 expire; prod_6 is past expiry but already sold
+    assert [i for i, s in sorted(statuses.items()) if s == ListingStatus.EXPIRED] == ["prod_4", "prod_5"]
+    assert statuses["prod_6"] == ListingStatus.SOLD
+    assert [match.listing_id for match in db.query(ListingMatch).all()] == ["prod_0"]
+
+    # Matches written for a listing expired by an earlier run are left alone
+    db.add(ListingMatch(listing_id="prod_4", buyer_id="farmer1", score=1, rank=1, crop_score=1,
+                        distance_score=1, volume_score=1, price_score=1, reliability_score=1))
+    db.commit()
+    assert expire_produce_listings(db, now=NOW) == 0
+    assert sorted(match.listing_id for match in db.query(ListingMatch).all()) == ["prod_0", "prod_4"]
@@ -0,0 +1,101 @@
+"""
+Tests for location resolution and radius search over produce listings
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlite_models import make_session_factory
+
+from app.crud.crud_produce import create_produce_listing, search_produce_listings, update_produce_listing
+from app.models.user import User
+from app.services.geo_service import (
+    LocationError, resolve_location, encode_geohash, geohash_cover, haversine_km
+)
+
+KANO = (12.0022, 8.5920)
+WUDIL = (11.8094, 8.8391)       # ~34 km from Kano
+ZARIA = (11.0855, 7.7199)       # ~140 km from Kano
+LAGOS = (6.6018, 3.3515)
+
+
+@pytest.fixture
+def db():
+    session = make_session_factory()()
+    session.add(User(id="farmer1", phone_number="+2348000000001", user_type="farmer"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_listing(db, location, crop="maize", **kwargs):
+    data = {
+        "farmer_id": "farmer1",
+        "crop_type": crop,
+        "quantity_kg": 500,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": 450,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": location,
+        **kwargs
+    }
+    return create_produce_listing(db, data)
+
+
+def test_resolve_location_formats():
+    assert resolve_location("12.0022, 8.5920").region == "kano"
+    point = resolve_location("SRID=4326;POINT(3.3515 6.6018)")
+    assert (point.latitude, point.longitude, point.region) == (6.6018, 3.3515, "lagos")
+    assert resolve_location("Dawanau market").region == "kano"
+    assert resolve_location(latitude=11.0855, longitude=7.7199).region == "kaduna"
+    assert resolve_location("10,20").ewkt == "SRID=4326;POINT(20.0 10.0)"
+
+    for bad in ["", "somewhere nice", "95,10", "SRID=3857;POINT(1 2)"]:
+        with pytest.raises(LocationError):
+            resolve_location(bad)
+
+
+def test_geohash_and_cover():
+    assert encode_geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    lat, lon = KANO
+    cells = geohash_cover(lat, lon, 50)
+    assert len(cells) == 9
+    # Points inside the radius always fall in one of the covering cells
+    for point in [WUDIL, (lat + 0.4, lon), (lat, lon - 0.4)]:
+        assert any(encode_geohash(*point).startswith(cell) for cell in cells)
+
+
+def test_listing_stores_point_and_derived_columns(db):
+    listing = add_listing(db, "Kano")
+    assert listing.location == f"SRID=4326;POINT({KANO[1]} {KANO[0]})"
+    assert (listing.latitude, listing.longitude, listing.region) == (KANO[0], KANO[1], "kano")
+    assert listing.geohash == encode_geohash(*KANO)
+
+    with pytest.raises(LocationError):
+        add_listing(db, "nowhere at all")
+
+
+def test_radius_search_returns_nearest_first(db):
+    add_listing(db, "Zaria")
+    add_listing(db, "Wudil")
+    add_listing(db, "Kano", crop="rice")
+    add_listing(db, "Lagos")
+
+    results = search_produce_listings(db, radius_km=50, latitude=KANO[0], longitude=KANO[1])
+    assert [listing.region for listing in results] == ["kano", "kano"]
+    assert results[0].distance_km == 0
+    assert results[1].distance_km == pytest.approx(haversine_km(*KANO, *WUDIL), abs=0.01)
+
+    wider = search_produce_listings(db, radius_km=200, latitude=KANO[0], longitude=KANO[1], crop_type="maize")
+    assert [listing.region for listing in wider] == ["kano", "kaduna"]
+
+    # Without a radius nothing is filtered by distance
+    assert len(search_produce_listings(db)) == 4
+
+
+def test_update_moves_listing(db):
+    listing = add_listing(db, "Kano")
+    update_produce_listing(db, listing.id, {"latitude": LAGOS[0], "longitude": LAGOS[1], "location": None})
+    assert listing.region == "lagos"
+    assert search_produce_listings(db, radius_km=20, latitude=KANO[0], longitude=KANO[1]) == []
+    assert len(search_produce_listings(db, radius_km=20, latitude=LAGOS[0], longitude=LAGOS[1])) == 1
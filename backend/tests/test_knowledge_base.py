@@ -0,0 +1,115 @@
+"""
+Tests for the advisory knowledge base
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.knowledge_base import KnowledgeBase, chunk_text
+from app.services.advisory_service import AdvisoryService
+
+
+class InMemoryCollection:
+    """Minimal stand-in for a ChromaDB collection"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, include=None):
+        return {"metadatas": [row["metadata"] for row in self.rows.values()]}
+
+    def add(self, ids, documents, embeddings, metadatas):
+        for id_, document, embedding, metadata in zip(ids, documents, embeddings, metadatas):
+            self.rows[id_] = {"document": document, "embedding": embedding, "metadata": metadata}
+
+    def delete(self, where):
+        self.rows = {
+            id_: row for id_, row in self.rows.items()
+            if row["metadata"]["source"] != where["source"]
+        }
+
+
+def write_docs(root):
+    (root / "maize").mkdir()
+    (root / "rice").mkdir()
+    (root / "maize" / "pests.md").write_text(
+        "# Maize Pests\n\nFall armyworm leaves ragged holes in maize leaves. Spray into the funnel early in the morning."
+    )
+    (root / "rice" / "water.md").write_text(
+        "# Rice Water\n\nKeep 2 to 5cm of water on lowland rice fields after transplanting."
+    )
+    (root / "README.md").write_text("# Not indexed\n\nInstructions for editors.")
+
+
+def make_indexed_kb(root):
+    kb = KnowledgeBase(persist_path=str(root / "index"), documents_dir=str(root))
+    kb._collection = InMemoryCollection()
+    kb.embed = lambda texts: [[float(len(text))] for text in texts]
+    return kb
+
+
+def test_chunks_respect_size_and_overlap():
+    text = "\n\n".join(f"Sentence number {i} about planting maize in rows." for i in range(40))
+    chunks = chunk_text(text, chunk_size=200, overlap=50)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    # Each chunk begins with the tail of the previous one
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.split(" Sentence")[0] in previous
+
+
+def test_short_document_is_one_chunk():
+    assert chunk_text("# Title\n\nOne short paragraph.") == ["Title One short paragraph."]
+
+
+def test_reindex_is_incremental(tmp_path):
+    write_docs(tmp_path)
+    kb = make_indexed_kb(tmp_path)
+
+    first = kb.reindex()
+    assert first["added"] == 2 and first["unchanged"] == 0
+    crops = {row["metadata"]["crop"] for row in kb.collection.rows.values()}
+    assert crops == {"maize", "rice"}
+
+    second = kb.reindex()
+    assert second == {"added": 0, "updated": 0, "unchanged": 2, "removed": 0, "chunks": 0}
+
+    (tmp_path / "maize" / "pests.md").write_text("# Maize Pests\n\nUse crop rotation against stem borers.")
+    (tmp_path / "rice" / "water.md").unlink()
+    third = kb.reindex()
+    assert third["updated"] == 1 and third["removed"] == 1 and third["unchanged"] == 0
+    sources = {row["metadata"]["source"] for row in kb.collection.rows.values()}
+    assert sources == {"maize/pests.md"}
+
+    assert kb.reindex(full=True)["updated"] == 1
+
+
+def test_keyword_fallback_answers_batched_queries(tmp_path):
+    write_docs(tmp_path)
+    kb = KnowledgeBase(documents_dir=str(tmp_path))
+    kb._unavailable_reason = "not installed"
+
+    results = kb.query_batch(["how do I stop armyworm in maize", "water level for rice fields", "xyz"], k=2)
+    assert results[0][0].source == "maize/pests.md"
+    assert results[1][0].crop == "rice"
+    assert results[2] == []
+
+    assert kb.query("armyworm", crop="rice") == []
+
+
+def test_advisory_service_formats_retrieved_advice(tmp_path):
+    write_docs(tmp_path)
+    kb = KnowledgeBase(documents_dir=str(tmp_path))
+    kb._unavailable_reason = "not installed"
+    service = AdvisoryService(kb=kb)
+
+    advice = service.get_crop_advice("fall armyworm in my maize")
+    assert "Maize Advisory" in advice
+    assert "funnel" in advice
+    assert "Source: Maize Pests" in advice
+
+    assert "don't have an extension guide" in service.get_crop_advice("bitcoin")
@@ -0,0 +1,72 @@
+"""
+Tests for local language identification of farmer messages
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.language_service import LanguageDetector, normalize_language
+from app.agents.prompts import get_language_instruction, LANGUAGE_INSTRUCTIONS
+
+
+class TestLanguageDetector:
+    """
+    Test cases for LanguageDetector
+    """
+
+    def setup_method(self):
+        self.detector = LanguageDetector()
+
+    def test_detects_english(self):
+        assert self.detector.detect("How do I treat maize stalk borer on my farm?").language == "english"
+
+    def test_detects_hausa(self):
+        result = self.detector.detect("Ina son sayar da masara buhu hamsin")
+        assert result.language == "hausa"
+        assert result.confidence > 0.5
+
+    def test_hausa_characters_are_strong_evidence(self):
+        assert self.detector.detect("Sannu, ƙwari suna cin masara").language == "hausa"
+
+    def test_detects_pidgin_despite_english_words(self):
+        assert self.detector.detect("I dey find buyer for my tomatoes").language == "pidgin"
+        assert self.detector.detect("Wetin be the price of rice for Kano?").language == "pidgin"
+
+    def test_detects_code_switching(self):
+        assert self.detector.detect("ina son transport for my maize to Kano market please").language == "mixed"
+
+    def test_empty_text_uses_default(self):
+        result = self.detector.detect("", default="hausa")
+        assert result.language == "hausa"
+        assert result.confidence == 0.0
+        assert self.detector.detect("12345", default="pidgin").language == "pidgin"
+
+    def test_whisper_hint_trusts_recent_language_only_when_sure(self):
+        assert self.detector.whisper_hint("hausa") == "ha"
+        assert self.detector.whisper_hint("hausa", recent_language="hausa", recent_confidence=0.4) == "ha"
+        assert self.detector.whisper_hint("hausa", recent_language="english", recent_confidence=0.9) == "en"
+        # One unsure English note must not force English on the next Hausa one
+        assert self.detector.whisper_hint("hausa", recent_language="english", recent_confidence=0.6) is None
+        assert self.detector.whisper_hint("hausa", recent_language="english") is None
+        assert self.detector.whisper_hint(recent_language="hausa", recent_confidence=0.95) == "ha"
+        # Whisper has no Pidgin model
+        assert self.detector.whisper_hint("pidgin") == "en"
+        # Unknown or code-switching users get Whisper auto-detection
+        assert self.detector.whisper_hint() is None
+        assert self.detector.whisper_hint("english", recent_language="mixed") is None
+
+
+def test_normalize_language():
+    from app.models.user import LanguagePreference
+    assert normalize_language(LanguagePreference.HAUSA) == "hausa"
+    assert normalize_language("EN") == "english"
+    assert normalize_language("ha") == "hausa"
+    assert normalize_language("klingon") is None
+    assert normalize_language(None) is None
+
+
+def test_language_instruction_fallback():
+    assert get_language_instruction("hausa") == LANGUAGE_INSTRUCTIONS["hausa"]
+    assert get_language_instruction(None) == LANGUAGE_INSTRUCTIONS["english"]
+    assert get_language_instruction("unknown") == LANGUAGE_INSTRUCTIONS["english"]
@@ -0,0 +1,142 @@
+"""
+Tests for the double-entry ledger written alongside payments and payouts
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlite_models import make_session_factory
+
+from app.crud.crud_produce import create_produce_listing
+from app.crud.crud_transaction import create_reservation
+from app.models.ledger import LedgerEntry, LedgerEntryKind, LedgerPosting
+from app.models.transaction import PaymentMethod, PaymentRecord, PaymentStatus, TransactionStatus
+from app.models.user import FarmerProfile, User, UserType
+from app.services.ledger_service import (
+    ESCROW_ACCOUNT, FEES_ACCOUNT, PAYSTACK_ACCOUNT, UnbalancedEntryError, farmer_account, ledger_service,
+)
+from app.services.payout_gateway import FAILED, LocalPayoutGateway, TransferResult
+from app.services.settlement_service import SettlementService
+from app.workers.payment_events import apply_payment_event, payment_event_id, store_payment_event
+
+NOW = datetime(2026, 3, 2, 12, 0)
+
+
+@pytest.fixture
+def db():
+    factory = make_session_factory()
+    session = factory()
+    session.add_all([
+        User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+        User(id="buyer1", phone_number="+2348000000002", user_type=UserType.BUYER),
+        FarmerProfile(user_id="farmer1", paystack_recipient_code="RCP_farmer1"),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def paid_deal(db, reference, quantity_kg=10.0, now=NOW):
+    """A deal paid through a charge.success webhook"""
+    listing_id = create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": "maize",
+        "quantity_kg": 1000,
+        "harvest_date": now,
+        "expected_price_per_kg": 400,
+        "expires_at": now + timedelta(days=20),
+        "location": "Kano",
+    }).id
+    transaction = create_reservation(db, listing_id, "buyer1", quantity_kg)
+    transaction.status = TransactionStatus.PAYMENT_INITIATED
+    db.add(PaymentRecord(transaction_id=transaction.id, amount=transaction.total_amount, reference=reference,
+                         status=PaymentStatus.PENDING, payment_method=PaymentMethod.PAYSTACK))
+    db.commit()
+    payload = {"event": "charge.success", "data": {"id": reference, "reference": reference,
+                                                   "amount": transaction.total_amount_kobo}}
+    event_id = payment_event_id(payload, json.dumps(payload).encode())
+    store_payment_event(db, event_id, payload)
+    apply_payment_event(db, event_id, now)
+    return transaction
+
+
+def balances(db):
+    return {account: ledger_service.balance(db, account)
+            for account in (PAYSTACK_ACCOUNT, ESCROW_ACCOUNT, FEES_ACCOUNT, farmer_account("farmer1"))}
+
+
+def test_payments_are_posted_once_and_balance(db):
+    deal = paid_deal(db, "pay_1")
+    entry = db.query(LedgerEntry).one()
+    assert (entry.kind, entry.reference, entry.transaction_id) == (LedgerEntryKind.PAYMENT_RECEIVED, "pay_1", deal.id)
+    assert sorted((p.account_id, p.amount_kobo) for p in entry.postings) == [
+        (ESCROW_ACCOUNT, -400_000), (PAYSTACK_ACCOUNT, 400_000),
+    ]
+
+    # Redelivered under another event id: the payment is already recorded
+    payload = {"event": "charge.success", "data": {"id": 999, "reference": "pay_1", "amount": 400_000}}
+    event_id = payment_event_id(payload, json.dumps(payload).encode())
+    store_payment_event(db, event_id, payload)
+    apply_payment_event(db, event_id, NOW)
+    assert db.query(LedgerEntry).count() == 1
+    assert balances(db)[PAYSTACK_ACCOUNT] == 400_000
+
+    with pytest.raises(UnbalancedEntryError):
+        ledger_service.post(db, LedgerEntryKind.PAYOUT, "po_x", [(PAYSTACK_ACCOUNT, -10), (ESCROW_ACCOUNT, 9)])
+    posting = db.query(LedgerPosting).first()
+    posting.amount_kobo = 0
+    with pytest.raises(ValueError, match="append-only"):
+        db.flush()
+    db.rollback()
+
+
+def test_settlement_and_payout_move_money_through_the_accounts(db):
+    paid_deal(db, "pay_1", now=NOW - timedelta(days=1))
+    deals = [paid_deal(db, "pay_2"), paid_deal(db, "pay_3", quantity_kg=5.0)]
+    for deal in deals:
+        deal.status = TransactionStatus.DELIVERED
+    db.commit()
+    assert balances(db)[ESCROW_ACCOUNT] == -1_000_000
+
+    report = asyncio.run(SettlementService(gateway=LocalPayoutGateway()).settle(db, now=NOW + timedelta(hours=1)))
+    assert report.paid == 1
+    # 1.5% of 400,000 and 200,000 kobo stays as fees; the rest left Paystack to the farmer
+    assert balances(db) == {
+        PAYSTACK_ACCOUNT: 400_000 + 9_000,
+        ESCROW_ACCOUNT: -400_000,
+        FEES_ACCOUNT: -9_000,
+        farmer_account("farmer1"): 0,
+    }
+    assert ledger_service.balance_at(db, PAYSTACK_ACCOUNT, NOW) == 400_000
+    assert ledger_service.balance_at(db, farmer_account("farmer1"), NOW + timedelta(hours=2)) == 0
+
+    day = ledger_service.daily_report(db, NOW.date())
+    assert day["balanced"] and day["entries"] == 4
+    paystack = next(row for row in day["accounts"] if row["account_id"] == PAYSTACK_ACCOUNT)
+    assert (paystack["opening_kobo"], paystack["debits_kobo"], paystack["credits_kobo"], paystack["closing_kobo"]) == (
+        400_000, 600_000, 591_000, 409_000,
+    )
+    assert [row["account_id"] for row in ledger_service.daily_report(db, (NOW - timedelta(days=1)).date())["accounts"]] == [
+        ESCROW_ACCOUNT, PAYSTACK_ACCOUNT,
+    ]
+
+
+def test_failed_payout_returns_the_deals_to_escrow(db):
+    deal = paid_deal(db, "pay_1")
+    deal.status = TransactionStatus.DELIVERED
+    db.commit()
+
+    class FailingGateway(LocalPayoutGateway):
+        async def bulk_transfer(self, batch_reference, transfers):
+            return {transfer["reference"]: TransferResult(FAILED, reason="Invalid account") for transfer in transfers}
+
+    report = asyncio.run(SettlementService(gateway=FailingGateway()).settle(db, now=NOW))
+    assert report.failed == 1
+    assert balances(db) == {
+        PAYSTACK_ACCOUNT: 400_000, ESCROW_ACCOUNT: -400_000, FEES_ACCOUNT: 0, farmer_account("farmer1"): 0,
+    }
+    assert [entry.kind for entry in db.query(LedgerEntry).order_by(LedgerEntry.id)] == [
+        LedgerEntryKind.PAYMENT_RECEIVED, LedgerEntryKind.SETTLEMENT, LedgerEntryKind.SETTLEMENT_REVERSAL,
+    ]
@@ -0,0 +1,209 @@
+"""
+Tests for the listing state machine, version checks and quantity reservations
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from sqlite_models import Base
+
+from app.api.deps import get_current_user
+from app.api.endpoints import produce
+from app.crud.crud_produce import create_produce_listing, update_produce_listing
+from app.crud.crud_transaction import create_reservation, update_transaction_status
+from app.models.produce import ProduceListing
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.user import User, UserType
+from app.schemas.produce import ListingStatus
+from app.services.listing_state_service import (
+    InsufficientQuantityError, InvalidTransitionError, ListingUnavailableError, StaleVersionError, can_transition
+)
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    # A file database so separate sessions really are separate connections
+    engine = create_engine(f"sqlite:///{tmp_path / 'listings.db'}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with factory() as db:
+        db.add_all([
+            User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+            User(id="buyer1", phone_number="+2348000000002", user_type=UserType.BUYER),
+            User(id="buyer2", phone_number="+2348000000003", user_type=UserType.BUYER),
+        ])
+        db.commit()
+    yield factory
+    engine.dispose()
+
+
+def add_listing(db, quantity_kg=10.0, price=400.0):
+    return create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": "maize",
+        "quantity_kg": quantity_kg,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": price,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": "Kano",
+    }).id
+
+
+def test_transitions():
+    assert can_transition(ListingStatus.AVAILABLE, ListingStatus.MATCHED)
+    assert can_transition(ListingStatus.MATCHED, ListingStatus.SOLD)
+    assert can_transition(ListingStatus.MATCHED, ListingStatus.AVAILABLE)
+    assert can_transition(ListingStatus.EXPIRED, ListingStatus.AVAILABLE)
+    assert not can_transition(ListingStatus.AVAILABLE, ListingStatus.SOLD)
+    assert not can_transition(ListingStatus.SOLD, ListingStatus.AVAILABLE)
+    assert not can_transition(ListingStatus.CANCELLED, ListingStatus.AVAILABLE)
+
+
+def test_update_rejects_stale_versions_and_invalid_transitions(sessions):
+    with sessions() as db:
+        listing_id = add_listing(db)
+        assert db.get(ProduceListing, listing_id).version == 1
+
+    with sessions() as first, sessions() as second:
+        update_produce_listing(first, listing_id, {"expected_price_per_kg": 420.0, "version": 1})
+        with pytest.raises(StaleVersionError):
+            update_produce_listing(second, listing_id, {"expected_price_per_kg": 380.0, "version": 1})
+
+        # Read before the other writer committed: the flush itself loses the compare-and-swap
+        stale = second.get(ProduceListing, listing_id)
+        update_produce_listing(first, listing_id, {"quantity_kg": 12.0})
+        with pytest.raises(StaleVersionError):
+            update_produce_listing(second, stale.id, {"quantity_kg": 8.0})
+
+        with pytest.raises(InvalidTransitionError):
+            update_produce_listing(first, listing_id, {"status": ListingStatus.SOLD})
+
+    with sessions() as db:
+        listing = db.get(ProduceListing, listing_id)
+        assert (listing.expected_price_per_kg, listing.quantity_kg, listing.version) == (420.0, 12.0, 3)
+        assert listing.status == ListingStatus.AVAILABLE
+
+
+def test_reservations_decrement_quantity_and_never_oversell(sessions):
+    with sessions() as db:
+        listing_id = add_listing(db, quantity_kg=10.0)
+
+    with sessions() as first, sessions() as second:
+        # Both buyers saw 10kg; only the first 8kg reservation can win
+        assert second.get(ProduceListing, listing_id).quantity_kg == 10.0
+        transaction = create_reservation(first, listing_id, "buyer1", 8.0)
+        assert (transaction.total_amount, transaction.status, transaction.seller_id) == (3200.0, TransactionStatus.PENDING, "farmer1")
+        with pytest.raises(InsufficientQuantityError):
+            create_reservation(second, listing_id, "buyer2", 5.0)
+        create_reservation(second, listing_id, "buyer2", 2.0)
+        with pytest.raises(ListingUnavailableError):
+            create_reservation(first, listing_id, "buyer1", 1.0)
+        assert create_reservation(first, "prod_missing", "buyer1", 1.0) is None
+
+    with sessions() as db:
+        listing = db.get(ProduceListing, listing_id)
+        assert (listing.quantity_kg, listing.status) == (0.0, ListingStatus.MATCHED)
+
+    results = []
+
+    def buyer(n):
+        with sessions() as db:
+            try:
+                create_reservation(db, contested_id, f"buyer{n % 2 + 1}", 1.5)
+                results.append(True)
+            except InsufficientQuantityError:
+                results.append(False)
+
+    with sessions() as db:
+        contested_id = add_listing(db, quantity_kg=10.0)
+    threads = [threading.Thread(target=buyer, args=(n,)) for n in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 6 x 1.5kg fit in 10kg; the other buyers lose without anything being oversold
+    assert results.count(True) == 6
+    with sessions() as db:
+        listing = db.get(ProduceListing, contested_id)
+        assert listing.quantity_kg == pytest.approx(1.0)
+        assert listing.status == ListingStatus.AVAILABLE
+        assert listing.version == 7
+
+
+def test_cancelled_deals_release_and_completed_deals_settle(sessions):
+    with sessions() as db:
+        listing_id = add_listing(db, quantity_kg=10.0)
+        first = create_reservation(db, listing_id, "buyer1", 6.0)
+        first_id = first.id
+        second = create_reservation(db, listing_id, "buyer2", 4.0)
+        assert db.get(ProduceListing, listing_id).status == ListingStatus.MATCHED
+
+        update_transaction_status(db, second.id, TransactionStatus.CANCELLED)
+        listing = db.get(ProduceListing, listing_id, populate_existing=True)
+        assert (listing.quantity_kg, listing.status) == (4.0, ListingStatus.AVAILABLE)
+        # Cancelling twice hands nothing back
+        update_transaction_status(db, second.id, TransactionStatus.CANCELLED)
+        assert db.get(ProduceListing, listing_id, populate_existing=True).quantity_kg == 4.0
+
+        third = create_reservation(db, listing_id, "buyer2", 4.0)
+        update_transaction_status(db, first.id, TransactionStatus.COMPLETED)
+        # One deal still open
+        assert db.get(ProduceListing, listing_id, populate_existing=True).status == ListingStatus.MATCHED
+        update_transaction_status(db, third.id, TransactionStatus.COMPLETED)
+        assert db.get(ProduceListing, listing_id, populate_existing=True).status == ListingStatus.SOLD
+
+    with sessions() as first_db, sessions() as second_db:
+        # Loaded at one version, written after another session moved the deal on
+        deal = first_db.get(Transaction, first_id)
+        update_transaction_status(second_db, first_id, TransactionStatus.DISPUTED)
+        with pytest.raises(StaleVersionError):
+            update_transaction_status(first_db, deal.id, TransactionStatus.CANCELLED)
+    with sessions() as db:
+        assert db.get(Transaction, first_id).status == TransactionStatus.DISPUTED
+        assert db.get(ProduceListing, listing_id).quantity_kg == 0.0
+
+
+def test_reserve_endpoint(sessions):
+    with sessions() as db:
+        listing_id = add_listing(db, quantity_kg=5.0)
+
+    user = {"id": "buyer1"}
+
+    def override_get_db():
+        db = sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def override_user():
+        with sessions() as db:
+            return db.get(User, user["id"])
+
+    app = FastAPI()
+    app.include_router(produce.router, prefix="/produce")
+    app.dependency_overrides[produce.get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = override_user
+    client = TestClient(app)
+
+    response = client.post(f"/produce/{listing_id}/reserve", json={"quantity_kg": 3})
+    assert response.status_code == 201
+    assert response.json()["quantity_kg"] == 3.0
+    assert client.post(f"/produce/{listing_id}/reserve", json={"quantity_kg": 3}).status_code == 409
+    assert client.post(f"/produce/{listing_id}/reserve", json={"quantity_kg": 0}).status_code == 422
+    assert client.post("/produce/prod_missing/reserve", json={"quantity_kg": 1}).status_code == 404
+
+    user["id"] = "farmer1"
+    assert client.post(f"/produce/{listing_id}/reserve", json={"quantity_kg": 1}).status_code == 403
+    # The farmer's view is two versions behind now
+    response = client.put(f"/produce/{listing_id}", json={"expected_price_per_kg": 450, "version": 1})
+    assert response.status_code == 409
+    response = client.put(f"/produce/{listing_id}", json={"expected_price_per_kg": 450, "version": 2})
+    assert response.status_code == 200
+    assert response.json()["version"] == 3
@@ -0,0 +1,84 @@
+"""
+Tests for transport quotes: vehicle assignment, batch pricing and the road network
+"""
+import json
+
+import numpy as np
+import pytest
+
+from app.models.logistics import TransportType
+from app.services.geo_service import haversine_km, resolve_location
+from app.services.logistics_cost_service import LogisticsCostService
+from app.services.logistics_service import LogisticsService
+from app.services.road_network import RoadNetwork
+
+KANO = (12.0022, 8.5920)
+ZARIA = (11.0855, 7.7199)
+KADUNA = (10.5105, 7.4165)
+LAGOS = (6.5244, 3.3792)
+
+
+def test_loads_get_the_cheapest_fleet_for_the_distance():
+    service = LogisticsCostService(detour_factor=1.3)
+    quote = service.quote_distances([20, 181, 0, 10, 100, 300], [100, 100, 500, 2000, 2000, 16_000])
+    assert [q.vehicles for q in quote] == [
+        {TransportType.MOTORCYCLE: 1},
+        {TransportType.VAN: 1},  # Too far for a motorcycle
+        {TransportType.VAN: 1},
+        {TransportType.VAN: 2},  # Two vans beat a truck on a short trip...
+        {TransportType.TRUCK_SMALL: 1},  # ...but not on a long one
+        {TransportType.VAN: 1, TransportType.TRUCK_LARGE: 1},
+    ]
+    # ₦1,500 + ₦120/km
+    assert quote[0].cost_kobo == 150_000 + 20 * 12_000
+    assert quote[5].transport_type == TransportType.TRUCK_LARGE
+    with pytest.raises(ValueError):
+        service.quote_distances([10], [0])
+
+
+def test_batch_quotes_match_single_quotes():
+    service = LogisticsCostService(detour_factor=1.3)
+    rng = np.random.default_rng(7)
+    origins = np.column_stack([rng.uniform(5, 13, 200), rng.uniform(3, 13, 200)])
+    destinations = np.column_stack([rng.uniform(5, 13, 200), rng.uniform(3, 13, 200)])
+    quantities = rng.uniform(10, 40_000, 200)
+
+    batch = service.quote_many(origins, destinations, quantities)
+    for i in range(0, 200, 17):
+        single = service.quote(tuple(origins[i]), tuple(destinations[i]), quantities[i])
+        assert (batch[i].vehicles, batch[i].cost_kobo) == (single.vehicles, single.cost_kobo)
+        assert batch[i].distance_km == pytest.approx(1.3 * haversine_km(*origins[i], *destinations[i]))
+        carried = sum(count * {TransportType.MOTORCYCLE: 100, TransportType.VAN: 1000, TransportType.TRUCK_SMALL: 3000,
+                               TransportType.TRUCK_MEDIUM: 5000, TransportType.TRUCK_LARGE: 15_000}[vehicle]
+                      for vehicle, count in batch[i].vehicles.items())
+        assert carried >= quantities[i]
+
+
+def test_road_network_routes_over_roads(tmp_path):
+    path = tmp_path / "roads.json"
+    path.write_text(json.dumps({
+        "nodes": {"kano": KANO, "zaria": ZARIA, "kaduna": KADUNA, "lagos": LAGOS},
+        "roads": [["kano", "zaria", 146.0], ["zaria", "kaduna", 80.0]],
+    }))
+    network = RoadNetwork.from_file(str(path), detour_factor=1.3)
+    service = LogisticsCostService(road_network=network, detour_factor=1.3)
+
+    near_kano = (KANO[0] + 0.01, KANO[1])
+    distances = service.distances_km([near_kano, KANO, KANO], [KADUNA, near_kano, LAGOS])
+    assert distances[0] == pytest.approx(1.3 * haversine_km(*near_kano, *KANO) + 226.0)
+    # Same node: straight line; no road to Lagos: straight line
+    assert distances[1] == pytest.approx(1.3 * haversine_km(*KANO, *near_kano))
+    assert distances[2] == pytest.approx(1.3 * haversine_km(*KANO, *LAGOS))
+    assert list(network._shortest) == [0]  # One Dijkstra for all three pairs from Kano
+
+
+def test_places_resolve_to_route_quotes():
+    kaduna, kano = resolve_location("Kaduna"), resolve_location("Kano")
+    quote = LogisticsCostService(detour_factor=1.3).quote((kaduna.latitude, kaduna.longitude),
+                                                         (kano.latitude, kano.longitude), 5000)
+    assert quote.vehicles == {TransportType.TRUCK_MEDIUM: 1}
+
+    reply = LogisticsService().get_transport_info("cost of transport from Kaduna to Kano for 50 bags")
+    assert "Transport from Kaduna to Kano" in reply
+    assert "Load: 5,000kg by 1 medium truck" in reply
+    assert f"Estimated cost: ₦{quote.cost:,.0f}" in reply
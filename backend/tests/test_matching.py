@@ -0,0 +1,138 @@
+"""
+Tests for buyer-listing matching
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from sqlite_models import make_session_factory
+
+from app.crud.crud_produce import create_produce_listing, update_produce_listing
+from app.models.matching import ListingMatch
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.user import BuyerProfile, User
+from app.services.matching_service import BuyerMatrix, MatchingService, canonical_crop, top_k_indices
+
+KANO = "SRID=4326;POINT(8.5920 12.0022)"
+LAGOS = "SRID=4326;POINT(3.3515 6.6018)"
+
+
+@pytest.fixture
+def db():
+    session = make_session_factory()()
+    session.add(User(id="farmer1", phone_number="+2348000000001", user_type="farmer"))
+    buyers = [
+        # id, location, village, crops, volume, radius, reliability
+        ("maize_kano", KANO, None, ["maize"], 500, 50, 5.0),
+        ("corn_kano_unreliable", KANO, None, ["corn"], 500, 50, 1.0),
+        ("maize_lagos", LAGOS, None, ["maize"], 500, 50, 5.0),
+        ("rice_kano", KANO, None, ["rice"], 500, 50, 5.0),
+        ("anything_wudil", None, "Wudil", [], 5000, 100, 5.0),
+    ]
+    for buyer_id, location, village, crops, volume, radius, reliability in buyers:
+        session.add(User(id=buyer_id, phone_number=f"+234{buyer_id}", user_type="buyer",
+                         location=location, village=village))
+        session.add(BuyerProfile(user_id=buyer_id, preferred_crops=crops, typical_purchase_volume_kg=volume,
+                                 service_radius_km=radius, reliability_score=reliability,
+                                 payment_timeliness_score=reliability))
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_listing(db, crop="maize", location="Kano", quantity_kg=500, price=450):
+    return create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": crop,
+        "quantity_kg": quantity_kg,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": price,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": location,
+    })
+
+
+def test_top_k_indices_matches_full_sort():
+    rng = np.random.default_rng(7)
+    scores = rng.random((20, 300))
+    scores[3, :] = -np.inf
+    best = top_k_indices(scores, 5)
+    expected = np.argsort(-scores, axis=1, kind="stable")[:, :5]
+    assert np.array_equal(np.take_along_axis(scores, best, axis=1), np.take_along_axis(scores, expected, axis=1))
+    assert top_k_indices(scores[:, :3], 5).shape == (20, 3)
+
+
+def test_buyer_matrix_normalises_crops_and_locations(db):
+    matrix = BuyerMatrix.build(db)
+    assert canonical_crop("Masara") == "maize"
+    assert set(matrix.crop_index) == {"maize", "rice"}
+    row = list(matrix.buyer_ids).index("corn_kano_unreliable")
+    assert matrix.prefers_crop[row, matrix.crop_index["maize"]]
+    assert matrix.reliability[row] == 0.0
+    # Village names resolve through the gazetteer
+    wudil = list(matrix.buyer_ids).index("anything_wudil")
+    assert not np.isnan(matrix.latitudes[wudil])
+    assert matrix.generalist[wudil]
+
+
+def test_ranks_buyers_and_excludes_mismatches(db):
+    listing = add_listing(db)
+    matches = MatchingService(matrix_ttl_seconds=0).match_listings(db, [listing])[listing.id]
+
+    # Rice-only and out-of-radius Lagos buyers are excluded
+    assert [m.buyer_id for m in matches] == ["maize_kano", "corn_kano_unreliable", "anything_wudil"]
+    assert [m.rank for m in matches] == [1, 2, 3]
+    best = matches[0]
+    assert best.distance_km == 0
+    assert best.components == {"crop": 1.0, "distance": 1.0, "volume": 1.0, "price": 0.5, "reliability": 1.0}
+    generalist = matches[2]
+    assert generalist.components["crop"] == 0.5
+    assert generalist.components["volume"] == pytest.approx(0.1)
+
+
+def test_price_history_favours_buyers_who_pay_more(db):
+    old = add_listing(db)
+    db.add_all([
+        Transaction(produce_listing_id=old.id, seller_id="farmer1", buyer_id="maize_kano",
+                    agreed_price_per_kg=300, quantity_kg=10, total_amount=3000),
+        Transaction(produce_listing_id=old.id, seller_id="farmer1", buyer_id="corn_kano_unreliable",
+                    agreed_price_per_kg=600, quantity_kg=10, total_amount=6000),
+        Transaction(produce_listing_id=old.id, seller_id="farmer1", buyer_id="anything_wudil",
+                    agreed_price_per_kg=900, quantity_kg=10, total_amount=9000,
+                    status=TransactionStatus.CANCELLED),
+    ])
+    db.commit()
+
+    listing = add_listing(db, price=450)
+    matches = {m.buyer_id: m for m in MatchingService().match_listings(db, [listing])[listing.id]}
+    assert matches["maize_kano"].components["price"] == pytest.approx(300 / 450, abs=1e-4)
+    assert matches["corn_kano_unreliable"].components["price"] == 1.0
+    # Cancelled deals are not purchase history
+    assert matches["anything_wudil"].components["price"] == 0.5
+
+
+def test_incremental_run_only_scores_new_or_updated_listings(db):
+    service = MatchingService(top_k=2, batch_size=1)
+    first, second = add_listing(db), add_listing(db, crop="rice")
+
+    assert service.match_pending(db) == {"listings": 2, "matches": 4}
+    assert [m.buyer_id for m in first.matches] == ["maize_kano", "corn_kano_unreliable"]
+    assert [m.buyer_id for m in second.matches] == ["rice_kano", "anything_wudil"]
+    assert service.match_pending(db) == {"listings": 0, "matches": 0}
+
+    third = add_listing(db, crop="rice")
+    update_produce_listing(db, first.id, {"location": "Lagos"})
+    assert first.matched_at is None
+    assert service.match_pending(db) == {"listings": 2, "matches": 3}
+    assert [m.buyer_id for m in first.matches] == ["maize_lagos"]
+    assert [m.buyer_id for m in third.matches] == ["rice_kano", "anything_wudil"]
+    assert db.query(ListingMatch).count() == 5
+
+
+def test_buyer_matrix_is_cached_until_invalidated(db):
+    service = MatchingService(matrix_ttl_seconds=3600)
+    matrix = service.buyer_matrix(db)
+    assert service.buyer_matrix(db) is matrix
+    service.invalidate()
+    assert service.buyer_matrix(db) is not matrix
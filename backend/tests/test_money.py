@@ -0,0 +1,105 @@
+"""
+Tests for kobo money handling and the admin revenue report
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from sqlite_models import make_session_factory
+
+from app.core.money import from_kobo, line_total_kobo, to_kobo
+from app.crud.crud_produce import create_produce_listing
+from app.crud.crud_transaction import create_reservation
+from app.models.transaction import PaymentMethod, PaymentRecord, PaymentStatus, Transaction, TransactionStatus
+from app.models.user import User, UserType
+from app.schemas.payment import PaymentRecordCreate
+from app.schemas.transaction import TransactionResponse
+from app.services.revenue_service import revenue_service
+
+
+@pytest.fixture
+def db():
+    factory = make_session_factory()
+    session = factory()
+    session.add_all([
+        User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+        User(id="buyer1", phone_number="+2348000000002", user_type=UserType.BUYER),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_listing(db, crop_type="maize", price=0.29):
+    return create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": crop_type,
+        "quantity_kg": 10_000,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": price,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": "Kano",
+    }).id
+
+
+def test_conversions_are_exact():
+    assert int(0.29 * 100) == 28  # The bug being fixed
+    assert to_kobo(0.29) == 29
+    assert to_kobo(0.1 + 0.2) == 30
+    assert to_kobo("1234.565") == 123457
+    assert to_kobo(Decimal("19.99")) == 1999
+    assert from_kobo(29) == Decimal("0.29")
+    assert to_kobo(from_kobo(987654321)) == 987654321
+    # Rounded once, on the total
+    assert line_total_kobo(0.29, 3.3) == 96
+    assert line_total_kobo(400.1, 3.3) == 132033
+
+
+def test_schemas_take_and_give_naira():
+    record = PaymentRecordCreate(transaction_id="txn_1", payment_method="PAYSTACK", amount=0.29, currency="NGN",
+                                 reference="pay_1", status="PENDING")
+    assert record.amount == Decimal("0.29")
+    assert record.model_dump(mode="json")["amount"] == 0.29
+
+
+def test_models_store_kobo(db):
+    listing_id = add_listing(db)
+    transaction = create_reservation(db, listing_id, "buyer1", 3.3)
+    assert transaction.total_amount_kobo == 96
+    assert transaction.agreed_price_per_kg_kobo == 29
+    assert transaction.total_amount == Decimal("0.96")
+
+    db.add(PaymentRecord(transaction_id=transaction.id, amount=transaction.total_amount, reference="pay_1",
+                         status=PaymentStatus.PENDING, payment_method=PaymentMethod.PAYSTACK))
+    db.commit()
+    assert db.query(PaymentRecord).one().amount_kobo == 96
+    # The naira attribute still works in SQL
+    assert db.query(Transaction).filter(Transaction.total_amount > 0.95).count() == 1
+    assert TransactionResponse.model_validate(transaction, from_attributes=True).model_dump(mode="json")["total_amount"] == 0.96
+
+
+def test_revenue_report_sums_kobo_in_the_database(db):
+    start = datetime.utcnow() - timedelta(days=1)
+    maize, beans = add_listing(db, "maize", 0.1), add_listing(db, "beans", 1000)
+    deals = [create_reservation(db, maize, "buyer1", 1.0) for _ in range(10)]
+    deals.append(create_reservation(db, beans, "buyer1", 2.5))
+    for n, deal in enumerate(deals):
+        deal.status = TransactionStatus.PAYMENT_CONFIRMED
+        db.add(PaymentRecord(transaction_id=deal.id, amount=deal.total_amount, reference=f"pay_{n}",
+                             status=PaymentStatus.SUCCESS, payment_method=PaymentMethod.PAYSTACK,
+                             confirmed_at=datetime.utcnow()))
+    db.add(PaymentRecord(transaction_id=deals[0].id, amount=50, reference="pay_failed",
+                         status=PaymentStatus.FAILED, payment_method=PaymentMethod.PAYSTACK))
+    db.commit()
+
+    report = revenue_service.report(db, start)
+    # 10 x 0.1 naira sums to exactly 1 naira, unlike summing floats
+    assert sum([0.1] * 10) != 1.0
+    assert report["payments"]["SUCCESS"] == {"count": 11, "kobo": 250_100, "naira": 2501.0}
+    assert report["payments"]["FAILED"] == {"count": 1, "kobo": 5000, "naira": 50.0}
+    assert report["payments"]["REFUNDED"]["count"] == 0
+    assert [day["kobo"] for day in report["collected_by_day"]] == [250_100]
+    assert [(row["crop_type"], row["deals"], row["kobo"]) for row in report["deal_value_by_crop"]] == [
+        ("beans", 1, 250_000), ("maize", 10, 100),
+    ]
@@ -0,0 +1,153 @@
+"""
+Tests for the Paystack webhook inbox and the payment event worker
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlite_models import make_session_factory
+
+from app.crud.crud_produce import create_produce_listing
+from app.crud.crud_transaction import create_reservation
+from app.models.logistics import LogisticsRequest, TransportType
+from app.models.notification import Notification, NotificationType
+from app.models.payment_event import PaymentEvent, PaymentEventStatus
+from app.models.transaction import PaymentMethod, PaymentRecord, PaymentStatus, TransactionStatus
+from app.models.user import User, UserType
+from app.workers.payment_events import (
+    PaymentEventProcessor, apply_payment_event, payment_event_id, store_payment_event
+)
+
+
+@pytest.fixture
+def factory():
+    factory = make_session_factory()
+    with factory() as db:
+        db.add_all([
+            User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+            User(id="buyer1", phone_number="+2348000000002", user_type=UserType.BUYER, village="Fagge"),
+        ])
+        db.commit()
+    return factory
+
+
+@pytest.fixture
+def db(factory):
+    session = factory()
+    yield session
+    session.close()
+
+
+def pending_payment(db, reference="pay_ref1", quantity_kg=500.0):
+    listing_id = create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": "maize",
+        "quantity_kg": 1000,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": 400,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": "Kano",
+    }).id
+    transaction = create_reservation(db, listing_id, "buyer1", quantity_kg)
+    transaction.status = TransactionStatus.PAYMENT_INITIATED
+    db.add(PaymentRecord(transaction_id=transaction.id, amount=transaction.total_amount, reference=reference,
+                         status=PaymentStatus.PENDING, payment_method=PaymentMethod.PAYSTACK))
+    db.commit()
+    return transaction
+
+
+def receive(db, event, reference, amount_kobo, charge_id=1001):
+    payload = {"event": event, "data": {"id": charge_id, "reference": reference, "amount": amount_kobo}}
+    event_id = payment_event_id(payload, json.dumps(payload).encode())
+    return event_id, store_payment_event(db, event_id, payload)
+
+
+def test_inbox_deduplicates_redeliveries(db):
+    event_id, stored = receive(db, "charge.success", "pay_ref1", 100)
+    assert event_id == "charge.success:1001"
+    assert stored.status == PaymentEventStatus.RECEIVED
+    assert receive(db, "charge.success", "pay_ref1", 100)[1] is None
+    # Same charge, different event: stored separately
+    assert receive(db, "charge.failed", "pay_ref1", 100)[1] is not None
+    assert db.query(PaymentEvent).count() == 2
+
+    payload = {"event": "transfer.success", "data": {"reference": "trf_1"}}
+    body = json.dumps(payload).encode()
+    assert payment_event_id(payload, body) == payment_event_id(payload, body)
+    assert payment_event_id(payload, body).startswith("transfer.success:")
+
+
+def test_charge_success_applies_everything_in_one_go(db):
+    transaction = pending_payment(db)
+    event_id, _ = receive(db, "charge.success", "pay_ref1", 20_000_000)
+
+    status, pushes = apply_payment_event(db, event_id)
+    assert status == PaymentEventStatus.PROCESSED
+    assert {user_id for user_id, _ in pushes} == {"buyer1", "farmer1"}
+
+    db.expire_all()
+    record = db.query(PaymentRecord).filter(PaymentRecord.reference == "pay_ref1").one()
+    assert record.status == PaymentStatus.SUCCESS and record.confirmed_at is not None
+    assert record.transaction.status == TransactionStatus.PAYMENT_CONFIRMED
+    assert record.transaction.payment_confirmed_at is not None
+
+    logistics = db.query(LogisticsRequest).filter(LogisticsRequest.transaction_id == transaction.id).one()
+    assert logistics.transport_type == TransportType.VAN
+    # No buyer location yet: no route to price
+    assert logistics.estimated_cost is None
+    assert logistics.dropoff_description == "Fagge"
+    notifications = db.query(Notification).filter(Notification.notification_type == NotificationType.PAYMENT_CONFIRMATION).all()
+    assert sorted(n.user_id for n in notifications) == ["buyer1", "farmer1"]
+    assert all(n.logistics_id == logistics.id for n in notifications)
+
+    # Applying again is a no-op
+    assert apply_payment_event(db, event_id) == (PaymentEventStatus.PROCESSED, [])
+    assert db.query(Notification).count() == 2
+    assert db.query(LogisticsRequest).count() == 1
+
+
+def test_mismatched_and_late_events_are_ignored(db):
+    pending_payment(db, "pay_ref2")
+    short_id, _ = receive(db, "charge.success", "pay_ref2", 100, charge_id=2001)
+    assert apply_payment_event(db, short_id)[0] == PaymentEventStatus.IGNORED
+    assert "Amount mismatch" in db.get(PaymentEvent, short_id).last_error
+
+    failed_id, _ = receive(db, "charge.failed", "pay_ref2", None, charge_id=2002)
+    assert apply_payment_event(db, failed_id)[0] == PaymentEventStatus.PROCESSED
+    record = db.query(PaymentRecord).filter(PaymentRecord.reference == "pay_ref2").one()
+    assert record.status == PaymentStatus.FAILED
+    assert record.transaction.status == TransactionStatus.PAYMENT_INITIATED
+
+    success_id, _ = receive(db, "charge.success", "pay_ref2", 20_000_000, charge_id=2003)
+    assert apply_payment_event(db, success_id)[0] == PaymentEventStatus.PROCESSED
+    late_id, _ = receive(db, "charge.failed", "pay_ref2", None, charge_id=2004)
+    assert apply_payment_event(db, late_id)[0] == PaymentEventStatus.IGNORED
+    db.expire_all()
+    assert db.query(PaymentRecord).filter(PaymentRecord.reference == "pay_ref2").one().status == PaymentStatus.SUCCESS
+
+    unknown_id, _ = receive(db, "charge.success", "pay_missing", 100, charge_id=2005)
+    assert apply_payment_event(db, unknown_id)[0] == PaymentEventStatus.IGNORED
+
+
+def test_worker_replays_pending_events_on_start(factory, db):
+    pending_payment(db, "pay_ref3")
+    event_id, _ = receive(db, "charge.success", "pay_ref3", 20_000_000, charge_id=3001)
+    processor = PaymentEventProcessor(session_factory=factory)
+    processor.queue.poll_timeout = 0.05
+
+    async def scenario():
+        await processor.start()
+        try:
+            for _ in range(100):
+                with factory() as check:
+                    if check.get(PaymentEvent, event_id).status != PaymentEventStatus.RECEIVED:
+                        return
+                await asyncio.sleep(0.02)
+        finally:
+            await processor.stop()
+
+    asyncio.run(scenario())
+    db.expire_all()
+    assert db.get(PaymentEvent, event_id).status == PaymentEventStatus.PROCESSED
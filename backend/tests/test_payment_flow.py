@@ -5,7 +5,7 @@ Verifies initialization and webhook processing with database tracking
 import sys
 import os
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -34,7 +34,7 @@ class MockArray(TypeDecorator):
 import sys
 import os
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -54,6 +54,8 @@ from app.api.endpoints.payments import get_db
 from app.models.user import User
 from app.models.transaction import Transaction, TransactionStatus, PaymentStatus, PaymentRecord
 from app.models.produce import ProduceListing
+from app.models.payment_event import PaymentEventStatus
+from app.workers.payment_events import apply_payment_event
 
 # Setup in-memory DB
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -143,7 +145,7 @@ def test_initialize_payment(client, test_data, db_session):
     # Mock PaymentService to avoid real API call
     with patch("app.api.endpoints.payments.PaymentService") as MockService:
         mock_instance = MockService.return_value
-        mock_instance.initialize_transaction.return_value = {
+        mock_instance.initialize_transaction = AsyncMock(return_value={
             "status": True,
             "message": "Authorization URL created",
             "data": {
@@ -151,7 +153,7 @@ def test_initialize_payment(client, test_data, db_session):
                 "access_code": "ac_test123",
                 "reference": "pay_test_ref"
             }
-        }
+        })
         
         # Call endpoint
         response = client.post(f"/api/v1/payments/initialize?transaction_id={test_data['transaction_id']}")
@@ -209,11 +211,23 @@ def test_verify_payment_webhook(client, test_data, db_session):
     # We need to mock signature verification if secret is set
     # Or just rely on the fact that if secret is None (default in test env), it skips verification
     
-    with patch("app.core.config.settings.PAYSTACK_WEBHOOK_SECRET", None):
+    with patch("app.core.config.settings.PAYSTACK_WEBHOOK_SECRET", None), \
+            patch("app.api.endpoints.payments.payment_event_processor.submit", new=AsyncMock()) as submit:
         response = client.post("/api/v1/payments/verify", json=payload)
-        
+        # A redelivery while the event is still pending is queued again
+        pending = client.post("/api/v1/payments/verify", json=payload)
+        event_id = response.json()["event_id"]
+        status, _ = apply_payment_event(db_session, event_id)
+        # Once applied, a redelivery is acknowledged but not queued again
+        duplicate = client.post("/api/v1/payments/verify", json=payload)
+
+    # Acknowledged at once; the event worker applies it
     assert response.status_code == 200
-    assert response.json()["status"] == "success"
+    assert response.json()["status"] == "accepted"
+    assert pending.json()["status"] == "requeued"
+    assert duplicate.json()["status"] == "duplicate"
+    assert [call.args for call in submit.await_args_list] == [(event_id,), (event_id,)]
+    assert status == PaymentEventStatus.PROCESSED
     
     # Verify DB updates
     db_session.refresh(record)
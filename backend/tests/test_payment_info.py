@@ -0,0 +1,133 @@
+"""
+Tests for the Sales agent's payment status and history answers
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from sqlite_models import make_session_factory
+
+from app.agents.tools.payment_tools import get_payment_info, process_payment
+from app.crud.crud_produce import create_produce_listing
+from app.crud.crud_transaction import create_reservation
+from app.models.transaction import PaymentMethod, PaymentRecord, PaymentStatus, TransactionStatus
+from app.models.user import User, UserType
+from app.services.cache_service import response_cache
+from app.services.payment_service import HISTORY_PAGE_SIZE, PaymentService
+from app.workers.payment_events import apply_payment_event, payment_event_id, store_payment_event
+
+
+@pytest.fixture
+def db():
+    factory = make_session_factory()
+    session = factory()
+    session.add_all([
+        User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+        User(id="buyer1", phone_number="+2348000000002", user_type=UserType.BUYER),
+        User(id="buyer2", phone_number="+2348000000003", user_type=UserType.BUYER),
+    ])
+    session.commit()
+    response_cache.local.clear()
+    yield session
+    session.close()
+
+
+def add_deal(db, buyer_id="buyer1", reference=None, quantity_kg=10.0, matched_at=None):
+    listing_id = create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": "maize",
+        "quantity_kg": 1000,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": 400,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": "Kano",
+    }).id
+    transaction = create_reservation(db, listing_id, buyer_id, quantity_kg)
+    if matched_at is not None:
+        transaction.matched_at = matched_at
+    if reference:
+        transaction.status = TransactionStatus.PAYMENT_INITIATED
+        db.add(PaymentRecord(transaction_id=transaction.id, amount=transaction.total_amount, reference=reference,
+                             status=PaymentStatus.PENDING, payment_method=PaymentMethod.PAYSTACK))
+    db.commit()
+    return transaction
+
+
+class CountQueries:
+    def __init__(self, db):
+        self.engine = db.get_bind()
+        self.count = 0
+
+    def record(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self.record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self.record)
+
+
+def test_status_comes_from_the_users_deals_in_one_query(db):
+    transaction = add_deal(db, reference="pay_ref1")
+    question = f"status {transaction.id}"
+    service = PaymentService()
+
+    with CountQueries(db) as queries:
+        answer = service.get_payment_info(question, user_id="buyer1", db=db)
+    assert queries.count == 1
+    assert f"Transaction {transaction.id}: 10kg maize for ₦4,000" in answer
+    assert "Payment: Payment initiated, awaiting confirmation" in answer
+    assert "Reference: pay_ref1" in answer
+
+    # By payment reference, and for the seller too
+    assert transaction.id in service.get_payment_info("status pay_ref1", user_id="farmer1", db=db)
+    # Another buyer's deal is not visible
+    assert "couldn't find a transaction" in service.get_payment_info(f"status {transaction.id}", user_id="buyer2", db=db)
+    # No account, no lookup
+    assert "couldn't find your account" in service.get_payment_info("check my payment status", db=db)
+
+
+def test_history_is_paginated(db):
+    now = datetime.utcnow()
+    deals = [add_deal(db, matched_at=now - timedelta(days=n)) for n in range(HISTORY_PAGE_SIZE + 2)]
+    service = PaymentService()
+
+    first = service.get_payment_info("show my payment history", user_id="buyer1", db=db)
+    assert f"1. {deals[0].id} - ₦4,000 - Bought 10kg maize" in first
+    assert deals[HISTORY_PAGE_SIZE].id not in first
+    assert "history page 2" in first
+
+    second = service.get_payment_info("payment history page 2", user_id="buyer1", db=db)
+    assert f"{HISTORY_PAGE_SIZE + 1}. {deals[HISTORY_PAGE_SIZE].id}" in second
+    assert "page 3" not in second
+    assert "Sold 10kg maize" in service.get_payment_info("history", user_id="farmer1", db=db)
+
+
+def test_answers_are_cached_until_a_payment_event(db):
+    transaction = add_deal(db, reference="pay_ref2")
+    service = PaymentService()
+    question = f"status {transaction.id}"
+    service.get_payment_info(question, user_id="buyer1", db=db)
+
+    with CountQueries(db) as queries:
+        cached = service.get_payment_info(question, user_id="buyer1", db=db)
+    assert queries.count == 0
+    assert "awaiting confirmation" in cached
+
+    payload = {"event": "charge.success", "data": {"id": 5001, "reference": "pay_ref2", "amount": 400_000}}
+    event_id = payment_event_id(payload, json.dumps(payload).encode())
+    store_payment_event(db, event_id, payload)
+    apply_payment_event(db, event_id)
+
+    answer = service.get_payment_info(question, user_id="buyer1", db=db)
+    assert "Payment: Payment confirmed and processed" in answer
+    assert "Deal: payment confirmed" in answer
+
+
+def test_tools_take_the_user_from_agent_state():
+    for agent_tool in (get_payment_info, process_payment):
+        assert "user_id" not in agent_tool.tool_call_schema.model_json_schema()["properties"]
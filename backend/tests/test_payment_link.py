@@ -0,0 +1,203 @@
+"""
+Tests for the Sales agent's process_payment tool against a local fake Paystack server
+"""
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, StateGraph
+from langgraph.prebuilt import ToolNode
+
+from fake_paystack import FakePaystack
+from sqlite_models import make_session_factory
+
+from app.agents.state import AgentState
+from app.agents.tools import payment_tools
+from app.crud.crud_produce import create_produce_listing
+from app.crud.crud_transaction import create_reservation
+from app.models.transaction import PaymentRecord, PaymentStatus, Transaction, TransactionStatus
+from app.models.user import User, UserType
+from app.services.payment_service import PaymentService
+from app.services.paystack_client import PaystackClient
+
+
+@pytest.fixture
+def factory():
+    factory = make_session_factory()
+    with factory() as db:
+        db.add_all([
+            User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+            User(id="buyer1", phone_number="+2348000000002", user_type=UserType.BUYER),
+            User(id="buyer2", phone_number="+2348000000003", user_type=UserType.BUYER),
+        ])
+        db.commit()
+    return factory
+
+
+@pytest.fixture
+def db(factory):
+    session = factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def fake():
+    with FakePaystack() as server:
+        yield server
+
+
+@pytest.fixture
+def service(fake):
+    service = PaymentService()
+    service.paystack = PaystackClient(secret_key=fake.secret_key, base_url=fake.url, backoff_seconds=0.01,
+                                      max_retries=0, read_timeout=2.0, connect_timeout=1.0)
+    return service
+
+
+def add_deal(db, buyer_id="buyer1", quantity_kg=10.0):
+    listing_id = create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": "maize",
+        "quantity_kg": 1000,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": 400,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": "Kano",
+    }).id
+    return create_reservation(db, listing_id, buyer_id, quantity_kg).id
+
+
+def run(service, coro):
+    async def scenario():
+        try:
+            return await coro
+        finally:
+            await service.paystack.aclose()
+
+    return asyncio.run(scenario())
+
+
+def initializations(fake):
+    return [path for method, path, _ in fake.requests if path == "/transaction/initialize"]
+
+
+def test_retried_calls_reuse_the_first_payment(db, fake, service):
+    deal_id = add_deal(db)
+
+    async def calls():
+        first = await service.create_payment_link(db, "buyer1", 4000.0, "Maize 10kg", session_id="chat_1")
+        again = await service.create_payment_link(db, "buyer1", 4000, "  maize   10KG ", session_id="chat_1")
+        return first, again
+
+    first, again = run(service, calls())
+    assert first["status"] and first["transaction_id"] == deal_id
+    assert first["authorization_url"] == f"https://checkout.paystack.com/{first['reference']}"
+    assert again["authorization_url"] == first["authorization_url"]
+    assert len(initializations(fake)) == 1
+    assert fake.transactions[first["reference"]]["amount"] == 400_000
+
+    db.expire_all()
+    record = db.query(PaymentRecord).one()
+    assert record.status == PaymentStatus.PENDING and record.reference == first["reference"]
+    assert db.get(Transaction, deal_id).status == TransactionStatus.PAYMENT_INITIATED
+
+
+def test_reworded_calls_and_other_sessions_reuse_the_open_payment(db, fake, service):
+    deal_id = add_deal(db)
+    db.add(PaymentRecord(transaction_id=deal_id, amount_kobo=400_000, reference="pay_from_initialize",
+                         status=PaymentStatus.PENDING, paystack_data={"access_code": "ac_1"}))
+    db.commit()
+
+    async def calls():
+        return [
+            await service.create_payment_link(db, "buyer1", 4000.0, "Maize 10kg", session_id="chat_1"),
+            await service.create_payment_link(db, "buyer1", 4000.0, "Pay for my maize", session_id="chat_9"),
+        ]
+
+    first, again = run(service, calls())
+    assert first["reference"] == again["reference"] == "pay_from_initialize"
+    assert again["authorization_url"] == "https://checkout.paystack.com/ac_1"
+    assert initializations(fake) == []
+    assert db.query(PaymentRecord).count() == 1
+
+
+def test_concurrent_calls_start_one_paystack_transaction(factory, fake, service):
+    with factory() as db:
+        add_deal(db)
+    fake.latency = 0.1
+
+    async def call():
+        with factory() as db:
+            return await service.create_payment_link(db, "buyer1", 4000.0, "Maize 10kg", session_id="chat_2")
+
+    async def calls():
+        return await asyncio.gather(call(), call(), call())
+
+    results = run(service, calls())
+    assert len(initializations(fake)) == 1
+    assert len({result["reference"] for result in results}) == 1
+    assert sum(1 for result in results if result.get("authorization_url")) == 1
+    with factory() as db:
+        assert db.query(PaymentRecord).count() == 1
+
+
+def test_only_the_buyers_open_deal_for_that_amount_is_charged(db, fake, service):
+    deal_id = add_deal(db)
+
+    async def calls():
+        return [
+            await service.create_payment_link(db, "buyer1", 3999.0, "Maize"),
+            await service.create_payment_link(db, "buyer2", 4000.0, "Maize", transaction_id=deal_id),
+            await service.create_payment_link(db, "buyer1", 5000.0, "Maize", transaction_id=deal_id),
+        ]
+
+    no_deal, not_theirs, wrong_amount = run(service, calls())
+    assert not no_deal["status"] and "no deal awaiting" in no_deal["message"]
+    assert not not_theirs["status"]
+    assert "is for ₦4,000.00" in wrong_amount["message"]
+    assert fake.requests == []
+    assert db.query(PaymentRecord).count() == 0
+
+
+def test_failures_free_the_key_for_another_attempt(db, fake, service):
+    add_deal(db)
+    fake.fail_next(1, status=503)
+
+    async def calls():
+        with pytest.raises(Exception, match="Payment initialization failed"):
+            await service.create_payment_link(db, "buyer1", 4000.0, "Maize", session_id="chat_3")
+        first = await service.create_payment_link(db, "buyer1", 4000.0, "Maize", session_id="chat_3")
+        # The payment fails at Paystack; paying again starts a new one
+        db.query(PaymentRecord).update({PaymentRecord.status: PaymentStatus.FAILED})
+        db.commit()
+        second = await service.create_payment_link(db, "buyer1", 4000.0, "Maize", session_id="chat_3")
+        return first, second
+
+    first, second = run(service, calls())
+    assert first["status"] and second["status"]
+    assert first["reference"] != second["reference"]
+    assert db.query(PaymentRecord).count() == 2
+
+
+def test_tool_takes_user_and_session_from_agent_state(factory, fake, service):
+    with factory() as db:
+        deal_id = add_deal(db)
+    graph = StateGraph(AgentState)
+    graph.add_node("SalesTools", ToolNode([payment_tools.process_payment]))
+    graph.set_entry_point("SalesTools")
+    graph.add_edge("SalesTools", END)
+    call = AIMessage(content="", tool_calls=[{
+        "name": "process_payment", "args": {"amount": 4000.0, "description": "Maize 10kg"}, "id": "call_1",
+    }])
+    state = {"messages": [call], "next": "", "user_id": "buyer1", "session_id": "chat_4", "user_info": {},
+             "language": "english"}
+
+    with patch.object(payment_tools, "payment_service", service), patch.object(payment_tools, "SessionLocal", factory):
+        result = run(service, graph.compile().ainvoke(state))
+
+    reply = result["messages"][-1].content
+    assert f"(transaction {deal_id})" in reply and "https://checkout.paystack.com/pay_" in reply
+    assert "user_id" not in payment_tools.process_payment.tool_call_schema.model_json_schema()["properties"]
@@ -0,0 +1,211 @@
+"""
+Tests for the farmer settlement job against a local payout gateway and a fake Paystack server
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from fake_paystack import FakePaystack
+from sqlite_models import make_session_factory
+
+from app.crud.crud_produce import create_produce_listing
+from app.crud.crud_transaction import create_reservation
+from app.models.payout import Payout, PayoutBatch, PayoutBatchStatus, PayoutStatus, SettlementEntry
+from app.models.produce import ProduceListing
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.user import FarmerProfile, User, UserType
+from app.schemas.produce import ListingStatus
+from app.services.paystack_client import PaystackClient
+from app.services.payout_gateway import LocalPayoutGateway, PaystackPayoutGateway
+from app.services.settlement_service import SettlementService
+
+NOW = datetime(2026, 3, 2, 12, 0)
+
+
+@pytest.fixture
+def db():
+    factory = make_session_factory()
+    session = factory()
+    session.add_all([
+        User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+        User(id="farmer2", phone_number="+2348000000002", user_type=UserType.FARMER),
+        User(id="farmer3", phone_number="+2348000000003", user_type=UserType.FARMER),
+        User(id="buyer1", phone_number="+2348000000004", user_type=UserType.BUYER),
+        FarmerProfile(user_id="farmer1", paystack_recipient_code="RCP_farmer1"),
+        FarmerProfile(user_id="farmer2", paystack_recipient_code="RCP_farmer2"),
+        FarmerProfile(user_id="farmer3"),  # No bank account yet
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_deals(db, farmer_id, count, price=400, quantity_kg=10.0, status=TransactionStatus.DELIVERED,
+              listing_kg=10_000):
+    listing_id = create_produce_listing(db, {
+        "farmer_id": farmer_id,
+        "crop_type": "maize",
+        "quantity_kg": listing_kg,
+        "harvest_date": NOW,
+        "expected_price_per_kg": price,
+        "expires_at": NOW + timedelta(days=20),
+        "location": "Kano",
+    }).id
+    deals = [create_reservation(db, listing_id, "buyer1", quantity_kg) for _ in range(count)]
+    for deal in deals:
+        deal.status = status
+    db.commit()
+    return [deal.id for deal in deals]
+
+
+class LostResponseGateway(LocalPayoutGateway):
+    """Pays, then loses the answer the first time (a timeout after Paystack accepted the batch)"""
+
+    def __init__(self):
+        super().__init__()
+        self.lose_next = True
+
+    async def bulk_transfer(self, batch_reference, transfers):
+        results = await super().bulk_transfer(batch_reference, transfers)
+        if self.lose_next:
+            self.lose_next = False
+            raise TimeoutError("read timeout")
+        return results
+
+
+class AcceptedButUnansweredGateway(LocalPayoutGateway):
+    """Takes every transfer but never answers the bulk call; some transfers cannot be verified either"""
+
+    def __init__(self, unverifiable=()):
+        super().__init__()
+        self.unverifiable = set(unverifiable)
+
+    async def bulk_transfer(self, batch_reference, transfers):
+        await super().bulk_transfer(batch_reference, transfers)
+        raise TimeoutError("read timeout")
+
+    async def transfer_statuses(self, references):
+        results = await super().transfer_statuses(references)
+        return {reference: result for reference, result in results.items() if reference not in self.unverifiable}
+
+
+def test_delivered_deals_are_paid_per_farmer_in_bulk_calls(db):
+    farmer1 = add_deals(db, "farmer1", 3, price=333.33)
+    farmer2 = add_deals(db, "farmer2", 2, listing_kg=20)  # Sold out: MATCHED
+    add_deals(db, "farmer3", 1)
+    in_transit = add_deals(db, "farmer1", 1, status=TransactionStatus.IN_LOGISTICS)
+    gateway = LocalPayoutGateway()
+    service = SettlementService(gateway=gateway, batch_size=1)
+
+    report = asyncio.run(service.settle(db, now=NOW))
+    assert (report.transactions, report.batches, report.submitted, report.paid) == (5, 2, 2, 2)
+    assert report.farmers_without_account == ["farmer3"]
+    assert len(gateway.calls) == 2
+
+    payouts = {payout.farmer_id: payout for payout in db.query(Payout).all()}
+    # 3 x 333,330 kobo; 1.5% fee of 4,999.95 naira rounded per deal
+    assert (payouts["farmer1"].gross_kobo, payouts["farmer1"].fee_kobo) == (999_990, 3 * 5_000)
+    assert (payouts["farmer2"].gross_kobo, payouts["farmer2"].fee_kobo) == (800_000, 2 * 6_000)
+    assert gateway.transfers[payouts["farmer2"].reference]["amount"] == 788_000
+    assert gateway.transfers[payouts["farmer1"].reference]["recipient"] == "RCP_farmer1"
+    for payout in payouts.values():
+        assert payout.status == PayoutStatus.PAID
+        assert payout.net_kobo == sum(entry.net_kobo for entry in payout.entries)
+    assert {batch.status for batch in db.query(PayoutBatch).all()} == {PayoutBatchStatus.COMPLETED}
+
+    db.expire_all()
+    for deal_id in farmer1 + farmer2:
+        deal = db.get(Transaction, deal_id)
+        assert deal.status == TransactionStatus.COMPLETED and deal.completed_at == NOW
+    assert db.get(Transaction, in_transit[0]).status == TransactionStatus.IN_LOGISTICS
+    # The sold-out listing is sold once its last deal completes
+    sold_out = db.get(ProduceListing, db.get(Transaction, farmer2[0]).produce_listing_id)
+    assert sold_out.status == ListingStatus.SOLD
+    assert db.get(ProduceListing, db.get(Transaction, farmer1[0]).produce_listing_id).status == ListingStatus.AVAILABLE
+
+    # Nothing is settled twice
+    again = asyncio.run(service.settle(db, now=NOW + timedelta(hours=1)))
+    assert (again.transactions, again.paid) == (0, 0)
+    assert len(gateway.calls) == 2
+
+
+def test_lost_response_is_resubmitted_with_the_same_references(db):
+    add_deals(db, "farmer1", 2)
+    gateway = LostResponseGateway()
+    service = SettlementService(gateway=gateway)
+
+    first = asyncio.run(service.settle(db, now=NOW))
+    assert (first.batches, first.errors, first.paid) == (1, 1, 0)
+    batch = db.query(PayoutBatch).one()
+    assert batch.status == PayoutBatchStatus.PENDING and batch.attempts == 1
+
+    second = asyncio.run(service.settle(db, now=NOW + timedelta(minutes=10)))
+    assert (second.batches, second.paid) == (0, 1)
+    assert gateway.calls == [batch.reference, batch.reference]
+    assert len(gateway.transfers) == 1
+    assert db.query(SettlementEntry).count() == 2
+    assert db.query(Transaction).filter(Transaction.status == TransactionStatus.COMPLETED).count() == 2
+
+
+def test_paystack_transfers_are_followed_until_final(db):
+    add_deals(db, "farmer1", 2)
+    farmer2 = add_deals(db, "farmer2", 1)
+    with FakePaystack() as fake:
+        fake.failing_recipients.add("RCP_farmer2")
+        client = PaystackClient(secret_key=fake.secret_key, base_url=fake.url, backoff_seconds=0.01,
+                                max_retries=0, read_timeout=2.0, connect_timeout=1.0)
+        service = SettlementService(gateway=PaystackPayoutGateway(client))
+
+        async def run(now):
+            try:
+                return await service.settle(db, now=now)
+            finally:
+                await client.aclose()
+
+        first = asyncio.run(run(NOW))
+        assert [path for _, path, _ in fake.requests] == ["/transfer/bulk"]
+        assert (first.submitted, first.processing, first.failed) == (1, 1, 1)
+        assert db.query(PayoutBatch).one().status == PayoutBatchStatus.SUBMITTED
+
+        paid = db.query(Payout).filter(Payout.farmer_id == "farmer1").one()
+        assert paid.status == PayoutStatus.PROCESSING and paid.transfer_code
+        fake.set_transfer_status(paid.reference, "success")
+        second = asyncio.run(run(NOW + timedelta(hours=1)))
+        assert (second.paid, second.processing, second.transactions) == (1, 0, 0)
+        assert fake.requests[-1][1] == f"/transfer/verify/{paid.reference}"
+        assert db.query(PayoutBatch).one().status == PayoutBatchStatus.COMPLETED
+
+        # The failed farmer's deal is released and settled again after the retry window
+        db.expire_all()
+        assert db.get(Transaction, farmer2[0]).status == TransactionStatus.DELIVERED
+        fake.failing_recipients.clear()
+        later = asyncio.run(run(NOW + timedelta(days=2)))
+        assert (later.transactions, later.processing) == (1, 1)
+        assert db.query(SettlementEntry).filter(SettlementEntry.transaction_id == farmer2[0]).count() == 2
+
+
+def test_giving_up_on_a_batch_checks_its_transfers_first(db):
+    add_deals(db, "farmer1", 1)
+    add_deals(db, "farmer2", 1)
+    gateway = AcceptedButUnansweredGateway()
+    service = SettlementService(gateway=gateway)
+    service.max_attempts = 2
+
+    asyncio.run(service.settle(db, now=NOW))
+    payouts = {payout.farmer_id: payout for payout in db.query(Payout).all()}
+    gateway.unverifiable.add(payouts["farmer2"].reference)
+    report = asyncio.run(service.settle(db, now=NOW + timedelta(minutes=10)))
+    assert (report.errors, report.paid, report.failed, report.processing) == (1, 1, 0, 1)
+    batch = db.query(PayoutBatch).one()
+    assert batch.status == PayoutBatchStatus.FAILED and batch.completed_at is None
+    assert payouts["farmer1"].status == PayoutStatus.PAID
+    assert payouts["farmer2"].status == PayoutStatus.PROCESSING
+    assert db.query(SettlementEntry).filter(SettlementEntry.released_at.isnot(None)).count() == 0
+
+    # Confirmed later; the deals are never put into a second payout
+    gateway.unverifiable.clear()
+    later = asyncio.run(service.settle(db, now=NOW + timedelta(days=2)))
+    assert (later.transactions, later.paid, later.processing) == (0, 1, 0)
+    assert db.query(Payout).count() == 2 and len(gateway.transfers) == 2
+    assert batch.completed_at == NOW + timedelta(days=2)
@@ -0,0 +1,137 @@
+"""
+Tests for the async Paystack client against a local fake Paystack server
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_paystack import FakePaystack
+
+from app.services.payment_service import PaymentService
+from app.services.paystack_client import PaystackClient, PaystackError, PaystackUnavailableError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def fake():
+    with FakePaystack() as server:
+        yield server
+
+
+def make_client(fake, **kwargs):
+    options = dict(secret_key=fake.secret_key, base_url=fake.url, backoff_seconds=0.01,
+                   read_timeout=2.0, connect_timeout=1.0)
+    options.update(kwargs)
+    return PaystackClient(**options)
+
+
+def test_initialize_and_verify_reuse_one_connection(fake):
+    client = make_client(fake)
+
+    async def scenario():
+        try:
+            init = await client.initialize_transaction("buyer@example.com", 500000, "pay_abc", "/callback",
+                                                       {"transaction_id": "tx1"})
+            fake.pay("pay_abc")
+            verified = [await client.verify_transaction("pay_abc") for _ in range(3)]
+            return init, verified
+        finally:
+            await client.aclose()
+
+    init, verified = run(scenario())
+    assert init["data"]["access_code"] == "ac_pay_abc"
+    assert verified[-1]["data"]["status"] == "success"
+    assert verified[-1]["data"]["amount"] == 500000
+    assert len(fake.requests) == 4
+    assert fake.connections() == 1
+
+
+def test_server_errors_are_retried_and_client_errors_are_not(fake):
+    client = make_client(fake, max_retries=2)
+
+    async def scenario():
+        try:
+            fake.fail_next(2, status=502)
+            ok = await client.initialize_transaction("buyer@example.com", 1000, "pay_retry", "/callback")
+            with pytest.raises(PaystackError) as rejected:
+                await client.verify_transaction("pay_missing")
+            fake.fail_next(3, status=503)
+            with pytest.raises(PaystackUnavailableError):
+                await client.verify_transaction("pay_retry")
+            return ok, rejected.value
+        finally:
+            await client.aclose()
+
+    ok, rejected = run(scenario())
+    assert ok["status"] is True
+    assert rejected.status_code == 400 and not isinstance(rejected, PaystackUnavailableError)
+    # 3 attempts for the initialise, 1 for the 4xx, 3 for the exhausted verify
+    assert len(fake.requests) == 7
+
+
+def test_read_timeout_is_retried(fake):
+    client = make_client(fake, read_timeout=0.2, max_retries=1)
+
+    async def scenario():
+        try:
+            fake.delay_next(1, seconds=1.0)
+            started = time.monotonic()
+            result = await client.initialize_transaction("buyer@example.com", 1000, "pay_slow", "/callback")
+            return result, time.monotonic() - started
+        finally:
+            await client.aclose()
+
+    result, elapsed = run(scenario())
+    assert result["data"]["reference"] == "pay_slow"
+    assert elapsed < 1.0
+
+
+def test_circuit_opens_after_repeated_failures_and_recovers(fake):
+    client = make_client(fake, max_retries=0, failure_threshold=3, reset_seconds=0.2)
+
+    async def scenario():
+        try:
+            fake.fail_next(3, status=500)
+            for _ in range(3):
+                with pytest.raises(PaystackUnavailableError):
+                    await client.verify_transaction("pay_x")
+            assert client.breaker.state == "open"
+            sent = len(fake.requests)
+            with pytest.raises(PaystackUnavailableError, match="circuit open"):
+                await client.verify_transaction("pay_x")
+            # Failing fast: nothing reached Paystack
+            assert len(fake.requests) == sent
+
+            await asyncio.sleep(0.25)
+            assert client.breaker.state == "half-open"
+            result = await client.initialize_transaction("buyer@example.com", 1000, "pay_back", "/callback")
+            assert client.breaker.state == "closed"
+            return result
+        finally:
+            await client.aclose()
+
+    assert run(scenario())["status"] is True
+
+
+def test_payment_service_awaits_the_client(fake):
+    service = PaymentService()
+    service.paystack = make_client(fake)
+
+    async def scenario():
+        try:
+            init = await service.initialize_transaction("buyer@example.com", 2500, "pay_svc", "/callback")
+            with pytest.raises(Exception, match="Payment initialization failed"):
+                await service.initialize_transaction("buyer@example.com", 2500, "pay_svc", "/callback")
+            return init
+        finally:
+            await service.paystack.aclose()
+
+    assert run(scenario())["data"]["reference"] == "pay_svc"
@@ -0,0 +1,178 @@
+"""
+Tests for price alert subscriptions and their batch evaluation
+"""
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sqlite_models import make_session_factory
+
+from app.api.deps import get_current_user
+from app.api.endpoints import market
+from app.crud.crud_price_alert import create_price_alert
+from app.crud.crud_produce import create_produce_listing
+from app.crud.crud_transaction import update_transaction_status
+from app.models.market import PriceAlert, PriceAlertDirection
+from app.models.notification import Notification, NotificationType
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.user import User, UserType
+from app.services.price_alert_service import AlertBook, PriceAlertService, PriceObservation, price_alert_service
+
+ABOVE, BELOW = PriceAlertDirection.ABOVE, PriceAlertDirection.BELOW
+
+
+@pytest.fixture
+def db():
+    session = make_session_factory()()
+    session.add_all([
+        User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+        User(id="buyer1", phone_number="+2348000000002", user_type=UserType.BUYER),
+        User(id="buyer2", phone_number="+2348000000003", user_type=UserType.BUYER),
+    ])
+    session.commit()
+    price_alert_service.invalidate()
+    yield session
+    session.close()
+
+
+def add_alert(db, user_id, direction, threshold, crop="maize", region=None, source="transaction"):
+    return create_price_alert(db, {
+        "crop_type": crop, "region": region, "source": source, "direction": direction, "threshold_price": threshold
+    }, user_id)
+
+
+def add_listing(db, price, location="Kano", crop="maize"):
+    return create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": crop,
+        "quantity_kg": 500,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": price,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": location,
+    })
+
+
+def alert_notifications(db):
+    return db.query(Notification).filter(Notification.notification_type == NotificationType.PRICE_ALERT).all()
+
+
+def test_book_lookup_matches_brute_force_on_many_subscriptions():
+    rng = np.random.default_rng(3)
+    n = 200_000
+    thresholds = rng.uniform(100, 1000, n).round()
+    directions = rng.choice([ABOVE, BELOW], n)
+    regions = rng.choice(["kano", "lagos", "all"], n)
+    fired_before = rng.random(n) < 0.1
+    now = datetime(2026, 1, 2)
+    rows = [
+        (f"a{i}", "maize", "transaction", directions[i], regions[i], thresholds[i],
+         now - timedelta(hours=1) if fired_before[i] else None)
+        for i in range(n)
+    ]
+    book = AlertBook.from_rows(rows)
+    assert len(book) == n
+
+    cutoff = (now - timedelta(hours=24)).timestamp()
+    for price in (150.0, 500.0, 999.0):
+        started = time.perf_counter()
+        hits = book.triggered(PriceObservation("transaction", "maize", "kano", price), cutoff)
+        assert time.perf_counter() - started < 0.5
+        fired = {alert_id for alert_id, *_ in hits}
+        expected = {
+            f"a{i}" for i in range(n)
+            if regions[i] == "kano" and not fired_before[i]
+            and (thresholds[i] <= price if directions[i] == ABOVE else thresholds[i] >= price)
+        }
+        assert fired == expected
+
+    listing_hits = book.triggered(PriceObservation("listing", "maize", "kano", 500.0), cutoff)
+    assert listing_hits == []
+
+
+def test_new_listings_fire_listing_alerts_once_per_cooldown(db):
+    regional = add_alert(db, "buyer1", BELOW, 400, crop="masara", region="Kano", source="listing")
+    national = add_alert(db, "buyer2", BELOW, 350, source="listing")
+    add_alert(db, "buyer2", ABOVE, 100, region="lagos", source="listing")
+    assert (regional.crop_type, regional.region, national.region) == ("maize", "kano", "all")
+
+    add_listing(db, 500)
+    assert alert_notifications(db) == []
+
+    cheap = add_listing(db, 380)
+    notifications = alert_notifications(db)
+    assert [n.user_id for n in notifications] == ["buyer1"]
+    assert cheap.id in notifications[0].message
+    assert "at or below ₦400/kg" in notifications[0].message
+
+    add_listing(db, 300)
+    assert sorted(n.user_id for n in alert_notifications(db)) == ["buyer1", "buyer2"]
+    db.refresh(regional)
+    assert regional.last_triggered_price == 380
+
+    # A fresh book, as another process would build, still honours the cooldown
+    price_alert_service.invalidate()
+    add_listing(db, 200)
+    assert len(alert_notifications(db)) == 2
+
+
+def test_workers_racing_on_the_same_prices_notify_once(db):
+    add_alert(db, "buyer1", BELOW, 400, source="listing")
+    add_alert(db, "buyer2", BELOW, 400, source="listing")
+    workers = [PriceAlertService(), PriceAlertService()]
+    for worker in workers:
+        worker.book(db)  # Both books built before either worker fires
+
+    observation = PriceObservation("listing", "maize", "kano", 350, "lst_1")
+    assert [worker.evaluate(db, [observation]) for worker in workers] == [2, 0]
+    assert len(alert_notifications(db)) == 2
+
+
+def test_deal_prices_fire_alerts_when_the_index_moves(db):
+    above = add_alert(db, "buyer1", ABOVE, 480, region="kano")
+    add_alert(db, "buyer2", BELOW, 300)
+    listing = add_listing(db, 500)
+
+    transaction = Transaction(
+        produce_listing_id=listing.id, seller_id="farmer1", buyer_id="buyer1",
+        agreed_price_per_kg=520, quantity_kg=100, total_amount=52000, status=TransactionStatus.PENDING,
+    )
+    db.add(transaction)
+    db.commit()
+    assert alert_notifications(db) == []
+
+    update_transaction_status(db, transaction.id, TransactionStatus.PAYMENT_CONFIRMED)
+    notifications = alert_notifications(db)
+    assert [n.user_id for n in notifications] == ["buyer1"]
+    assert notifications[0].message.startswith("Maize deals in Kano reached a median of ₦520/kg today")
+    db.refresh(above)
+    assert above.last_triggered_at is not None
+
+
+def test_alert_endpoints(db):
+    app = FastAPI()
+    app.include_router(market.router, prefix="/market")
+    app.dependency_overrides[market.get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: db.get(User, "buyer1")
+    client = TestClient(app)
+
+    response = client.post("/market/alerts", json={
+        "crop_type": "Tumatir", "region": "Kano", "direction": "BELOW", "threshold_price": 250, "source": "listing"
+    })
+    assert response.status_code == 201
+    alert = response.json()
+    assert (alert["crop_type"], alert["region"], alert["source"]) == ("tomatoes", "kano", "listing")
+    assert client.post("/market/alerts", json={"crop_type": "maize", "direction": "SIDEWAYS",
+                                               "threshold_price": 250}).status_code == 422
+
+    add_listing(db, 200, crop="tomatoes")
+    assert len(alert_notifications(db)) == 1
+
+    assert [a["id"] for a in client.get("/market/alerts").json()] == [alert["id"]]
+    assert client.delete(f"/market/alerts/{alert['id']}").status_code == 204
+    assert client.delete(f"/market/alerts/{alert['id']}").status_code == 404
+    assert db.query(PriceAlert).count() == 0
@@ -0,0 +1,148 @@
+"""
+Tests for the daily market price index
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sqlite_models import make_session_factory
+
+from app.agents.tools.market_tools import format_price_summary
+from app.api.endpoints import market
+from app.crud.crud_produce import create_produce_listing, delete_produce_listing, update_produce_listing
+from app.crud.crud_transaction import delete_transaction, update_transaction_status
+from app.models.market import PriceIndexDaily
+from app.models.transaction import Transaction, TransactionStatus
+from app.models.user import User, UserType
+from app.services.price_index_service import price_index_service, price_stats
+
+TODAY = datetime.utcnow().date()
+
+
+@pytest.fixture
+def db():
+    session = make_session_factory()()
+    session.add_all([
+        User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+        User(id="buyer1", phone_number="+2348000000002", user_type=UserType.BUYER),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_listing(db, crop="maize", location="Kano", price=450, quantity_kg=500):
+    return create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": crop,
+        "quantity_kg": quantity_kg,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": price,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": location,
+    })
+
+
+def add_deal(db, listing, price, quantity_kg, status=TransactionStatus.PENDING, days_ago=0):
+    transaction = Transaction(
+        produce_listing_id=listing.id, seller_id="farmer1", buyer_id="buyer1",
+        agreed_price_per_kg=price, quantity_kg=quantity_kg, total_amount=price * quantity_kg,
+        status=status, matched_at=datetime.utcnow() - timedelta(days=days_ago),
+    )
+    db.add(transaction)
+    db.commit()
+    price_index_service.refresh_transactions(db, [transaction])
+    return transaction
+
+
+def index_row(db, source, region="all", crop="maize", day=TODAY):
+    return db.query(PriceIndexDaily).filter_by(source=source, region=region, crop_type=crop, day=day).one_or_none()
+
+
+def test_price_stats_quartiles_and_weighted_average():
+    stats = price_stats([400, 500, 600, 700], [100, 100, 100, 700])
+    assert (stats["p25_price"], stats["median_price"], stats["p75_price"]) == (475.0, 550.0, 625.0)
+    assert stats["avg_price"] == 640.0
+    assert (stats["sample_count"], stats["volume_kg"]) == (4, 1000.0)
+
+
+def test_deals_enter_the_index_when_paid_and_leave_when_cancelled(db):
+    listing = add_listing(db)
+    deal = add_deal(db, listing, 400, 100)
+    add_deal(db, listing, 500, 300, TransactionStatus.PAYMENT_CONFIRMED)
+    assert index_row(db, "transaction").sample_count == 1
+
+    update_transaction_status(db, deal.id, TransactionStatus.PAYMENT_CONFIRMED)
+    regional = index_row(db, "transaction", region="kano")
+    assert (regional.sample_count, regional.volume_kg, regional.median_price, regional.avg_price) == (2, 400.0, 450.0, 475.0)
+    assert index_row(db, "transaction").sample_count == 2
+
+    update_transaction_status(db, deal.id, TransactionStatus.CANCELLED)
+    assert index_row(db, "transaction", region="kano").median_price == 500.0
+
+    delete_transaction(db, deal.id)
+    other = db.query(Transaction).filter(Transaction.id != deal.id).one()
+    update_transaction_status(db, other.id, TransactionStatus.DISPUTED)
+    assert index_row(db, "transaction") is None
+
+
+def test_listing_asks_follow_creates_updates_and_deletes(db):
+    kano = add_listing(db, price=400)
+    add_listing(db, price=600, location="Lagos")
+    assert index_row(db, "listing").median_price == 500.0
+    assert index_row(db, "listing", region="lagos").median_price == 600.0
+
+    update_produce_listing(db, kano.id, {"crop_type": "rice"})
+    assert index_row(db, "listing").median_price == 600.0
+    assert index_row(db, "listing", crop="rice", region="kano").median_price == 400.0
+
+    delete_produce_listing(db, kano.id)
+    assert index_row(db, "listing", crop="rice") is None
+
+
+def test_rebuild_matches_incremental_rows(db):
+    listing = add_listing(db)
+    add_deal(db, listing, 420, 200, TransactionStatus.COMPLETED, days_ago=3)
+    add_deal(db, listing, 480, 100, TransactionStatus.DELIVERED)
+
+    def snapshot():
+        return sorted(
+            (row.source, row.region, row.day, row.median_price, row.sample_count, row.volume_kg)
+            for row in db.query(PriceIndexDaily)
+        )
+
+    incremental = snapshot()
+    db.query(PriceIndexDaily).delete()
+    db.commit()
+    assert price_index_service.rebuild(db, TODAY - timedelta(days=7), TODAY + timedelta(days=1)) == 6
+    assert snapshot() == incremental
+
+
+def test_summary_endpoint_and_agent_answer(db):
+    listing = add_listing(db, price=520)
+    add_deal(db, listing, 400, 100, TransactionStatus.COMPLETED, days_ago=2)
+    add_deal(db, listing, 500, 300, TransactionStatus.COMPLETED)
+
+    app = FastAPI()
+    app.include_router(market.router, prefix="/market")
+    app.dependency_overrides[market.get_db] = lambda: db
+    client = TestClient(app)
+
+    history = client.get("/market/prices", params={"crop": "masara", "region": "Kano", "source": "transaction"}).json()
+    assert [(row["day"], row["median_price"]) for row in history] == [
+        (TODAY.isoformat(), 500.0), ((TODAY - timedelta(days=2)).isoformat(), 400.0)
+    ]
+    assert client.get("/market/prices", params={"crop": "maize", "source": "rumour"}).status_code == 422
+
+    summary = client.get("/market/prices/summary", params={"crop": "maize"}).json()
+    assert summary["region"] == "all"
+    assert summary["transaction"]["avg_price"] == 475.0
+    assert summary["transaction"]["latest_day"] == TODAY.isoformat()
+    assert summary["listing"]["sample_count"] == 1
+
+    answer = format_price_summary(price_index_service.summary(db, "maize", "kano"))
+    assert answer.startswith("Maize prices in Kano, last 14 days:")
+    assert "₦475/kg on average over 2 deals (400 kg)" in answer
+    assert "No recent yams" in format_price_summary(price_index_service.summary(db, "yams"))
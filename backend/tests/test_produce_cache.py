@@ -0,0 +1,165 @@
+"""
+Tests for the produce response cache and ETag revalidation
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sqlite_models import make_session_factory
+
+from app.api.endpoints import produce
+from app.crud.crud_produce import create_produce_listing, delete_produce_listing, update_produce_listing
+from app.models.user import User
+from app.services.cache_service import (
+    CachedResponse, MemoryCacheBackend, ResponseCache, etag_matches, response_cache
+)
+
+
+class FakeSharedBackend:
+    """Stands in for Redis: a dict of entries plus version counters"""
+
+    def __init__(self):
+        self.entries = {}
+        self.versions = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, ttl_seconds):
+        self.entries[key] = CachedResponse.from_json(value.to_json())
+
+    def version(self, namespace):
+        return self.versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        self.versions[namespace] = self.version(namespace) + 1
+        return self.versions[namespace]
+
+
+def test_lru_evicts_least_recently_used_and_expires():
+    lru = MemoryCacheBackend(max_entries=2)
+    lru.set("a", 1, 60)
+    lru.set("b", 2, 60)
+    assert lru.get("a") == 1
+    lru.set("c", 3, 60)
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+    lru.set("d", 4, -1)
+    assert lru.get("d") is None
+
+
+def test_invalidate_bumps_the_key_version():
+    cache = ResponseCache(ttl_seconds=60)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return b"[]", {}
+
+    first = cache.get_or_build("produce", "all", {"limit": 10}, build)
+    assert cache.get_or_build("produce", "all", {"limit": 10}, build) == first
+    assert len(builds) == 1
+    cache.get_or_build("produce", "all", {"limit": 20}, build)
+    assert len(builds) == 2
+
+    cache.invalidate("produce")
+    cache.get_or_build("produce", "all", {"limit": 10}, build)
+    assert len(builds) == 3
+
+
+def test_shared_backend_fills_other_processes_and_propagates_invalidation():
+    shared = FakeSharedBackend()
+    process_a = ResponseCache(shared=shared, version_ttl_seconds=0)
+    process_b = ResponseCache(shared=shared, version_ttl_seconds=0)
+
+    entry = process_a.get_or_build("produce", "detail", {"id": "x"}, lambda: (b'{"id": "x"}', {}))
+    assert process_b.get_or_build("produce", "detail", {"id": "x"}, pytest.fail) == entry
+
+    process_a.invalidate("produce")
+    rebuilt = process_b.get_or_build("produce", "detail", {"id": "x"}, lambda: (b'{"id": "y"}', {}))
+    assert rebuilt.body == b'{"id": "y"}'
+
+
+def test_etag_matching():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"def"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+@pytest.fixture
+def db():
+    session = make_session_factory()()
+    session.add(User(id="farmer1", phone_number="+2348000000001", user_type="farmer"))
+    session.commit()
+    response_cache.local.clear()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(produce.router, prefix="/produce")
+    app.dependency_overrides[produce.get_db] = lambda: db
+    return TestClient(app)
+
+
+def add_listing(db, crop="maize"):
+    return create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": crop,
+        "quantity_kg": 500,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": 450,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": "Kano",
+    })
+
+
+def test_endpoints_serve_cached_pages_and_304(client, db):
+    listing = add_listing(db)
+
+    first = client.get("/produce/", params={"crop_type": "maize"})
+    assert first.status_code == 200
+    assert [item["id"] for item in first.json()] == [listing.id]
+    etag = first.headers["etag"]
+
+    not_modified = client.get("/produce/", params={"crop_type": "maize"}, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    detail = client.get(f"/produce/{listing.id}")
+    assert detail.json()["id"] == listing.id
+    assert client.get(f"/produce/{listing.id}", headers={"If-None-Match": detail.headers["etag"]}).status_code == 304
+    assert client.get("/produce/prod_missing").status_code == 404
+
+
+def test_writes_invalidate_cached_pages(client, db):
+    listing = add_listing(db)
+    page = client.get("/produce/all")
+    detail = client.get(f"/produce/{listing.id}")
+
+    update_produce_listing(db, listing.id, {"quantity_kg": 750})
+    changed = client.get(f"/produce/{listing.id}", headers={"If-None-Match": detail.headers["etag"]})
+    assert changed.status_code == 200
+    assert changed.json()["quantity_kg"] == 750
+
+    second = add_listing(db, crop="rice")
+    assert len(client.get("/produce/all", headers={"If-None-Match": page.headers["etag"]}).json()) == 2
+
+    delete_produce_listing(db, second.id)
+    assert client.get(f"/produce/{second.id}").status_code == 404
+
+
+def test_full_pages_cache_the_next_cursor(client, db):
+    for _ in range(3):
+        add_listing(db)
+    first = client.get("/produce/all", params={"limit": 2})
+    cached = client.get("/produce/all", params={"limit": 2})
+    assert first.headers["x-next-cursor"] == cached.headers["x-next-cursor"]
+    rest = client.get("/produce/all", params={"limit": 2, "after": first.headers["x-next-cursor"]})
+    assert len(rest.json()) == 1
+    assert client.get("/produce/all", params={"after": "garbage"}).status_code == 400
@@ -0,0 +1,183 @@
+"""
+Tests for keyset pagination and index usage of produce search.
+
+The PostgreSQL check loads 1M listings and is skipped unless
+PERF_DATABASE_URL points at a scratch PostGIS database.
+"""
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from sqlite_models import make_engine
+
+from app.crud.crud_produce import (
+    decode_listing_cursor, encode_listing_cursor, get_produce_listings, search_produce_listings
+)
+from app.db.base_class import Base
+from app.models.produce import ProduceListing
+from app.models.user import User
+from app.schemas.produce import ListingStatus
+
+BASE_TIME = datetime(2025, 1, 1)
+
+
+@contextmanager
+def capture_sql(engine):
+    """Record the SELECT statements and parameters sent to the database"""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_execute)
+
+
+@pytest.fixture
+def engine():
+    return make_engine()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        User(id="farmer1", phone_number="+2348000000001", user_type="farmer"),
+        User(id="farmer2", phone_number="+2348000000002", user_type="farmer"),
+    ])
+    for i in range(25):
+        session.add(ProduceListing(
+            id=f"prod_{i:04d}",
+            farmer_id="farmer1" if i % 2 else "farmer2",
+            crop_type="maize" if i % 3 else "rice",
+            quantity_kg=100 + i,
+            expected_price_per_kg=400 + i,
+            harvest_date=BASE_TIME,
+            # Pairs of listings share a timestamp so the id tiebreak is exercised
+            created_at=BASE_TIME + timedelta(hours=i // 2),
+            expires_at=BASE_TIME + timedelta(days=30),
+            status=ListingStatus.SOLD if i == 7 else ListingStatus.AVAILABLE,
+            location="SRID=4326;POINT(8.5920 12.0022)",
+        ))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_cursor_round_trip():
+    listing = ProduceListing(id="prod_abc", created_at=BASE_TIME)
+    assert decode_listing_cursor(encode_listing_cursor(listing)) == (BASE_TIME, "prod_abc")
+    with pytest.raises(ValueError):
+        decode_listing_cursor("not-a-cursor")
+
+
+def test_keyset_pages_cover_every_listing_once(db):
+    seen = []
+    after = None
+    while True:
+        page = get_produce_listings(db, limit=10, after=after)
+        seen.extend(page)
+        if len(page) < 10:
+            break
+        after = encode_listing_cursor(page[-1])
+
+    assert len(seen) == 25
+    assert len({listing.id for listing in seen}) == 25
+    keys = [(listing.created_at, listing.id) for listing in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_search_filters_status_and_pages_with_cursor(db):
+    first = search_produce_listings(db, crop_type="maize", status=ListingStatus.AVAILABLE, limit=5)
+    second = search_produce_listings(db, crop_type="maize", status=ListingStatus.AVAILABLE, limit=5,
+                                     after=encode_listing_cursor(first[-1]))
+    ids = [listing.id for listing in first + second]
+    assert len(ids) == len(set(ids)) == 10
+    assert "prod_0007" not in ids
+    assert all(listing.crop_type == "maize" for listing in first + second)
+
+
+def sqlite_plan(engine, statement, parameters):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize("filters", [
+    {"crop_type": "maize", "status": ListingStatus.AVAILABLE},
+    {"crop_type": "maize", "status": ListingStatus.AVAILABLE, "max_price": 450, "min_quantity": 110},
+    {"status": ListingStatus.AVAILABLE},
+    {"farmer_id": "farmer1"},
+    {"crop_type": "maize", "status": ListingStatus.AVAILABLE, "after": "WyIyMDI1LTAxLTAxVDA1OjAwOjAwIiwgInByb2RfMDAxMCJd"},
+    {"status": ListingStatus.AVAILABLE, "after": "WyIyMDI1LTAxLTAxVDA1OjAwOjAwIiwgInByb2RfMDAxMCJd"},
+])
+def test_search_uses_indexes_not_table_scans(engine, db, filters):
+    with capture_sql(engine) as statements:
+        search_produce_listings(db, limit=10, **filters)
+    statement, parameters = statements[-1]
+
+    plan = sqlite_plan(engine, statement, parameters)
+    for step in plan:
+        if "produce_listings" in step:
+            assert "INDEX" in step, plan
+            if filters.get("after"):
+                # The cursor seeks into the index rather than walking it from the start
+                assert step.startswith("SEARCH"), plan
+    # The index order serves ORDER BY created_at, id: no sort step
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+@pytest.mark.skipif(not os.getenv("PERF_DATABASE_URL"), reason="set PERF_DATABASE_URL to a scratch PostGIS database")
+def test_postgres_search_avoids_seq_scan_at_one_million_listings():
+    pg_engine = create_engine(os.environ["PERF_DATABASE_URL"])
+    Base.metadata.drop_all(bind=pg_engine)
+    Base.metadata.create_all(bind=pg_engine)
+    with pg_engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, phone_number, user_type) "
+            "SELECT 'farmer' || g, '+234' || g, 'FARMER' FROM generate_series(1, 1000) g"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO produce_listings (id, farmer_id, crop_type, quantity_kg, expected_price_per_kg, "
+            "harvest_date, created_at, expires_at, status, location) "
+            "SELECT 'prod_' || g, 'farmer' || (g % 1000 + 1), "
+            "(ARRAY['maize','rice','yams','tomatoes','onions','peppers'])[g % 6 + 1], "
+            "50 + g % 1000, 200 + g % 500, now(), now() - (g || ' minutes')::interval, now() + interval '30 days', "
+            "(CASE WHEN g % 10 = 0 THEN 'SOLD' ELSE 'AVAILABLE' END)::produce_listng_status_enum, "
+            "ST_SetSRID(ST_MakePoint(3 + random() * 10, 5 + random() * 8), 4326) "
+            "FROM generate_series(1, 1000000) g"
+        )
+        conn.exec_driver_sql("ANALYZE produce_listings")
+
+    db = sessionmaker(bind=pg_engine)()
+    try:
+        for filters in [
+            {"crop_type": "maize", "status": ListingStatus.AVAILABLE},
+            {"crop_type": "rice", "status": ListingStatus.AVAILABLE, "max_price": 300},
+            {"farmer_id": "farmer42"},
+        ]:
+            with capture_sql(pg_engine) as statements:
+                page = search_produce_listings(db, limit=50, **filters)
+            statement, parameters = statements[-1]
+            with pg_engine.connect() as conn:
+                plan = "\n".join(row[0] for row in conn.exec_driver_sql(f"EXPLAIN {statement}", parameters))
+            assert "Seq Scan on produce_listings" not in plan, plan
+
+            after = encode_listing_cursor(page[-1])
+            with capture_sql(pg_engine) as statements:
+                search_produce_listings(db, limit=50, after=after, **filters)
+            statement, parameters = statements[-1]
+            with pg_engine.connect() as conn:
+                plan = "\n".join(row[0] for row in conn.exec_driver_sql(f"EXPLAIN {statement}", parameters))
+            assert "Seq Scan on produce_listings" not in plan, plan
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=pg_engine)
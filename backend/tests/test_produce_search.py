@@ -0,0 +1,104 @@
+"""
+Tests for free-text and fuzzy produce search
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from sqlite_models import make_session_factory
+
+from app.api.endpoints import produce
+from app.crud.crud_produce import create_produce_listing, search_produce_listings
+from app.models.produce import ProduceListing
+from app.models.user import User, UserType
+from app.services.cache_service import response_cache
+from app.services.search_service import normalize_crop_name, parse_query, search_service
+
+
+@pytest.fixture
+def db():
+    session = make_session_factory()()
+    session.add(User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER))
+    session.commit()
+    response_cache.local.clear()
+    yield session
+    session.close()
+
+
+def add_listing(db, crop, transcription=None, days_ago=0):
+    listing = create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": crop,
+        "quantity_kg": 500,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": 450,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": "Kano",
+        "transcription": transcription,
+    })
+    listing.created_at = datetime.utcnow() - timedelta(days=days_ago)
+    db.commit()
+    return listing
+
+
+def test_crop_names_normalise_synonyms_and_typos():
+    assert normalize_crop_name("masara") == "maize"
+    assert normalize_crop_name("Tomatos") == "tomatoes"
+    assert normalize_crop_name("guinea corn") == "sorghum"
+    assert normalize_crop_name("fertilizer") is None
+
+    query = parse_query("I have fresh guinea corn and tumatir")
+    assert query.crops == ["sorghum", "tomatoes"]
+    assert query.terms == ["fresh"]
+    assert "dawa" in query.groups[0]
+
+
+def test_fallback_index_ranks_local_names_and_transcriptions(db):
+    tomatoes = add_listing(db, "tomatoes", days_ago=2)
+    voice = add_listing(db, "peppers", "Ina da tumatir da barkono a Kano", days_ago=1)
+    maize = add_listing(db, "maize", "Masara mai kyau")
+
+    # "tumatir" in the transcription is as good a match as the crop itself; newest first on ties
+    results = search_produce_listings(db, q="tomatos")
+    assert [(listing.id, listing.search_rank) for listing in results] == [(voice.id, 1.0), (tomatoes.id, 1.0)]
+
+    # Both terms match the voice listing, only one matches the others
+    results = search_produce_listings(db, q="tomato pepper")
+    assert results[0].id == voice.id
+    assert results[0].search_rank > results[1].search_rank
+
+    assert [listing.id for listing in search_produce_listings(db, q="corn")] == [maize.id]
+    assert [listing.id for listing in search_produce_listings(db, q="kyauu")] == [maize.id]
+    assert search_produce_listings(db, q="the and") == []
+
+
+def test_crop_filter_accepts_local_names(db):
+    maize = add_listing(db, "maize")
+    add_listing(db, "rice")
+    assert [listing.id for listing in search_produce_listings(db, crop_type="masara")] == [maize.id]
+
+
+def test_index_follows_writes_and_endpoint_returns_ranks(db):
+    app = FastAPI()
+    app.include_router(produce.router, prefix="/produce")
+    app.dependency_overrides[produce.get_db] = lambda: db
+    client = TestClient(app)
+
+    assert client.get("/produce/", params={"q": "shinkafa"}).json() == []
+    rice = add_listing(db, "rice")
+    response = client.get("/produce/", params={"q": "shinkafa", "limit": 1})
+    assert [(item["id"], item["search_rank"]) for item in response.json()] == [(rice.id, 1.0)]
+    assert "x-next-cursor" not in response.headers
+
+
+def test_postgres_match_uses_text_and_trigram_operators(db):
+    query, rank = search_service._postgres_match(parse_query("masara kyau"))
+    sql = str(db.query(ProduceListing).filter(query).statement.compile(dialect=postgresql.dialect()))
+    assert "produce_listings.search_vector @@ to_tsquery" in sql
+    assert "produce_listings.crop_type IN" in sql
+    assert "produce_listings.crop_type %%" in sql
+    assert "<%% produce_listings.transcription" in sql
+    assert "ts_rank_cd" in str(rank.compile(dialect=postgresql.dialect()))
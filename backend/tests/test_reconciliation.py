@@ -0,0 +1,149 @@
+"""
+Tests for the Paystack reconciliation job against a local fake Paystack server
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from fake_paystack import FakePaystack
+from sqlite_models import make_session_factory
+
+from app.crud.crud_produce import create_produce_listing
+from app.crud.crud_transaction import create_reservation
+from app.models.notification import Notification
+from app.models.payment_event import PaymentEvent, PaymentEventStatus
+from app.models.transaction import PaymentMethod, PaymentRecord, PaymentStatus, Transaction, TransactionStatus
+from app.models.user import User, UserType
+from app.services.payment_service import PaymentService
+from app.services.paystack_client import PaystackClient
+from app.services.reconciliation_service import ReconciliationService
+
+NOW = datetime(2026, 3, 2, 12, 0)
+
+# reference -> (Paystack status or None if unknown there, age of the local record)
+SCENARIO = {
+    "pay_paid": ("success", timedelta(hours=2)),
+    "pay_failed": ("failed", timedelta(hours=2)),
+    "pay_reversed": ("reversed", timedelta(hours=3)),
+    "pay_abandoned_old": ("abandoned", timedelta(days=2)),
+    "pay_abandoned_new": ("abandoned", timedelta(hours=1)),
+    "pay_missing_old": (None, timedelta(days=3)),
+    "pay_fresh": ("success", timedelta(minutes=5)),
+}
+
+
+@pytest.fixture
+def db():
+    factory = make_session_factory()
+    session = factory()
+    session.add_all([
+        User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+        User(id="buyer1", phone_number="+2348000000002", user_type=UserType.BUYER, village="Fagge"),
+    ])
+    session.commit()
+    listing_id = create_produce_listing(session, {
+        "farmer_id": "farmer1",
+        "crop_type": "maize",
+        "quantity_kg": 5000,
+        "harvest_date": NOW,
+        "expected_price_per_kg": 400,
+        "expires_at": NOW + timedelta(days=20),
+        "location": "Kano",
+    }).id
+    for reference, (_, age) in SCENARIO.items():
+        transaction = create_reservation(session, listing_id, "buyer1", 100.0)
+        transaction.status = TransactionStatus.PAYMENT_INITIATED
+        session.add(PaymentRecord(transaction_id=transaction.id, amount=transaction.total_amount, reference=reference,
+                                  status=PaymentStatus.PENDING, payment_method=PaymentMethod.PAYSTACK,
+                                  created_at=NOW - age))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def fake(db):
+    with FakePaystack() as server:
+        for record in db.query(PaymentRecord):
+            status = SCENARIO[record.reference][0]
+            if status is not None:
+                server.add_transaction(record.reference, round(record.amount * 100), status)
+        yield server
+
+
+def make_service(fake, **kwargs):
+    payment_service = PaymentService()
+    payment_service.paystack = PaystackClient(secret_key=fake.secret_key, base_url=fake.url, backoff_seconds=0.01,
+                                              read_timeout=2.0, connect_timeout=1.0)
+    return ReconciliationService(payment_service, **kwargs)
+
+
+def reconcile(service, db, **kwargs):
+    async def scenario():
+        try:
+            return await service.reconcile(db, now=NOW, **kwargs)
+        finally:
+            await service.payment_service.paystack.aclose()
+
+    return asyncio.run(scenario())
+
+
+def statuses(db):
+    db.expire_all()
+    return {record.reference: record.status for record in db.query(PaymentRecord)}
+
+
+def test_dry_run_reports_drift_without_writing(db, fake):
+    before = statuses(db)
+    report = reconcile(make_service(fake), db, dry_run=True)
+
+    assert report.dry_run
+    assert report.checked == 6  # pay_fresh is not stale yet
+    assert (report.confirmed, report.failed, report.refunded, report.unchanged) == (1, 3, 1, 1)
+    assert report.drift == {
+        "pay_paid": "success", "pay_failed": "failed", "pay_reversed": "reversed",
+        "pay_abandoned_old": "abandoned", "pay_missing_old": "missing",
+    }
+    assert statuses(db) == before
+    assert db.query(PaymentEvent).count() == 0
+
+
+def test_reconcile_corrects_drift_in_batches(db, fake):
+    fake.latency = 0.05
+    report = reconcile(make_service(fake, concurrency=2, batch_size=4), db)
+
+    assert report.drift_found == 5 and report.errors == 0
+    assert statuses(db) == {
+        "pay_paid": PaymentStatus.SUCCESS,
+        "pay_failed": PaymentStatus.FAILED,
+        "pay_reversed": PaymentStatus.REFUNDED,
+        "pay_abandoned_old": PaymentStatus.FAILED,
+        "pay_abandoned_new": PaymentStatus.PENDING,
+        "pay_missing_old": PaymentStatus.FAILED,
+        "pay_fresh": PaymentStatus.PENDING,
+    }
+    # Verified concurrently, never more than the bound in flight
+    assert len(fake.requests) == 6
+    assert fake.max_in_flight == 2
+
+    # The confirmed payment went through the webhook inbox like a late webhook
+    paid = db.query(PaymentRecord).filter(PaymentRecord.reference == "pay_paid").one()
+    assert paid.transaction.status == TransactionStatus.PAYMENT_CONFIRMED
+    event = db.query(PaymentEvent).one()
+    assert event.id == f"charge.success:{fake.transactions['pay_paid']['id']}"
+    assert event.status == PaymentEventStatus.PROCESSED
+    assert db.query(Notification).count() == 2
+    assert db.query(Transaction).filter(Transaction.status == TransactionStatus.PAYMENT_CONFIRMED).count() == 1
+
+    # Nothing left to correct on the next run
+    again = reconcile(make_service(fake), db)
+    assert again.checked == 1 and again.drift_found == 0  # pay_abandoned_new
+
+
+def test_unverifiable_payments_stay_pending(db, fake):
+    fake.fail_next(100, status=503)
+    report = reconcile(make_service(fake, concurrency=3), db, max_records=3)
+
+    assert report.checked == 3 and report.errors == 3 and report.drift_found == 0
+    assert set(statuses(db).values()) == {PaymentStatus.PENDING}
@@ -0,0 +1,93 @@
+"""
+Tests for transaction lookups by id and by listing
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from sqlite_models import make_session_factory
+
+from app.crud.crud_produce import create_produce_listing
+from app.crud.crud_transaction import (
+    create_reservation, get_transaction, get_transaction_for_listing, get_transactions, update_transaction_status
+)
+from app.models.transaction import PaymentMethod, PaymentRecord, PaymentStatus, Transaction, TransactionStatus
+from app.models.user import User, UserType
+
+
+@pytest.fixture
+def db():
+    factory = make_session_factory()
+    session = factory()
+    session.add_all([
+        User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER),
+        User(id="buyer1", phone_number="+2348000000002", user_type=UserType.BUYER),
+        User(id="buyer2", phone_number="+2348000000003", user_type=UserType.BUYER),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_listing(db):
+    return create_produce_listing(db, {
+        "farmer_id": "farmer1",
+        "crop_type": "maize",
+        "quantity_kg": 1000,
+        "harvest_date": datetime.utcnow(),
+        "expected_price_per_kg": 400,
+        "expires_at": datetime.utcnow() + timedelta(days=20),
+        "location": "Kano",
+    }).id
+
+
+def test_lookups_by_id_and_by_listing_are_separate(db):
+    listing_id = add_listing(db)
+    first = create_reservation(db, listing_id, "buyer1", 100.0)
+    second = create_reservation(db, listing_id, "buyer2", 100.0)
+    first.matched_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+
+    assert get_transaction(db, first.id).id == first.id
+    # A listing id is not a transaction id
+    assert get_transaction(db, listing_id) is None
+
+    assert get_transaction_for_listing(db, listing_id).id == second.id
+    assert get_transaction_for_listing(db, listing_id, buyer_id="buyer1").id == first.id
+    update_transaction_status(db, second.id, TransactionStatus.CANCELLED)
+    assert get_transaction_for_listing(db, listing_id).id == first.id
+    assert get_transaction_for_listing(db, "listing_missing") is None
+
+
+def test_listing_transactions_loads_payments_in_one_query(db):
+    listing_id = add_listing(db)
+    for n in range(5):
+        transaction = create_reservation(db, listing_id, "buyer1", 10.0)
+        db.add(PaymentRecord(transaction_id=transaction.id, amount=transaction.total_amount, reference=f"pay_{n}",
+                             status=PaymentStatus.SUCCESS, payment_method=PaymentMethod.PAYSTACK))
+    db.commit()
+    db.expunge_all()
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        transactions = get_transactions(db, buyer_id="buyer1")
+        assert [t.payment_status for t in transactions] == [PaymentStatus.SUCCESS] * 5
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    # The transactions, then every payment record in one SELECT ... IN
+    assert len(statements) == 2
+
+
+def test_lookup_columns_are_indexed():
+    indexed = {column.name for index in Transaction.__table__.indexes for column in index.columns}
+    assert {"produce_listing_id", "buyer_id", "seller_id", "status"} <= indexed
+    assert any(
+        [column.name for column in index.columns] == ["transaction_id"] for index in PaymentRecord.__table__.indexes
+    )
@@ -0,0 +1,103 @@
+"""
+Tests for TTS generation and the content-addressed audio cache
+"""
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services.tts_service import AudioCache, TTSService, normalize_tts_text
+
+
+class FakeEngine:
+    """Writes deterministic bytes instead of calling espeak-ng"""
+
+    name = "fake"
+    extension = ".wav"
+    media_type = "audio/wav"
+    available = True
+
+    def __init__(self):
+        self.calls = []
+
+    def synthesize(self, text, voice, output_path):
+        self.calls.append((text, voice))
+        with open(output_path, "wb") as f:
+            f.write(f"{voice}:{text}".encode("utf-8") * 10)
+
+
+def make_service(tmp_path):
+    engine = FakeEngine()
+    return TTSService(engine=engine, cache=AudioCache(str(tmp_path), engine.extension)), engine
+
+
+def test_cache_key_depends_on_text_language_and_voice():
+    key = AudioCache.make_key("Plant maize in June", "english", "en")
+    assert key == AudioCache.make_key("Plant maize in June", "english", "en")
+    assert key != AudioCache.make_key("Plant maize in July", "english", "en")
+    assert key != AudioCache.make_key("Plant maize in June", "pidgin", "en")
+    assert key != AudioCache.make_key("Plant maize in June", "english", "ha")
+    assert AudioCache.is_valid_key(key)
+    assert not AudioCache.is_valid_key("../../etc/passwd")
+
+
+def test_markup_and_emoji_are_not_spoken():
+    assert normalize_tts_text("🌽 *Maize* price:\n  ₦25,000 per bag ✅") == "Maize price: ₦25,000 per bag"
+
+
+def test_repeated_answer_is_synthesized_once(tmp_path):
+    service, engine = make_service(tmp_path)
+
+    async def scenario():
+        first = await service.generate("*Spray* neem extract 🌿", "hausa")
+        second = await service.generate("Spray neem extract", "hausa")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert engine.calls == [("Spray neem extract", "ha")]
+    key = first.rsplit("/", 1)[-1]
+    assert service.cache.get(key).parent.name == key[:2]
+
+
+def test_concurrent_requests_share_one_synthesis(tmp_path):
+    service, engine = make_service(tmp_path)
+
+    async def scenario():
+        return await asyncio.gather(*[service.generate("Harvest when dry", "english") for _ in range(5)])
+
+    urls = asyncio.run(scenario())
+    assert len(set(urls)) == 1
+    assert len(engine.calls) == 1
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_cached_audio_supports_range_requests(tmp_path, monkeypatch):
+    from app.api.endpoints import chat
+
+    service, _ = make_service(tmp_path)
+    monkeypatch.setattr(chat, "tts_service", service)
+    url = asyncio.run(service.generate("Store rice in a cool place", "english"))
+    key = url.rsplit("/", 1)[-1]
+    audio = service.cache.get(key).read_bytes()
+
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    client = TestClient(app)
+
+    response = client.get(f"/chat/tts/{key}")
+    assert response.status_code == 200
+    assert response.content == audio
+
+    response = client.get(f"/chat/tts/{key}", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == audio[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(audio)}"
+
+    assert client.get(f"/chat/tts/{key}", headers={"Range": f"bytes={len(audio) + 5}-"}).status_code == 416
+    assert client.get("/chat/tts/not-a-key").status_code == 404
+    assert client.get(f"/chat/tts/{'0' * 64}").status_code == 404
@@ -0,0 +1,217 @@
+"""
+Tests for the voice worker and the background job queue it runs on
+"""
+import asyncio
+import sys
+import os
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlite_models import make_session_factory
+
+from app.api.endpoints import chat
+from app.models.conversation import ChatSession, VoiceMessage
+from app.models.user import LanguagePreference, User, UserType
+from app.services.voice_service import VoiceService
+from app.workers import voice_processor as voice_processor_module
+from app.workers.queue import JobQueue, MemoryQueueBackend, create_queue_backend
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def wait_until(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        await asyncio.sleep(0.01)
+
+
+def test_jobs_are_processed_concurrently():
+    async def scenario():
+        processed = []
+        active = {"now": 0, "max": 0}
+
+        async def handler(job):
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            await asyncio.sleep(0.05)
+            processed.append(job["id"])
+            active["now"] -= 1
+
+        queue = JobQueue("test", handler, concurrency=3, poll_timeout=0.05)
+        await queue.start()
+        for i in range(6):
+            await queue.enqueue({"id": i})
+        await wait_until(lambda: len(processed) == 6)
+        await queue.stop()
+        return processed, active["max"]
+
+    processed, max_active = run(scenario())
+    assert sorted(processed) == list(range(6))
+    assert max_active == 3
+
+
+def test_failed_job_is_retried_then_succeeds():
+    async def scenario():
+        attempts = []
+
+        async def handler(job):
+            attempts.append(job["attempt"])
+            if len(attempts) < 3:
+                raise RuntimeError("transient")
+
+        queue = JobQueue("test", handler, max_retries=3, backoff_seconds=0.01, poll_timeout=0.05)
+        await queue.start()
+        await queue.enqueue({"id": "a"})
+        await wait_until(lambda: len(attempts) == 3)
+        await queue.stop()
+        return attempts
+
+    assert run(scenario()) == [0, 1, 2]
+
+
+def test_failure_handler_called_after_max_retries():
+    async def scenario():
+        failures = []
+        calls = []
+
+        async def handler(job):
+            calls.append(job["id"])
+            raise RuntimeError("boom")
+
+        async def on_failure(job, error):
+            failures.append((job["id"], job["attempt"], str(error)))
+
+        queue = JobQueue("test", handler, max_retries=2, backoff_seconds=0.01,
+                         on_failure=on_failure, poll_timeout=0.05)
+        await queue.start()
+        await queue.enqueue({"id": "b"})
+        await wait_until(lambda: len(failures) == 1)
+        await queue.stop()
+        return calls, failures
+
+    calls, failures = run(scenario())
+    assert len(calls) == 3
+    assert failures == [("b", 3, "boom")]
+
+
+def test_retry_delay_is_bounded_by_exponential_backoff():
+    queue = JobQueue("test", None, backoff_seconds=2.0)
+    for attempt in range(1, 5):
+        delay = queue.retry_delay(attempt)
+        assert 0 <= delay <= 2.0 * (2 ** (attempt - 1))
+
+
+def test_create_queue_backend():
+    assert isinstance(create_queue_backend("memory", "voice"), MemoryQueueBackend)
+    try:
+        create_queue_backend("redis", "voice", None)
+        assert False, "redis backend without a URL should fail"
+    except ValueError:
+        pass
+
+
+class SlowWhisper:
+    """Stands in for the sync Groq client: every transcription blocks its thread"""
+
+    def __init__(self, seconds=0.2):
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self.create))
+        self.seconds = seconds
+        self.languages = []
+
+    def create(self, file, model, response_format, **options):
+        time.sleep(self.seconds)
+        self.languages.append(options.get("language"))
+        return "Ina da buhunan masara hamsin"
+
+
+def test_transcription_does_not_block_the_event_loop(tmp_path):
+    audio = tmp_path / "note.ogg"
+    audio.write_bytes(b"OggS")
+    service = VoiceService()
+    service.client = SlowWhisper()
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        started = time.monotonic()
+        texts = await asyncio.gather(*(service.transcribe_voice_note(str(audio), language=None) for _ in range(2)))
+        elapsed = time.monotonic() - started
+        ticking.cancel()
+        return texts, elapsed, ticks
+
+    texts, elapsed, ticks = run(scenario())
+    assert texts == ["Ina da buhunan masara hamsin"] * 2
+    assert elapsed < 0.35  # The two calls overlapped
+    assert ticks >= 10  # The loop kept running meanwhile
+
+
+class FakeAgent:
+    async def process_query(self, text, user=None, conversation_history=None, language=None, session_id=None):
+        return f"Reply to: {text}"
+
+
+def test_voice_job_is_transcribed_answered_and_stored(tmp_path, monkeypatch):
+    factory = make_session_factory()
+    with factory() as db:
+        db.add_all([
+            User(id="farmer1", phone_number="+2348000000001", user_type=UserType.FARMER,
+                 language_preference=LanguagePreference.HAUSA),
+            ChatSession(id="chat_1", user_id="farmer1", session_type="advisory", user_message="", ai_response=""),
+            *[VoiceMessage(id=f"voice_{i}", user_id="farmer1", audio_file_url=str(tmp_path / f"note{i}.ogg"),
+                           audio_duration_seconds=3, processing_status="pending") for i in (1, 2)],
+        ])
+        db.commit()
+    for i in (1, 2):
+        (tmp_path / f"note{i}.ogg").write_bytes(b"OggS")
+    monkeypatch.setattr(voice_processor_module, "SessionLocal", factory)
+
+    replies = []
+
+    async def audio(text, language=None):
+        replies.append(text)
+        return f"/api/v1/chat/tts/reply{len(replies)}"
+
+    monkeypatch.setattr(voice_processor_module.tts_service, "generate", audio)
+    processor = voice_processor_module.VoiceProcessor()
+    processor.voice_service.client = SlowWhisper(seconds=0)
+    processor._ai_agent = FakeAgent()
+
+    async def scenario():
+        for i in (1, 2):
+            await processor.process_job({"voice_message_id": f"voice_{i}", "session_id": "chat_1", "user_id": "farmer1"})
+        await asyncio.gather(*processor._tts_tasks)
+
+    run(scenario())
+    # The profile language, confirmed by the first note, is the hint for both
+    assert processor.voice_service.client.languages == ["ha", "ha"]
+
+    with factory() as db:
+        voice_message = db.get(VoiceMessage, "voice_1")
+        assert voice_message.processing_status == "completed"
+        assert (voice_message.transcription, voice_message.language_detected) == ("Ina da buhunan masara hamsin", "hausa")
+        messages = db.get(ChatSession, "chat_1").context_data["messages"]
+        assert [message["content"] for message in messages][:2] == [
+            "Ina da buhunan masara hamsin", "Reply to: Ina da buhunan masara hamsin",
+        ]
+        session = db.get(ChatSession, "chat_1")
+        assert (session.voice_message_id, session.ai_voice_response_url) == ("voice_2", "/api/v1/chat/tts/reply2")
+
+        # The older note keeps its own reply once the session has moved on
+        status = run(chat.get_voice_note_status("voice_1", current_user=db.get(User, "farmer1"), db=db))
+        assert (status["status"], status["session_id"]) == ("completed", "chat_1")
+        assert status["ai_response"] == "Reply to: Ina da buhunan masara hamsin"
+        assert status["tts_audio_url"] == "/api/v1/chat/tts/reply1"
+    assert not (tmp_path / "note1.ogg").exists()